@@ -4,12 +4,179 @@
 LexiSharp-linux 主程序：通过录音 + 多种云端 ASR（火山引擎、Soniox 等）实现一键语音输入。
 """
 
+# ctl 子命令只是常驻进程的轻量客户端：本段只依赖标准库，在加载 Tk、requests、numpy、sherpa-onnx 等依赖之前处理，
+# 窗口管理器快捷键绑定的 `lexisharp.py ctl toggle` 因此几乎没有启动开销
+import argparse
+import json
+import os
+import socket
+import struct
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+# 配置文件路径
+CONFIG_DIR = Path.home() / ".lexisharp-linux"
+CONFIG_PATH = CONFIG_DIR / "config.json"
+
+
+# ====== Unix 套接字帧协议（本地模型服务 / 控制通道共用） ======
+FRAME_HEADER = struct.Struct("!II")
+FRAME_MAX_HEADER_BYTES = 64 * 1024
+FRAME_MAX_PAYLOAD_BYTES = 256 * 1024 * 1024
+
+
+def send_frame(sock: socket.socket, header: dict, payload: bytes = b"") -> None:
+    """
+    发送一帧：8 字节长度前缀（JSON 头长度、负载长度）+ UTF-8 JSON 头 + 原始负载。
+    """
+    head = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    sock.sendall(FRAME_HEADER.pack(len(head), len(payload)) + head)
+    if payload:
+        sock.sendall(payload)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:], size - received)
+        if not count:
+            raise ConnectionError("连接已关闭。")
+        received += count
+    return bytes(buffer)
+
+
+def recv_frame(sock: socket.socket) -> tuple[dict, bytes]:
+    """
+    读取一帧，返回 (JSON 头, 负载)。
+    """
+    head_len, payload_len = FRAME_HEADER.unpack(_recv_exact(sock, FRAME_HEADER.size))
+    if head_len > FRAME_MAX_HEADER_BYTES or payload_len > FRAME_MAX_PAYLOAD_BYTES:
+        raise ConnectionError("帧长度超出限制。")
+    header = json.loads(_recv_exact(sock, head_len).decode("utf-8")) if head_len else {}
+    payload = _recv_exact(sock, payload_len) if payload_len else b""
+    return header, payload
+
+
+def unix_request(
+    path: str,
+    header: dict,
+    payload: bytes = b"",
+    timeout: float = 30.0,
+    trusted_uids: Optional[set] = None,
+) -> tuple[dict, bytes]:
+    """
+    连接 Unix 套接字发送一帧请求并等待一帧应答。
+    指定 trusted_uids 时先经 SO_PEERCRED 校验监听方的用户 ID，不在其中则不发送任何数据。
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        if trusted_uids is not None:
+            uid = _peer_uid(sock)
+            if uid not in trusted_uids:
+                raise PermissionError(f"套接字 {path} 的监听方（uid={uid}）不受信任，已拒绝发送音频")
+        send_frame(sock, header, payload)
+        return recv_frame(sock)
+
+
+def _peer_uid(sock: socket.socket) -> int:
+    """
+    通过 SO_PEERCRED 获取对端用户 ID，失败时返回 -1。
+    """
+    try:
+        creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+        _pid, uid, _gid = struct.unpack("3i", creds)
+        return uid
+    except (OSError, AttributeError):
+        return -1
+
+
+def default_daemon_socket(config: dict) -> str:
+    """
+    控制套接字路径：优先配置项 daemon_socket，其次 $XDG_RUNTIME_DIR，最后配置目录。
+    """
+    configured = str(config.get("daemon_socket") or "").strip()
+    if configured:
+        return os.path.expanduser(configured)
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and Path(runtime_dir).is_dir():
+        return str(Path(runtime_dir) / "lexisharp.sock")
+    return str(CONFIG_DIR / "daemon.sock")
+
+
+def add_ctl_arguments(ctl: argparse.ArgumentParser) -> None:
+    ctl.add_argument("action", choices=["start", "stop", "toggle", "status", "transcribe", "ping", "quit"])
+    ctl.add_argument("file", nargs="?", help="transcribe 命令的音频文件（16-bit 单声道 WAV）")
+    ctl.add_argument("--socket", metavar="PATH", help="控制套接字路径")
+    ctl.add_argument("--no-output", action="store_true", help="stop/toggle 仅返回文本，不复制或自动粘贴")
+    ctl.add_argument("--output", action="store_true", help="transcribe 结果同样复制/粘贴到当前窗口")
+    ctl.add_argument("--json", action="store_true", help="以 JSON 输出完整应答")
+    ctl.add_argument("--timeout", type=float, default=120.0, help="等待应答的超时（秒，默认 120）")
+
+
+def run_ctl(args: argparse.Namespace, config: dict) -> int:
+    """
+    向常驻进程发送控制命令，识别文本输出到标准输出。
+    """
+    header: dict = {"op": args.action, "deliver": not args.no_output}
+    if args.action == "transcribe":
+        if not args.file:
+            print("transcribe 需要指定音频文件。", file=sys.stderr)
+            return 2
+        header["path"] = str(Path(args.file).expanduser().resolve())
+        header["deliver"] = bool(args.output)
+    socket_path = args.socket or default_daemon_socket(config)
+    try:
+        reply, _ = unix_request(socket_path, header, timeout=args.timeout)
+    except FileNotFoundError:
+        print(f"常驻进程未运行（{socket_path}），请先执行 `lexisharp.py daemon`。", file=sys.stderr)
+        return 3
+    except (OSError, ConnectionError) as exc:
+        print(f"连接常驻进程失败：{exc}", file=sys.stderr)
+        return 3
+    if args.json:
+        print(json.dumps(reply, ensure_ascii=False))
+    elif not reply.get("ok"):
+        print(reply.get("error") or "未知错误", file=sys.stderr)
+    elif reply.get("text"):
+        print(reply["text"])
+    elif args.action == "status":
+        print(f"{reply.get('state')}（{reply.get('channel')}）：{reply.get('last_status')}")
+    return 0 if reply.get("ok") else 1
+
+
+def _read_config_file() -> dict:
+    """
+    只读方式加载配置文件（不补全、不写回），供 ctl 使用。
+    """
+    try:
+        return json.loads(CONFIG_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+if __name__ == "__main__" and sys.argv[1:2] == ["ctl"]:
+    _ctl_parser = argparse.ArgumentParser(prog="lexisharp.py ctl", description="控制常驻进程")
+    add_ctl_arguments(_ctl_parser)
+    raise SystemExit(run_ctl(_ctl_parser.parse_args(sys.argv[2:]), _read_config_file()))
+
+
 import asyncio
 import audioop
 import base64
-import json
+import collections
+import concurrent.futures
+import gzip
+import hashlib
 import logging
-import os
+import multiprocessing
+import platform
+import random
+import re
+import resource
 import shutil
 import signal
 import subprocess
@@ -17,11 +184,16 @@ import tempfile
 import threading
 import time
 import wave
+import weakref
+from importlib import metadata as importlib_metadata
 from dataclasses import dataclass
 from logging.handlers import RotatingFileHandler
-from pathlib import Path
+from multiprocessing import connection as mp_connection
+from multiprocessing import shared_memory
 from http import HTTPStatus
-from typing import List, Optional
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
 from uuid import uuid4
 
 import tkinter as tk
@@ -30,18 +202,45 @@ from tkinter import filedialog
 
 import pyperclip
 import requests
-from pynput import keyboard as pynput_keyboard
 
 try:
-    from evdev import UInput, ecodes
+    from pynput import keyboard as pynput_keyboard
+except Exception:  # pragma: no cover - 无图形会话（命令行/基准测试等）时不可用
+    pynput_keyboard = None
+
+try:
+    from evdev import InputDevice, UInput, ecodes, list_devices
 except ImportError:  # pragma: no cover - 处理运行时缺失
+    InputDevice = None
     UInput = None
     ecodes = None
+    list_devices = None
+
+# X11 进程内键入：python-xlib 的 XTest 扩展（pynput 的依赖）
+try:
+    from Xlib import X, XK
+    from Xlib import display as xlib_display
+    from Xlib.ext import xtest
+    from Xlib.protocol.event import ClientMessage as XClientMessage
+except ImportError:  # pragma: no cover - 处理运行时缺失
+    X = XK = xlib_display = xtest = XClientMessage = None
 
+# 异步 HTTP 引擎：httpx（可选），安装 h2 后启用 HTTP/2
 try:
-    import dashscope  # type: ignore[import]
+    import httpx  # type: ignore[import]
 except ImportError:  # pragma: no cover - 处理运行时缺失
-    dashscope = None
+    httpx = None
+
+try:
+    import h2  # type: ignore[import]  # noqa: F401
+except ImportError:  # pragma: no cover - 处理运行时缺失
+    h2 = None
+
+# 流式识别渠道（volcengine_stream / soniox_stream）：websocket-client（可选）
+try:
+    import websocket  # type: ignore[import]
+except ImportError:  # pragma: no cover - 处理运行时缺失
+    websocket = None
 
 # 本地引擎：sherpa-onnx（可选）
 try:  # pragma: no cover - 运行时动态可用
@@ -67,7 +266,7 @@ except Exception:
 try:
     from dbus_next import BusType, Message
     from dbus_next.constants import MessageType
-    from dbus_next.errors import DBusError
+    from dbus_next.errors import DBusError, InterfaceNotFoundError
     from dbus_next.aio import MessageBus
 except ImportError:  # pragma: no cover - 处理运行时缺失
     BusType = None
@@ -75,11 +274,19 @@ except ImportError:  # pragma: no cover - 处理运行时缺失
     MessageBus = None
     MessageType = None
     DBusError = Exception
+    InterfaceNotFoundError = Exception
 
-# 配置文件路径
-CONFIG_DIR = Path.home() / ".lexisharp-linux"
-CONFIG_PATH = CONFIG_DIR / "config.json"
 LOG_PATH = CONFIG_DIR / "lexisharp.log"
+# 接入点测速结果（重启后沿用）
+ENDPOINTS_PATH = CONFIG_DIR / "endpoints.json"
+# 识别失败的录音暂存目录与补识别结果记录
+SPOOL_DIR = CONFIG_DIR / "spool"
+SPOOL_RESULTS_PATH = CONFIG_DIR / "spool_results.jsonl"
+# 识别结果缓存目录（按音频内容与渠道配置寻址）
+TRANSCRIPT_CACHE_DIR = CONFIG_DIR / "cache"
+
+# 通义千问（DashScope）多模态生成接口路径
+QWEN_GENERATION_PATH = "/api/v1/services/aigc/multimodal-generation/generation"
 
 # 默认配置模板
 NEW_CONFIG_CREATED = False
@@ -90,6 +297,10 @@ CONFIG_TEMPLATE = {
     "access_key": "在此填写Access Key",
     "resource_id": "volc.bigasr.auc_turbo",
     "model_name": "bigmodel",
+    # 火山引擎请求体发送方式：stream（边编码边上传，带 Content-Length）、chunked（分块传输编码）、buffer（整体构造后发送）
+    "volc_upload_mode": "stream",
+    # 上传音频编码：wav（原始 PCM）或 opus（录音期间由 ffmpeg 实时压缩）
+    "volc_upload_codec": "wav",
     "channel": "volcengine",
     "soniox_api_base": "https://api.soniox.com",
     "soniox_api_key": "在此填写Soniox API Key",
@@ -98,18 +309,36 @@ CONFIG_TEMPLATE = {
     "soniox_enable_speaker_diarization": False,
     "soniox_enable_language_identification": False,
     "soniox_context": "",
+    # 自适应轮询：首次按音频时长估算等待，之后从 soniox_poll_min_interval_s 起退避至 soniox_poll_interval_s
     "soniox_poll_interval_s": 1.0,
+    "soniox_poll_min_interval_s": 0.15,
     "soniox_poll_timeout_s": 120.0,
+    # 上传文件与转写任务的删除放到后台队列，失败时按退避重试的次数
+    "soniox_cleanup_retries": 3,
+    # 上传音频编码：wav、flac（无损）或 opus
+    "soniox_upload_codec": "wav",
+    # 边录音边上传（分块传输编码），停止录音后只剩最后一块数据；开启后忽略 soniox_upload_codec
+    "soniox_live_upload": False,
     "qwen_api_key": "在此填写DashScope API Key",
+    # 上传音频编码：wav、flac（无损）或 opus
+    "qwen_upload_codec": "wav",
     "qwen_model": "qwen3-asr-flash",
     "qwen_context": "",
     "qwen_language": "",
     "qwen_enable_lid": True,
     "qwen_enable_itn": False,
+    # DashScope 接口地址（国际站可改为 https://dashscope-intl.aliyuncs.com）
+    "qwen_api_base": "https://dashscope.aliyuncs.com",
+    # 改用 dashscope SDK 调用（SDK 会先上传音频到临时存储，多一次往返）
+    "qwen_use_sdk": False,
     "auto_paste": True,
     "input_method": "dbus",
     "dbus_fallback_to_clipboard": True,
     "dbus_timeout_ms": 300,
+    # DBus 输入不可用（如使用 IBus 的桌面）回退为剪贴板粘贴时，粘贴完成后恢复原来的剪贴板文本
+    "dbus_fallback_restore_clipboard": True,
+    # 恢复前等待目标程序读取剪贴板的时间（毫秒）
+    "clipboard_restore_delay_ms": 500,
     "paste_delay_ms": 200,
     "max_wait_s": 45,
     "log_level": "INFO",
@@ -118,7 +347,14 @@ CONFIG_TEMPLATE = {
     "stop_hotkey": "ctrl+alt+s",
     "floating_button_enabled": False,
     "floating_button_size": 96,
+    # 模拟键入的按键间隔（毫秒）：xdotool 固定使用该值，uinput 直接键入用作每组按键之间的间隔，XTest 在 0 ~ 该值之间自适应
     "type_delay_ms": 5,
+    # X11 模拟键入引擎：xtest（进程内 XTest 扩展，需 python-xlib）或 xdotool（xdotool type 子进程）
+    "x11_typing_engine": "xtest",
+    # Wayland 下经 uinput 虚拟键盘直接键入（按 US 键盘布局，仅限可打印 ASCII 文本，不经过剪贴板）：
+    # auto 仅在确认键盘布局为 US、未检测到 Fcitx/IBus（输入法处于中文模式会截获按键）且能读取物理键盘状态时启用，
+    # always 始终启用（布局由用户保证），off 关闭
+    "uinput_direct_typing": "auto",
     # ===== 本地引擎（sherpa-onnx）相关配置 =====
     # 当前选择的本地模型规格：small 或 full
     "local_sherpa_variant": "small",
@@ -135,6 +371,109 @@ CONFIG_TEMPLATE = {
     "local_sherpa_trim_silence": False,
     # 去静音阈值（0.0~1.0，幅度），适度调大以更激进裁剪
     "local_sherpa_vad_threshold": 0.01,
+    # 固定解码方法（greedy_search/modified_beam_search），留空则 greedy 优先、失败回退 beam
+    "local_sherpa_decoding_method": "",
+    # 在独立子进程中运行本地识别器（原生崩溃不影响主程序，崩溃后自动重启）
+    "local_sherpa_process_isolation": False,
+    # ===== 多用户共享的本地识别服务（local_server 渠道） =====
+    # 服务端 Unix 套接字路径（由 `lexisharp.py server` 提供），应位于其他用户不可写的目录
+    "local_server_socket": "/run/lexisharp/asr.sock",
+    # 信任的服务端用户 ID：连接时经 SO_PEERCRED 校验，root 与当前用户始终信任，留空则不额外信任其他用户
+    "local_server_owner_uid": "",
+    # 请求的模型名称，留空使用服务端默认模型
+    "local_server_model": "",
+    # 常驻模式（daemon）控制套接字，留空使用 $XDG_RUNTIME_DIR/lexisharp.sock
+    "daemon_socket": "",
+    # ===== HTTP 连接池（云端渠道共用） =====
+    # 每个主机保持的最大连接数
+    "http_pool_maxsize": 4,
+    # 连接空闲超过该时长（秒）后重建会话，需小于服务端的 keep-alive 超时
+    "http_idle_timeout_s": 50,
+    # 云端请求引擎：requests（同步连接池）或 async（httpx 异步引擎，安装 h2 后启用 HTTP/2 多路复用）
+    "http_engine": "requests",
+    # 开始录音时在后台经一次 HEAD 请求提前建立到识别服务的连接（DNS + TCP + TLS），录音较长时定期续期
+    "http_warmup": True,
+    # ===== 流式识别渠道（录音期间经 WebSocket 发送音频，实时显示中间结果） =====
+    # 火山引擎大模型流式识别地址与资源 ID（凭证复用 app_key / access_key）
+    "volc_stream_url": "wss://openspeech.bytedance.com/api/v3/sauc/bigmodel",
+    "volc_stream_resource_id": "volc.bigasr.sauc.duration",
+    # Soniox 实时识别地址与模型（凭证复用 soniox_api_key）
+    "soniox_stream_url": "wss://stt-rt.soniox.com/transcribe-websocket",
+    "soniox_stream_model": "stt-rt-preview",
+    # 每个音频包的时长（毫秒）
+    "stream_packet_ms": 100,
+    # 停止录音后等待最终结果的超时（秒）
+    "stream_final_timeout_s": 10,
+    # ===== 上传音频压缩（各渠道 *_upload_codec 不为 wav 时使用） =====
+    # ffmpeg 可执行文件路径
+    "ffmpeg_path": "ffmpeg",
+    # Opus 编码码率（kbps），语音 16~32 已足够
+    "opus_bitrate_kbps": 24,
+    # ===== 对冲识别（主渠道迟迟未返回时，把同一段音频同时发给备用渠道，先得到非空结果者胜出） =====
+    # 备用渠道（如 local_sherpa、local_server 或另一云端渠道），留空关闭
+    "hedge_channel": "",
+    # 发出备用请求前的等待（毫秒）；0 表示使用主渠道近期耗时的 p90
+    "hedge_delay_ms": 0,
+    # 主渠道耗时样本不足 10 条时使用的等待（毫秒）
+    "hedge_default_delay_ms": 2000,
+    # ===== 自适应请求超时（关闭时所有云端请求固定使用 max_wait_s） =====
+    "adaptive_timeout": True,
+    # 近期样本不足 10 条时的先验估计：固定开销（秒）+ 音频时长 × 每秒音频允许的处理时间
+    "timeout_base_s": 5,
+    "timeout_per_audio_s": 0.5,
+    # 样本充足后取该渠道（耗时 / 音频时长）的 p95 × 音频时长 × 该倍数
+    "timeout_headroom": 2.0,
+    # 超时的下限与上限（秒）
+    "timeout_floor_s": 8,
+    "timeout_ceiling_s": 120,
+    # ===== 失败录音暂存（网络中断等导致识别失败时保留录音，恢复后自动补识别） =====
+    "spool_enabled": True,
+    # 暂存目录，留空使用 ~/.lexisharp-linux/spool
+    "spool_dir": "",
+    # 暂存总容量（MB）与最长保留时间（小时），超出时先删除最旧的录音
+    "spool_max_mb": 200,
+    "spool_max_age_h": 72,
+    # 补识别失败后的重试间隔：从基数（秒）起逐次翻倍，不超过上限（秒）
+    "spool_retry_base_s": 30,
+    "spool_retry_max_s": 1800,
+    # 补识别结果的去向：history（仅写入 spool_results.jsonl）或 clipboard（同时复制到剪贴板）
+    "spool_deliver": "history",
+    # ===== 识别结果缓存（同一段音频、同一渠道与识别配置直接返回上次的结果） =====
+    # 仅用于重复识别已有文件的场景：batch、设置界面测试 WAV、ctl transcribe；实时录音从不重复，不读也不写缓存。
+    # 缓存以明文保存识别文本；关闭即完全绕过，batch 命令可用 --no-cache 临时绕过
+    "transcript_cache_enabled": True,
+    # 缓存目录，留空使用 ~/.lexisharp-linux/cache
+    "transcript_cache_dir": "",
+    # 缓存总容量（MB），超出时淘汰最久未使用的结果
+    "transcript_cache_max_mb": 50,
+    # ===== 接入点测速（同一服务有多个地域接入点时自动选用最快的健康接入点） =====
+    # 各渠道的候选接入点，键为 volcengine / soniox / qwen，值的格式分别与 api_url / soniox_api_base / qwen_api_base 相同，
+    # 如 {"soniox": ["https://api.soniox.com"]}；当前配置的接入点自动参与测速，留空关闭
+    "endpoint_candidates": {},
+    # 测速间隔（秒）与每轮额外的随机抖动上限（秒）
+    "endpoint_probe_interval_s": 900,
+    "endpoint_probe_jitter_s": 120,
+    # ===== 按时长路由（短句走本地模型，省去云端往返） =====
+    "route_by_duration": False,
+    # 短句使用的渠道（local_sherpa 或 local_server）
+    "route_short_channel": "local_sherpa",
+    # 时长不超过该值（秒）的录音视为短句
+    "route_short_max_s": 3.0,
+    # 仅在本地识别器已加载（热）时才把短句路由到本地，未就绪时在后台加载
+    "route_require_warm": True,
+    # ===== 故障转移与熔断 =====
+    # 主渠道失败后依次尝试的备用渠道（如 ["soniox", "local_sherpa"]），留空只使用 channel
+    "fallback_channels": [],
+    # 每个渠道失败后的额外重试次数（带随机抖动的指数退避）
+    "channel_retries": 1,
+    # 重试退避基数（毫秒）：第 n 次重试前随机等待 0 ~ 基数 × 2^(n-1)
+    "retry_backoff_ms": 300,
+    # 单次识别（含重试与故障转移）的总时间预算（秒），单个请求的超时也不会超过剩余预算
+    "recognition_budget_s": 60,
+    # 渠道连续失败达到该次数后熔断，冷却期内直接跳过
+    "breaker_failure_threshold": 3,
+    # 熔断冷却时长（秒），之后放行一次试探请求，成功即恢复
+    "breaker_cooldown_s": 60,
     # 仅保留 GitHub Releases 下载方式
 }
 
@@ -229,6 +568,26 @@ def current_active_window() -> Optional[str]:
         return None
 
 
+def window_name(window_id: Optional[str]) -> str:
+    """
+    获取窗口标题，便于调试。
+    """
+    if not window_id:
+        return ""
+    try:
+        result = subprocess.run(
+            ["xdotool", "getwindowname", window_id],
+            check=False,
+            capture_output=True,
+            text=True,
+            timeout=0.5
+        )
+        name = result.stdout.strip()
+        return name or ""
+    except Exception:  # pragma: no cover
+        return ""
+
+
 class ClipboardHelper:
     """
     统一管理剪贴板操作，根据当前桌面环境自动选择工具。
@@ -238,6 +597,9 @@ class ClipboardHelper:
         parent_logger = logger or logging.getLogger("lexisharp")
         self.logger = parent_logger.getChild("clipboard")
         self._wl_copy_processes: List[subprocess.Popen] = []
+        # 尚未执行的剪贴板恢复（定时器, 待恢复的原文本）
+        self._pending_restore: Optional[tuple[threading.Timer, str]] = None
+        self._restore_lock = threading.Lock()
 
     @staticmethod
     def _is_wayland() -> bool:
@@ -327,6 +689,52 @@ class ClipboardHelper:
             self.logger.info("pyperclip 写入剪贴板成功")
             return True
 
+    def snapshot_text(self) -> Optional[str]:
+        """
+        读取当前剪贴板文本以便粘贴后恢复；剪贴板为空或内容不是文本（如图片）时返回 None。
+        上一次恢复尚未执行时直接沿用其原文本（此时剪贴板里是上一段识别结果）。
+        """
+        with self._restore_lock:
+            if self._pending_restore is not None:
+                timer, previous = self._pending_restore
+                timer.cancel()
+                self._pending_restore = None
+                return previous
+        if self._is_wayland():
+            wl_paste = self._which("wl-paste")
+            if wl_paste:
+                try:
+                    result = subprocess.run([wl_paste, "--list-types"], capture_output=True, text=True, timeout=1)
+                except (OSError, subprocess.SubprocessError):
+                    return None
+                types = result.stdout.split()
+                if not any(kind.startswith("text/") or kind in {"UTF8_STRING", "STRING", "TEXT"} for kind in types):
+                    self.logger.info("剪贴板为空或不是文本，粘贴后不恢复。")
+                    return None
+        return self.paste() or None
+
+    def restore_later(self, previous: str, pasted: str, delay_ms: int) -> None:
+        """
+        等待目标程序读取剪贴板后恢复原文本；期间剪贴板若已被改写（不再是 pasted）则放弃恢复。
+        """
+
+        def restore() -> None:
+            with self._restore_lock:
+                if self._pending_restore is None or self._pending_restore[0] is not timer:
+                    return
+                self._pending_restore = None
+            if self.paste().rstrip("\n") != pasted.rstrip("\n"):
+                self.logger.info("剪贴板已被其他程序改写，跳过恢复。")
+                return
+            if self.copy(previous):
+                self.logger.info("已恢复粘贴前的剪贴板内容，字符数=%d", len(previous))
+
+        timer = threading.Timer(max(0, delay_ms) / 1000.0, restore)
+        timer.daemon = True
+        with self._restore_lock:
+            self._pending_restore = (timer, previous)
+        timer.start()
+
     def paste(self) -> str:
         """
         从剪贴板读取文本，Wayland 优先使用 wl-paste。
@@ -378,10 +786,16 @@ class AutoPasteResult:
     clipboard_synced: bool
     method: str
     status_message: Optional[str] = None
+    # 粘贴后已安排恢复原剪贴板：识别结果不会留在剪贴板中
+    clipboard_restoring: bool = False
 
 
 class FcitxDbusInput:
-    """通过 Fcitx DBus 接口提交文本，避免修改剪贴板。"""
+    """
+    通过 Fcitx DBus 接口提交文本，避免修改剪贴板。
+    Session Bus 连接常驻在独立的事件循环线程上，可用的服务/接口与输入上下文在多次提交间复用；
+    Fcitx 重启（NameOwnerChanged）或总线断开时清除缓存，下次提交重新发现。
+    """
 
     SERVICE_CANDIDATES = (
         (
@@ -400,6 +814,9 @@ class FcitxDbusInput:
         "org.fcitx.Fcitx.InputContext1",
         "org.fcitx.Fcitx.InputContext",
     )
+    # IBus 在 Session Bus 上注册的名称（ibus-daemon 本身使用私有总线）。
+    # IBus 的 CommitText 是守护进程发给客户端的信号，没有供外部程序提交文本的方法，只用于识别当前输入法框架。
+    IBUS_SERVICES = ("org.freedesktop.portal.IBus", "org.freedesktop.IBus")
 
     def __init__(
         self,
@@ -412,6 +829,21 @@ class FcitxDbusInput:
         self.timeout_ms = max(100, int(timeout_ms))
         self.app_name = app_name
         self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        # 以下状态只在事件循环线程中读写
+        self._bus: Optional[MessageBus] = None
+        # 可用的服务名与输入法接口代理（服务重启后仍可沿用，服务消失时清除）
+        self._service: Optional[str] = None
+        self._im_iface = None
+        # 复用的输入上下文（路径属于当前 Fcitx 进程，服务重启即失效）
+        self._context_path: Optional[str] = None
+        self._context_iface = None
+        # 输入上下文的自省信息与接口名：同一服务的所有上下文结构相同，只需自省一次
+        self._context_introspection = None
+        self._context_iface_name: Optional[str] = None
+        # 当前占用总线的输入法框架（"fcitx" / "ibus" / "" 表示均未检测到；None 表示需重新检测）
+        self._framework: Optional[str] = None
 
     @property
     def _timeout(self) -> float:
@@ -429,66 +861,233 @@ class FcitxDbusInput:
             self.logger.debug("待提交文本为空，忽略 DBus 调用。")
             return True
         with self._lock:
+            future = asyncio.run_coroutine_threadsafe(self._send(payload), self._ensure_loop())
             try:
-                return self._run_async(self._send_once(payload))
+                # 冷启动需连接总线并发现服务（约 6 次往返），单次调用受 dbus_timeout_ms 限制
+                return future.result(timeout=self._timeout * 8 + 1.0)
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                self.logger.warning("DBus 输入超时，已放弃本次提交。")
+                return False
             except Exception:  # pragma: no cover
                 self.logger.exception("DBus 输入流程出现异常")
                 return False
 
-    def close(self) -> None:
-        # 对于异步实现，无需额外资源释放。
+    def framework(self) -> Optional[str]:
+        """
+        返回当前运行的输入法框架："fcitx"、"ibus" 或 None。
+        按 Session Bus 上的服务名判断并缓存，输入法进程启动/退出时失效；总线不可用时按 XMODIFIERS 等环境变量推断。
+        """
+        if not self.is_supported():
+            return self._framework_from_env()
+        with self._lock:
+            future = asyncio.run_coroutine_threadsafe(self._detect_framework(), self._ensure_loop())
+            try:
+                return future.result(timeout=self._timeout * 4 + 1.0)
+            except Exception:  # pylint: disable=broad-except
+                future.cancel()
+                self.logger.debug("检测输入法框架失败", exc_info=True)
+                return self._framework_from_env()
+
+    @staticmethod
+    def _framework_from_env() -> Optional[str]:
+        hints = " ".join(
+            os.environ.get(name, "") for name in ("XMODIFIERS", "GTK_IM_MODULE", "QT_IM_MODULE")
+        ).lower()
+        if "fcitx" in hints:
+            return "fcitx"
+        if "ibus" in hints:
+            return "ibus"
         return None
 
-    def _run_async(self, coro: "asyncio.Future[bool]") -> bool:
-        try:
-            return asyncio.run(coro)
-        except RuntimeError as exc:
-            if "asyncio.run() cannot be called from a running event loop" in str(exc):
-                loop = asyncio.new_event_loop()
-                try:
-                    asyncio.set_event_loop(loop)
-                    return loop.run_until_complete(coro)
-                finally:
-                    asyncio.set_event_loop(None)
-                    loop.close()
-            raise
+    def warmup(self) -> None:
+        """
+        在后台提前连接总线并创建输入上下文，首次提交时只剩提交本身的往返。
+        """
+        if not self.is_supported():
+            return
+        asyncio.run_coroutine_threadsafe(self._ensure_context(), self._ensure_loop())
+
+    def close(self) -> None:
+        with self._lock:
+            loop, self._loop = self._loop, None
+            if loop is None:
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout=self._timeout + 1.0)
+            except Exception:  # pylint: disable=broad-except
+                self.logger.debug("关闭 DBus 连接失败", exc_info=True)
+            loop.call_soon_threadsafe(loop.stop)
+            if self._thread is not None:
+                self._thread.join(timeout=2)
+            loop.close()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=loop.run_forever, name="FcitxDbusLoop", daemon=True)
+            self._thread.start()
+            self._loop = loop
+        return self._loop
+
+    async def _call(self, awaitable):
+        return await asyncio.wait_for(awaitable, self._timeout)
+
+    async def _send(self, text: str) -> bool:
+        # 缓存的输入上下文可能已被 Fcitx 回收：激活失败时清除缓存并重新创建一次
+        for attempt in range(2):
+            context_iface = await self._ensure_context()
+            if context_iface is None:
+                return False
+            try:
+                await self._call(context_iface.call_focus_in())
+            except Exception as exc:  # pylint: disable=broad-except
+                self._drop_context()
+                if attempt:
+                    self.logger.warning("DBus 激活输入上下文失败：%s", exc)
+                    return False
+                self.logger.info("缓存的输入上下文不可用（%s），重新创建。", exc)
+                continue
+            try:
+                await self._call(context_iface.call_commit_string(text))
+            except Exception as exc:  # pylint: disable=broad-except
+                # 提交可能已生效（如仅回复超时），不重试以免重复输入
+                self._drop_context()
+                self.logger.warning("DBus 提交文本失败：%s", exc)
+                return False
+            try:
+                await self._call(context_iface.call_focus_out())
+            except Exception:  # pylint: disable=broad-except
+                self.logger.debug("FocusOut 调用失败，忽略。", exc_info=True)
+            self.logger.info("通过 DBus 成功提交文本，长度=%d", len(text))
+            return True
+        return False
 
-    async def _send_once(self, text: str) -> bool:
-        bus: Optional[MessageBus] = None
+    async def _ensure_bus(self) -> Optional[MessageBus]:
+        if self._bus is not None and self._bus.connected:
+            return self._bus
+        self._reset()
         try:
-            bus = MessageBus(bus_type=BusType.SESSION)
-            await bus.connect()
+            bus = await self._call(MessageBus(bus_type=BusType.SESSION).connect())
         except Exception as exc:
             self.logger.warning("连接 Session Bus 失败：%s", exc)
-            return False
+            return None
+        bus.add_message_handler(self._on_message)
+        for service in self._watched_services():
+            rule = (
+                "type='signal',sender='org.freedesktop.DBus',interface='org.freedesktop.DBus',"
+                f"member='NameOwnerChanged',arg0='{service}'"
+            )
+            try:
+                await self._call(bus.call(self._bus_message("AddMatch", rule)))
+            except Exception:  # pylint: disable=broad-except
+                self.logger.debug("订阅 %s 的 NameOwnerChanged 失败", service, exc_info=True)
+        asyncio.ensure_future(self._watch_disconnect(bus))
+        self._bus = bus
+        return bus
 
+    async def _watch_disconnect(self, bus: MessageBus) -> None:
         try:
-            for service, entries in self.SERVICE_CANDIDATES:
-                if not await self._has_owner(bus, service):
-                    continue
-                for path, iface_name in entries:
-                    success = await self._try_service_entry(bus, service, path, iface_name, text)
-                    if success:
-                        return True
-            self.logger.warning("未检测到可用的 Fcitx DBus 接口。")
-            return False
-        finally:
-            try:
-                bus.disconnect()
-            except Exception:
-                self.logger.debug("关闭 DBus 连接失败", exc_info=True)
+            await bus.wait_for_disconnect()
+        except Exception:  # pylint: disable=broad-except
+            pass
+        if self._bus is bus:
+            self.logger.info("Session Bus 连接已断开，下次提交时重新连接。")
+            self._bus = None
+            self._reset()
+
+    def _watched_services(self) -> tuple:
+        return tuple(service for service, _ in self.SERVICE_CANDIDATES) + self.IBUS_SERVICES
+
+    async def _detect_framework(self) -> Optional[str]:
+        if self._framework is not None:
+            return self._framework or None
+        bus = await self._ensure_bus()
+        if bus is None:
+            return self._framework_from_env()
+        framework = ""
+        for service, _ in self.SERVICE_CANDIDATES:
+            if await self._has_owner(bus, service):
+                framework = "fcitx"
+                break
+        else:
+            for service in self.IBUS_SERVICES:
+                if await self._has_owner(bus, service):
+                    framework = "ibus"
+                    break
+        if framework != self._framework:
+            self.logger.info("检测到输入法框架：%s", {"fcitx": "Fcitx", "ibus": "IBus"}.get(framework, "无"))
+        self._framework = framework
+        return framework or None
+
+    def _on_message(self, message: "Message") -> None:
+        if (
+            message.message_type == MessageType.SIGNAL
+            and message.member == "NameOwnerChanged"
+            and message.body
+            and message.body[0] in self._watched_services()
+        ):
+            # 输入法进程变化：下次使用时重新检测框架
+            self._framework = None
+            service, _, new_owner = message.body
+            if service in self.IBUS_SERVICES:
+                return
+            if self._context_path is not None or (service == self._service and not new_owner):
+                self.logger.info("%s %s，清除缓存的输入上下文。", service, "已重启" if new_owner else "已退出")
+            self._drop_context()
+            if service == self._service and not new_owner:
+                self._service = self._im_iface = None
+                self._context_introspection = self._context_iface_name = None
+
+    def _drop_context(self) -> None:
+        self._context_path = None
+        self._context_iface = None
+
+    def _reset(self) -> None:
+        self._framework = None
+        self._drop_context()
+        self._service = self._im_iface = None
+        self._context_introspection = self._context_iface_name = None
 
-    async def _has_owner(self, bus: MessageBus, service: str) -> bool:
-        message = Message(
+    @staticmethod
+    def _bus_message(member: str, arg: str) -> "Message":
+        return Message(
             destination="org.freedesktop.DBus",
             path="/org/freedesktop/DBus",
             interface="org.freedesktop.DBus",
-            member="NameHasOwner",
+            member=member,
             signature="s",
-            body=[service]
+            body=[arg]
         )
+
+    async def _ensure_context(self):
+        """
+        返回可用的输入上下文接口：优先复用缓存，否则（按缓存的服务或重新发现）创建新的上下文。
+        """
+        if self._context_iface is not None:
+            return self._context_iface
+        bus = await self._ensure_bus()
+        if bus is None:
+            return None
+        if self._im_iface is not None and await self._create_context(bus, self._service, self._im_iface):
+            return self._context_iface
+        self._service = self._im_iface = None
+        self._context_introspection = self._context_iface_name = None
+        for service, entries in self.SERVICE_CANDIDATES:
+            if not await self._has_owner(bus, service):
+                continue
+            for path, iface_name in entries:
+                im_iface = await self._input_method_iface(bus, service, path, iface_name)
+                if im_iface is not None and await self._create_context(bus, service, im_iface):
+                    self._service, self._im_iface = service, im_iface
+                    self.logger.info("使用 Fcitx DBus 接口：%s %s（%s）", service, path, iface_name)
+                    return self._context_iface
+        self.logger.warning("未检测到可用的 Fcitx DBus 接口。")
+        return None
+
+    async def _has_owner(self, bus: MessageBus, service: str) -> bool:
         try:
-            reply = await bus.call(message)
+            reply = await self._call(bus.call(self._bus_message("NameHasOwner", service)))
         except Exception as exc:
             self.logger.debug("查询 %s 的 DBus 拥有者失败：%s", service, exc)
             return False
@@ -496,30 +1095,22 @@ class FcitxDbusInput:
             return False
         return bool(reply.body and reply.body[0])
 
-    async def _try_service_entry(
-        self,
-        bus: MessageBus,
-        service: str,
-        path: str,
-        iface_name: str,
-        text: str
-    ) -> bool:
-        try:
-            introspection = await bus.introspect(service, path)
+    async def _input_method_iface(self, bus: MessageBus, service: str, path: str, iface_name: str):
+        try:
+            introspection = await self._call(bus.introspect(service, path))
         except Exception as exc:
             self.logger.debug("读取 %s %s 自省信息失败：%s", service, path, exc)
-            return False
-
+            return None
         proxy = bus.get_proxy_object(service, path, introspection)
         try:
-            input_method_iface = proxy.get_interface(iface_name)
-        except KeyError:
+            return proxy.get_interface(iface_name)
+        except InterfaceNotFoundError:
             self.logger.debug("接口 %s 未在路径 %s 上暴露", iface_name, path)
-            return False
+            return None
 
-        args = self._build_context_args()
+    async def _create_context(self, bus: MessageBus, service: str, im_iface) -> bool:
         try:
-            context_path, _ = await input_method_iface.call_CreateInputContext(args)
+            context_path, _ = await self._call(im_iface.call_create_input_context(self._build_context_args()))
         except DBusError as exc:
             self.logger.debug("CreateInputContext 调用失败：%s", exc)
             return False
@@ -527,67 +1118,75 @@ class FcitxDbusInput:
             self.logger.debug("CreateInputContext 未知异常：%s", exc)
             return False
 
-        try:
-            ctx_introspection = await bus.introspect(service, context_path)
-        except Exception as exc:
-            self.logger.debug("获取上下文 %s 自省失败：%s", context_path, exc)
-            return False
-
-        proxy_ctx = bus.get_proxy_object(service, context_path, ctx_introspection)
-        context_iface = None
-        for candidate in self.INPUT_CONTEXT_INTERFACES:
-            if candidate in ctx_introspection.interfaces:
-                try:
-                    context_iface = proxy_ctx.get_interface(candidate)
-                    break
-                except KeyError:
-                    continue
+        if self._context_introspection is None:
+            try:
+                introspection = await self._call(bus.introspect(service, context_path))
+            except Exception as exc:
+                self.logger.debug("获取上下文 %s 自省失败：%s", context_path, exc)
+                return False
+            names = {interface.name for interface in introspection.interfaces}
+            iface_name = next((name for name in self.INPUT_CONTEXT_INTERFACES if name in names), None)
+            if iface_name is None:
+                self.logger.debug("输入上下文 %s 不包含支持的接口", context_path)
+                return False
+            self._context_introspection, self._context_iface_name = introspection, iface_name
 
-        if context_iface is None:
+        proxy_ctx = bus.get_proxy_object(service, context_path, self._context_introspection)
+        try:
+            self._context_iface = proxy_ctx.get_interface(self._context_iface_name)
+        except InterfaceNotFoundError:
             self.logger.debug("输入上下文 %s 不包含支持的接口", context_path)
             return False
+        self._context_path = context_path
+        self.logger.debug("已创建输入上下文 %s", context_path)
+        return True
 
-        try:
-            await context_iface.call_FocusIn()
-            await context_iface.call_CommitString(text)
+    async def _shutdown(self) -> None:
+        bus, context_iface = self._bus, self._context_iface
+        self._bus = None
+        self._reset()
+        if bus is None:
+            return
+        if context_iface is not None:
             try:
-                await context_iface.call_FocusOut()
-            except Exception:
-                self.logger.debug("FocusOut 调用失败，忽略。", exc_info=True)
-            self.logger.info("通过 DBus 成功提交文本，长度=%d", len(text))
-            return True
-        except DBusError as exc:
-            self.logger.warning("DBus 提交文本失败：%s", exc)
-            return False
-        except Exception as exc:
-            self.logger.exception("DBus 输入时出现异常")
-            return False
-        finally:
-            if context_iface is not None:
-                try:
-                    await context_iface.call_DestroyIC()
-                except Exception:
-                    self.logger.debug("DestroyIC 调用失败，忽略。", exc_info=True)
+                await self._call(context_iface.call_destroy_ic())
+            except Exception:  # pylint: disable=broad-except
+                self.logger.debug("DestroyIC 调用失败，忽略。", exc_info=True)
+        try:
+            bus.disconnect()
+        except Exception:  # pylint: disable=broad-except
+            self.logger.debug("关闭 DBus 连接失败", exc_info=True)
 
-    def _build_context_args(self) -> list[tuple[str, str]]:
+    def _build_context_args(self) -> list[list[str]]:
+        # dbus-next 要求 STRUCT（a(ss) 的元素）以 list 传入
         display = os.environ.get("WAYLAND_DISPLAY") or os.environ.get("DISPLAY") or ""
         return [
-            ("program", self.app_name),
-            ("display", display),
-            ("clientControlVirtualkeyboardShow", "true"),
-            ("clientControlVirtualkeyboardHide", "true"),
+            ["program", self.app_name],
+            ["display", display],
+            ["clientControlVirtualkeyboardShow", "true"],
+            ["clientControlVirtualkeyboardHide", "true"],
         ]
+
+
 class InputInjector:
     """
     在不同图形栈下注入键盘事件，Wayland 环境优先使用 uinput。
     """
 
+    # 键盘布局检测结果的缓存时间（秒）：GNOME 等桌面可在运行中切换布局
+    LAYOUT_CACHE_S = 30.0
+    # uinput 直接键入时每组（一次 syn()）最多包含的字符数
+    TYPE_BATCH_CHARS = 16
+
     def __init__(self, logger: Optional[logging.Logger] = None):
         parent_logger = logger or logging.getLogger("lexisharp")
         self.logger = parent_logger.getChild("injector")
         self.is_wayland = bool(os.environ.get("WAYLAND_DISPLAY"))
         self.mode = "none"
         self._uinput: Optional["UInput"] = None
+        self._keymap: dict[str, tuple[int, bool]] = {}
+        self._layout: Optional[str] = None
+        self._layout_checked_at: Optional[float] = None
         if self.is_wayland:
             self._init_uinput()
         else:
@@ -611,13 +1210,12 @@ class InputInjector:
                 "/dev/uinput 无写权限，请将当前用户加入 input 组或调整 udev 规则。"
             )
             return
+        self._keymap = self._build_keymap()
+        keys = {ecodes.KEY_LEFTCTRL, ecodes.KEY_RIGHTCTRL, ecodes.KEY_LEFTSHIFT, ecodes.KEY_V}
+        keys.update(key for key, _ in self._keymap.values())
         capabilities = {
             # 仅声明需要的键位，其他事件类型由驱动自动处理，避免出现 Invalid argument。
-            ecodes.EV_KEY: [
-                ecodes.KEY_LEFTCTRL,
-                ecodes.KEY_RIGHTCTRL,
-                ecodes.KEY_V,
-            ],
+            ecodes.EV_KEY: sorted(keys),
         }
         try:
             self._uinput = UInput(capabilities, name="LexiSharp Virtual Keyboard")
@@ -629,7 +1227,124 @@ class InputInjector:
             self._uinput = None
         else:
             self.mode = "uinput"
-            self.logger.info("uinput 虚拟键盘初始化完成，自动粘贴将通过 Ctrl+V 注入。")
+            self.logger.info("uinput 虚拟键盘初始化完成，ASCII 文本可直接键入，其余文本通过 Ctrl+V 注入。")
+
+    @staticmethod
+    def _build_keymap() -> dict[str, tuple[int, bool]]:
+        """
+        按 US 键盘布局生成 字符 → (键码, 是否需要 Shift) 映射，覆盖全部可打印 ASCII 字符。
+        """
+        keymap: dict[str, tuple[int, bool]] = {" ": (ecodes.KEY_SPACE, False)}
+        for char in "abcdefghijklmnopqrstuvwxyz":
+            key = getattr(ecodes, f"KEY_{char.upper()}")
+            keymap[char] = (key, False)
+            keymap[char.upper()] = (key, True)
+        for digit, shifted in zip("1234567890", "!@#$%^&*()"):
+            key = getattr(ecodes, f"KEY_{digit}")
+            keymap[digit] = (key, False)
+            keymap[shifted] = (key, True)
+        for plain, shifted, name in (
+            ("-", "_", "MINUS"),
+            ("=", "+", "EQUAL"),
+            ("[", "{", "LEFTBRACE"),
+            ("]", "}", "RIGHTBRACE"),
+            ("\\", "|", "BACKSLASH"),
+            (";", ":", "SEMICOLON"),
+            ("'", '"', "APOSTROPHE"),
+            ("`", "~", "GRAVE"),
+            (",", "<", "COMMA"),
+            (".", ">", "DOT"),
+            ("/", "?", "SLASH"),
+        ):
+            key = getattr(ecodes, f"KEY_{name}")
+            keymap[plain] = (key, False)
+            keymap[shifted] = (key, True)
+        return keymap
+
+    def keyboard_layout(self) -> Optional[str]:
+        """
+        当前键盘布局（如 us、de、us+dvorak、us,ru）：依次查看 XKB_DEFAULT_LAYOUT、GNOME 输入源与 localectl，
+        无法确定时返回 None。虚拟键盘按 US 布局发送键码，其他布局下会键入错误的字符。
+        """
+        now = time.monotonic()
+        if self._layout_checked_at is None or now - self._layout_checked_at >= self.LAYOUT_CACHE_S:
+            self._layout = self._detect_layout()
+            self._layout_checked_at = now
+            self.logger.debug("检测到键盘布局：%s", self._layout or "未知")
+        return self._layout
+
+    @staticmethod
+    def _detect_layout() -> Optional[str]:
+        layout = os.environ.get("XKB_DEFAULT_LAYOUT", "").strip()
+        if layout:
+            variant = os.environ.get("XKB_DEFAULT_VARIANT", "").strip()
+            return f"{layout}+{variant}" if variant else layout
+
+        def run(args: List[str]) -> str:
+            try:
+                return subprocess.run(args, capture_output=True, text=True, timeout=1).stdout
+            except (OSError, subprocess.SubprocessError):
+                return ""
+
+        gsettings = shutil.which("gsettings")
+        if gsettings and "GNOME" in os.environ.get("XDG_CURRENT_DESKTOP", "").upper():
+            # mru-sources 的第一项是当前使用的输入源；输入法（ibus）源同样不是 US 布局
+            for key in ("mru-sources", "sources"):
+                output = run([gsettings, "get", "org.gnome.desktop.input-sources", key])
+                sources = re.findall(r"\('([^']*)',\s*'([^']*)'\)", output)
+                if sources:
+                    kind, name = sources[0]
+                    return name if kind == "xkb" else f"{kind}:{name}"
+        localectl = shutil.which("localectl")
+        if localectl:
+            fields = {}
+            for line in run([localectl, "status"]).splitlines():
+                name, _, value = line.partition(":")
+                fields[name.strip()] = value.strip()
+            layout = fields.get("X11 Layout", "")
+            if layout:
+                variant = fields.get("X11 Variant", "")
+                return f"{layout}+{variant}" if variant else layout
+        return None
+
+    def held_modifiers(self, timeout_s: float = 0.0) -> Optional[List[str]]:
+        """
+        读取物理键盘上按住的 Ctrl/Alt/Super/Shift（如仍按着的停止录音快捷键），最多等待 timeout_s 秒让其松开；
+        返回仍按住的键名（空列表表示都已松开），没有可读取的键盘设备（/dev/input 无读权限）时返回 None。
+        """
+        if InputDevice is None or list_devices is None:
+            return None
+        modifiers = {
+            ecodes.KEY_LEFTCTRL, ecodes.KEY_RIGHTCTRL, ecodes.KEY_LEFTALT, ecodes.KEY_RIGHTALT,
+            ecodes.KEY_LEFTMETA, ecodes.KEY_RIGHTMETA, ecodes.KEY_LEFTSHIFT, ecodes.KEY_RIGHTSHIFT,
+        }
+        keyboards = []
+        for path in list_devices():
+            try:
+                device = InputDevice(path)
+            except OSError:
+                continue
+            if device.name != "LexiSharp Virtual Keyboard" and ecodes.KEY_A in device.capabilities().get(ecodes.EV_KEY, []):
+                keyboards.append(device)
+            else:
+                device.close()
+        if not keyboards:
+            return None
+        deadline = time.monotonic() + max(0.0, timeout_s)
+        try:
+            while True:
+                held = set()
+                for device in keyboards:
+                    try:
+                        held.update(key for key in device.active_keys() if key in modifiers)
+                    except OSError:
+                        continue
+                if not held or time.monotonic() >= deadline:
+                    return sorted(ecodes.KEY[key] if isinstance(ecodes.KEY[key], str) else ecodes.KEY[key][0] for key in held)
+                time.sleep(0.02)
+        finally:
+            for device in keyboards:
+                device.close()
 
     def can_use_uinput(self) -> bool:
         """
@@ -637,6 +1352,57 @@ class InputInjector:
         """
         return self.mode == "uinput" and self._uinput is not None
 
+    def can_type(self, text: str) -> bool:
+        """
+        判断文本能否完全由虚拟键盘直接键入（不含中文、换行等布局外字符）。
+        """
+        return self.can_use_uinput() and bool(text) and all(char in self._keymap for char in text)
+
+    def type_text(self, text: str, delay_ms: int = 0) -> bool:
+        """
+        经 uinput 直接键入文本：按键事件成组连续写入，每组只发送一次 syn()，组间间隔 delay_ms。
+        同一帧内同一键码（含 Shift）只按下一次：重复按键在同一帧内可能被合并或丢弃，遇到重复键码或满 TYPE_BATCH_CHARS 个字符即分组。
+        """
+        if not self.can_type(text):
+            return False
+        delay = max(0.0, delay_ms / 1000.0)
+        started = time.perf_counter()
+        groups = 0
+        try:
+            keys_in_group: set = set()
+            chars_in_group = 0
+            for char in text:
+                key, shifted = self._keymap[char]
+                keys = {key, ecodes.KEY_LEFTSHIFT} if shifted else {key}
+                if keys & keys_in_group or chars_in_group >= self.TYPE_BATCH_CHARS:
+                    self._uinput.syn()
+                    groups += 1
+                    keys_in_group.clear()
+                    chars_in_group = 0
+                    if delay > 0:
+                        time.sleep(delay)
+                keys_in_group |= keys
+                chars_in_group += 1
+                if shifted:
+                    self._uinput.write(ecodes.EV_KEY, ecodes.KEY_LEFTSHIFT, 1)
+                self._uinput.write(ecodes.EV_KEY, key, 1)
+                self._uinput.write(ecodes.EV_KEY, key, 0)
+                if shifted:
+                    self._uinput.write(ecodes.EV_KEY, ecodes.KEY_LEFTSHIFT, 0)
+            self._uinput.syn()
+            groups += 1
+        except Exception:
+            self.logger.exception("uinput 直接键入时发生异常")
+            try:
+                self._emit_key(ecodes.KEY_LEFTSHIFT, 0)
+            except Exception:  # pylint: disable=broad-except
+                pass
+            return False
+        self.logger.info(
+            "已通过 uinput 直接键入 %d 个字符（%d 组），用时 %.0f ms。", len(text), groups, (time.perf_counter() - started) * 1000.0
+        )
+        return True
+
     def inject_ctrl_v(self, wait_ms: int = 0) -> bool:
         """
         通过 uinput 发出 Ctrl+V 快捷键。
@@ -685,45 +1451,366 @@ class InputInjector:
             finally:
                 self._uinput = None
                 self.mode = "none"
-class Recorder:
+
+
+class XTestTyper:
     """
-    基于 arecord 的简易录音器。
+    X11 下经 XTest 扩展在进程内模拟键入（替代逐字符的 xdotool type 子进程）。
+    X 连接常驻，每次键入前重新读取键盘映射；布局中没有的字符（如中文）成批映射到一段空闲键码，每次键入结束后恢复为空；
+    按键成批发送，每批末 sync 一次，按往返耗时在 0 ~ type_delay_ms 之间自适应调节按键间隔。
+    与 xdotool --clearmodifiers 一样，键入前松开按住的修饰键并关闭 CapsLock，键入后恢复。
     """
 
-    def __init__(self, sample_rate: int = 16000, device: str | None = None, logger: logging.Logger | None = None):
-        self.sample_rate = sample_rate
-        self.device = device
-        self.logger = logger or logging.getLogger("lexisharp.recorder")
-        self._process: Optional[subprocess.Popen] = None
-        self._file_path: Optional[str] = None
-        self._wave_file: Optional[wave.Wave_write] = None
-        self._reader_thread: Optional[threading.Thread] = None
-        self._stop_event = threading.Event()
-        self._current_level: float = 0.0
+    # 每批发送的按键数：批末 sync 一次，往返耗时反映 X 服务器的积压程度
+    BURST_KEYS = 32
+    # sync 往返超过该值（秒）视为积压，加大按键间隔
+    BACKLOG_RTT_S = 0.004
+    # 改写键码映射前后等待目标程序处理完已发送按键与 MappingNotify 的时间（秒）
+    REMAP_SETTLE_S = 0.03
 
-    def start(self) -> str:
+    def __init__(self, logger: logging.Logger, max_delay_ms: float = 5.0):
+        self.logger = logger.getChild("xtest")
+        self.max_delay_s = max(0.0, max_delay_ms / 1000.0)
+        self._lock = threading.Lock()
+        self._display = None
+        # keysym → (键码, 是否需要 Shift)
+        self._keymap: dict[int, tuple[int, bool]] = {}
+        # 一段连续的空闲键码（change_keyboard_mapping 一次写入一段连续键码）及其当前映射的 keysym
+        self._spare: List[int] = []
+        self._remapped: dict[int, int] = {}
+        self._syms_per_keycode = 2
+        self._shift_keycode = 0
+        self._caps_keycode = 0
+        self._delay_s = 0.0
+
+    @staticmethod
+    def is_available() -> bool:
+        return xtest is not None and bool(os.environ.get("DISPLAY"))
+
+    def _open(self):
+        if self._display is None:
+            display = xlib_display.Display()
+            if not display.has_extension("XTEST"):
+                display.close()
+                raise RuntimeError("X 服务器不支持 XTEST 扩展。")
+            self._display = display
+        return self._display
+
+    def _load_keymap(self) -> None:
         """
-        启动录音并返回临时音频文件路径。
+        读取当前键盘映射：每次键入前调用，setxkbmap 或切换布局后立即生效（与 xdotool 每次调用重新读取一致）。
+        本类自己重映射过的空闲键码仍视为空闲，不计入布局。
         """
-        if self._process:
-            raise RuntimeError("录音已在进行中。")
-
-        self._stop_event.clear()
-        self._current_level = 0.0
-
-        tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-        tmp_file.close()
-        self._file_path = tmp_file.name
+        display = self._display
+        # 丢弃积压的事件（主要是 MappingNotify），映射已在下面直接重新读取
+        while display.pending_events():
+            display.next_event()
+        first = display.display.info.min_keycode
+        mapping = display.get_keyboard_mapping(first, display.display.info.max_keycode - first + 1)
+        self._syms_per_keycode = max(2, len(mapping[0]) if mapping else 2)
+        # 直接从刚读取的映射查找，python-xlib 的 keysym_to_keycode 缓存只在处理 MappingNotify 时更新
+        first_syms = [syms[0] if syms else 0 for syms in mapping]
+        shift_keycode = first + first_syms.index(XK.XK_Shift_L) if XK.XK_Shift_L in first_syms else 0
+        caps_keycode = first + first_syms.index(XK.XK_Caps_Lock) if XK.XK_Caps_Lock in first_syms else 0
+        keymap: dict[int, tuple[int, bool]] = {}
+        empty: List[int] = []
+        for offset, syms in enumerate(mapping):
+            keycode = first + offset
+            if keycode in self._remapped or not any(syms):
+                empty.append(keycode)
+                continue
+            # 只使用第一组的前两级（无修饰 / Shift）；没有 Shift 键码时只用第一级
+            for level in (0, 1) if shift_keycode else (0,):
+                if level < len(syms) and syms[level] and syms[level] not in keymap:
+                    keymap[syms[level]] = (keycode, level == 1)
+        runs: List[List[int]] = []
+        for keycode in empty:
+            if runs and runs[-1][-1] == keycode - 1:
+                runs[-1].append(keycode)
+            else:
+                runs.append([keycode])
+        spare = max(runs, key=len) if runs else []
+        changed = keymap != self._keymap or spare != self._spare
+        self._keymap, self._spare = keymap, spare
+        self._shift_keycode, self._caps_keycode = shift_keycode, caps_keycode
+        if changed:
+            self.logger.info("XTest 键盘映射已载入：布局内 keysym %d 个，可重映射的空闲键码 %d 个", len(keymap), len(spare))
 
-        try:
-            self._wave_file = wave.open(self._file_path, "wb")
-            self._wave_file.setnchannels(1)
-            self._wave_file.setsampwidth(2)
+    @staticmethod
+    def _keysym(char: str) -> int:
+        if char == "\n":
+            return XK.XK_Return
+        if char == "\t":
+            return XK.XK_Tab
+        code = ord(char)
+        # Latin-1 字符的 keysym 与码位相同，其余使用 Unicode keysym
+        if 0x20 <= code <= 0x7E or 0xA0 <= code <= 0xFF:
+            return code
+        return 0x01000000 | code
+
+    def type_text(self, text: str, target_window: Optional[str] = None) -> bool:
+        """
+        向当前焦点窗口（指定 target_window 时先激活该窗口）键入文本，返回是否全部发送。
+        """
+        keysyms = [self._keysym(char) for char in text if char != "\r"]
+        if not keysyms:
+            return True
+        with self._lock:
+            try:
+                display = self._open()
+                self._load_keymap()
+                if target_window:
+                    self._activate(display, target_window)
+                started = time.perf_counter()
+                held, caps = self._clear_modifiers(display)
+                try:
+                    remaps = self._type_keysyms(display, keysyms)
+                finally:
+                    # 空闲键码不长期占用：其他程序（及之后的物理按键）看到的键盘映射保持原样
+                    self._reset_spare(display)
+                    self._restore_modifiers(display, held, caps)
+            except Exception as exc:  # pylint: disable=broad-except
+                self.logger.warning("XTest 键入失败：%s", exc)
+                self._close_display()
+                return False
+        elapsed = time.perf_counter() - started
+        self.logger.info(
+            "XTest 键入 %d 个字符，用时 %.0f ms（%.0f 字符/秒，重映射 %d 批，当前按键间隔 %.1f ms）",
+            len(keysyms),
+            elapsed * 1000.0,
+            len(keysyms) / elapsed if elapsed > 0 else 0.0,
+            remaps,
+            self._delay_s * 1000.0,
+        )
+        return True
+
+    def _type_keysyms(self, display, keysyms: List[int]) -> int:
+        if not self._spare and any(keysym not in self._keymap for keysym in keysyms):
+            raise RuntimeError("键盘映射中没有空闲键码，无法键入布局外的字符。")
+        remaps = 0
+        pos = 0
+        while pos < len(keysyms):
+            # 向后扫描：布局内字符与已映射字符直接键入，缺失字符最多凑满一段空闲键码后成批映射
+            needed: dict[int, None] = {}
+            end = pos
+            while end < len(keysyms):
+                keysym = keysyms[end]
+                if keysym not in self._keymap and keysym not in needed:
+                    if len(needed) >= len(self._spare):
+                        break
+                    needed[keysym] = None
+                end += 1
+            if end == pos:
+                raise RuntimeError("XTest 键入无法推进：没有可用于布局外字符的键码。")
+            if any(keysym not in self._remapped.values() for keysym in needed):
+                self._remap(display, list(needed))
+                remaps += 1
+            self._send(display, keysyms[pos:end])
+            pos = end
+        return remaps
+
+    def _clear_modifiers(self, display) -> tuple[List[int], bool]:
+        """
+        松开当前按住的修饰键（如仍按着的快捷键），CapsLock 打开时将其关闭；返回键入后需恢复的 (修饰键码, 是否关闭了 CapsLock)。
+        """
+        pressed = display.query_keymap()
+        held: List[int] = []
+        for index, keycodes in enumerate(display.get_modifier_mapping()):
+            if index == X.LockMapIndex:
+                continue
+            for keycode in keycodes:
+                if keycode and pressed[keycode // 8] & (1 << (keycode % 8)) and keycode not in held:
+                    held.append(keycode)
+        for keycode in held:
+            xtest.fake_input(display, X.KeyRelease, keycode)
+        caps = bool(self._caps_keycode) and bool(display.screen().root.query_pointer().mask & X.LockMask)
+        if caps:
+            xtest.fake_input(display, X.KeyPress, self._caps_keycode)
+            xtest.fake_input(display, X.KeyRelease, self._caps_keycode)
+        if held or caps:
+            self.logger.debug("键入前松开修饰键 %s%s", held, "，并关闭 CapsLock" if caps else "")
+        display.sync()
+        return held, caps
+
+    def _restore_modifiers(self, display, held: List[int], caps: bool) -> None:
+        if caps:
+            xtest.fake_input(display, X.KeyPress, self._caps_keycode)
+            xtest.fake_input(display, X.KeyRelease, self._caps_keycode)
+        for keycode in held:
+            xtest.fake_input(display, X.KeyPress, keycode)
+        display.sync()
+
+    def _reset_spare(self, display) -> None:
+        """
+        等目标程序处理完已发送的按键后，把重映射过的空闲键码恢复为空。
+        """
+        if not self._remapped:
+            return
+        display.sync()
+        time.sleep(self.REMAP_SETTLE_S)
+        rows = [[0] * self._syms_per_keycode for _ in self._remapped]
+        # 重映射的是一段从最小键码起的连续键码；期间重新读取映射后 _spare 可能已不同
+        display.change_keyboard_mapping(min(self._remapped), rows)
+        display.sync()
+        self._remapped = {}
+
+    def _remap(self, display, keysyms: List[int]) -> None:
+        if self._remapped:
+            # 目标程序可能尚未处理完使用旧映射的按键
+            display.sync()
+            time.sleep(self.REMAP_SETTLE_S)
+        rows = [[keysym, keysym] + [0] * (self._syms_per_keycode - 2) for keysym in keysyms]
+        display.change_keyboard_mapping(self._spare[0], rows)
+        display.sync()
+        self._remapped = {keycode: keysym for keycode, keysym in zip(self._spare, keysyms)}
+        time.sleep(self.REMAP_SETTLE_S)
+
+    def _send(self, display, keysyms: List[int]) -> None:
+        lookup = {keysym: keycode for keycode, keysym in self._remapped.items()}
+        shift_down = False
+        for index, keysym in enumerate(keysyms, 1):
+            keycode = lookup.get(keysym)
+            shifted = False
+            if keycode is None:
+                keycode, shifted = self._keymap[keysym]
+            if shifted != shift_down:
+                xtest.fake_input(display, X.KeyPress if shifted else X.KeyRelease, self._shift_keycode)
+                shift_down = shifted
+            xtest.fake_input(display, X.KeyPress, keycode)
+            xtest.fake_input(display, X.KeyRelease, keycode)
+            if self._delay_s > 0:
+                display.flush()
+                time.sleep(self._delay_s)
+            if index % self.BURST_KEYS == 0:
+                self._pace(display)
+        if shift_down:
+            xtest.fake_input(display, X.KeyRelease, self._shift_keycode)
+        self._pace(display)
+
+    def _pace(self, display) -> None:
+        """
+        刷新并同步一批按键：往返耗时偏高说明服务器积压，按键间隔加倍（不超过 type_delay_ms），否则减半直至为 0。
+        """
+        started = time.perf_counter()
+        display.sync()
+        if time.perf_counter() - started > self.BACKLOG_RTT_S:
+            self._delay_s = min(self.max_delay_s, max(self._delay_s * 2, 0.0005))
+        elif self._delay_s > 0.0002:
+            self._delay_s /= 2
+        else:
+            self._delay_s = 0.0
+
+    def _activate(self, display, target_window: str) -> None:
+        """
+        目标窗口不是当前激活窗口时通过 _NET_ACTIVE_WINDOW 请求窗口管理器激活；无窗口管理器时直接设置输入焦点。
+        """
+        window_id = int(target_window, 0)
+        root = display.screen().root
+        active_atom = display.intern_atom("_NET_ACTIVE_WINDOW")
+        prop = root.get_full_property(active_atom, X.AnyPropertyType)
+        if prop is None:
+            display.set_input_focus(display.create_resource_object("window", window_id), X.RevertToParent, X.CurrentTime)
+            display.sync()
+            return
+        if prop.value and int(prop.value[0]) == window_id:
+            return
+        event = XClientMessage(
+            window=display.create_resource_object("window", window_id),
+            client_type=active_atom,
+            data=(32, [2, X.CurrentTime, 0, 0, 0]),
+        )
+        root.send_event(event, event_mask=X.SubstructureRedirectMask | X.SubstructureNotifyMask)
+        display.sync()
+        deadline = time.monotonic() + 0.2
+        while time.monotonic() < deadline:
+            prop = root.get_full_property(active_atom, X.AnyPropertyType)
+            if prop is not None and prop.value and int(prop.value[0]) == window_id:
+                return
+            time.sleep(0.01)
+        self.logger.debug("激活窗口 %s 超时，键入到当前焦点窗口。", target_window)
+
+    def _close_display(self) -> None:
+        if self._display is None:
+            return
+        try:
+            self._reset_spare(self._display)
+            self._display.close()
+        except Exception:  # pylint: disable=broad-except
+            self.logger.debug("关闭 X 连接失败", exc_info=True)
+        self._display = None
+        self._remapped = {}
+
+    def close(self) -> None:
+        """
+        恢复被重映射的空闲键码并关闭 X 连接。
+        """
+        with self._lock:
+            self._close_display()
+
+
+class Recorder:
+    """
+    基于 arecord 的简易录音器。
+    """
+
+    def __init__(self, sample_rate: int = 16000, device: str | None = None, logger: logging.Logger | None = None):
+        self.sample_rate = sample_rate
+        self.device = device
+        self.logger = logger or logging.getLogger("lexisharp.recorder")
+        self._process: Optional[subprocess.Popen] = None
+        self._file_path: Optional[str] = None
+        self._wave_file: Optional[wave.Wave_write] = None
+        self._reader_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._current_level: float = 0.0
+        # 录音数据监听者（如上传编码器），仅对下一次录音生效
+        self._listeners: list = []
+
+    def add_listener(self, listener) -> None:
+        """
+        注册下一次录音的 PCM 数据监听者：需提供 start(path)、feed(chunk)、close()，录音结束后自动移除。
+        """
+        self._listeners.append(listener)
+
+    def _close_listeners(self) -> None:
+        listeners, self._listeners = self._listeners, []
+        for listener in listeners:
+            try:
+                listener.close()
+            except Exception:  # pylint: disable=broad-except
+                self.logger.exception("关闭录音监听者失败")
+
+    def start(self) -> str:
+        """
+        启动录音并返回临时音频文件路径。
+        """
+        if self._process:
+            raise RuntimeError("录音已在进行中。")
+
+        self._stop_event.clear()
+        self._current_level = 0.0
+
+        tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
+        tmp_file.close()
+        self._file_path = tmp_file.name
+
+        try:
+            self._wave_file = wave.open(self._file_path, "wb")
+            self._wave_file.setnchannels(1)
+            self._wave_file.setsampwidth(2)
             self._wave_file.setframerate(self.sample_rate)
         except Exception:
             self._cleanup_files()
             raise
 
+        for listener in list(self._listeners):
+            try:
+                listener.start(self._file_path)
+            except Exception:  # pylint: disable=broad-except
+                self.logger.exception("录音监听者启动失败，已移除")
+                self._listeners.remove(listener)
+                listener.close()
+
         try:
             self._process = subprocess.Popen(
                 self._build_arecord_args(),
@@ -774,6 +1861,7 @@ class Recorder:
                 self._wave_file.close()
             finally:
                 self._wave_file = None
+        self._close_listeners()
 
         self._current_level = 0.0
         self._stop_event.clear()
@@ -803,6 +1891,8 @@ class Recorder:
                 if not chunk:
                     break
                 self._wave_file.writeframes(chunk)
+                for listener in self._listeners:
+                    listener.feed(chunk)
                 rms = audioop.rms(chunk, 2)
                 self._current_level = min(rms / 32768.0, 1.0)
         except Exception:
@@ -814,6 +1904,7 @@ class Recorder:
         """
         录音初始化失败时清理临时文件。
         """
+        self._close_listeners()
         if self._wave_file:
             try:
                 self._wave_file.close()
@@ -848,6 +1939,168 @@ class Recorder:
         return args
 
 
+class AudioEncoder:
+    """
+    通过 ffmpeg 把 16-bit 单声道 PCM 流压缩为 FLAC/Opus，作为录音监听者在录音期间实时编码。
+    """
+
+    # 编码 -> (输出后缀, ffmpeg 编码参数)
+    CODECS = {
+        "flac": (".flac", ["-c:a", "flac", "-compression_level", "5", "-f", "flac"]),
+        "opus": (".ogg", ["-c:a", "libopus", "-application", "voip", "-compression_level", "5", "-f", "ogg"]),
+    }
+    # 停止录音后等待 ffmpeg 收尾的上限（秒），超时即强制结束
+    CLOSE_TIMEOUT_S = 5.0
+
+    def __init__(
+        self,
+        codec: str,
+        sample_rate: int = 16000,
+        ffmpeg: str = "ffmpeg",
+        opus_bitrate_kbps: int = 24,
+        logger: logging.Logger | None = None,
+    ):
+        if codec not in self.CODECS:
+            raise ValueError(f"不支持的音频编码：{codec}")
+        self.codec = codec
+        self.sample_rate = sample_rate
+        self.ffmpeg = ffmpeg
+        self.opus_bitrate_kbps = max(6, int(opus_bitrate_kbps))
+        self.logger = logger or logging.getLogger("lexisharp.encoder")
+        # 对应的原始录音文件，由录音器在 start() 时告知
+        self.source_path: Optional[str] = None
+        self.output_path: Optional[str] = None
+        self.raw_bytes = 0
+        self.cpu_ms = 0.0
+        self.tail_ms = 0.0
+        self.error: Optional[str] = None
+        self._process: Optional[subprocess.Popen] = None
+        self._done = threading.Event()
+
+    def open(self) -> None:
+        """
+        启动 ffmpeg 进程；在开始录音前调用，可把进程启动开销移出关键路径。
+        """
+        suffix, codec_args = self.CODECS[self.codec]
+        tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+        tmp_file.close()
+        self.output_path = tmp_file.name
+        # 关闭输入探测与缓冲，使编码紧跟录音进度，停止录音后只需处理最后一块数据
+        args = [
+            self.ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+            "-probesize", "32", "-fflags", "nobuffer",
+            "-f", "s16le", "-ar", str(self.sample_rate), "-ac", "1", "-i", "pipe:0",
+            *codec_args,
+        ]
+        if self.codec == "opus":
+            args.extend(["-b:a", f"{self.opus_bitrate_kbps}k"])
+        args.append(self.output_path)
+        try:
+            self._process = subprocess.Popen(
+                args,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                bufsize=0,
+            )
+        except FileNotFoundError as exc:
+            self.discard()
+            raise RuntimeError(f"未找到 ffmpeg（{self.ffmpeg}），无法压缩上传音频。") from exc
+
+    def start(self, audio_file: str) -> None:
+        self.source_path = audio_file
+
+    def feed(self, chunk: bytes) -> None:
+        if self.error or not self._process or not self._process.stdin:
+            return
+        try:
+            self._process.stdin.write(chunk)
+            self.raw_bytes += len(chunk)
+        except OSError as exc:
+            self.error = f"写入编码器失败：{exc}"
+
+    def close(self) -> None:
+        """
+        结束输入并等待 ffmpeg 收尾，同时记录子进程的 CPU 耗时。
+        """
+        if self._done.is_set():
+            return
+        started = time.perf_counter()
+        process, self._process = self._process, None
+        try:
+            if process is None:
+                self.error = self.error or "编码器未启动"
+                return
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+            deadline = time.monotonic() + self.CLOSE_TIMEOUT_S
+            while True:
+                pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+                if pid:
+                    break
+                if time.monotonic() >= deadline:
+                    # ffmpeg 卡住时不能拖住停止录音，强制结束后再回收
+                    self.logger.warning("ffmpeg 在 %.0f 秒内未退出，已强制结束", self.CLOSE_TIMEOUT_S)
+                    self.error = self.error or "ffmpeg 收尾超时"
+                    process.kill()
+                    _pid, status, usage = os.wait4(process.pid, 0)
+                    break
+                time.sleep(0.01)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            self.cpu_ms = (usage.ru_utime + usage.ru_stime) * 1000.0
+            if process.returncode != 0 and not self.error:
+                self.error = f"ffmpeg 退出码 {process.returncode}"
+        finally:
+            self.tail_ms = (time.perf_counter() - started) * 1000.0
+            self._done.set()
+
+    def result(self, timeout: float = 10.0) -> Optional[str]:
+        """
+        等待编码完成并返回压缩文件路径；失败或超时返回 None。
+        """
+        if not self._done.wait(timeout):
+            self.error = self.error or "等待编码完成超时"
+            return None
+        if self.error or not self.output_path or not Path(self.output_path).exists():
+            return None
+        if Path(self.output_path).stat().st_size == 0:
+            self.error = "编码输出为空"
+            return None
+        return self.output_path
+
+    def discard(self) -> None:
+        if self._process is not None:
+            self._process.kill()
+            self.close()
+        if self.output_path and Path(self.output_path).exists():
+            try:
+                os.remove(self.output_path)
+            except OSError:
+                pass
+        self.output_path = None
+
+    @classmethod
+    def encode_file(cls, wav_path: str, codec: str, **kwargs) -> "AudioEncoder":
+        """
+        对已有的 WAV 文件整体编码（批量转写、常驻模式转写文件等未经录音器的场景）。
+        """
+        with wave.open(wav_path, "rb") as wf:
+            if wf.getsampwidth() != 2 or wf.getnchannels() != 1:
+                raise RuntimeError("仅支持 16-bit 单声道 WAV 压缩上传。")
+            encoder = cls(codec, sample_rate=wf.getframerate(), **kwargs)
+            encoder.open()
+            encoder.start(wav_path)
+            while True:
+                frames = wf.readframes(16000)
+                if not frames:
+                    break
+                encoder.feed(frames)
+        encoder.close()
+        return encoder
+
+
 class GlobalHotkeyManager:
     """
     管理全局快捷键监听。
@@ -862,7 +2115,7 @@ class GlobalHotkeyManager:
         logger: logging.Logger
     ):
         self.logger = logger
-        self.listener: Optional[pynput_keyboard.GlobalHotKeys] = None
+        self.listener: Optional["pynput_keyboard.GlobalHotKeys"] = None
         self._start_callback = start_callback
         self._stop_callback = stop_callback
 
@@ -885,6 +2138,9 @@ class GlobalHotkeyManager:
             logger.info("未配置全局快捷键，跳过注册。")
             return
 
+        if pynput_keyboard is None:
+            raise RuntimeError("pynput 不可用，请确认已安装并处于图形会话中。")
+
         try:
             self.listener = pynput_keyboard.GlobalHotKeys(mapping)
             self.listener.start()
@@ -934,2687 +2190,8090 @@ class GlobalHotkeyManager:
         return _inner
 
 
-class FloatingButton:
+def read_wav_pcm16(audio_file: str) -> tuple[bytes, int]:
     """
-    浮动录音按钮，支持拖拽与尺寸调节。
+    读取单声道 16-bit PCM wav，返回原始 PCM 字节与采样率。
     """
+    with wave.open(audio_file, "rb") as wf:
+        sr = wf.getframerate()
+        if wf.getnchannels() != 1:
+            raise RuntimeError("当前本地引擎示例仅支持单声道音频，请确保录音为单声道。")
+        if wf.getsampwidth() != 2:
+            raise RuntimeError("需要 16-bit PCM（s16le）音频。")
+        return wf.readframes(wf.getnframes()), sr
 
-    STATE_STYLE = {
-        "idle": ("#4CAF50", "#388E3C", "开始录音"),
-        "recording": ("#F44336", "#D32F2F", "录音中…"),
-        "processing": ("#FF9800", "#F57C00", "识别中…"),
-    }
 
-    def __init__(self, app: "LexiSharpApp", size: int):
-        self.app = app
-        self.top = tk.Toplevel(app.root)
-        self.top.withdraw()
-        self.top.overrideredirect(True)
-        self.top.attributes("-topmost", True)
-        self.top.configure(bg="#1B1B1B")
+@dataclass
+class SherpaModelSpec:
+    """本地模型目录探测结果。"""
+    model_dir: Path
+    tokens_path: Path
+    onnx_files: list[Path]
+    model_type: str
 
-        self.size = max(50, int(size))
-        self._dragging = False
-        self._press_offset = (0, 0)
-        self._icon_img: Optional[tk.PhotoImage] = None
 
-        self.button = tk.Button(
-            self.top,
-            text="",
-            bg="#4CAF50",
-            fg="white",
-            activebackground="#388E3C",
-            activeforeground="white",
-            relief=tk.FLAT,
-            bd=0,
-            font=("WenQuanYi Micro Hei", 10, "bold"),
-            cursor="hand2"
-        )
-        self.button.pack(fill=tk.BOTH, expand=True)
+class LocalSherpaEngine:
+    """
+    本地 sherpa-onnx 离线识别引擎，负责模型探测、识别器构建与缓存。
+    设计：
+    - 仅在需要时初始化并缓存识别器，避免重复加载模型导致的冷启动。
+    - 自动检测模型类型（SenseVoice/Transducer/Paraformer/Whisper）以适配不同目录结构。
+    - 要求模型目录至少包含 `tokens.txt` 与一个/多个 .onnx 文件。
+    - 不依赖 Tk，可供 GUI、命令行基准测试等场景复用。
+    """
 
-        self.button.bind("<ButtonPress-1>", self._on_press)
-        self.button.bind("<B1-Motion>", self._on_drag)
-        self.button.bind("<ButtonRelease-1>", self._on_release)
+    DEFAULT_DECODING_METHODS = ("greedy_search", "modified_beam_search")
 
-        self.top.geometry(f"{self.size}x{self.size}+120+120")
-        # 设置窗口图标（与主窗口一致）
-        try:
-            if self.app._app_icon_photo is not None:
-                self.top.iconphoto(True, self.app._app_icon_photo)
-        except Exception:
-            pass
-        # 应用图标到按钮
-        self._apply_icon()
-        self.top.deiconify()
+    def __init__(self, config: dict, logger: Optional[logging.Logger] = None):
+        parent_logger = logger or logging.getLogger("lexisharp")
+        self.config = config
+        self.logger = parent_logger.getChild("sherpa")
+        self.sample_rate: int = 16000
+        # 按配置签名缓存识别器
+        self._signature: Optional[str] = None
+        self._recognizer: Optional[object] = None
 
-    def update_size(self, size: int) -> None:
+    @staticmethod
+    def is_available() -> bool:
+        return sherpa_onnx is not None and np is not None
+
+    def _ensure_available(self) -> None:
+        if not self.is_available():
+            raise RuntimeError(
+                "本地引擎不可用：缺少依赖。请执行 `pip install sherpa-onnx onnxruntime numpy` 并重启程序。"
+            )
+
+    def resolve_model(self, model_dir: Optional[str] = None) -> SherpaModelSpec:
         """
-        调整按钮尺寸。
+        定位模型目录并探测模型文件与类型；未指定目录时按当前配置的 small/full 规格选择。
         """
-        self.size = max(50, int(size))
-        x = self.top.winfo_x() if self.top.winfo_ismapped() else 120
-        y = self.top.winfo_y() if self.top.winfo_ismapped() else 120
-        self.top.geometry(f"{self.size}x{self.size}+{x}+{y}")
-        self._apply_icon()
+        if not model_dir:
+            variant = (self.config.get("local_sherpa_variant") or "small").strip().lower()
+            if variant not in {"small", "full"}:
+                variant = "small"
+            model_dir = str(self.config.get(f"local_sherpa_model_dir_{variant}") or "").strip()
+        if not model_dir:
+            raise RuntimeError("未设置本地模型目录，请在“设置”中选择或下载本地模型后重试。")
+        model_dir_path = Path(os.path.expanduser(model_dir)).resolve()
+        if not model_dir_path.exists():
+            raise RuntimeError(f"模型目录不存在：{model_dir_path}")
 
-    def set_state(self, state: str) -> None:
+        # 探测模型文件
+        tokens_path = None
+        onnx_files: list[Path] = []
+        for p in model_dir_path.rglob("*"):
+            if p.is_file():
+                if p.name.lower() == "tokens.txt":
+                    tokens_path = p
+                if p.suffix.lower() == ".onnx":
+                    onnx_files.append(p)
+
+        if not tokens_path:
+            raise RuntimeError("未在模型目录中找到 tokens.txt，请检查模型是否完整。")
+        if not onnx_files:
+            raise RuntimeError("未在模型目录中找到 .onnx 文件，请检查模型是否完整。")
+
+        # 根据文件名/数量做粗略类型识别
+        model_type = self._detect_sherpa_model_type(onnx_files)
+        return SherpaModelSpec(model_dir_path, tokens_path, onnx_files, model_type)
+
+    def decoding_methods(self, model_type: str) -> list[str]:
         """
-        根据状态调整显示样式。
+        返回依次尝试的解码方法；配置 local_sherpa_decoding_method 时仅使用该方法。
         """
-        bg, active_bg, text = self.STATE_STYLE.get(state, self.STATE_STYLE["idle"])
-        self.button.configure(
-            bg=bg,
-            activebackground=active_bg,
-            text=""
+        forced = str(self.config.get("local_sherpa_decoding_method") or "").strip()
+        if forced:
+            return [forced]
+        # 为兼容旧版 sherpa-onnx，优先使用 greedy，必要时再尝试 beam
+        return list(self.DEFAULT_DECODING_METHODS)
+
+    def load(self, spec: SherpaModelSpec, decoding_method: str) -> object:
+        """
+        按解码方法构建/复用识别器。
+        """
+        self._ensure_available()
+        provider = (self.config.get("local_sherpa_provider") or "cpu").strip().lower()
+        num_threads = max(1, int(self.config.get("local_sherpa_threads", 4)))
+        prefer_int8 = bool(self.config.get("local_sherpa_prefer_int8", True))
+        signature = (
+            f"{spec.model_type}|{spec.model_dir}|{provider}|{num_threads}|{decoding_method}|{prefer_int8}"
         )
-        # 始终使用图标展示
-        self._apply_icon()
+        if signature != self._signature or self._recognizer is None:
+            self.logger.info(
+                "初始化本地引擎（%s）(%s)，目录=%s，provider=%s，threads=%d",
+                spec.model_type,
+                decoding_method,
+                spec.model_dir,
+                provider,
+                num_threads,
+            )
+            self._recognizer = None
+            self._signature = None
+            self._recognizer = self._build_offline_recognizer(
+                model_type=spec.model_type,
+                onnx_files=spec.onnx_files,
+                tokens_path=str(spec.tokens_path),
+                provider=provider,
+                num_threads=num_threads,
+                decoding_method=decoding_method,
+                prefer_int8=prefer_int8,
+            )
+            self._signature = signature
+        return self._recognizer
 
-    def destroy(self) -> None:
+    def is_loaded(self) -> bool:
         """
-        销毁浮动按钮。
+        判断是否已有缓存的识别器（用于判断是否处于“热”状态）。
         """
-        if self.top:
-            try:
-                self.top.destroy()
-            finally:
-                self.top = None
-
-    def _on_press(self, event) -> None:
-        self._dragging = False
-        self._press_offset = (event.x, event.y)
-        self.app.prime_external_window()
-
-    def _on_drag(self, event) -> None:
-        self._dragging = True
-        x = event.x_root - self._press_offset[0]
-        y = event.y_root - self._press_offset[1]
-        self.top.geometry(f"{self.size}x{self.size}+{x}+{y}")
-
-    def _on_release(self, _event) -> None:
-        if not self._dragging:
-            self.app.root.after(0, self.app.toggle_recording)
-        self._dragging = False
-
-    def _apply_icon(self) -> None:
-        """根据当前尺寸获取图标并应用到按钮。"""
-        try:
-            # 给图标留一点内边距
-            icon_size = max(24, int(self.size * 0.7))
-            img = self.app.get_icon_for_size(icon_size)
-            if img is not None:
-                self._icon_img = img  # 保存引用，避免被 GC
-                self.button.configure(image=self._icon_img, compound=tk.CENTER)
-            else:
-                # 无图标时显示短文本
-                self.button.configure(image="", text="录音")
-        except Exception:
-            self.button.configure(image="", text="录音")
-
-
-class LexiSharpApp:
-    """
-    Tkinter 图形界面应用，负责录音、调用ASR、剪贴板操作。
-    """
-
-    def __init__(self, root: tk.Tk, config: dict, logger: logging.Logger):
-        self.root = root
-        self.config = config
-        self.logger = logger
-        self.clipboard = ClipboardHelper(logger=self.logger)
-        self.input_injector = InputInjector(logger=self.logger)
-        dbus_timeout = int(self.config.get("dbus_timeout_ms", CONFIG_TEMPLATE["dbus_timeout_ms"]))
-        self.dbus_input = FcitxDbusInput(logger=self.logger, timeout_ms=dbus_timeout)
-        self.start_hotkey = (self.config.get("start_hotkey") or "").strip()
-        self.stop_hotkey = (self.config.get("stop_hotkey") or "").strip()
-        self.hotkey_manager: Optional[GlobalHotkeyManager] = None
-        self.floating_button: Optional[FloatingButton] = None
-        self._floating_state = "idle"
-        self.floating_enabled_var = tk.BooleanVar(
-            master=self.root,
-            value=bool(self.config.get("floating_button_enabled", False))
-        )
-        float_size = int(self.config.get("floating_button_size", 96) or 96)
-        self.floating_size_var = tk.IntVar(
-            master=self.root,
-            value=max(50, min(200, float_size))
-        )
-        device = (self.config.get("arecord_device") or "").strip() or None
-        if device:
-            self.logger.info("配置中指定录音设备：%s", device)
-        self.recorder = Recorder(device=device, logger=self.logger)
-
-        self.root.update_idletasks()
-        self.root_window_id = str(self.root.winfo_id())
-        self._own_windows: set[str] = {self.root_window_id}
-        self._last_external_window: Optional[str] = None
-        self._register_window(self.root)
-
-        self.target_window: Optional[str] = None
-        self.audio_path: Optional[str] = None
-        self.processing = False
-
-        self.status_var = tk.StringVar(value="准备就绪，点击开始录音。")
-        self.result_var = tk.StringVar(value="尚未识别内容。")
-        self.button_text = tk.StringVar(value="开始录音")
-        self.level_var = tk.DoubleVar(value=0.0)
-        self.last_result_text: str = ""
-        self.original_window_before_record: Optional[str] = None
-        self.settings_dialog: Optional["SettingsDialog"] = None
-        self.config_ready: bool = False
-        self._config_prompt_shown: bool = False
-
-        # 本地引擎缓存：避免重复加载模型（按配置签名缓存）
-        self._local_sherpa_signature: Optional[str] = None
-        self._local_sherpa_recognizer: Optional[object] = None
-        self._local_sherpa_sr: int = 16000
-
-        # 应用图标缓存
-        self._app_icon_photo: Optional[tk.PhotoImage] = None
-        self._icon_cache: dict[int, tk.PhotoImage] = {}
-        self._icon_source_path: Optional[str] = None
-        self._icon_base_pil = None  # type: ignore[assignment]
-
-        self._setup_theme()
-        self._init_icons()
-        self._build_ui()
-        self._update_floating_controls_state()
-        self._schedule_level_update()
-        self._validate_keys(initial=NEW_CONFIG_CREATED)
-        self._init_hotkeys()
-        if self.floating_enabled_var.get():
-            self._create_floating_button()
-            self._apply_floating_state(self._floating_state)
-
-        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+        return self._recognizer is not None
 
-    def _build_ui(self) -> None:
+    def read_wav(self, audio_file: str) -> tuple["np.ndarray", int]:
         """
-        构建界面组件。
+        读取 wav 文件并转为 float32 波形。
         """
-        self.root.title("LexiSharp-linux")
-        self.root.geometry("500x500")
-        self.root.resizable(False, False)
-
-        font_title = ("WenQuanYi Micro Hei", 18, "bold")
-        font_body = ("WenQuanYi Micro Hei", 12)
+        self._ensure_available()
+        pcm_bytes, sr = read_wav_pcm16(audio_file)
+        samples = np.frombuffer(pcm_bytes, dtype=np.int16).astype(np.float32) / 32768.0
+        return samples, sr
 
-        # 顶部两按钮并排：开始录音 / 设置（等宽）
-        btn_bar = ttk.Frame(self.root, padding=(20, 16))
-        btn_bar.pack(fill=tk.X)
-        btn_bar.columnconfigure(0, weight=1)
-        btn_bar.columnconfigure(1, weight=1)
+    def transcribe_file(self, audio_file: str) -> Optional[str]:
+        """
+        识别 wav 文件并返回文本。
+        """
+        self._ensure_available()
+        spec = self.resolve_model()
+        samples, sr = self.read_wav(audio_file)
+        return self.transcribe_samples(samples, sr, spec=spec)
 
-        self.record_button = ttk.Button(
-            btn_bar,
-            textvariable=self.button_text,
-            command=self.toggle_recording,
-            style="Record.TButton",
-        )
-        self.record_button.grid(row=0, column=0, sticky="ew", padx=(0, 8))
+    def transcribe_samples(
+        self,
+        samples: "np.ndarray",
+        sr: int,
+        spec: Optional[SherpaModelSpec] = None
+    ) -> Optional[str]:
+        """
+        识别 float32 波形，解码失败时按顺序尝试其他解码方法。
+        """
+        self._ensure_available()
+        spec = spec or self.resolve_model()
+        samples = self.prepare_samples(samples, sr)
 
-        settings_button = ttk.Button(
-            btn_bar,
-            text="设置",
-            command=self._open_settings,
-            style="Record.TButton",
-        )
-        settings_button.grid(row=0, column=1, sticky="ew", padx=(8, 0))
+        last_err: Optional[Exception] = None
+        for dmethod in self.decoding_methods(spec.model_type):
+            try:
+                recognizer = self.load(spec, dmethod)
+            except Exception as exc:
+                last_err = exc
+                self.logger.exception("构建识别器失败（%s）", dmethod)
+                continue
+            try:
+                text = self.decode(recognizer, samples, sr)
+                if text:
+                    return text
+                self.logger.warning("解码方法 %s 未返回文本，尝试其他方法…", dmethod)
+            except Exception as exc:
+                last_err = exc
+                self.logger.exception("本地引擎识别失败（%s）", dmethod)
+                continue
 
-        # 主页其余内容
-        main_frame = ttk.Frame(self.root, padding=(20, 0))
-        main_frame.pack(fill=tk.BOTH, expand=True)
+        if last_err:
+            raise RuntimeError(f"本地引擎识别失败：{last_err}")
+        return None
 
-        # 设置主窗口图标（如果找到 asr.png/svg）
-        if self._app_icon_photo is not None:
+    def prepare_samples(self, samples: "np.ndarray", sr: int) -> "np.ndarray":
+        """
+        解码前的预处理：检查采样率并按配置做前后去静音。
+        """
+        if sr != self.sample_rate:
+            self.logger.warning("采样率不匹配：录音=%d，预期=%d，将按原样送入。", sr, self.sample_rate)
+        # 去静音（可选，仅前后裁剪）
+        if bool(self.config.get("local_sherpa_trim_silence", False)):
             try:
-                self.root.iconphoto(True, self._app_icon_photo)
+                thr = float(self.config.get("local_sherpa_vad_threshold", 0.01))
             except Exception:
-                pass
-
-        floating_frame = ttk.Frame(main_frame)
-        floating_frame.pack(pady=(4, 0))
-
-        floating_toggle = ttk.Checkbutton(
-            floating_frame,
-            text="显示浮动录音按钮",
-            variable=self.floating_enabled_var,
-            command=self._toggle_floating_button
-        )
-        floating_toggle.pack(side=tk.LEFT)
-
-        size_label = ttk.Label(
-            floating_frame,
-            text="按钮大小"
-        )
-        size_label.pack(side=tk.LEFT, padx=(16, 4))
-
-        self.floating_size_scale = tk.Scale(
-            floating_frame,
-            from_=60,
-            to=160,
-            orient=tk.HORIZONTAL,
-            resolution=5,
-            showvalue=True,
-            variable=self.floating_size_var,
-            command=self._on_floating_size_change,
-            length=160
-        )
-        self.floating_size_scale.pack(side=tk.LEFT)
-
-        level_label = ttk.Label(
-            main_frame,
-            text="实时音量检测"
-        )
-        level_label.pack(pady=(0, 4))
-
-        self.level_bar = ttk.Progressbar(
-            main_frame,
-            orient=tk.HORIZONTAL,
-            length=360,
-            mode="determinate",
-            maximum=100,
-            variable=self.level_var
-        )
-        self.level_bar.pack(fill=tk.X)
-
-        status_label = ttk.Label(
-            main_frame,
-            textvariable=self.status_var,
-            wraplength=360,
-            justify=tk.LEFT,
-            # 字体通过主题控制
-        )
-        status_label.pack(pady=(10, 4), fill=tk.X)
-
-        result_frame = ttk.LabelFrame(main_frame, text="最近识别结果")
-        result_frame.pack(fill=tk.BOTH, expand=True, pady=(4, 16))
-
-        result_display = ttk.Label(
-            result_frame,
-            textvariable=self.result_var,
-            wraplength=360,
-            justify=tk.LEFT,
-            # 字体通过主题控制
-        )
-        result_display.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
+                thr = 0.01
+            trimmed = self._trim_silence(samples, sr, threshold=thr)
+            if trimmed is not None and len(trimmed) > 0:
+                samples = trimmed
+        return samples
 
-    def _setup_theme(self) -> None:
-        """配置 ttk 主题与样式。"""
+    @staticmethod
+    def decode(recognizer: object, samples: "np.ndarray", sr: int) -> str:
+        """
+        使用给定识别器执行一次离线解码并返回文本。
+        """
+        # Offline 识别流程
+        stream = recognizer.create_stream()  # type: ignore[attr-defined]
+        stream.accept_waveform(sr, samples)  # type: ignore[attr-defined]
         try:
-            style = ttk.Style(self.root)
-            # 选择通用主题
+            stream.input_finished()  # type: ignore[attr-defined]
+        except Exception:
+            pass
+        try:
+            recognizer.decode_stream(stream)  # type: ignore[attr-defined]
+        except AttributeError:
+            recognizer.decode_streams([stream])  # type: ignore[attr-defined]
+        return LocalSherpaEngine.stream_text(recognizer, stream)
+
+    @staticmethod
+    def decode_batch(recognizer: object, items: List[tuple["np.ndarray", int]]) -> List[str]:
+        """
+        一次 decode_streams 批量解码多段波形，旧版本接口回退为逐条 decode_stream。
+        """
+        streams = []
+        for samples, sr in items:
+            stream = recognizer.create_stream()  # type: ignore[attr-defined]
+            stream.accept_waveform(sr, samples)  # type: ignore[attr-defined]
             try:
-                style.theme_use("clam")
+                stream.input_finished()  # type: ignore[attr-defined]
             except Exception:
                 pass
+            streams.append(stream)
+        try:
+            recognizer.decode_streams(streams)  # type: ignore[attr-defined]
+        except AttributeError:
+            for stream in streams:
+                recognizer.decode_stream(stream)  # type: ignore[attr-defined]
+        return [LocalSherpaEngine.stream_text(recognizer, stream) for stream in streams]
 
-            style.configure("Header.TButton", padding=8)
-            # 录音按钮样式
-            style.configure(
-                "Record.TButton",
-                font=("WenQuanYi Micro Hei", 14, "bold"),
-                padding=14
-            )
-        except Exception:
-            pass
-
-    def _init_icons(self) -> None:
-        """尝试从当前目录或脚本目录加载 asr.png 或 asr.svg 作为程序图标。"""
-        candidates = []
-        try:
-            here = Path.cwd()
-            candidates.extend([here / "asr.png", here / "asr.svg"])
-        except Exception:
-            pass
+    @staticmethod
+    def stream_text(recognizer: object, stream: object) -> str:
+        """
+        从已解码的 stream 中提取文本，兼容新旧版本接口。
+        """
+        text = None
         try:
-            script_dir = Path(__file__).resolve().parent
-            candidates.extend([script_dir / "asr.png", script_dir / "asr.svg"])
+            result = recognizer.get_result(stream)  # type: ignore[attr-defined]
+            text = getattr(result, "text", None) or (result if isinstance(result, str) else None)
         except Exception:
             pass
-
-        icon_path: Optional[Path] = None
-        for p in candidates:
+        if not text:
             try:
-                if p.exists():
-                    icon_path = p
-                    break
+                text = getattr(stream, "result", None)
+                text = getattr(text, "text", None) if text is not None else None
             except Exception:
-                continue
-
-        if not icon_path:
-            return
-        self._icon_source_path = str(icon_path)
+                text = None
+        return (text or "").strip()
 
+    def _trim_silence(self, samples: "np.ndarray", sr: int, threshold: float = 0.01) -> Optional["np.ndarray"]:
+        """简单前后去静音：基于幅度阈值裁剪头尾的近静音段。
+        threshold 为归一化幅度阈值（0~1），默认 0.01。
+        若整段都低于阈值，则返回原始 samples 以避免误删。
+        """
         try:
-            if icon_path.suffix.lower() == ".png":
-                # 直接用 Tk PhotoImage；同时若有 PIL 则保留 PIL 以便缩放
-                self._app_icon_photo = tk.PhotoImage(file=str(icon_path))
-                if Image is not None:
-                    self._icon_base_pil = Image.open(str(icon_path)).convert("RGBA")
-            elif icon_path.suffix.lower() == ".svg":
-                # 尝试用 cairosvg 转 PNG，再用 PIL 读
-                if cairosvg is not None and Image is not None and ImageTk is not None:
-                    png_bytes = cairosvg.svg2png(url=str(icon_path))
-                    from io import BytesIO
-                    self._icon_base_pil = Image.open(BytesIO(png_bytes)).convert("RGBA")
-                    # 生成一个中等大小的 PhotoImage 作为窗口图标
-                    im64 = self._icon_base_pil.copy()
-                    im64.thumbnail((64, 64), Image.LANCZOS)
-                    self._app_icon_photo = ImageTk.PhotoImage(im64)
-                else:
-                    # 无法处理 svg，忽略
-                    return
+            if samples is None or len(samples) == 0:
+                return samples
+            x = np.abs(samples)
+            # 以 20ms 为一帧做快速扫描
+            frame = max(1, int(sr * 0.02))
+            n = len(x)
+            # 找到第一个超过阈值的帧起点
+            start = 0
+            while start < n:
+                end = min(n, start + frame)
+                if x[start:end].max() >= threshold:
+                    break
+                start = end
+            # 全静音：直接返回原始
+            if start >= n:
+                return samples
+            # 找到最后一个超过阈值的帧终点
+            tail = n
+            pos = n
+            while pos > 0:
+                s = max(0, pos - frame)
+                if x[s:pos].max() >= threshold:
+                    break
+                pos = s
+            tail = pos
+            # 保护：至少保留 0.3s 音频
+            min_keep = int(sr * 0.3)
+            if tail - start < min_keep:
+                # 尝试扩展至最小长度
+                mid = (start + tail) // 2
+                start = max(0, mid - min_keep // 2)
+                tail = min(n, start + min_keep)
+            return samples[start:tail]
         except Exception:
-            # 加载失败则放弃图标设置
-            self._app_icon_photo = None
-            self._icon_base_pil = None
-            return
+            # 安全兜底：若出错不裁剪
+            return samples
 
-    def get_icon_for_size(self, size: int) -> Optional[tk.PhotoImage]:
-        """返回指定像素大小的 PhotoImage，用于浮动按钮等。"""
-        if size <= 0:
-            return None
-        if size in self._icon_cache:
-            return self._icon_cache[size]
+    def _detect_sherpa_model_type(self, onnx_files: list[Path]) -> str:
+        """基于路径/文件名推断模型类型，返回 `sense_voice`/`transducer`/`paraformer`/`whisper`。"""
+        names = {p.name.lower() for p in onnx_files}
+        # SenseVoice 专用模型（目录名通常包含 sense-voice）
+        for p in onnx_files:
+            full = str(p).lower()
+            if "sense-voice" in full or "sense_voice" in full:
+                return "sense_voice"
+        if {"encoder.onnx", "decoder.onnx", "joiner.onnx"}.issubset(names):
+            return "transducer"
+        # whisper 常见包含 encoder/decoder 或 whisper-*.onnx
+        if any("whisper" in n for n in names) or {"whisper-encoder.onnx", "whisper-decoder.onnx"}.issubset(names):
+            return "whisper"
+        # 默认按 Paraformer（单文件 model.onnx）处理
+        return "paraformer"
+
+    def _build_offline_recognizer(
+        self,
+        model_type: str,
+        onnx_files: list[Path],
+        tokens_path: str,
+        provider: str,
+        num_threads: int,
+        decoding_method: str = "greedy_search",
+        prefer_int8: bool = True,
+    ):
+        """根据推断的模型类型构建 OfflineRecognizer。"""
+        mc = None
+        tokens = tokens_path
+        if model_type == "transducer":
+            # encoder/decoder/joiner 三件套
+            base = {p.name.lower(): str(p) for p in onnx_files}
+            mc = sherpa_onnx.OfflineModelConfig(
+                transducer=sherpa_onnx.OfflineTransducerModelConfig(
+                    encoder=base.get("encoder.onnx", ""),
+                    decoder=base.get("decoder.onnx", ""),
+                    joiner=base.get("joiner.onnx", ""),
+                ),
+                tokens=tokens,
+                num_threads=num_threads,
+                provider=provider,
+            )
+        elif model_type == "sense_voice":
+            # SenseVoice 专用配置
+            model_path = self._choose_model_file(onnx_files, prefer_int8, provider)
+            sv_cfg = sherpa_onnx.OfflineSenseVoiceModelConfig(
+                model=model_path,
+                language="auto",
+                use_itn=False,
+            )
+            mc = sherpa_onnx.OfflineModelConfig(
+                sense_voice=sv_cfg,
+                tokens=tokens,
+                num_threads=num_threads,
+                provider=provider,
+            )
+        elif model_type == "whisper":
+            # 支持合并模型或拆分的 encoder/decoder
+            base = {p.name.lower(): str(p) for p in onnx_files}
+            enc = base.get("whisper-encoder.onnx") or base.get("encoder.onnx") or ""
+            dec = base.get("whisper-decoder.onnx") or base.get("decoder.onnx") or ""
+            # 一些仓库会直接给单模型文件，尝试兜底
+            single = next((str(p) for p in onnx_files if "whisper" in p.name.lower()), "")
+            whisper_cfg = sherpa_onnx.OfflineWhisperModelConfig(
+                encoder=enc,
+                decoder=dec,
+                model=single,
+                language="zh",
+                task="transcribe",
+            )
+            mc = sherpa_onnx.OfflineModelConfig(
+                whisper=whisper_cfg,
+                tokens=tokens,
+                num_threads=num_threads,
+                provider=provider,
+            )
+        else:  # paraformer（默认）
+            model_path = self._choose_model_file(onnx_files, prefer_int8, provider)
+            pf_cfg = sherpa_onnx.OfflineParaformerModelConfig(model=model_path)
+            mc = sherpa_onnx.OfflineModelConfig(
+                paraformer=pf_cfg,
+                tokens=tokens,
+                num_threads=num_threads,
+                provider=provider,
+            )
+        # 适配新旧 API：优先尝试新版本构造，失败则回退到旧版工厂方法
         try:
-            if self._icon_base_pil is not None and ImageTk is not None:
-                im = self._icon_base_pil.copy()
-                im.thumbnail((size, size), Image.LANCZOS)
-                photo = ImageTk.PhotoImage(im)
-                self._icon_cache[size] = photo
-                return photo
-            # 无 PIL，则尝试基于 Tk PhotoImage 缩放（只能近似）
-            if self._app_icon_photo is not None:
-                w = self._app_icon_photo.width()
-                if w > 0:
-                    factor = max(1, int(round(w / max(1, size))))
-                    try:
-                        photo = self._app_icon_photo.subsample(factor)
-                        self._icon_cache[size] = photo
-                        return photo
-                    except Exception:
-                        return self._app_icon_photo
-        except Exception:
-            return None
-        return None
+            return sherpa_onnx.OfflineRecognizer(model_config=mc, decoding_method=decoding_method)
+        except TypeError:
+            # 旧版本兼容路径
+            return self._build_offline_recognizer_legacy(
+                model_type=model_type,
+                onnx_files=onnx_files,
+                tokens_path=tokens,
+                provider=provider,
+                num_threads=num_threads,
+                decoding_method=decoding_method,
+            )
 
-    def _collect_missing_fields(self, config: dict) -> tuple[list[str], str]:
-        """
-        根据指定配置收集缺失的必填字段，并返回渠道标识。
-        """
-        channel = (config.get("channel") or "volcengine").strip().lower()
-        missing_messages: list[str] = []
+    def _build_offline_recognizer_legacy(
+        self,
+        model_type: str,
+        onnx_files: list[Path],
+        tokens_path: str,
+        provider: str,
+        num_threads: int,
+        decoding_method: str = "greedy_search",
+        prefer_int8: bool = True,
+    ):
+        """兼容旧版 sherpa-onnx 的构造方式（from_transducer/from_paraformer/from_whisper）。"""
+        import inspect
 
-        if channel in {"volcengine", "volcano", "volc", "bytedance"}:
-            app_key = os.environ.get("LEXISHARP_APP_KEY") or config.get("app_key", "")
-            access_key = os.environ.get("LEXISHARP_ACCESS_KEY") or config.get("access_key", "")
-            has_app_key = bool(str(app_key).strip()) and "在此填写" not in str(app_key)
-            has_access_key = bool(str(access_key).strip()) and "在此填写" not in str(access_key)
-            if not (has_app_key or has_access_key):
-                missing_messages.append("至少填写火山引擎凭证（App ID 或 Access Key）。")
-        elif channel == "soniox":
-            api_key = os.environ.get("SONIOX_API_KEY") or config.get("soniox_api_key", "")
-            if "在此填写" in api_key or not str(api_key).strip():
-                missing_messages.append("Soniox API Key（soniox_api_key 或环境变量 SONIOX_API_KEY）")
-        elif channel in {"qwen", "tongyi", "tongyiqianwen", "dashscope"}:
-            api_key = os.environ.get("DASHSCOPE_API_KEY") or config.get("qwen_api_key", "")
-            if "在此填写" in str(api_key) or not str(api_key).strip():
-                missing_messages.append("通义千问 API Key（qwen_api_key 或环境变量 DASHSCOPE_API_KEY）")
-        elif channel in {"local_sherpa", "local", "sherpa"}:
-            variant = str(config.get("local_sherpa_variant", "small")).strip().lower()
-            if variant not in {"small", "full"}:
-                variant = "small"
-            model_dir = str(config.get(f"local_sherpa_model_dir_{variant}", "")).strip()
-            if not model_dir:
-                missing_messages.append("未设置本地模型目录（small/full）")
-            else:
-                p = Path(os.path.expanduser(model_dir)).resolve()
-                if not p.exists():
-                    missing_messages.append(f"模型目录不存在：{p}")
+        def call_with_supported(func, params: dict, model_type: str, model_paths: dict):
+            """
+            根据工厂函数签名动态选择参数键：
+            - paraformer：优先传 paraformer=str 路径；否则传 model=str；否则传 config 对象（极少见）
+            - transducer：签名含 encoder/decoder/joiner 则传 3 路径；否则传 transducer=config
+            - whisper：签名含 encoder/decoder/model 则传 3 路径；否则传 whisper=config
+            其他通用参数按签名过滤。
+            """
+            try:
+                sig = inspect.signature(func)
+                param_names = set(sig.parameters.keys())
+            except (TypeError, ValueError):
+                sig = None
+                param_names = set()
+
+            kwargs: dict[str, object] = {}
+            # tokens 总是必填
+            if "tokens" in params:
+                kwargs["tokens"] = params["tokens"]
+            # 仅当能获取到签名且参数名存在时，才传可选参数，避免旧版 C 扩展因未知关键字异常/不确定行为
+            for k in ("num_threads", "provider", "decoding_method", "language", "task"):
+                if sig is not None and k in param_names and k in params:
+                    kwargs[k] = params[k]
+
+            if model_type == "paraformer":
+                model_path = model_paths.get("model", "")
+                if "paraformer" in param_names:
+                    kwargs["paraformer"] = model_path
+                elif "model" in param_names:
+                    kwargs["model"] = model_path
                 else:
-                    tokens = list(p.rglob("tokens.txt"))
-                    onnx = list(p.rglob("*.onnx"))
-                    if not tokens:
-                        missing_messages.append("模型缺少 tokens.txt")
-                    if not onnx:
-                        missing_messages.append("模型目录中未发现 .onnx 文件")
+                    # 无法判断，降级为配置对象
+                    kwargs["paraformer"] = sherpa_onnx.OfflineParaformerModelConfig(model=model_path)
+            elif model_type == "transducer":
+                if {"encoder", "decoder", "joiner"}.issubset(param_names):
+                    kwargs.update({
+                        "encoder": model_paths.get("encoder", ""),
+                        "decoder": model_paths.get("decoder", ""),
+                        "joiner": model_paths.get("joiner", ""),
+                    })
+                else:
+                    kwargs["transducer"] = sherpa_onnx.OfflineTransducerModelConfig(
+                        encoder=model_paths.get("encoder", ""),
+                        decoder=model_paths.get("decoder", ""),
+                        joiner=model_paths.get("joiner", ""),
+                    )
+            elif model_type == "whisper":
+                if {"encoder", "decoder", "model"}.issubset(param_names):
+                    kwargs.update({
+                        "encoder": model_paths.get("encoder", ""),
+                        "decoder": model_paths.get("decoder", ""),
+                        "model": model_paths.get("model", ""),
+                    })
+                    if "language" in param_names and "language" not in kwargs:
+                        kwargs["language"] = "zh"
+                    if "task" in param_names and "task" not in kwargs:
+                        kwargs["task"] = "transcribe"
+                else:
+                    kwargs["whisper"] = sherpa_onnx.OfflineWhisperModelConfig(
+                        encoder=model_paths.get("encoder", ""),
+                        decoder=model_paths.get("decoder", ""),
+                        model=model_paths.get("model", ""),
+                        language=kwargs.get("language", "zh"),
+                        task=kwargs.get("task", "transcribe"),
+                    )
+            else:  # sense_voice
+                # 旧版 from_sense_voice 一般签名为 (tokens, model, language?, use_itn?, num_threads?, provider?, decoding_method?)
+                # 因此优先传 model=路径；再按签名选择 language/use_itn 等
+                if sig is None or "model" in param_names:
+                    kwargs["model"] = model_paths.get("model", "")
+                    if sig is not None and "language" in param_names and "language" not in kwargs:
+                        kwargs["language"] = "auto"
+                    if sig is not None and "use_itn" in param_names and "use_itn" not in kwargs:
+                        kwargs["use_itn"] = False
+                else:
+                    # 极少数特殊命名，尝试 sense_voice_model
+                    if "sense_voice_model" in param_names:
+                        kwargs["sense_voice_model"] = model_paths.get("model", "")
+                    else:
+                        # 最后兜底：构造配置对象（万一该版本支持）
+                        kwargs["model"] = model_paths.get("model", "")
+
+            return func(**kwargs)
+
+        tokens = tokens_path
+        names = {p.name.lower(): str(p) for p in onnx_files}
+
+        # 优先从类方法查找；否则从模块级函数兜底
+        rec_cls = getattr(sherpa_onnx, "OfflineRecognizer", None)
+        factory = None
+        if model_type == "transducer":
+            factory = getattr(rec_cls, "from_transducer", None) or getattr(sherpa_onnx, "from_transducer", None)
+            if not factory:
+                raise RuntimeError("当前 sherpa-onnx 版本不支持 transducer 工厂方法，请升级 sherpa-onnx。")
+            return call_with_supported(
+                factory,
+                dict(
+                    tokens=tokens,
+                    num_threads=num_threads,
+                    provider=provider,
+                    decoding_method=decoding_method,
+                ),
+                model_type,
+                {
+                    "encoder": names.get("encoder.onnx", ""),
+                    "decoder": names.get("decoder.onnx", ""),
+                    "joiner": names.get("joiner.onnx", ""),
+                },
+            )
+        if model_type == "sense_voice":
+            factory = getattr(rec_cls, "from_sense_voice", None) or getattr(sherpa_onnx, "from_sense_voice", None)
+            if not factory:
+                # 某些版本可能使用 from_sensevoice 命名，尝试兜底
+                factory = getattr(rec_cls, "from_sensevoice", None) or getattr(sherpa_onnx, "from_sensevoice", None)
+            if not factory:
+                raise RuntimeError("当前 sherpa-onnx 版本不支持 sense-voice 工厂方法，请升级 sherpa-onnx。")
+            model_path = self._choose_model_file(onnx_files, prefer_int8, provider)
+            return call_with_supported(
+                factory,
+                dict(
+                    tokens=tokens,
+                    num_threads=num_threads,
+                    provider=provider,
+                    decoding_method=decoding_method,
+                    language="auto",
+                    use_itn=False,
+                ),
+                model_type,
+                {"model": model_path},
+            )
+        if model_type == "whisper":
+            factory = getattr(rec_cls, "from_whisper", None) or getattr(sherpa_onnx, "from_whisper", None)
+            if not factory:
+                raise RuntimeError("当前 sherpa-onnx 版本不支持 whisper 工厂方法，请升级 sherpa-onnx。")
+            return call_with_supported(
+                factory,
+                dict(
+                    tokens=tokens,
+                    num_threads=num_threads,
+                    provider=provider,
+                    decoding_method=decoding_method,
+                ),
+                model_type,
+                {
+                    "encoder": names.get("whisper-encoder.onnx") or names.get("encoder.onnx", ""),
+                    "decoder": names.get("whisper-decoder.onnx") or names.get("decoder.onnx", ""),
+                    "model": next((v for k, v in names.items() if "whisper" in k), ""),
+                },
+            )
+        # paraformer 默认
+        factory = getattr(rec_cls, "from_paraformer", None) or getattr(sherpa_onnx, "from_paraformer", None)
+        if not factory:
+            raise RuntimeError("当前 sherpa-onnx 版本不支持 paraformer 工厂方法，请升级 sherpa-onnx。")
+        model_path = self._choose_model_file(onnx_files, prefer_int8, provider)
+        return call_with_supported(
+            factory,
+            dict(
+                tokens=tokens,
+                num_threads=num_threads,
+                provider=provider,
+                decoding_method=decoding_method,
+            ),
+            model_type,
+            {"model": model_path},
+        )
+
+    def _choose_model_file(self, onnx_files: list[Path], prefer_int8: bool, provider: str) -> str:
+        """在多个 .onnx 中选择一个主模型文件：
+        - CPU 且 prefer_int8 时优先选择名称包含 int8 的文件；
+        - 否则优先非 int8；
+        - 若未匹配到，回退为体积最大者。
+        """
+        if not onnx_files:
+            return ""
+        names = [p.name.lower() for p in onnx_files]
+        pairs = list(zip(names, onnx_files))
+        if provider == "cpu" and prefer_int8:
+            for n, p in pairs:
+                if "int8" in n:
+                    return str(p)
         else:
-            self.logger.info("检测到自定义渠道：%s，跳过配置校验。", channel)
+            # 优先非 int8
+            for n, p in pairs:
+                if "int8" not in n:
+                    return str(p)
+        # 兜底：体积最大
+        return str(max(onnx_files, key=lambda p: p.stat().st_size))
 
-        return missing_messages, channel
 
-    def _validate_keys(self, initial: bool = False, trigger_prompt: bool = True) -> bool:
+def _decode_worker_main(conn, config: dict) -> None:
+    """
+    本地解码子进程入口：持有识别器，按请求从共享内存读取 PCM 并解码。
+    """
+    logger = logging.getLogger("lexisharp.decode-worker")
+    engine = LocalSherpaEngine(config, logger=logger)
+    attached: Optional[shared_memory.SharedMemory] = None
+    try:
+        while True:
+            try:
+                command, payload = conn.recv()
+            except (EOFError, OSError):
+                break
+            if command == "stop":
+                break
+            if command == "load":
+                started = time.perf_counter()
+                try:
+                    engine.config = payload
+                    spec = engine.resolve_model()
+                    engine.load(spec, engine.decoding_methods(spec.model_type)[0])
+                except Exception as exc:  # pylint: disable=broad-except
+                    conn.send(("error", {"error": f"{type(exc).__name__}: {exc}"}))
+                else:
+                    conn.send(("ready", {
+                        "model_type": spec.model_type,
+                        "load_ms": (time.perf_counter() - started) * 1000.0,
+                    }))
+                continue
+            if command == "decode":
+                try:
+                    if attached is None or attached.name != payload["shm"]:
+                        if attached is not None:
+                            attached.close()
+                        attached = shared_memory.SharedMemory(name=payload["shm"])
+                    count = int(payload["samples"])
+                    started = time.perf_counter()
+                    pcm = np.frombuffer(attached.buf, dtype=np.int16, count=count)
+                    samples = pcm.astype(np.float32) / 32768.0
+                    del pcm  # 释放对共享内存缓冲区的引用，便于后续关闭
+                    text = engine.transcribe_samples(samples, int(payload["sr"]))
+                    conn.send(("result", {
+                        "id": payload["id"],
+                        "text": text,
+                        "decode_ms": (time.perf_counter() - started) * 1000.0,
+                    }))
+                except Exception as exc:  # pylint: disable=broad-except
+                    conn.send(("result", {"id": payload["id"], "error": f"{type(exc).__name__}: {exc}"}))
+    finally:
+        if attached is not None:
+            try:
+                attached.close()
+            except Exception:
+                pass
+        conn.close()
+
+
+class _DecodeWorkerCrashed(Exception):
+    """子进程异常退出或无响应。"""
+
+
+class _DecodeWorkerTimeout(_DecodeWorkerCrashed):
+    """子进程在限定时间内未返回解码结果。"""
+
+
+class LocalDecodeWorker:
+    """
+    进程隔离的本地解码器：识别器运行在独立子进程中，sherpa-onnx/onnxruntime 的原生崩溃
+    不会拖垮主程序，重负载解码也不会占用 GUI 进程的 GIL。
+    音频通过 multiprocessing.shared_memory 交接（仅传递段名与样本数），子进程崩溃后由监视线程立即重启并重新加载模型。
+    """
+
+    MIN_SHM_BYTES = 1 << 20
+    # 等待子进程加载模型的上限（秒），超时视为子进程卡死
+    LOAD_TIMEOUT_S = 180.0
+
+    def __init__(self, config: dict, logger: Optional[logging.Logger] = None):
+        parent_logger = logger or logging.getLogger("lexisharp")
+        self.config = config
+        self.logger = parent_logger.getChild("decode-worker")
+        self._ctx = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._process: Optional["multiprocessing.process.BaseProcess"] = None
+        self._conn = None
+        self._ready = threading.Event()
+        self._load_error: Optional[str] = None
+        self._loaded_signature: Optional[str] = None
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        self._request_seq = 0
+        self._closed = False
+        self.restarts = 0
+        # 交接开销统计（毫秒）：总往返耗时减去子进程内解码耗时
+        self._overhead_samples: List[float] = []
+
+    def _config_signature(self) -> str:
+        keys = sorted(key for key in self.config if key.startswith("local_sherpa_"))
+        return json.dumps({key: self.config.get(key) for key in keys}, sort_keys=True, ensure_ascii=False)
+
+    def start(self) -> None:
         """
-        检查当前渠道所需配置是否完整。
+        在后台启动子进程并预加载模型，不阻塞调用方。
         """
-        self.logger.debug("开始校验配置。")
-        missing_messages, channel = self._collect_missing_fields(self.config)
-
-        if missing_messages:
-            self.config_ready = False
-            if hasattr(self, "record_button"):
-                self.record_button.configure(state=tk.DISABLED)
-            missing_text = "、".join(missing_messages)
-            self.logger.warning("配置缺失：%s", missing_text)
-            self.status_var.set("配置缺失，请点击右上角“设置”按钮完成必填项。")
-            if trigger_prompt and (initial or not self._config_prompt_shown):
-                messagebox.showwarning(
-                    "配置提醒",
-                    f"当前配置缺少以下内容：\n{missing_text}\n请在“设置”中完善后再使用。"
-                )
-                self._config_prompt_shown = True
-            if trigger_prompt:
-                self.root.after(0, self._open_settings)
-            return False
+        threading.Thread(target=self._spawn_and_load, name="DecodeWorkerLoader", daemon=True).start()
 
-        self.logger.info("配置校验通过，渠道：%s", channel)
-        self.config_ready = True
-        self._config_prompt_shown = False
-        if hasattr(self, "record_button"):
-            self.record_button.configure(state=tk.NORMAL)
-        if initial or self.status_var.get().startswith("配置缺失"):
-            self.status_var.set("准备就绪，点击开始录音。")
-        return True
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
 
-    def toggle_recording(self) -> None:
+    def is_ready(self) -> bool:
         """
-        开始或停止录音。
+        子进程存活且已按当前配置加载模型。
         """
-        if self.processing:
-            return
-        if not self.config_ready:
-            messagebox.showwarning("配置提醒", "当前配置尚未完成，请先在设置中填写必需字段。")
-            self._open_settings()
-            return
-
-        if not self.recorder.is_running():
-            self.prime_external_window()
-            self.start_recording()
-        else:
-            self.stop_recording()
+        return self.is_alive() and self._loaded_signature == self._config_signature()
 
-    def start_recording(self) -> None:
+    def _spawn_and_load(self) -> None:
+        with self._state_lock:
+            if self._closed:
+                return
+            if not self.is_alive():
+                self._spawn()
+            self._load()
+
+    def _spawn(self) -> None:
+        self._ready.clear()
+        self._loaded_signature = None
+        parent_conn, child_conn = self._ctx.Pipe(duplex=True)
+        process = self._ctx.Process(
+            target=_decode_worker_main,
+            args=(child_conn, dict(self.config)),
+            name="LexiSharpDecodeWorker",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        self._process = process
+        self._conn = parent_conn
+        self.logger.info("本地解码子进程已启动，pid=%s", process.pid)
+        threading.Thread(target=self._watch, args=(process,), name="DecodeWorkerWatch", daemon=True).start()
+
+    def _watch(self, process) -> None:
         """
-        开始录音。
+        等待子进程退出；非主动终止的退出（原生崩溃、被 OOM 杀掉等）立即重启并重新加载模型，
+        不必等到下一次识别时才在出字路径上同步重启。
         """
-        self.logger.info("开始录音。")
+        mp_connection.wait([process.sentinel])
+        if self._closed:
+            return
+        process.join(timeout=1)
+        with self._state_lock:
+            # 已被主动终止或替换（识别路径的重启、关闭）时不再处理
+            if self._closed or self._process is not process:
+                return
+            if self._load_error is not None:
+                # 加载阶段即崩溃：避免反复重启，留给下一次识别报告错误
+                self.logger.error("本地解码子进程加载模型时退出（exitcode=%s），不自动重启。", process.exitcode)
+                return
+            self._restart(f"进程已退出（exitcode={process.exitcode}）")
+
+    def _load(self) -> None:
+        signature = self._config_signature()
+        self._ready.clear()
+        self._load_error = None
         try:
-            self.audio_path = self.recorder.start()
-        except RuntimeError as exc:
-            self.logger.exception("启动录音失败")
-            messagebox.showerror("录音失败", str(exc))
-            self._schedule_floating_state("idle")
+            self._conn.send(("load", dict(self.config)))
+            if not self._conn.poll(self.LOAD_TIMEOUT_S):
+                self._load_error = f"加载模型超时（>{self.LOAD_TIMEOUT_S:.0f}s）"
+                self.logger.error("本地解码子进程加载模型超时，终止子进程。")
+                self._terminate()
+                self._ready.set()
+                return
+            kind, payload = self._conn.recv()
+        except (EOFError, OSError) as exc:
+            self._load_error = f"子进程异常退出：{exc}"
+            self.logger.error("本地解码子进程加载模型时退出，exitcode=%s", self._exitcode())
+            self._ready.set()
             return
+        if kind == "ready":
+            self._loaded_signature = signature
+            self.logger.info(
+                "本地解码子进程模型就绪（%s），加载耗时 %.0f ms",
+                payload.get("model_type"),
+                payload.get("load_ms", 0.0),
+            )
+        else:
+            self._load_error = str(payload.get("error") or "未知错误")
+            self.logger.error("本地解码子进程加载模型失败：%s", self._load_error)
+        self._ready.set()
+
+    def _exitcode(self) -> Optional[int]:
+        return self._process.exitcode if self._process is not None else None
+
+    def _restart(self, reason: str) -> None:
+        self.restarts += 1
+        self.logger.warning("本地解码子进程重启（第 %d 次）：%s", self.restarts, reason)
+        self._terminate()
+        self._spawn()
+        self._load()
+
+    def _terminate(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+        if self._process is not None:
+            if self._process.is_alive():
+                self._process.kill()
+            self._process.join(timeout=5)
+            self._process = None
+        self._ready.clear()
+        self._loaded_signature = None
+
+    def _ensure_shm(self, size: int) -> shared_memory.SharedMemory:
+        if self._shm is not None and self._shm.size >= size:
+            return self._shm
+        capacity = self.MIN_SHM_BYTES
+        while capacity < size:
+            capacity *= 2
+        self._release_shm()
+        self._shm = shared_memory.SharedMemory(create=True, size=capacity)
+        self.logger.debug("分配共享内存 %s，容量 %d 字节", self._shm.name, capacity)
+        return self._shm
+
+    def _release_shm(self) -> None:
+        if self._shm is not None:
+            try:
+                self._shm.close()
+                self._shm.unlink()
+            except Exception:
+                self.logger.debug("释放共享内存失败", exc_info=True)
+            self._shm = None
 
-        self.logger.info("录音文件已创建：%s", self.audio_path)
-        self.button_text.set("停止录音")
-        self.status_var.set("录音中…再次点击按钮即可结束。")
-        self._schedule_floating_state("recording")
+    def transcribe_file(self, audio_file: str) -> Optional[str]:
+        """
+        读取 wav 并交由子进程识别。
+        """
+        pcm_bytes, sr = read_wav_pcm16(audio_file)
+        return self.transcribe_pcm(pcm_bytes, sr)
 
-    def stop_recording(self) -> None:
+    def transcribe_pcm(self, pcm_bytes: bytes, sr: int) -> Optional[str]:
         """
-        停止录音并进入识别流程。
+        识别 16-bit PCM 数据；子进程崩溃时自动重启并重试一次，解码超时不重试（同一输入大概率再次卡住）。
         """
-        path = self.recorder.stop()
-        self.audio_path = path
-        self.logger.info("停止录音，文件路径：%s", path)
-        if not path or not Path(path).exists():
-            self.logger.warning("未捕获到音频文件，path=%s", path)
-            self.button_text.set("开始录音")
-            self.status_var.set("未捕获到音频文件，请重试。")
-            self._schedule_floating_state("idle")
-            return
+        timeout = max(10.0, float(self.config.get("max_wait_s", CONFIG_TEMPLATE["max_wait_s"])))
+        with self._lock:
+            for attempt in range(2):
+                with self._state_lock:
+                    if self._closed:
+                        raise RuntimeError("本地解码子进程已关闭。")
+                    if not self.is_alive():
+                        if self._process is not None:
+                            self._restart(f"进程已退出（exitcode={self._exitcode()}）")
+                        else:
+                            self._spawn()
+                            self._load()
+                    elif self._loaded_signature != self._config_signature():
+                        self.logger.info("本地模型配置已变化，子进程重新加载模型。")
+                        self._load()
+                if not self._ready.wait(timeout):
+                    raise TransientRecognitionError("本地解码子进程加载模型超时。")
+                if self._load_error:
+                    raise RuntimeError(f"本地引擎加载失败：{self._load_error}")
+                process = self._process
+                try:
+                    return self._decode_once(pcm_bytes, sr, timeout)
+                except _DecodeWorkerTimeout as exc:
+                    with self._state_lock:
+                        self._terminate()
+                    # 在后台重新拉起子进程，下一次识别无需同步等待加载
+                    self.start()
+                    raise TransientRecognitionError(f"本地解码子进程无响应：{exc}") from exc
+                except _DecodeWorkerCrashed as exc:
+                    if attempt:
+                        raise TransientRecognitionError(f"本地解码子进程崩溃：{exc}") from exc
+                    with self._state_lock:
+                        # 监视线程可能已先一步完成重启
+                        if self._process is process:
+                            self._restart(str(exc))
+        return None
 
-        file_size = Path(path).stat().st_size
-        self.logger.info("音频文件大小：%d 字节", file_size)
-        self.button_text.set("开始录音")
-        provider_name = self._channel_display_name()
-        self.status_var.set(f"正在向 {provider_name} 发送识别请求…")
-        self._schedule_floating_state("processing")
-        self.processing = True
-        threading.Thread(target=self._recognize_task, daemon=True).start()
+    def _decode_once(self, pcm_bytes: bytes, sr: int, timeout: float) -> Optional[str]:
+        started = time.perf_counter()
+        size = len(pcm_bytes)
+        shm = self._ensure_shm(max(size, 1))
+        shm.buf[:size] = pcm_bytes
+        self._request_seq += 1
+        request_id = self._request_seq
+        try:
+            self._conn.send(("decode", {"shm": shm.name, "samples": size // 2, "sr": sr, "id": request_id}))
+            if not self._conn.poll(timeout):
+                raise _DecodeWorkerTimeout(f"解码超时（>{timeout:.0f}s），已终止子进程")
+            kind, payload = self._conn.recv()
+        except (EOFError, OSError, BrokenPipeError) as exc:
+            raise _DecodeWorkerCrashed(f"exitcode={self._exitcode()}，{exc}") from exc
+        if kind != "result" or payload.get("id") != request_id:
+            raise _DecodeWorkerCrashed(f"收到非预期的应答：{kind}")
+        if payload.get("error"):
+            raise RuntimeError(f"本地引擎识别失败：{payload['error']}")
+        total_ms = (time.perf_counter() - started) * 1000.0
+        decode_ms = float(payload.get("decode_ms") or 0.0)
+        overhead = max(0.0, total_ms - decode_ms)
+        self._overhead_samples = (self._overhead_samples + [overhead])[-50:]
+        self.logger.info(
+            "进程隔离解码：总耗时 %.1f ms，子进程解码 %.1f ms，交接开销 %.2f ms（近 %d 次均值 %.2f ms）",
+            total_ms,
+            decode_ms,
+            overhead,
+            len(self._overhead_samples),
+            sum(self._overhead_samples) / len(self._overhead_samples),
+        )
+        return payload.get("text") or None
 
-    def _recognize_task(self) -> None:
+    def close(self) -> None:
         """
-        后台线程：读取音频、调用ASR、处理结果。
+        停止子进程并释放共享内存。
         """
-        threading.current_thread().name = "ASRWorker"
+        self._closed = True
+        if not self._state_lock.acquire(timeout=2):
+            # 加载或重启仍在进行：直接结束子进程，让其中的等待立即返回
+            process = self._process
+            if process is not None and process.is_alive():
+                process.kill()
+            self._state_lock.acquire()
         try:
-            self.logger.info("识别线程启动，音频文件：%s", self.audio_path)
-            text = self._call_asr(self.audio_path)
-            if text is None:
-                self.logger.warning("ASR 未返回有效文本")
-                self._update_status("未获得识别结果，请检查日志或稍后再试。")
-                return
-            self.logger.info("ASR 返回文本：%s", text)
-            self._refresh_result(text)
+            if self._conn is not None and self.is_alive():
+                try:
+                    self._conn.send(("stop", None))
+                    self._process.join(timeout=2)
+                except Exception:
+                    pass
+            self._terminate()
+            self._release_shm()
+        finally:
+            self._state_lock.release()
 
-            copy_success_message = "识别完成，内容已复制到剪贴板。"
-            auto_paste_clipboard_message = "识别完成，内容已复制到剪贴板，并自动粘贴到目标窗口。"
-            auto_paste_dbus_message = "识别完成，已通过输入法自动提交到目标窗口，剪贴板保持原样。"
-            copy_message = copy_success_message
-
-            auto_paste_enabled = bool(self.config.get("auto_paste", False))
-            autopaste_result: Optional[AutoPasteResult] = None
-            pasted = False
-            clipboard_synced = False
-            copy_needed = True
-
-            if auto_paste_enabled:
-                autopaste_result = self._auto_paste_async()
-                pasted = autopaste_result.success
-                clipboard_synced = autopaste_result.clipboard_synced
-                if pasted and autopaste_result.method == "dbus":
-                    copy_needed = False
-                else:
-                    copy_needed = not clipboard_synced
-
-            copied = True
-            if copy_needed:
-                copied = self.clipboard.copy(text)
-                if not copied:
-                    copy_message = (
-                        "识别成功，但无法复制到剪贴板，请安装 wl-clipboard（Wayland）或 xclip/xsel（X11）。"
-                    )
 
-            final_status: Optional[str] = None
-            if auto_paste_enabled:
-                if pasted:
-                    if autopaste_result and autopaste_result.method == "dbus":
-                        final_status = auto_paste_dbus_message
-                    else:
-                        final_status = auto_paste_clipboard_message
-                    if autopaste_result and autopaste_result.status_message:
-                        final_status += f"（{autopaste_result.status_message}）"
-                else:
-                    if autopaste_result and autopaste_result.status_message:
-                        final_status = autopaste_result.status_message
-                    else:
-                        final_status = (
-                            "识别完成，内容已复制到剪贴板，请手动粘贴。"
-                            if copied
-                            else copy_message
-                        )
-            else:
-                final_status = (
-                    "识别完成，内容已复制到剪贴板，请手动粘贴。"
-                    if copied
-                    else copy_message
+# ====== 多用户共享的本地识别服务（server） ======
+def _prepare_unix_socket_path(path: Path) -> None:
+    """
+    绑定前检查套接字路径：已有服务在监听则报错，残留文件则清理。
+    """
+    if not path.exists():
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        except PermissionError as exc:
+            raise RuntimeError(
+                f"无法创建套接字目录 {path.parent}：{exc}（可由 root 创建后授权给当前用户，或指定其他路径）"
+            ) from exc
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        probe.settimeout(1.0)
+        try:
+            probe.connect(str(path))
+        except OSError:
+            path.unlink()
+            return
+    raise RuntimeError(f"套接字 {path} 已有服务在监听。")
+
+
+@dataclass
+class _ServerRequest:
+    uid: int
+    samples: "np.ndarray"
+    sr: int
+    enqueued: float
+    done: threading.Event
+    text: str = ""
+    error: Optional[str] = None
+    batch_size: int = 0
+    decode_ms: float = 0.0
+
+
+class _SharedModelSlot:
+    """
+    共享模型服务中的单个模型：持有一份识别器，按用户公平排队并以 decode_streams 批量解码。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model_dir: str,
+        config: dict,
+        logger: logging.Logger,
+        max_batch: int,
+        batch_window_s: float,
+    ) -> None:
+        self.name = name
+        self.model_dir = model_dir
+        self.engine = LocalSherpaEngine(config, logger=logger)
+        self.logger = logger.getChild(f"model.{name}")
+        self.max_batch = max(1, max_batch)
+        self.batch_window_s = max(0.0, batch_window_s)
+        self._cond = threading.Condition()
+        # 按用户分队列，轮转出队保证多用户公平
+        self._queues: dict[int, collections.deque] = {}
+        self._rotation: collections.deque = collections.deque()
+        self._pending = 0
+        self._recognizer: Optional[object] = None
+        self._load_lock = threading.Lock()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=f"ModelSlot-{name}", daemon=True)
+        self._thread.start()
+
+    def ensure_loaded(self) -> object:
+        with self._load_lock:
+            if self._recognizer is None:
+                started = time.perf_counter()
+                spec = self.engine.resolve_model(self.model_dir)
+                self._recognizer = self.engine.load(spec, self.engine.decoding_methods(spec.model_type)[0])
+                self.logger.info(
+                    "模型 %s 已加载（%s），耗时 %.0f ms",
+                    self.name,
+                    spec.model_type,
+                    (time.perf_counter() - started) * 1000.0,
                 )
+            return self._recognizer
+
+    def submit(self, request: _ServerRequest) -> None:
+        with self._cond:
+            queue = self._queues.get(request.uid)
+            if queue is None:
+                queue = self._queues[request.uid] = collections.deque()
+                self._rotation.append(request.uid)
+            queue.append(request)
+            self._pending += 1
+            self._cond.notify()
 
-            if not copied:
-                final_status = copy_message
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
 
-            if final_status:
-                self._update_status(final_status)
+    def _take_batch(self) -> List[_ServerRequest]:
+        """
+        轮转各用户队列取请求：每轮每个用户最多取一条，直至达到批大小。
+        """
+        batch: List[_ServerRequest] = []
+        while self._rotation and len(batch) < self.max_batch:
+            uid = self._rotation.popleft()
+            queue = self._queues[uid]
+            batch.append(queue.popleft())
+            self._pending -= 1
+            if queue:
+                self._rotation.append(uid)
+            else:
+                del self._queues[uid]
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                # 短暂等待并发请求聚合成批
+                if self._pending < self.max_batch and self.batch_window_s > 0:
+                    deadline = time.monotonic() + self.batch_window_s
+                    while self._pending < self.max_batch and not self._stopped:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                batch = self._take_batch()
+            if batch:
+                self._decode_batch(batch)
+
+    def _decode_batch(self, batch: List[_ServerRequest]) -> None:
+        started = time.perf_counter()
+        try:
+            recognizer = self.ensure_loaded()
+            texts = LocalSherpaEngine.decode_batch(recognizer, [(request.samples, request.sr) for request in batch])
+            for request, text in zip(batch, texts):
+                request.text = text
         except Exception as exc:  # pylint: disable=broad-except
-            self.logger.exception("识别流程发生异常")
-            self._update_status(f"识别失败：{exc}")
+            if len(batch) == 1 or self._recognizer is None:
+                self.logger.exception("批量解码失败，批大小=%d", len(batch))
+                for request in batch:
+                    request.error = f"{type(exc).__name__}: {exc}"
+            else:
+                # 逐条重试，只让出错的请求失败，不连累同批其他用户
+                self.logger.warning("批量解码失败（批大小=%d）：%s，改为逐条解码", len(batch), exc)
+                for request in batch:
+                    try:
+                        request.text = LocalSherpaEngine.decode_batch(self._recognizer, [(request.samples, request.sr)])[0]
+                    except Exception as item_exc:  # pylint: disable=broad-except
+                        self.logger.warning("解码失败（uid=%s）：%s", request.uid, item_exc)
+                        request.error = f"{type(item_exc).__name__}: {item_exc}"
+        decode_ms = (time.perf_counter() - started) * 1000.0
+        users = len({request.uid for request in batch})
+        self.logger.info("批量解码完成：批大小=%d，用户数=%d，耗时 %.1f ms", len(batch), users, decode_ms)
+        for request in batch:
+            request.batch_size = len(batch)
+            request.decode_ms = decode_ms
+            request.done.set()
+
+
+class LocalASRServer:
+    """
+    多用户共享的本地识别服务：每个模型只加载一次，通过 Unix 套接字为多个桌面会话提供识别。
+    内存占用随模型数量而非用户数量增长。
+    """
+
+    def __init__(
+        self,
+        config: dict,
+        logger: logging.Logger,
+        socket_path: str,
+        models: dict[str, str],
+        default_model: str,
+        max_batch: int = 8,
+        batch_window_ms: float = 15.0,
+        socket_mode: int = 0o666,
+    ) -> None:
+        if not models:
+            raise RuntimeError("未配置可用的模型目录。")
+        self.config = config
+        self.logger = logger.getChild("server")
+        self.socket_path = Path(os.path.expanduser(socket_path))
+        self.socket_mode = socket_mode
+        self.default_model = default_model if default_model in models else next(iter(models))
+        self.timeout = max(10.0, float(config.get("max_wait_s", CONFIG_TEMPLATE["max_wait_s"])))
+        self.slots = {
+            name: _SharedModelSlot(name, model_dir, dict(config), logger, max_batch, batch_window_ms / 1000.0)
+            for name, model_dir in models.items()
+        }
+        self._sock: Optional[socket.socket] = None
+        self._stop_event = threading.Event()
+
+    def preload(self) -> None:
+        for slot in self.slots.values():
+            slot.ensure_loaded()
+
+    def serve_forever(self) -> None:
+        _prepare_unix_socket_path(self.socket_path)
+        if self.socket_path.parent.stat().st_mode & 0o002:
+            self.logger.warning("套接字目录 %s 对所有用户可写，其他用户可抢先占用该路径。", self.socket_path.parent)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(str(self.socket_path))
+        os.chmod(self.socket_path, self.socket_mode)
+        self._sock.listen(64)
+        self._sock.settimeout(0.5)
+        self.logger.info(
+            "本地识别服务已启动：%s，模型=%s，默认=%s",
+            self.socket_path,
+            ", ".join(f"{name}={slot.model_dir}" for name, slot in self.slots.items()),
+            self.default_model,
+        )
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    conn, _ = self._sock.accept()
+                except socket.timeout:
+                    continue
+                except OSError:
+                    if self._stop_event.is_set():
+                        break
+                    raise
+                threading.Thread(target=self._handle_client, args=(conn,), name="ServerClient", daemon=True).start()
         finally:
-            if self.audio_path and Path(self.audio_path).exists():
+            self.shutdown()
+
+    def shutdown(self) -> None:
+        self._stop_event.set()
+        for slot in self.slots.values():
+            slot.stop()
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
                 try:
-                    self.logger.info("清理音频文件：%s", self.audio_path)
-                    os.remove(self.audio_path)
+                    self.socket_path.unlink()
                 except OSError:
-                    self.logger.exception("删除音频文件失败：%s", self.audio_path)
                     pass
-            self.original_window_before_record = None
-            self.audio_path = None
-            self.processing = False
-            self._schedule_floating_state("idle")
 
-    def _channel_display_name(self) -> str:
-        """
-        返回识别渠道的可读名称。
-        """
-        channel = (self.config.get("channel") or "volcengine").strip().lower()
-        if channel in {"volcengine", "volcano", "volc", "bytedance"}:
-            return "火山引擎"
-        if channel == "soniox":
-            return "Soniox"
-        if channel in {"qwen", "tongyi", "tongyiqianwen", "dashscope"}:
-            return "通义千问"
-        if channel in {"local_sherpa", "local", "sherpa"}:
-            return "本地模型（sherpa-onnx）"
-        return channel or "火山引擎"
+    def _handle_client(self, conn: socket.socket) -> None:
+        uid = _peer_uid(conn)
+        with conn:
+            conn.settimeout(self.timeout)
+            while True:
+                try:
+                    header, payload = recv_frame(conn)
+                except (ConnectionError, socket.timeout, OSError, ValueError):
+                    return
+                try:
+                    reply = self._dispatch(uid, header, payload)
+                except Exception as exc:  # pylint: disable=broad-except
+                    self.logger.exception("处理客户端请求失败（uid=%s）", uid)
+                    reply = {"ok": False, "error": str(exc)}
+                try:
+                    send_frame(conn, reply)
+                except OSError:
+                    return
 
-    def _open_settings(self) -> None:
+    def _dispatch(self, uid: int, header: dict, payload: bytes) -> dict:
+        op = header.get("op")
+        if op == "ping":
+            return {"ok": True, "models": sorted(self.slots), "default": self.default_model}
+        if op != "transcribe":
+            return {"ok": False, "error": f"未知操作：{op}"}
+        name = str(header.get("model") or self.default_model)
+        slot = self.slots.get(name)
+        if slot is None:
+            return {"ok": False, "error": f"服务端未加载模型：{name}"}
+        if header.get("format", "s16le") != "s16le":
+            return {"ok": False, "error": "仅支持 s16le PCM。"}
+        sr = int(header.get("sr") or 16000)
+        if not 8000 <= sr <= 192000:
+            return {"ok": False, "error": f"不支持的采样率：{sr}"}
+        if not payload or len(payload) % 2:
+            return {"ok": False, "error": "音频数据为空或长度不是 16 位样本的整数倍。"}
+        samples = np.frombuffer(payload, dtype=np.int16).astype(np.float32) / 32768.0
+        samples = slot.engine.prepare_samples(samples, sr)
+        request = _ServerRequest(uid=uid, samples=samples, sr=sr, enqueued=time.perf_counter(), done=threading.Event())
+        slot.submit(request)
+        if not request.done.wait(self.timeout):
+            return {"ok": False, "error": "服务端识别超时。"}
+        if request.error:
+            return {"ok": False, "error": request.error}
+        total_ms = (time.perf_counter() - request.enqueued) * 1000.0
+        return {
+            "ok": True,
+            "text": request.text,
+            "model": name,
+            "batch_size": request.batch_size,
+            "decode_ms": round(request.decode_ms, 2),
+            "queue_ms": round(max(0.0, total_ms - request.decode_ms), 2),
+        }
+
+
+# ====== HTTP 连接池（云端渠道与模型下载共用） ======
+class Base64JsonBody:
+    """
+    流式 JSON 请求体：依次输出 JSON 前缀、分块 base64 编码的音频文件与后缀，峰值内存只占一个分块。
+    """
+
+    # 3 的整数倍，保证各分块的 base64 结果可直接拼接
+    CHUNK_SIZE = 3 * 16 * 1024
+    PLACEHOLDER = "@@LEXISHARP_AUDIO@@"
+
+    def __init__(self, payload: dict, audio_file: str):
         """
-        打开设置对话框。
+        payload 中的音频字段需填入 PLACEHOLDER，发送时替换为文件内容的 base64 编码。
         """
-        try:
-            if self.settings_dialog and self.settings_dialog.window.winfo_exists():
-                self.settings_dialog.window.lift()
-                self.settings_dialog.window.focus_force()
+        text = json.dumps(payload, ensure_ascii=False)
+        head, sep, tail = text.partition(json.dumps(self.PLACEHOLDER))
+        if not sep:
+            raise ValueError("请求体中缺少音频占位符")
+        self.prefix = (head + '"').encode("utf-8")
+        self.suffix = ('"' + tail).encode("utf-8")
+        self.audio_file = audio_file
+        self.audio_size = os.path.getsize(audio_file)
+
+    def __len__(self) -> int:
+        return len(self.prefix) + 4 * ((self.audio_size + 2) // 3) + len(self.suffix)
+
+    def __iter__(self):
+        # 每次迭代重新打开文件，重试或重定向时可再次发送
+        yield self.prefix
+        with open(self.audio_file, "rb") as fp:
+            while True:
+                chunk = fp.read(self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield base64.b64encode(chunk)
+        yield self.suffix
+
+
+class RecognitionCancelled(RuntimeError):
+    """
+    识别请求被取消（例如对冲识别中已有另一渠道先返回结果）。
+    """
+
+
+class TransientRecognitionError(RuntimeError):
+    """
+    暂时性识别失败（服务端繁忙、识别超时、本地子进程无响应等），稍后重试有望成功。
+    """
+
+
+def _is_transient_error(exc: BaseException) -> bool:
+    """
+    判断识别失败是否为暂时性错误：网络中断、超时、HTTP 429/5xx 才值得重试、计入熔断或暂存补识别；
+    鉴权失败（401/403）、配置缺失、未返回可用文本等重试也不会成功。沿 raise ... from 的原因链判断。
+    """
+    seen = set()
+    current: Optional[BaseException] = exc
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        if isinstance(current, TransientRecognitionError):
+            return True
+        if isinstance(current, requests.HTTPError):
+            status = current.response.status_code if current.response is not None else None
+            return status is None or status == 429 or status >= 500
+        if isinstance(current, (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError, socket.timeout)):
+            return True
+        current = current.__cause__
+    return False
+
+
+class CancelToken:
+    """
+    协作式取消标记：绑定到执行识别的线程后，连接池在每次发送请求前检查，
+    异步引擎还会直接取消进行中的请求，轮询等待也会被立即唤醒。
+    """
+
+    _local = threading.local()
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: list = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._event.is_set():
                 return
-        except Exception:
-            self.settings_dialog = None
-        try:
-            self.settings_dialog = SettingsDialog(self)
-        except Exception:
-            self.logger.exception("打开设置窗口失败")
-            messagebox.showerror("设置", "无法打开设置窗口，请查看日志。")
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
 
-    def _on_settings_closed(self) -> None:
+    def add_callback(self, callback) -> None:
         """
-        设置窗口关闭时回调。
+        登记取消时要执行的动作；已取消时立即执行。
         """
-        self.settings_dialog = None
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
 
-    def _call_asr(self, audio_file: str) -> Optional[str]:
+    def remove_callback(self, callback) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    @classmethod
+    def bind(cls, token: Optional["CancelToken"]) -> None:
         """
-        根据配置选择识别渠道并返回文本结果。
+        为当前线程设置（token=None 时清除）取消标记。
         """
-        channel = (self.config.get("channel") or "volcengine").strip().lower()
-        self.logger.info("识别渠道：%s", channel or "volcengine")
-        if channel in {"volcengine", "volcano", "volc", "bytedance"}:
-            return self._call_volcengine(audio_file)
-        if channel == "soniox":
-            return self._call_soniox(audio_file)
-        if channel in {"qwen", "tongyi", "tongyiqianwen", "dashscope"}:
-            return self._call_qwen(audio_file)
-        if channel in {"local_sherpa", "local", "sherpa"}:
-            return self._call_local_sherpa(audio_file)
-        raise RuntimeError(f"未识别的识别渠道：{channel}")
+        cls._local.token = token
 
-    def _call_volcengine(self, audio_file: str) -> Optional[str]:
+    @classmethod
+    def current(cls) -> Optional["CancelToken"]:
+        return getattr(cls._local, "token", None)
+
+    @classmethod
+    def check(cls) -> None:
+        token = cls.current()
+        if token is not None and token.cancelled:
+            raise RecognitionCancelled("识别已取消")
+
+    @classmethod
+    def sleep(cls, seconds: float) -> None:
         """
-        调用火山引擎极速版ASR接口。
+        可被取消打断的 time.sleep。
         """
-        self.logger.info("准备读取音频并发起火山引擎请求：%s", audio_file)
-        with open(audio_file, "rb") as f:
-            audio_data = base64.b64encode(f.read()).decode("utf-8")
-
-        request_id = os.environ.get("LEXISHARP_REQUEST_ID") or f"lexisharp-{uuid4()}"
-        self.logger.info("本次请求 RequestId：%s", request_id)
+        token = cls.current()
+        if token is None:
+            time.sleep(seconds)
+            return
+        token._event.wait(seconds)  # pylint: disable=protected-access
+        cls.check()
 
-        payload = {
-            "user": {
-                "uid": os.environ.get("LEXISHARP_APP_KEY", self.config.get("app_key"))
-            },
-            "audio": {
-                "data": audio_data
-            },
-            "request": {
-                "model_name": self.config.get("model_name", "bigmodel")
-            }
-        }
 
-        headers = {
-            "X-Api-App-Key": os.environ.get("LEXISHARP_APP_KEY", self.config.get("app_key")),
-            "X-Api-Access-Key": os.environ.get("LEXISHARP_ACCESS_KEY", self.config.get("access_key")),
-            "X-Api-Resource-Id": self.config.get("resource_id", "volc.bigasr.auc_turbo"),
-            "X-Api-Request-Id": request_id,
-            "X-Api-Sequence": "-1"
-        }
+class HttpSessionPool:
+    """
+    按主机复用的长连接会话池：每个 scheme://host 一个 requests.Session，
+    保持 keep-alive，空闲过久的会话整体重建，避免复用已被服务端关闭的连接。
+    """
 
-        try:
-            response = requests.post(
-                self.config.get("api_url", CONFIG_TEMPLATE["api_url"]),
-                headers=headers,
-                json=payload,
-                timeout=int(self.config.get("max_wait_s", 45))
-            )
-            response.raise_for_status()
-        except requests.HTTPError as exc:
-            error_body = ""
-            if exc.response is not None:
-                error_body = exc.response.text
-                self.logger.error(
-                    "HTTP 请求异常，状态：%s，响应体：%s",
-                    exc.response.status_code,
-                    error_body[:500]
-                )
-            raise RuntimeError(f"网络请求失败：{exc}，响应内容：{error_body}") from exc
-        except requests.RequestException as exc:
-            self.logger.exception("火山引擎请求发送失败")
-            raise RuntimeError(f"网络请求失败：{exc}") from exc
+    def __init__(self, config: dict, logger: logging.Logger):
+        self.config = config
+        self.logger = logger.getChild("http")
+        self._lock = threading.Lock()
+        self._sessions: dict[str, requests.Session] = {}
+        self._last_used: dict[str, float] = {}
+        self._inflight: collections.Counter = collections.Counter()
+        self._warming: set[str] = set()
+        self._stats: dict[str, dict[str, int]] = collections.defaultdict(
+            lambda: {"requests": 0, "new_connections": 0, "reused": 0, "expired_sessions": 0, "warmups": 0}
+        )
 
-        status_code = response.headers.get("X-Api-Status-Code")
-        self.logger.info("火山引擎返回状态码：%s，HTTP 状态：%s", status_code, response.status_code)
-        if status_code != "20000000":
-            message = response.headers.get("X-Api-Message", "未知错误")
-            self.logger.error("火山引擎接口返回异常：%s - %s", status_code, message)
-            raise RuntimeError(f"ASR接口返回异常：{status_code} - {message}")
+    @staticmethod
+    def _host_key(url: str) -> str:
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}"
 
-        data = response.json()
-        text = data.get("result", {}).get("text", "")
-        self.logger.debug("火山引擎原始数据：%s", data)
-        return text.strip() or None
+    def _idle_timeout(self) -> float:
+        return max(1.0, float(self.config.get("http_idle_timeout_s", CONFIG_TEMPLATE["http_idle_timeout_s"])))
 
-    def _call_soniox(self, audio_file: str) -> Optional[str]:
+    def _new_session(self) -> requests.Session:
+        maxsize = max(1, int(self.config.get("http_pool_maxsize", CONFIG_TEMPLATE["http_pool_maxsize"])))
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=maxsize)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _acquire(self, key: str) -> requests.Session:
+        with self._lock:
+            session = self._sessions.get(key)
+            idle = time.monotonic() - self._last_used.get(key, 0.0)
+            if session is not None and self._inflight[key] == 0 and idle > self._idle_timeout():
+                self.logger.debug("连接空闲 %.0f 秒，重建会话：%s", idle, key)
+                session.close()
+                session = None
+                self._stats[key]["expired_sessions"] += 1
+            if session is None:
+                session = self._new_session()
+                self._sessions[key] = session
+            self._inflight[key] += 1
+            self._last_used[key] = time.monotonic()
+            return session
+
+    def _release(self, key: str) -> None:
+        with self._lock:
+            self._inflight[key] -= 1
+            self._last_used[key] = time.monotonic()
+
+    @staticmethod
+    def _connection_count(session: requests.Session) -> int:
         """
-        调用 Soniox 异步识别接口。
+        统计会话内 urllib3 连接池累计新建的连接数（每次新建即一次 TCP/TLS 握手）。
         """
-        api_key = os.environ.get("SONIOX_API_KEY") or self.config.get("soniox_api_key")
-        if not api_key or not str(api_key).strip():
-            raise RuntimeError("未配置 Soniox API Key，请在环境变量 SONIOX_API_KEY 或配置文件 soniox_api_key 中填写。")
-        base_url = (self.config.get("soniox_api_base") or CONFIG_TEMPLATE["soniox_api_base"]).rstrip("/")
-        model = (
-            os.environ.get("SONIOX_MODEL")
-            or self.config.get("soniox_model")
-            or CONFIG_TEMPLATE["soniox_model"]
-        )
-        poll_interval = max(0.5, float(self.config.get("soniox_poll_interval_s", CONFIG_TEMPLATE["soniox_poll_interval_s"])))
-        poll_timeout = max(poll_interval, float(self.config.get("soniox_poll_timeout_s", CONFIG_TEMPLATE["soniox_poll_timeout_s"])))
-        timeout = int(self.config.get("max_wait_s", 45))
+        total = 0
+        # http:// 与 https:// 挂载的是同一个适配器，需去重
+        adapters = {id(adapter): adapter for adapter in session.adapters.values()}
+        for adapter in adapters.values():
+            pools = getattr(getattr(adapter, "poolmanager", None), "pools", None)
+            if pools is None:
+                continue
+            for pool_key in list(pools.keys()):
+                pool = pools.get(pool_key)
+                total += int(getattr(pool, "num_connections", 0) or 0)
+        return total
 
-        request_id = os.environ.get("LEXISHARP_REQUEST_ID") or f"lexisharp-{uuid4()}"
-        self.logger.info("Soniox 请求 RequestId：%s", request_id)
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        通过池化会话发送请求，参数与 requests.Session.request 一致。
+        """
+        # 同步会话无法中断已发出的请求，只在发送前响应取消
+        CancelToken.check()
+        key = self._host_key(url)
+        session = self._acquire(key)
+        before = self._connection_count(session)
+        try:
+            response = session.request(method, url, **kwargs)
+        except BaseException:
+            self._finish(method, key, session, before)
+            raise
+        if not kwargs.get("stream"):
+            self._finish(method, key, session, before)
+            return response
+        # 流式响应的正文尚未读取、连接仍被占用：关闭响应时再释放在途计数并记录统计
+        original_close = response.close
+        finished = threading.Event()
+
+        def close() -> None:
+            try:
+                original_close()
+            finally:
+                if not finished.is_set():
+                    finished.set()
+                    self._finish(method, key, session, before)
 
-        session = requests.Session()
-        session.headers["Authorization"] = f"Bearer {api_key}"
-        session.headers["User-Agent"] = "LexiSharp-Soniox/1.0"
+        response.close = close
+        return response
 
-        file_id = None
-        transcription_id = None
-        upload_url = f"{base_url}/v1/files"
-        transcription_url = f"{base_url}/v1/transcriptions"
+    def _finish(self, method: str, key: str, session: requests.Session, before: int) -> None:
+        new_connections = max(0, self._connection_count(session) - before)
+        self._release(key)
+        with self._lock:
+            stats = self._stats[key]
+            stats["requests"] += 1
+            stats["new_connections"] += new_connections
+            stats["reused"] += 0 if new_connections else 1
+        self.logger.debug(
+            "%s %s：%s", method, key, f"新建连接 {new_connections} 个" if new_connections else "复用已有连接"
+        )
 
+    def warm(self, url: str, timeout: float = 5.0) -> None:
+        """
+        发送一次 HEAD 请求，提前完成 DNS 解析与 TCP/TLS 握手，连接随后留在池中供识别请求复用。
+        服务端对 HEAD 返回 4xx 不影响连接复用；重复调用可在录音较长时为连接续期，避免空闲超时后被整体重建。
+        """
+        key = self._host_key(url)
+        with self._lock:
+            if key in self._warming:
+                return
+            self._warming.add(key)
         try:
-            self.logger.info("开始上传音频至 Soniox：%s", audio_file)
-            with open(audio_file, "rb") as audio_fp:
-                response = session.post(upload_url, files={"file": audio_fp}, timeout=timeout)
-            response.raise_for_status()
-            file_id = response.json().get("id")
-            if not file_id:
-                raise RuntimeError("Soniox 文件上传响应缺少文件 ID。")
-            self.logger.info("Soniox 文件 ID：%s", file_id)
+            session = self._acquire(key)
+            before = self._connection_count(session)
+            try:
+                started = time.perf_counter()
+                session.request("HEAD", url, timeout=timeout, allow_redirects=False).close()
+                elapsed_ms = (time.perf_counter() - started) * 1000.0
+            finally:
+                new_connections = max(0, self._connection_count(session) - before)
+                self._release(key)
+            with self._lock:
+                self._stats[key]["new_connections"] += new_connections
+                self._stats[key]["warmups"] += 1
+            self.logger.info(
+                "预热 %s：%s，HEAD 往返 %.0f ms（已在录音期间完成，不计入识别延迟）",
+                key,
+                "新建连接" if new_connections else "连接仍可用",
+                elapsed_ms,
+            )
+        except Exception as exc:  # pylint: disable=broad-except
+            self.logger.warning("预热连接失败 %s：%s", key, exc)
+        finally:
+            with self._lock:
+                self._warming.discard(key)
 
-            request_body = {
-                "model": model,
-                "file_id": file_id,
-                "client_reference_id": request_id
-            }
-            hints = self.config.get("soniox_language_hints")
-            if isinstance(hints, list):
-                normalized = [str(item).strip() for item in hints if str(item).strip()]
-                if normalized:
-                    request_body["language_hints"] = normalized
-            if bool(self.config.get("soniox_enable_speaker_diarization")):
-                request_body["enable_speaker_diarization"] = True
-            if bool(self.config.get("soniox_enable_language_identification")):
-                request_body["enable_language_identification"] = True
-            context_text = (self.config.get("soniox_context") or "").strip()
-            if context_text:
-                request_body["context"] = context_text
+    def request_many(self, calls: List[tuple]) -> List[object]:
+        """
+        依次发送多个相互独立的请求（method, url, kwargs），返回响应或异常列表。
+        """
+        results: List[object] = []
+        for method, url, kwargs in calls:
+            try:
+                results.append(self.request(method, url, **kwargs))
+            except Exception as exc:  # pylint: disable=broad-except
+                results.append(exc)
+        return results
 
-            self.logger.info("创建 Soniox 转写任务...")
-            response = session.post(transcription_url, json=request_body, timeout=timeout)
-            response.raise_for_status()
-            transcription_id = response.json().get("id")
-            if not transcription_id:
-                raise RuntimeError("Soniox 转写创建响应缺少任务 ID。")
-            self.logger.info("Soniox 转写 ID：%s", transcription_id)
+    def stats(self) -> dict[str, dict[str, int]]:
+        with self._lock:
+            return {key: dict(value) for key, value in self._stats.items()}
 
-            status_url = f"{transcription_url}/{transcription_id}"
-            transcript_url = f"{status_url}/transcript"
+    def close(self) -> None:
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+        for key, value in self.stats().items():
+            self.logger.info(
+                "HTTP 连接统计 %s：请求 %d 次，新建连接 %d 次，录音期间预热 %d 次，复用 %d 次，空闲重建 %d 次",
+                key,
+                value["requests"],
+                value["new_connections"],
+                value["warmups"],
+                value["reused"],
+                value["expired_sessions"],
+            )
 
-            deadline = time.monotonic() + poll_timeout
-            last_status = ""
-            while True:
-                if time.monotonic() > deadline:
-                    raise RuntimeError("Soniox 识别超时，请检查音频或增大 soniox_poll_timeout_s。")
-                response = session.get(status_url, timeout=timeout)
-                response.raise_for_status()
-                status_payload = response.json()
-                status = (status_payload.get("status") or "").lower()
-                if status != last_status:
-                    self.logger.info("Soniox 任务状态：%s", status or "未知")
-                    last_status = status
-                if status == "completed":
-                    break
-                if status == "error":
-                    message = status_payload.get("error_message") or status_payload.get("message") or "未知错误"
-                    raise RuntimeError(f"Soniox 识别失败：{message}")
-                time.sleep(poll_interval)
 
-            self.logger.info("Soniox 转写完成，获取文本...")
-            response = session.get(transcript_url, timeout=timeout)
-            response.raise_for_status()
-            transcript_payload = response.json()
-            text = (transcript_payload.get("text") or "").strip()
-            if not text:
-                tokens = transcript_payload.get("tokens") or []
-                text = self._render_soniox_tokens(tokens).strip() if tokens else ""
-            if not text:
-                raise RuntimeError("Soniox API 未返回可用文本内容。")
-            return text
-        except requests.HTTPError as exc:
-            error_body = ""
-            if exc.response is not None:
-                error_body = exc.response.text
-            self.logger.error("Soniox HTTP 请求异常：%s，响应：%s", exc, error_body[:500])
-            raise RuntimeError(f"Soniox HTTP 请求失败：{exc}，响应内容：{error_body}") from exc
-        except requests.RequestException as exc:
-            self.logger.exception("Soniox 请求发送失败")
-            raise RuntimeError(f"Soniox 网络请求失败：{exc}") from exc
-        finally:
-            cleanup_timeout = min(timeout, 30)
-            if transcription_id:
-                try:
-                    session.delete(f"{transcription_url}/{transcription_id}", timeout=cleanup_timeout)
-                except Exception:
-                    self.logger.warning("Soniox 转写清理失败：%s", transcription_id)
-            if file_id:
-                try:
-                    session.delete(f"{base_url}/v1/files/{file_id}", timeout=cleanup_timeout)
-                except Exception:
-                    self.logger.warning("Soniox 文件清理失败：%s", file_id)
-            session.close()
+class AsyncHttpEngine:
+    """
+    基于 httpx.AsyncClient 的异步 HTTP 引擎：在一个常驻事件循环线程上发送所有云端请求，
+    支持 HTTP/2 多路复用（需安装 h2），超时与取消会真正中断底层 I/O。
+    对外提供与 HttpSessionPool 相同的同步接口，返回 requests.Response 并抛出 requests 异常。
+    """
 
-    def _render_soniox_tokens(self, tokens: List[dict]) -> str:
+    # 同步等待结果时在请求超时之外预留的余量（秒），事件循环卡住时调用方也不会无限等待
+    WAIT_GRACE_S = 5.0
+
+    def __init__(self, config: dict, logger: logging.Logger):
+        if httpx is None:
+            raise RuntimeError("未安装 httpx，请执行 `pip install \"httpx[http2]\"` 后重试。")
+        self.config = config
+        self.logger = logger.getChild("http")
+        self.http2 = h2 is not None
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._streams: "weakref.WeakSet" = weakref.WeakSet()
+        self._stats: dict[str, dict[str, int]] = collections.defaultdict(
+            lambda: {"requests": 0, "new_connections": 0, "reused": 0, "warmups": 0}
+        )
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is not None:
+                return self._loop
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=loop.run_forever, name="AsyncHttpLoop", daemon=True)
+            self._thread.start()
+            maxsize = max(1, int(self.config.get("http_pool_maxsize", CONFIG_TEMPLATE["http_pool_maxsize"])))
+            idle = max(1.0, float(self.config.get("http_idle_timeout_s", CONFIG_TEMPLATE["http_idle_timeout_s"])))
+
+            async def create_client() -> "httpx.AsyncClient":
+                return httpx.AsyncClient(
+                    http2=self.http2,
+                    limits=httpx.Limits(max_connections=maxsize * 4, max_keepalive_connections=maxsize, keepalive_expiry=idle),
+                )
+
+            self._client = asyncio.run_coroutine_threadsafe(create_client(), loop).result()
+            self._loop = loop
+            self.logger.info("异步 HTTP 引擎已启动（HTTP/2：%s）", "启用" if self.http2 else "未安装 h2，使用 HTTP/1.1")
+            return loop
+
+    @staticmethod
+    def _httpx_kwargs(kwargs: dict) -> dict:
         """
-        将 Soniox token 序列拼装成可读文本。
+        将 requests 风格的参数转换为 httpx 参数。
         """
-        parts: List[str] = []
-        current_speaker: Optional[str] = None
-        current_language: Optional[str] = None
-        for token in tokens:
-            text = str(token.get("text") or "")
-            if not text:
-                continue
-            speaker = token.get("speaker")
-            language = token.get("language")
-            if speaker is not None and speaker != current_speaker:
-                if parts:
-                    parts.append("\n\n")
-                current_speaker = speaker
-                current_language = None
-                parts.append(f"说话人 {speaker}: ")
-            if language and language != current_language:
-                current_language = language
-                parts.append(f"[{language}] ")
-            parts.append(text)
-        return "".join(parts)
+        out: dict = {key: kwargs[key] for key in ("headers", "params", "json", "files") if key in kwargs}
+        if "data" in kwargs:
+            data = kwargs["data"]
+            if isinstance(data, dict):
+                out["data"] = data
+            elif isinstance(data, (bytes, bytearray, str)):
+                out["content"] = data
+            else:
+                # 同步可迭代请求体包装为异步迭代器流式发送；有长度时带 Content-Length，否则分块传输
+                out["content"] = AsyncHttpEngine._aiter_body(data)
+                if hasattr(data, "__len__"):
+                    out["headers"] = {**(out.get("headers") or {}), "Content-Length": str(len(data))}
+        timeout = kwargs.get("timeout")
+        if isinstance(timeout, tuple):
+            out["timeout"] = httpx.Timeout(timeout[1], connect=timeout[0])
+        elif timeout is not None:
+            out["timeout"] = httpx.Timeout(timeout)
+        out["follow_redirects"] = kwargs.get("allow_redirects", True)
+        return out
 
-    def _call_qwen(self, audio_file: str) -> Optional[str]:
+    @staticmethod
+    async def _aiter_body(data):
+        # 在线程池中取下一块：读文件或等待录音数据都不应阻塞事件循环
+        loop = asyncio.get_running_loop()
+        iterator = iter(data)
+        done = object()
+        while True:
+            chunk = await loop.run_in_executor(None, next, iterator, done)
+            if chunk is done:
+                return
+            yield chunk
+
+    @staticmethod
+    def _to_requests_response(response: "httpx.Response") -> requests.Response:
+        result = requests.Response()
+        result.status_code = response.status_code
+        result.headers = requests.structures.CaseInsensitiveDict(response.headers.items())
+        result._content = response.content  # pylint: disable=protected-access
+        result.url = str(response.url)
+        result.reason = response.reason_phrase
+        result.encoding = response.encoding
+        return result
+
+    async def arequest(self, method: str, url: str, **kwargs) -> requests.Response:
         """
-        调用通义千问录音识别接口（DashScope 多模态会话模型）。
+        在事件循环中发送请求（协程版本）。
         """
-        if dashscope is None:
-            raise RuntimeError("未安装 dashscope 库，请执行 `pip install dashscope` 后重试。")
+        deadline = kwargs.pop("deadline", None)
+        key = HttpSessionPool._host_key(url)  # pylint: disable=protected-access
+        try:
+            coro = self._client.request(method, url, **self._httpx_kwargs(kwargs))
+            response = await (asyncio.wait_for(coro, deadline) if deadline else coro)
+        except asyncio.TimeoutError as exc:
+            raise requests.Timeout(f"请求超过 {deadline} 秒未完成：{method} {url}") from exc
+        except httpx.TimeoutException as exc:
+            raise requests.Timeout(f"{type(exc).__name__}: {exc}") from exc
+        except httpx.HTTPError as exc:
+            raise requests.ConnectionError(f"{type(exc).__name__}: {exc}") from exc
+        stream = response.extensions.get("network_stream")
+        with self._lock:
+            stats = self._stats[key]
+            stats["requests"] += 1
+            if stream is not None and stream in self._streams:
+                stats["reused"] += 1
+                reused = True
+            else:
+                stats["new_connections"] += 1
+                reused = False
+                if stream is not None:
+                    self._streams.add(stream)
+        self.logger.debug("%s %s（%s）：%s", method, key, response.http_version, "复用已有连接" if reused else "新建连接")
+        return self._to_requests_response(response)
 
-        api_key = os.environ.get("DASHSCOPE_API_KEY") or self.config.get("qwen_api_key")
-        if "在此填写" in str(api_key) or not str(api_key).strip():
-            raise RuntimeError("未配置通义千问 API Key，请在环境变量 DASHSCOPE_API_KEY 或配置项 qwen_api_key 中填写。")
+    @staticmethod
+    def _wait_limit(kwargs: dict) -> Optional[float]:
+        """
+        同步等待的上限：deadline 或 timeout（连接 + 读取）加余量；
+        请求体为录音期间持续产出、长度未知的流时不设上限，由各步 I/O 超时兜底。
+        """
+        data = kwargs.get("data")
+        if data is not None and not isinstance(data, (bytes, bytearray, str, dict)) and not hasattr(data, "__len__"):
+            return None
+        limit = kwargs.get("deadline")
+        if limit is None:
+            timeout = kwargs.get("timeout")
+            if timeout is None:
+                return None
+            limit = sum(timeout) if isinstance(timeout, tuple) else timeout
+        return float(limit) + AsyncHttpEngine.WAIT_GRACE_S
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        同步发送请求：在事件循环线程上执行，调用方等待结果；中断等待或线程绑定的取消标记被触发时会取消底层请求。
+        """
+        CancelToken.check()
+        limit = self._wait_limit(kwargs)
+        future = asyncio.run_coroutine_threadsafe(self.arequest(method, url, **kwargs), self._ensure_loop())
+        token = CancelToken.current()
+        if token is not None:
+            token.add_callback(future.cancel)
+        try:
+            return future.result(timeout=limit)
+        except concurrent.futures.TimeoutError as exc:
+            future.cancel()
+            raise requests.Timeout(f"等待 {limit:.0f} 秒仍未完成：{method} {url}") from exc
+        except concurrent.futures.CancelledError as exc:
+            raise RecognitionCancelled(f"请求已取消：{method} {url}") from exc
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            if token is not None:
+                token.remove_callback(future.cancel)
 
-        model = (self.config.get("qwen_model") or CONFIG_TEMPLATE["qwen_model"]).strip() or CONFIG_TEMPLATE["qwen_model"]
-        context_text = str(self.config.get("qwen_context") or "").strip()
-        language = str(self.config.get("qwen_language") or "").strip()
-        enable_lid = bool(self.config.get("qwen_enable_lid", CONFIG_TEMPLATE["qwen_enable_lid"]))
-        enable_itn = bool(self.config.get("qwen_enable_itn", CONFIG_TEMPLATE["qwen_enable_itn"]))
+    def request_many(self, calls: List[tuple]) -> List[object]:
+        """
+        并发发送多个相互独立的请求（method, url, kwargs），返回响应或异常列表。
+        """
+        async def run_all() -> List[object]:
+            return await asyncio.gather(
+                *(self.arequest(method, url, **kwargs) for method, url, kwargs in calls),
+                return_exceptions=True,
+            )
 
+        limits = [self._wait_limit(kwargs) for _method, _url, kwargs in calls]
+        limit = None if None in limits else max(limits, default=0.0)
+        future = asyncio.run_coroutine_threadsafe(run_all(), self._ensure_loop())
         try:
-            audio_uri = Path(audio_file).resolve().as_uri()
-        except ValueError:
-            audio_uri = f"file://{Path(audio_file).resolve()}"
+            return future.result(timeout=limit)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            return [requests.Timeout(f"等待 {limit:.0f} 秒仍未完成：{method} {url}") for method, url, _kwargs in calls]
 
-        messages: List[dict[str, object]] = []
-        if context_text:
-            messages.append({
-                "role": "system",
-                "content": [{"text": context_text}]
-            })
-        messages.append({
-            "role": "user",
-            "content": [{"audio": audio_uri}]
-        })
+    def warm(self, url: str, timeout: float = 5.0) -> None:
+        """
+        预热连接：发送一次 HEAD 请求，连接留在 httpx 连接池中。
+        """
+        key = HttpSessionPool._host_key(url)  # pylint: disable=protected-access
+        started = time.perf_counter()
+        try:
+            self.request("HEAD", url, timeout=timeout, allow_redirects=False)
+        except requests.RequestException as exc:
+            self.logger.warning("预热连接失败 %s：%s", key, exc)
+            return
+        with self._lock:
+            self._stats[key]["warmups"] += 1
+        self.logger.info("预热 %s：HEAD 往返 %.0f ms（已在录音期间完成，不计入识别延迟）", key, (time.perf_counter() - started) * 1000.0)
 
-        asr_options: dict[str, object] = {
-            "enable_lid": enable_lid,
-            "enable_itn": enable_itn
-        }
-        if language:
-            asr_options["language"] = language
+    def stats(self) -> dict[str, dict[str, int]]:
+        with self._lock:
+            return {key: dict(value) for key, value in self._stats.items()}
 
-        timeout = max(15, int(self.config.get("max_wait_s", CONFIG_TEMPLATE["max_wait_s"])))
+    def close(self) -> None:
+        with self._lock:
+            loop, client = self._loop, self._client
+            self._loop = self._client = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop).result(timeout=5)
+        except Exception:  # pylint: disable=broad-except
+            self.logger.debug("关闭异步 HTTP 客户端失败", exc_info=True)
+        loop.call_soon_threadsafe(loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        loop.close()
+        for key, value in self.stats().items():
+            self.logger.info(
+                "HTTP 连接统计 %s：请求 %d 次，新建连接 %d 次，复用 %d 次，预热 %d 次",
+                key,
+                value["requests"],
+                value["new_connections"],
+                value["reused"],
+                value["warmups"],
+            )
 
-        self.logger.info(
-            "准备调用通义千问，模型：%s，语种提示：%s，启用语种检测：%s，启用逆文本规范化：%s",
-            model,
-            language or "自动检测",
-            "是" if enable_lid else "否",
-            "是" if enable_itn else "否"
-        )
 
-        try:
-            response = dashscope.MultiModalConversation.call(
-                api_key=str(api_key).strip(),
-                model=model,
-                messages=messages,
-                result_format="message",
-                asr_options=asr_options,
-                request_timeout=timeout
-            )
-        except Exception as exc:  # pylint: disable=broad-except
-            self.logger.exception("通义千问接口调用失败")
-            raise RuntimeError(f"通义千问调用失败：{exc}") from exc
+class BackgroundCleanup:
+    """
+    后台清理队列：删除请求不阻塞识别结果返回，失败按指数退避重试。
+    """
 
-        status_code = int(response.get("status_code", HTTPStatus.OK))
-        if status_code != HTTPStatus.OK:
-            error_code = response.get("code") or status_code
-            error_message = response.get("message") or "未知错误"
-            raise RuntimeError(f"通义千问接口返回异常：{error_code} - {error_message}")
+    def __init__(self, transport, logger: logging.Logger, retries: int = 3, base_delay_s: float = 1.0):
+        self.transport = transport
+        self.logger = logger
+        self.retries = max(0, int(retries))
+        self.base_delay_s = max(0.0, float(base_delay_s))
+        self._cond = threading.Condition()
+        # (下次尝试时间, 已尝试次数, 请求元组)
+        self._pending: List[tuple[float, int, tuple]] = []
+        self._busy = 0
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, calls: List[tuple]) -> None:
+        if not calls:
+            return
+        with self._cond:
+            if self._stopped:
+                return
+            now = time.monotonic()
+            self._pending.extend((now, 0, call) for call in calls)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="BackgroundCleanup", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _take_due(self) -> List[tuple[int, tuple]]:
+        """
+        等待并取出已到期的请求；停止且队列清空时返回空列表。
+        """
+        with self._cond:
+            while True:
+                if not self._pending:
+                    if self._stopped:
+                        return []
+                    self._cond.wait()
+                    continue
+                now = time.monotonic()
+                due = [item for item in self._pending if item[0] <= now or self._stopped]
+                if due:
+                    self._pending = [item for item in self._pending if item not in due]
+                    self._busy += 1
+                    return [(attempt, call) for _when, attempt, call in due]
+                self._cond.wait(min(item[0] for item in self._pending) - now)
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_due()
+            if not batch:
+                return
+            try:
+                results = self.transport.request_many([call for _attempt, call in batch])
+            except Exception as exc:  # pylint: disable=broad-except
+                results = [exc] * len(batch)
+            retry: List[tuple[float, int, tuple]] = []
+            for (attempt, call), result in zip(batch, results):
+                url = call[1]
+                if not isinstance(result, Exception):
+                    # 404 视为已删除（例如服务端已自动清理）
+                    if result.status_code < 400 or result.status_code == 404:
+                        self.logger.debug("后台清理完成：%s", url)
+                        continue
+                    result = RuntimeError(f"HTTP {result.status_code}")
+                if attempt < self.retries and not self._stopped:
+                    retry.append((time.monotonic() + self.base_delay_s * (2 ** attempt), attempt + 1, call))
+                    self.logger.info("后台清理失败，稍后重试（第 %d 次）：%s（%s）", attempt + 1, url, result)
+                else:
+                    self.logger.warning("后台清理失败，已放弃：%s（%s）", url, result)
+            with self._cond:
+                self._pending.extend(retry)
+                self._busy -= 1
+                self._cond.notify_all()
 
-        output = response.get("output") or {}
-        text_fragments: List[str] = []
-        annotations_languages: List[str] = []
+    def close(self, timeout: float = 5.0) -> None:
+        """
+        停止接收新任务，并在超时前把队列中的请求各尝试一次。
+        """
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout=timeout)
+        with self._cond:
+            left = len(self._pending) + self._busy
+        if left:
+            self.logger.warning("退出时仍有 %d 个后台清理请求未完成", left)
+
+
+class EndpointProber:
+    """
+    接入点测速：后台低频测量各渠道候选接入点的握手（DNS + TCP + TLS）与请求往返（HEAD），
+    识别时选用请求往返最短的健康接入点；结果保存到磁盘，重启后第一次识别即可直接使用。
+    """
 
-        if isinstance(output, dict):
-            choices = output.get("choices") or []
-            if choices:
-                first_choice = choices[0] or {}
-                message_payload = first_choice.get("message") if isinstance(first_choice, dict) else None
-                if message_payload is None:
-                    message_payload = getattr(first_choice, "message", None)
-                if message_payload:
-                    if isinstance(message_payload, dict):
-                        annotations = message_payload.get("annotations") or []
-                        content = message_payload.get("content") or []
-                    else:
-                        annotations = getattr(message_payload, "annotations", []) or []
-                        content = getattr(message_payload, "content", []) or []
-                    for annotation in annotations:
-                        if isinstance(annotation, dict):
-                            lang = str(annotation.get("language") or "").strip()
-                            if lang:
-                                annotations_languages.append(lang)
-                    for item in content:
-                        if isinstance(item, dict):
-                            snippet = str(item.get("text") or "").strip()
-                            if snippet:
-                                text_fragments.append(snippet)
-            if not text_fragments:
-                direct_text = output.get("text")
-                if isinstance(direct_text, str) and direct_text.strip():
-                    text_fragments.append(direct_text.strip())
-        else:
-            self.logger.debug("通义千问返回的 output 非字典类型：%s", type(output))
+    # 请求往返的平滑系数（新样本权重）
+    SMOOTHING = 0.5
 
-        text = "".join(text_fragments).strip()
-        if not text:
-            self.logger.debug("通义千问原始响应：%s", response)
-            raise RuntimeError("通义千问 API 未返回可用文本，请检查音频文件或日志。")
+    def __init__(
+        self,
+        candidates: dict,
+        logger: logging.Logger,
+        path: Path = ENDPOINTS_PATH,
+        interval_s: float = 900.0,
+        jitter_s: float = 120.0,
+        timeout_s: float = 5.0,
+    ):
+        self.candidates = {channel: list(urls) for channel, urls in candidates.items() if len(urls) > 1}
+        self.logger = logger.getChild("endpoints")
+        self.path = path
+        self.interval_s = max(60.0, interval_s)
+        self.jitter_s = max(0.0, jitter_s)
+        self.timeout_s = timeout_s
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._results: dict[str, dict[str, dict]] = {}
+        self._probed_at = 0.0
+        if self.candidates:
+            self._load()
+
+    def _load(self) -> None:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as exc:
+            self.logger.warning("读取接入点测速结果失败：%s", exc)
+            return
+        self._probed_at = float(data.get("probed_at") or 0.0)
+        for channel, urls in self.candidates.items():
+            saved = (data.get("results") or {}).get(channel) or {}
+            self._results[channel] = {url: saved[url] for url in urls if isinstance(saved.get(url), dict)}
+        best = {channel: self.best(channel) for channel in self.candidates}
+        self.logger.info("已载入接入点测速结果：%s", "，".join(f"{channel} → {url}" for channel, url in best.items() if url) or "无可用记录")
 
-        if annotations_languages:
-            ordered_unique = list(dict.fromkeys(annotations_languages))
-            self.logger.info("通义千问识别到的语种：%s", "、".join(ordered_unique))
+    def _save(self) -> None:
+        with self._lock:
+            data = {"probed_at": self._probed_at, "results": self._results}
+            text = json.dumps(data, ensure_ascii=False, indent=2)
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(text, encoding="utf-8")
+            os.replace(tmp, self.path)
+        except OSError as exc:
+            self.logger.warning("保存接入点测速结果失败：%s", exc)
+
+    def start(self) -> None:
+        if not self.candidates or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="EndpointProber", daemon=True)
+        self._thread.start()
 
-        usage = response.get("usage") or {}
-        if isinstance(usage, dict):
-            duration = usage.get("seconds")
-            if duration is not None:
-                self.logger.info("通义千问计费时长：%s 秒", duration)
+    def close(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        # 上次测速结果仍在有效期内时推迟首轮，避免每次启动都测速
+        delay = max(0.0, self._probed_at + self.interval_s - time.time())
+        while not self._stop.wait(delay):
+            self.probe_all()
+            delay = self.interval_s + random.uniform(0.0, self.jitter_s)
+
+    def probe_all(self) -> None:
+        for channel, urls in self.candidates.items():
+            for url in urls:
+                if self._stop.is_set():
+                    return
+                result = self.probe(url)
+                with self._lock:
+                    previous = self._results.setdefault(channel, {}).get(url)
+                    if result["healthy"] and previous and previous.get("healthy"):
+                        result["rtt_ms"] = round(
+                            self.SMOOTHING * result["rtt_ms"] + (1 - self.SMOOTHING) * float(previous["rtt_ms"]), 1
+                        )
+                    self._results[channel][url] = result
+            self.logger.info(
+                "接入点测速 %s：%s；选用 %s",
+                channel,
+                "，".join(self._describe(url, self._results[channel][url]) for url in urls),
+                self.best(channel) or "（均不可用，使用配置值）",
+            )
+        self._probed_at = time.time()
+        self._save()
 
-        return text
+    @staticmethod
+    def _describe(url: str, result: dict) -> str:
+        host = urlparse(url).netloc
+        if not result.get("healthy"):
+            return f"{host} 不可用（{result.get('error') or '未知错误'}）"
+        return f"{host} 握手 {result['handshake_ms']:.0f} ms / 往返 {result['rtt_ms']:.0f} ms"
 
-    # ====== 本地离线引擎（sherpa-onnx） ======
-    def _call_local_sherpa(self, audio_file: str) -> Optional[str]:
+    def probe(self, url: str) -> dict:
         """
-        使用 sherpa-onnx 在本地进行离线识别。
-        设计：
-        - 仅在需要时初始化并缓存识别器，避免重复加载模型导致的冷启动。
-        - 自动检测模型类型（Transducer/Paraformer/Whisper）以适配不同目录结构。
-        - 要求模型目录至少包含 `tokens.txt` 与一个/多个 .onnx 文件。
+        新建一条连接测量握手耗时，再在该连接上发送 HEAD 测量请求往返；5xx 与网络错误视为不健康。
         """
-        if sherpa_onnx is None or np is None:
-            raise RuntimeError(
-                "本地引擎不可用：缺少依赖。请执行 `pip install sherpa-onnx onnxruntime numpy` 并重启程序。"
-            )
-
-        variant = (self.config.get("local_sherpa_variant") or "small").strip().lower()
-        if variant not in {"small", "full"}:
-            variant = "small"
+        parsed = urlparse(url)
+        connection_class = HTTPSConnection if parsed.scheme == "https" else HTTPConnection
+        conn = connection_class(parsed.hostname, parsed.port, timeout=self.timeout_s)
+        probed_at = time.time()
+        try:
+            started = time.perf_counter()
+            conn.connect()
+            handshake_ms = (time.perf_counter() - started) * 1000.0
+            started = time.perf_counter()
+            conn.request("HEAD", parsed.path or "/", headers={"User-Agent": "LexiSharp-Probe/1.0"})
+            response = conn.getresponse()
+            response.read()
+            rtt_ms = (time.perf_counter() - started) * 1000.0
+        except (OSError, HTTPException) as exc:
+            return {"healthy": False, "error": str(exc) or type(exc).__name__, "probed_at": probed_at}
+        finally:
+            conn.close()
+        if response.status >= 500:
+            return {"healthy": False, "error": f"HTTP {response.status}", "probed_at": probed_at}
+        return {
+            "healthy": True,
+            "handshake_ms": round(handshake_ms, 1),
+            "rtt_ms": round(rtt_ms, 1),
+            "probed_at": probed_at,
+        }
 
-        model_dir_key = f"local_sherpa_model_dir_{variant}"
-        model_dir = str(self.config.get(model_dir_key) or "").strip()
-        if not model_dir:
-            raise RuntimeError("未设置本地模型目录，请在“设置”中选择或下载本地模型后重试。")
-        model_dir_path = Path(os.path.expanduser(model_dir)).resolve()
-        if not model_dir_path.exists():
-            raise RuntimeError(f"模型目录不存在：{model_dir_path}")
+    def best(self, channel: str) -> Optional[str]:
+        """
+        返回该渠道请求往返最短的健康接入点，没有测速结果时为 None。
+        """
+        with self._lock:
+            results = self._results.get(channel) or {}
+            healthy = [(float(result["rtt_ms"]), url) for url, result in results.items() if result.get("healthy")]
+        if not healthy:
+            return None
+        return min(healthy)[1]
 
-        # 探测模型文件
-        tokens_path = None
-        onnx_files: list[Path] = []
-        for p in model_dir_path.rglob("*"):
-            if p.is_file():
-                if p.name.lower() == "tokens.txt":
-                    tokens_path = p
-                if p.suffix.lower() == ".onnx":
-                    onnx_files.append(p)
 
-        if not tokens_path:
-            raise RuntimeError("未在模型目录中找到 tokens.txt，请检查模型是否完整。")
-        if not onnx_files:
-            raise RuntimeError("未在模型目录中找到 .onnx 文件，请检查模型是否完整。")
+class LiveUpload:
+    """
+    边录音边上传：作为录音监听者，把采集到的 PCM 以分块传输编码写入 multipart 请求体，录音结束时上传随即完成。
+    """
 
-        provider = (self.config.get("local_sherpa_provider") or "cpu").strip().lower()
-        num_threads = max(1, int(self.config.get("local_sherpa_threads", 4)))
-        prefer_int8 = bool(self.config.get("local_sherpa_prefer_int8", True))
+    def __init__(
+        self,
+        transport,
+        url: str,
+        headers: dict,
+        cleanup: BackgroundCleanup,
+        sample_rate: int = 16000,
+        timeout: float = 60.0,
+        logger: logging.Logger | None = None,
+    ):
+        self.transport = transport
+        self.url = url
+        self.headers = headers
+        self.cleanup = cleanup
+        self.sample_rate = sample_rate
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger("lexisharp.upload")
+        self.boundary = f"lexisharp-{uuid4().hex}"
+        self.source_path: Optional[str] = None
+        self.payload: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.bytes_sent = 0
+        self.closed_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._chunks: collections.deque = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._done = threading.Event()
+
+    def _wav_header(self) -> bytes:
+        # 总长度未知：与 arecord 写入管道时一致，RIFF/data 长度填最大值，解码端读到 EOF 为止
+        data_size = 0x7FFFFFFF - 36
+        return struct.pack(
+            "<4sI4s4sIHHIIHH4sI",
+            b"RIFF", data_size + 36, b"WAVE",
+            b"fmt ", 16, 1, 1, self.sample_rate, self.sample_rate * 2, 2, 16,
+            b"data", data_size,
+        )
 
-        # 根据文件名/数量做粗略类型识别
-        model_type = self._detect_sherpa_model_type(onnx_files)
+    def _body(self):
+        name = Path(self.source_path or "recording.wav").name
+        yield (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{name}"\r\n'
+            "Content-Type: audio/wav\r\n\r\n"
+        ).encode("utf-8") + self._wav_header()
+        while True:
+            with self._cond:
+                while not self._chunks and not self._closed:
+                    self._cond.wait()
+                if not self._chunks:
+                    break
+                chunk = b"".join(self._chunks)
+                self._chunks.clear()
+            self.bytes_sent += len(chunk)
+            yield chunk
+        yield f"\r\n--{self.boundary}--\r\n".encode("utf-8")
 
-        # 读取 wav 文件并转为 float32 波形
-        with wave.open(audio_file, "rb") as wf:
-            sr = wf.getframerate()
-            if wf.getnchannels() != 1:
-                raise RuntimeError("当前本地引擎示例仅支持单声道音频，请确保录音为单声道。")
-            if wf.getsampwidth() != 2:
-                raise RuntimeError("需要 16-bit PCM（s16le）音频。")
-            pcm_bytes = wf.readframes(wf.getnframes())
-        samples = np.frombuffer(pcm_bytes, dtype=np.int16).astype(np.float32) / 32768.0
-        if sr != self._local_sherpa_sr:
-            self.logger.warning("采样率不匹配：录音=%d，预期=%d，将按原样送入。", sr, self._local_sherpa_sr)
-        # 去静音（可选，仅前后裁剪）
-        if bool(self.config.get("local_sherpa_trim_silence", False)):
-            try:
-                thr = float(self.config.get("local_sherpa_vad_threshold", 0.01))
-            except Exception:
-                thr = 0.01
-            trimmed = self._trim_silence(samples, sr, threshold=thr)
-            if trimmed is not None and len(trimmed) > 0:
-                samples = trimmed
+    def _run(self) -> None:
+        try:
+            response = self.transport.request(
+                "POST",
+                self.url,
+                headers={**self.headers, "Content-Type": f"multipart/form-data; boundary={self.boundary}"},
+                data=self._body(),
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            self.payload = response.json()
+        except Exception as exc:  # pylint: disable=broad-except
+            self.error = str(exc)
+            with self._cond:
+                self._chunks.clear()
+        finally:
+            self.finished_at = time.monotonic()
+            self._done.set()
 
-        # 决策解码策略：paraformer 优先 modified_beam_search；其他优先 greedy
-        methods: list[str]
-        if model_type == "paraformer":
-            # 为兼容旧版 sherpa-onnx，优先使用 greedy，必要时再尝试 beam
-            methods = ["greedy_search", "modified_beam_search"]
-        else:
-            methods = ["greedy_search", "modified_beam_search"]
+    def start(self, audio_file: str) -> None:
+        self.source_path = audio_file
+        threading.Thread(target=self._run, name="LiveUpload", daemon=True).start()
 
-        last_err: Optional[Exception] = None
-        for dmethod in methods:
-            # 按解码方法构建/复用识别器
-            signature = f"{model_type}|{model_dir_path}|{provider}|{num_threads}|{dmethod}"
-            if signature != self._local_sherpa_signature:
-                self.logger.info(
-                    "初始化本地引擎（%s）(%s)，目录=%s，provider=%s，threads=%d",
-                    model_type,
-                    dmethod,
-                    model_dir_path,
-                    provider,
-                    num_threads,
-                )
-                try:
-                    self._local_sherpa_recognizer = self._build_offline_recognizer(
-                        model_type=model_type,
-                        onnx_files=onnx_files,
-                        tokens_path=str(tokens_path),
-                        provider=provider,
-                        num_threads=num_threads,
-                        decoding_method=dmethod,
-                        prefer_int8=prefer_int8,
-                    )
-                    self._local_sherpa_signature = signature
-                except Exception as exc:
-                    last_err = exc
-                    self.logger.exception("构建识别器失败（%s）", dmethod)
-                    continue
+    def feed(self, chunk: bytes) -> None:
+        if self.error:
+            return
+        with self._cond:
+            self._chunks.append(chunk)
+            self._cond.notify()
 
-            recognizer = self._local_sherpa_recognizer
-            if recognizer is None:
-                continue
-            try:
-                # Offline 识别流程
-                stream = recognizer.create_stream()  # type: ignore[attr-defined]
-                stream.accept_waveform(sr, samples)  # type: ignore[attr-defined]
-                try:
-                    stream.input_finished()  # type: ignore[attr-defined]
-                except Exception:
-                    pass
-                try:
-                    recognizer.decode_stream(stream)  # type: ignore[attr-defined]
-                except AttributeError:
-                    try:
-                        recognizer.decode_streams([stream])  # type: ignore[attr-defined]
-                    except Exception:
-                        raise
-                # 获取结果
-                text = None
-                try:
-                    result = recognizer.get_result(stream)  # type: ignore[attr-defined]
-                    text = getattr(result, "text", None) or (result if isinstance(result, str) else None)
-                except Exception:
-                    pass
-                if not text:
-                    try:
-                        text = getattr(stream, "result", None)
-                        text = getattr(text, "text", None) if text is not None else None
-                    except Exception:
-                        text = None
-                text = (text or "").strip()
-                if text:
-                    return text
-                else:
-                    self.logger.warning("解码方法 %s 未返回文本，尝试其他方法…", dmethod)
-            except Exception as exc:
-                last_err = exc
-                self.logger.exception("本地引擎识别失败（%s）", dmethod)
-                continue
+    def close(self) -> None:
+        with self._cond:
+            if not self._closed:
+                self._closed = True
+                self.closed_at = time.monotonic()
+            self._cond.notify_all()
 
-        if last_err:
-            raise RuntimeError(f"本地引擎识别失败：{last_err}")
-        return None
+    def result(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        等待上传完成并返回响应 JSON；失败或超时返回 None。
+        """
+        if not self._done.wait(self.timeout if timeout is None else timeout):
+            self.error = self.error or "等待上传完成超时"
+            return None
+        return self.payload
 
-    def _trim_silence(self, samples: "np.ndarray", sr: int, threshold: float = 0.01) -> Optional["np.ndarray"]:
-        """简单前后去静音：基于幅度阈值裁剪头尾的近静音段。
-        threshold 为归一化幅度阈值（0~1），默认 0.01。
-        若整段都低于阈值，则返回原始 samples 以避免误删。
+    def discard(self) -> None:
         """
-        try:
-            if samples is None or len(samples) == 0:
-                return samples
-            x = np.abs(samples)
-            # 以 20ms 为一帧做快速扫描
-            frame = max(1, int(sr * 0.02))
-            n = len(x)
-            # 找到第一个超过阈值的帧起点
-            start = 0
-            while start < n:
-                end = min(n, start + frame)
-                if x[start:end].max() >= threshold:
-                    break
-                start = end
-            # 全静音：直接返回原始
-            if start >= n:
-                return samples
-            # 找到最后一个超过阈值的帧终点
-            tail = n
-            pos = n
-            while pos > 0:
-                s = max(0, pos - frame)
-                if x[s:pos].max() >= threshold:
-                    break
-                pos = s
-            tail = pos
-            # 保护：至少保留 0.3s 音频
-            min_keep = int(sr * 0.3)
-            if tail - start < min_keep:
-                # 尝试扩展至最小长度
-                mid = (start + tail) // 2
-                start = max(0, mid - min_keep // 2)
-                tail = min(n, start + min_keep)
-            return samples[start:tail]
-        except Exception:
-            # 安全兜底：若出错不裁剪
-            return samples
+        录音被取消时放弃结果：上传完成后在后台删除已上传的文件。
+        """
+        self.close()
 
-    def _detect_sherpa_model_type(self, onnx_files: list[Path]) -> str:
-        """基于路径/文件名推断模型类型，返回 `sense_voice`/`transducer`/`paraformer`/`whisper`。"""
-        names = {p.name.lower() for p in onnx_files}
-        # SenseVoice 专用模型（目录名通常包含 sense-voice）
-        for p in onnx_files:
-            full = str(p).lower()
-            if "sense-voice" in full or "sense_voice" in full:
-                return "sense_voice"
-        if {"encoder.onnx", "decoder.onnx", "joiner.onnx"}.issubset(names):
-            return "transducer"
-        # whisper 常见包含 encoder/decoder 或 whisper-*.onnx
-        if any("whisper" in n for n in names) or {"whisper-encoder.onnx", "whisper-decoder.onnx"}.issubset(names):
-            return "whisper"
-        # 默认按 Paraformer（单文件 model.onnx）处理
-        return "paraformer"
+        def _delete() -> None:
+            payload = self.result()
+            file_id = (payload or {}).get("id")
+            if file_id:
+                self.cleanup.submit([("DELETE", f"{self.url}/{file_id}", {"headers": self.headers, "timeout": 30})])
 
-    def _build_offline_recognizer(
+        threading.Thread(target=_delete, name="LiveUploadDiscard", daemon=True).start()
+
+
+class StreamingSession:
+    """
+    流式识别会话：作为录音监听者，录音期间经 WebSocket 分包发送音频并接收中间结果，录音结束后只需等待最后一包的应答。
+    """
+
+    name = "流式识别"
+
+    def __init__(
         self,
-        model_type: str,
-        onnx_files: list[Path],
-        tokens_path: str,
-        provider: str,
-        num_threads: int,
-        decoding_method: str = "greedy_search",
-        prefer_int8: bool = True,
+        config: dict,
+        logger: logging.Logger,
+        on_partial=None,
+        sample_rate: int = 16000,
     ):
-        """根据推断的模型类型构建 OfflineRecognizer。"""
-        mc = None
-        tokens = tokens_path
-        if model_type == "transducer":
-            # encoder/decoder/joiner 三件套
-            base = {p.name.lower(): str(p) for p in onnx_files}
-            mc = sherpa_onnx.OfflineModelConfig(
-                transducer=sherpa_onnx.OfflineTransducerModelConfig(
-                    encoder=base.get("encoder.onnx", ""),
-                    decoder=base.get("decoder.onnx", ""),
-                    joiner=base.get("joiner.onnx", ""),
-                ),
-                tokens=tokens,
-                num_threads=num_threads,
-                provider=provider,
-            )
-        elif model_type == "sense_voice":
-            # SenseVoice 专用配置
-            model_path = self._choose_model_file(onnx_files, prefer_int8, provider)
-            sv_cfg = sherpa_onnx.OfflineSenseVoiceModelConfig(
-                model=model_path,
-                language="auto",
-                use_itn=False,
-            )
-            mc = sherpa_onnx.OfflineModelConfig(
-                sense_voice=sv_cfg,
-                tokens=tokens,
-                num_threads=num_threads,
-                provider=provider,
-            )
-        elif model_type == "whisper":
-            # 支持合并模型或拆分的 encoder/decoder
-            base = {p.name.lower(): str(p) for p in onnx_files}
-            enc = base.get("whisper-encoder.onnx") or base.get("encoder.onnx") or ""
-            dec = base.get("whisper-decoder.onnx") or base.get("decoder.onnx") or ""
-            # 一些仓库会直接给单模型文件，尝试兜底
-            single = next((str(p) for p in onnx_files if "whisper" in p.name.lower()), "")
-            whisper_cfg = sherpa_onnx.OfflineWhisperModelConfig(
-                encoder=enc,
-                decoder=dec,
-                model=single,
-                language="zh",
-                task="transcribe",
-            )
-            mc = sherpa_onnx.OfflineModelConfig(
-                whisper=whisper_cfg,
-                tokens=tokens,
-                num_threads=num_threads,
-                provider=provider,
-            )
-        else:  # paraformer（默认）
-            model_path = self._choose_model_file(onnx_files, prefer_int8, provider)
-            pf_cfg = sherpa_onnx.OfflineParaformerModelConfig(model=model_path)
-            mc = sherpa_onnx.OfflineModelConfig(
-                paraformer=pf_cfg,
-                tokens=tokens,
-                num_threads=num_threads,
-                provider=provider,
-            )
-        # 适配新旧 API：优先尝试新版本构造，失败则回退到旧版工厂方法
+        self.config = config
+        self.logger = logger
+        self.on_partial = on_partial
+        self.sample_rate = sample_rate
+        packet_ms = max(20, int(config.get("stream_packet_ms", CONFIG_TEMPLATE["stream_packet_ms"])))
+        self.packet_bytes = sample_rate * 2 * packet_ms // 1000
+        self.source_path: Optional[str] = None
+        self.text = ""
+        self.error: Optional[str] = None
+        self.closed_at: Optional[float] = None
+        self.final_at: Optional[float] = None
+        self._ws = None
+        self._buffer = bytearray()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._aborted = False
+        self._done = threading.Event()
+
+    # ---- 子类实现的协议细节 ----
+    def _connect(self):
+        raise NotImplementedError
+
+    def _send_audio(self, data: bytes, last: bool) -> None:
+        raise NotImplementedError
+
+    def _handle_message(self, opcode: int, data: bytes) -> bool:
+        """
+        处理一条服务端消息，返回 True 表示已收到最终结果。
+        """
+        raise NotImplementedError
+
+    # ---- 录音监听者接口 ----
+    def start(self, audio_file: str) -> None:
+        self.source_path = audio_file
+        threading.Thread(target=self._run, name="StreamSender", daemon=True).start()
+
+    def feed(self, chunk: bytes) -> None:
+        with self._cond:
+            if self.error:
+                return
+            self._buffer.extend(chunk)
+            if len(self._buffer) >= self.packet_bytes:
+                self._cond.notify()
+
+    def close(self) -> None:
+        with self._cond:
+            if not self._closed:
+                self._closed = True
+                self.closed_at = time.monotonic()
+            self._cond.notify_all()
+
+    def discard(self) -> None:
+        self._aborted = True
+        self.close()
+        if not self._done.is_set():
+            # 唤醒仍在等待结果的调用方
+            self._fail("已取消")
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:  # pylint: disable=broad-except
+                pass
+
+    def result(self, timeout: float) -> str:
+        """
+        等待最终结果；失败或超时抛出 RuntimeError。
+        """
+        if not self._done.wait(timeout):
+            self.discard()
+            raise RuntimeError(f"{self.name}等待最终结果超时。")
+        if self.error:
+            raise RuntimeError(f"{self.name}失败：{self.error}")
+        return self.text
+
+    # ---- 内部 ----
+    def _emit_partial(self, text: str) -> None:
+        if text == self.text:
+            return
+        self.text = text
+        if self.on_partial is not None:
+            try:
+                self.on_partial(text)
+            except Exception:  # pylint: disable=broad-except
+                self.logger.debug("中间结果回调失败", exc_info=True)
+
+    def _fail(self, message: str) -> None:
+        with self._cond:
+            if not self.error:
+                self.error = message
+            self._buffer.clear()
+            self._cond.notify_all()
+        self._done.set()
+
+    def _run(self) -> None:
+        started = time.perf_counter()
         try:
-            return sherpa_onnx.OfflineRecognizer(model_config=mc, decoding_method=decoding_method)
-        except TypeError:
-            # 旧版本兼容路径
-            return self._build_offline_recognizer_legacy(
-                model_type=model_type,
-                onnx_files=onnx_files,
-                tokens_path=tokens,
-                provider=provider,
-                num_threads=num_threads,
-                decoding_method=decoding_method,
-            )
+            self._ws = self._connect()
+        except Exception as exc:  # pylint: disable=broad-except
+            self._fail(f"连接失败：{exc}")
+            return
+        self.logger.info("%s已连接，耗时 %.0f ms", self.name, (time.perf_counter() - started) * 1000.0)
+        threading.Thread(target=self._recv_loop, name="StreamReceiver", daemon=True).start()
+        try:
+            while True:
+                with self._cond:
+                    while len(self._buffer) < self.packet_bytes and not self._closed and not self.error:
+                        self._cond.wait()
+                    if self.error or self._aborted:
+                        return
+                    last = self._closed
+                    size = len(self._buffer) if last else len(self._buffer) - len(self._buffer) % self.packet_bytes
+                    data = bytes(self._buffer[:size])
+                    del self._buffer[:size]
+                packets = [data[offset:offset + self.packet_bytes] for offset in range(0, len(data), self.packet_bytes)]
+                if last:
+                    # 最后一包携带结束标志（可能为空），服务端随即返回最终结果
+                    packets = packets or [b""]
+                    for packet in packets[:-1]:
+                        self._send_audio(packet, last=False)
+                    self._send_audio(packets[-1], last=True)
+                    return
+                for packet in packets:
+                    self._send_audio(packet, last=False)
+        except Exception as exc:  # pylint: disable=broad-except
+            if not self._aborted:
+                self._fail(f"发送音频失败：{exc}")
 
-    def _build_offline_recognizer_legacy(
-        self,
-        model_type: str,
-        onnx_files: list[Path],
-        tokens_path: str,
-        provider: str,
-        num_threads: int,
-        decoding_method: str = "greedy_search",
-        prefer_int8: bool = True,
-    ):
-        """兼容旧版 sherpa-onnx 的构造方式（from_transducer/from_paraformer/from_whisper）。"""
-        import inspect
+    def _recv_loop(self) -> None:
+        try:
+            while not self._done.is_set():
+                opcode, data = self._ws.recv_data()
+                if opcode == websocket.ABNF.OPCODE_CLOSE:
+                    if not self._done.is_set():
+                        self._fail("服务端提前关闭连接")
+                    return
+                if self._handle_message(opcode, data):
+                    self.final_at = time.monotonic()
+                    self._done.set()
+        except Exception as exc:  # pylint: disable=broad-except
+            if not self._aborted:
+                self._fail(f"接收结果失败：{exc}")
+        finally:
+            try:
+                self._ws.close()
+            except Exception:  # pylint: disable=broad-except
+                pass
 
-        def call_with_supported(func, params: dict, model_type: str, model_paths: dict):
-            """
-            根据工厂函数签名动态选择参数键：
-            - paraformer：优先传 paraformer=str 路径；否则传 model=str；否则传 config 对象（极少见）
-            - transducer：签名含 encoder/decoder/joiner 则传 3 路径；否则传 transducer=config
-            - whisper：签名含 encoder/decoder/model 则传 3 路径；否则传 whisper=config
-            其他通用参数按签名过滤。
-            """
+
+class VolcengineStreamSession(StreamingSession):
+    """
+    火山引擎大模型流式识别（二进制帧协议：4 字节头 + 序号 + 负载长度 + gzip 负载）。
+    """
+
+    name = "火山引擎流式识别"
+
+    # 消息类型
+    FULL_CLIENT_REQUEST = 0b0001
+    AUDIO_ONLY_REQUEST = 0b0010
+    FULL_SERVER_RESPONSE = 0b1001
+    SERVER_ERROR = 0b1111
+    # 标志位：正序号 / 最后一包（负序号）
+    POS_SEQUENCE = 0b0001
+    NEG_SEQUENCE = 0b0011
+    # 序列化与压缩
+    JSON_SERIALIZATION = 0b0001
+    GZIP_COMPRESSION = 0b0001
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._seq = 1
+
+    @classmethod
+    def pack(cls, message_type: int, flags: int, serialization: int, payload: bytes, seq: Optional[int] = None) -> bytes:
+        header = bytes([0x11, (message_type << 4) | flags, (serialization << 4) | cls.GZIP_COMPRESSION, 0])
+        body = gzip.compress(payload)
+        seq_bytes = struct.pack(">i", seq) if seq is not None else b""
+        return header + seq_bytes + struct.pack(">I", len(body)) + body
+
+    @classmethod
+    def unpack(cls, data: bytes) -> tuple[int, int, Optional[int], object]:
+        """
+        解析服务端帧，返回（消息类型、标志、序号、负载或错误信息）。
+        """
+        header_size = (data[0] & 0x0F) * 4
+        message_type = data[1] >> 4
+        flags = data[1] & 0x0F
+        serialization = data[2] >> 4
+        compression = data[2] & 0x0F
+        rest = data[header_size:]
+        seq = None
+        if flags & 0x01:
+            seq = struct.unpack(">i", rest[:4])[0]
+            rest = rest[4:]
+        if message_type == cls.SERVER_ERROR:
+            code, size = struct.unpack(">II", rest[:8])
+            return message_type, flags, seq, f"{code} - {rest[8:8 + size].decode('utf-8', 'replace')}"
+        size = struct.unpack(">I", rest[:4])[0]
+        body = rest[4:4 + size]
+        if compression == cls.GZIP_COMPRESSION and body:
+            body = gzip.decompress(body)
+        payload: object = json.loads(body) if serialization == cls.JSON_SERIALIZATION and body else body
+        return message_type, flags, seq, payload
+
+    def _connect(self):
+        app_key = os.environ.get("LEXISHARP_APP_KEY", self.config.get("app_key"))
+        headers = [
+            f"X-Api-App-Key: {app_key}",
+            f"X-Api-Access-Key: {os.environ.get('LEXISHARP_ACCESS_KEY', self.config.get('access_key'))}",
+            f"X-Api-Resource-Id: {self.config.get('volc_stream_resource_id') or CONFIG_TEMPLATE['volc_stream_resource_id']}",
+            f"X-Api-Connect-Id: {uuid4()}",
+        ]
+        url = str(self.config.get("volc_stream_url") or CONFIG_TEMPLATE["volc_stream_url"])
+        ws = websocket.create_connection(url, header=headers, timeout=int(self.config.get("max_wait_s", 45)))
+        request = {
+            "user": {"uid": app_key},
+            "audio": {"format": "pcm", "codec": "raw", "rate": self.sample_rate, "bits": 16, "channel": 1},
+            "request": {
+                "model_name": self.config.get("model_name", "bigmodel"),
+                "enable_punc": True,
+                "enable_itn": True,
+                "result_type": "full",
+            },
+        }
+        ws.send_binary(self.pack(
+            self.FULL_CLIENT_REQUEST,
+            self.POS_SEQUENCE,
+            self.JSON_SERIALIZATION,
+            json.dumps(request).encode("utf-8"),
+            seq=self._seq,
+        ))
+        return ws
+
+    def _send_audio(self, data: bytes, last: bool) -> None:
+        self._seq += 1
+        seq = -self._seq if last else self._seq
+        flags = self.NEG_SEQUENCE if last else self.POS_SEQUENCE
+        self._ws.send_binary(self.pack(self.AUDIO_ONLY_REQUEST, flags, 0, data, seq=seq))
+
+    def _handle_message(self, opcode: int, data: bytes) -> bool:
+        message_type, flags, _seq, payload = self.unpack(data)
+        if message_type == self.SERVER_ERROR:
+            self._fail(f"服务端错误 {payload}")
+            return False
+        if message_type != self.FULL_SERVER_RESPONSE or not isinstance(payload, dict):
+            return False
+        text = str((payload.get("result") or {}).get("text") or "")
+        self._emit_partial(text)
+        return flags & 0b0010 != 0
+
+
+class SonioxStreamSession(StreamingSession):
+    """
+    Soniox 实时识别（首帧 JSON 配置，随后发送 PCM 二进制帧，空帧表示音频结束）。
+    """
+
+    name = "Soniox 流式识别"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._final_text = ""
+
+    def _connect(self):
+        url = str(self.config.get("soniox_stream_url") or CONFIG_TEMPLATE["soniox_stream_url"])
+        ws = websocket.create_connection(url, timeout=int(self.config.get("max_wait_s", 45)))
+        request: dict[str, object] = {
+            "api_key": os.environ.get("SONIOX_API_KEY") or self.config.get("soniox_api_key"),
+            "model": self.config.get("soniox_stream_model") or CONFIG_TEMPLATE["soniox_stream_model"],
+            "audio_format": "pcm_s16le",
+            "sample_rate": self.sample_rate,
+            "num_channels": 1,
+            "client_reference_id": os.environ.get("LEXISHARP_REQUEST_ID") or f"lexisharp-{uuid4()}",
+        }
+        hints = self.config.get("soniox_language_hints")
+        if isinstance(hints, list) and hints:
+            request["language_hints"] = [str(item).strip() for item in hints if str(item).strip()]
+        context_text = str(self.config.get("soniox_context") or "").strip()
+        if context_text:
+            request["context"] = context_text
+        ws.send(json.dumps(request))
+        return ws
+
+    def _send_audio(self, data: bytes, last: bool) -> None:
+        if data:
+            self._ws.send_binary(data)
+        if last:
+            self._ws.send_binary(b"")
+
+    def _handle_message(self, opcode: int, data: bytes) -> bool:
+        payload = json.loads(data)
+        if payload.get("error_code") or payload.get("error_message"):
+            self._fail(f"服务端错误 {payload.get('error_code')} - {payload.get('error_message')}")
+            return False
+        pending = []
+        for token in payload.get("tokens") or []:
+            text = str(token.get("text") or "")
+            if token.get("is_final"):
+                self._final_text += text
+            else:
+                pending.append(text)
+        self._emit_partial((self._final_text + "".join(pending)).strip())
+        return bool(payload.get("finished"))
+
+
+# ====== 识别引擎与结果输出（图形界面与常驻模式共用） ======
+class LatencyTracker:
+    """
+    按渠道保存最近的识别耗时（秒）与失败次数，并统计对冲识别的胜负与整体耗时；线程安全。
+    """
+
+    # 少于该样本数时不给出分位数
+    MIN_SAMPLES = 10
+
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self._samples: dict[str, collections.deque] = collections.defaultdict(lambda: collections.deque(maxlen=window))
+        # 耗时与音频时长之比（短于 1 秒按 1 秒计），用于估算请求超时
+        self._ratios: dict[str, collections.deque] = collections.defaultdict(lambda: collections.deque(maxlen=window))
+        self._race_samples: collections.deque = collections.deque(maxlen=window)
+        self._failures: collections.Counter = collections.Counter()
+        self._wins: collections.Counter = collections.Counter()
+        self.races = 0
+        self.hedged = 0
+
+    def record(self, channel: str, seconds: float, audio_s: Optional[float] = None) -> None:
+        with self._lock:
+            self._samples[channel].append(seconds)
+            if audio_s:
+                self._ratios[channel].append(seconds / max(audio_s, 1.0))
+
+    def record_failure(self, channel: str) -> None:
+        with self._lock:
+            self._failures[channel] += 1
+
+    def record_race(self, winner: Optional[str], hedged: bool, seconds: float) -> None:
+        with self._lock:
+            self.races += 1
+            self.hedged += 1 if hedged else 0
+            if winner is not None:
+                self._wins[winner] += 1
+            self._race_samples.append(seconds)
+
+    def wins(self, channel: str) -> int:
+        with self._lock:
+            return self._wins[channel]
+
+    def failures(self, channel: str) -> int:
+        with self._lock:
+            return self._failures[channel]
+
+    def samples(self, channel: str) -> List[float]:
+        with self._lock:
+            return list(self._samples.get(channel, ()))
+
+    def percentile(self, channel: str, pct: float) -> Optional[float]:
+        values = self.samples(channel)
+        if len(values) < self.MIN_SAMPLES:
+            return None
+        return _percentile(values, pct)
+
+    def ratio_percentile(self, channel: str, pct: float) -> Optional[float]:
+        with self._lock:
+            values = list(self._ratios.get(channel, ()))
+        if len(values) < self.MIN_SAMPLES:
+            return None
+        return _percentile(values, pct)
+
+    def percentiles(self, channel: str) -> Optional[tuple]:
+        """
+        返回 (p50, p90, p99)，尚无样本时为 None。
+        """
+        values = self.samples(channel)
+        if not values:
+            return None
+        return tuple(_percentile(values, pct) for pct in (50, 90, 99))
+
+    def race_percentiles(self) -> Optional[tuple]:
+        with self._lock:
+            values = list(self._race_samples)
+        if not values:
+            return None
+        return tuple(_percentile(values, pct) for pct in (50, 90, 99))
+
+
+class CircuitBreaker:
+    """
+    渠道熔断器：连续失败达到阈值后打开，冷却期内跳过该渠道；冷却结束后放行一次试探请求（半开），
+    成功即恢复，失败则重新开始冷却。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    STATE_NAMES = {CLOSED: "正常", OPEN: "熔断", HALF_OPEN: "试探"}
+
+    def __init__(self, name: str, threshold: int, cooldown_s: float, logger: logging.Logger):
+        self.name = name
+        self.threshold = max(1, threshold)
+        self.cooldown_s = max(0.0, cooldown_s)
+        self.logger = logger
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        """
+        距离冷却结束的秒数（未熔断时为 0）。
+        """
+        with self._lock:
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.cooldown_s - time.monotonic())
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() >= self._opened_at + self.cooldown_s:
+                self.state = self.HALF_OPEN
+                self._probing = False
+                self.logger.info("熔断器：%s 冷却结束，放行一次试探请求。", self.name)
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+                return True
+            return self.state == self.CLOSED
+
+    def release(self) -> None:
+        """
+        试探请求被取消、未得出结论时归还试探名额。
+        """
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                self.logger.info("熔断器：%s 试探成功，恢复使用。", self.name)
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.threshold):
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self.trips += 1
+                self.logger.warning(
+                    "熔断器：%s 连续失败 %d 次，暂停使用 %.0f 秒（累计熔断 %d 次）。",
+                    self.name,
+                    self.failures,
+                    self.cooldown_s,
+                    self.trips,
+                )
+
+
+class TranscriptCache:
+    """
+    识别结果缓存：以 PCM 内容哈希加渠道及其影响识别结果的配置为键，每条结果一个小 JSON 文件；
+    文件 mtime 记录最近使用时间，总容量超过上限时淘汰最久未使用的结果。
+    """
+
+    # 同一文件（路径、大小、修改时间不变）的内容哈希只计算一次：重试、故障转移与对冲各渠道共用
+    DIGEST_MEMO_SIZE = 64
+
+    def __init__(self, directory: Path, max_bytes: int, logger: logging.Logger):
+        self.directory = directory
+        self.max_bytes = max(0, max_bytes)
+        self.logger = logger
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # 键 → 文件大小，按最近使用时间排序（首次访问时扫描目录建立）
+        self._index: Optional[collections.OrderedDict] = None
+        self._total = 0
+        self._digests: collections.OrderedDict = collections.OrderedDict()
+
+    def audio_digest(self, audio_file: str) -> Optional[str]:
+        """
+        返回音频内容的 SHA-256：WAV 只对采样格式与 PCM 数据取哈希（与文件头里的其他字段无关），其他文件对整个文件取哈希。
+        """
+        try:
+            stat = os.stat(audio_file)
+        except OSError:
+            return None
+        memo_key = (audio_file, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(memo_key)
+            if digest is not None:
+                self._digests.move_to_end(memo_key)
+                return digest
+        hasher = hashlib.sha256()
+        try:
             try:
-                sig = inspect.signature(func)
-                param_names = set(sig.parameters.keys())
-            except (TypeError, ValueError):
-                sig = None
-                param_names = set()
+                with wave.open(audio_file, "rb") as wf:
+                    hasher.update(f"pcm:{wf.getframerate()}:{wf.getnchannels()}:{wf.getsampwidth()}:".encode("ascii"))
+                    while True:
+                        frames = wf.readframes(65536)
+                        if not frames:
+                            break
+                        hasher.update(frames)
+            except (wave.Error, EOFError):
+                hasher = hashlib.sha256(b"file:")
+                with open(audio_file, "rb") as fp:
+                    for block in iter(lambda: fp.read(1 << 20), b""):
+                        hasher.update(block)
+        except OSError:
+            return None
+        digest = hasher.hexdigest()
+        with self._lock:
+            self._digests[memo_key] = digest
+            while len(self._digests) > self.DIGEST_MEMO_SIZE:
+                self._digests.popitem(last=False)
+        return digest
 
-            kwargs: dict[str, object] = {}
-            # tokens 总是必填
-            if "tokens" in params:
-                kwargs["tokens"] = params["tokens"]
-            # 仅当能获取到签名且参数名存在时，才传可选参数，避免旧版 C 扩展因未知关键字异常/不确定行为
-            for k in ("num_threads", "provider", "decoding_method", "language", "task"):
-                if sig is not None and k in param_names and k in params:
-                    kwargs[k] = params[k]
+    @staticmethod
+    def make_key(digest: str, channel: str, settings: dict) -> str:
+        blob = json.dumps({"audio": digest, "channel": channel, "settings": settings}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
 
-            if model_type == "paraformer":
-                model_path = model_paths.get("model", "")
-                if "paraformer" in param_names:
-                    kwargs["paraformer"] = model_path
-                elif "model" in param_names:
-                    kwargs["model"] = model_path
-                else:
-                    # 无法判断，降级为配置对象
-                    kwargs["paraformer"] = sherpa_onnx.OfflineParaformerModelConfig(model=model_path)
-            elif model_type == "transducer":
-                if {"encoder", "decoder", "joiner"}.issubset(param_names):
-                    kwargs.update({
-                        "encoder": model_paths.get("encoder", ""),
-                        "decoder": model_paths.get("decoder", ""),
-                        "joiner": model_paths.get("joiner", ""),
-                    })
-                else:
-                    kwargs["transducer"] = sherpa_onnx.OfflineTransducerModelConfig(
-                        encoder=model_paths.get("encoder", ""),
-                        decoder=model_paths.get("decoder", ""),
-                        joiner=model_paths.get("joiner", ""),
-                    )
-            elif model_type == "whisper":
-                if {"encoder", "decoder", "model"}.issubset(param_names):
-                    kwargs.update({
-                        "encoder": model_paths.get("encoder", ""),
-                        "decoder": model_paths.get("decoder", ""),
-                        "model": model_paths.get("model", ""),
-                    })
-                    if "language" in param_names and "language" not in kwargs:
-                        kwargs["language"] = "zh"
-                    if "task" in param_names and "task" not in kwargs:
-                        kwargs["task"] = "transcribe"
-                else:
-                    kwargs["whisper"] = sherpa_onnx.OfflineWhisperModelConfig(
-                        encoder=model_paths.get("encoder", ""),
-                        decoder=model_paths.get("decoder", ""),
-                        model=model_paths.get("model", ""),
-                        language=kwargs.get("language", "zh"),
-                        task=kwargs.get("task", "transcribe"),
-                    )
-            else:  # sense_voice
-                # 旧版 from_sense_voice 一般签名为 (tokens, model, language?, use_itn?, num_threads?, provider?, decoding_method?)
-                # 因此优先传 model=路径；再按签名选择 language/use_itn 等
-                if sig is None or "model" in param_names:
-                    kwargs["model"] = model_paths.get("model", "")
-                    if sig is not None and "language" in param_names and "language" not in kwargs:
-                        kwargs["language"] = "auto"
-                    if sig is not None and "use_itn" in param_names and "use_itn" not in kwargs:
-                        kwargs["use_itn"] = False
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _ensure_index(self) -> collections.OrderedDict:
+        if self._index is None:
+            entries = []
+            try:
+                for entry in os.scandir(self.directory):
+                    if entry.name.endswith(".json"):
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        entries.append((stat.st_mtime, entry.name[: -len(".json")], stat.st_size))
+            except OSError:
+                pass
+            entries.sort()
+            self._index = collections.OrderedDict((key, size) for _, key, size in entries)
+            self._total = sum(size for _, _, size in entries)
+        return self._index
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            index = self._ensure_index()
+            if key not in index:
+                self.misses += 1
+                return None
+            path = self._path(key)
+            try:
+                text = json.loads(path.read_text(encoding="utf-8"))["text"]
+                os.utime(path)
+            except (OSError, ValueError, KeyError, TypeError):
+                self._total -= index.pop(key)
+                self.misses += 1
+                return None
+            index.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def put(self, key: str, text: str, meta: dict) -> None:
+        record = dict(meta, text=text, created_at=time.time())
+        data = json.dumps(record, ensure_ascii=False).encode("utf-8")
+        with self._lock:
+            index = self._ensure_index()
+            path = self._path(key)
+            tmp = path.with_suffix(f".{uuid4().hex[:8]}.tmp")
+            try:
+                if not self.directory.is_dir():
+                    self.directory.mkdir(parents=True, exist_ok=True)
+                    os.chmod(self.directory, 0o700)
+                tmp.write_bytes(data)
+                os.replace(tmp, path)
+            except OSError as exc:
+                self.logger.warning("写入识别缓存失败：%s", exc)
+                return
+            self._total += len(data) - index.pop(key, 0)
+            index[key] = len(data)
+            self.stores += 1
+            while self._total > self.max_bytes and index:
+                old_key, size = index.popitem(last=False)
+                self._total -= size
+                self.evictions += 1
+                try:
+                    self._path(old_key).unlink()
+                except OSError:
+                    pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = len(self._index) if self._index is not None else None
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": self._total if self._index is not None else None,
+            }
+
+
+class ASREngine:
+    """
+    识别渠道调度：按配置选择云端或本地引擎，不依赖 Tk。
+    """
+
+    # 录音期间连接续期的最长时间（秒），录音被放弃而未开始识别时不会无限续期
+    WARMUP_MAX_S = 600.0
+
+    def __init__(self, config: dict, logger: logging.Logger):
+        self.config = config
+        self.logger = logger
+        # 当前录音的连接预热续期，开始识别时停止
+        self._warm_stop = threading.Event()
+        # 本地引擎：内部按配置签名缓存识别器，避免重复加载模型
+        self.local_engine = LocalSherpaEngine(self.config, logger=self.logger)
+        # 进程隔离模式下的解码子进程（按需创建）
+        self.local_worker: Optional[LocalDecodeWorker] = None
+        # 长连接池，避免每次识别重复 DNS/TCP/TLS 握手；模型下载等流式场景直接使用
+        self.http = HttpSessionPool(self.config, logger=self.logger)
+        # 云端渠道的请求通道：http_engine=async 时为异步引擎（HTTP/2），否则即连接池本身
+        self.transport = self._build_transport()
+        # 云端临时资源（Soniox 上传文件与转写任务）的后台清理队列
+        self.cleanup = BackgroundCleanup(
+            self.transport,
+            logger=self.logger,
+            retries=int(self.config.get("soniox_cleanup_retries", CONFIG_TEMPLATE["soniox_cleanup_retries"])),
+        )
+        # Soniox 处理耗时与音频时长之比（滑动平均），用于估算首次轮询时机
+        self._soniox_ratio: Optional[float] = None
+        # 录音期间挂接的监听者（上传编码器、边录边传），按原始录音路径匹配
+        self._attached: list = []
+        self._attached_lock = threading.Lock()
+        # 流式渠道的中间结果回调（界面/常驻模式设置），参数为当前完整文本
+        self.on_partial = None
+        self._ffmpeg_missing_logged = False
+        # 各渠道近期识别耗时（对冲延迟取主渠道 p90）与对冲胜负统计
+        self.latency = LatencyTracker()
+        self._hedge_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._hedge_lock = threading.Lock()
+        # 各渠道的熔断器与故障转移次数（主渠道, 实际渠道）
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._failovers: collections.Counter = collections.Counter()
+        self._breaker_lock = threading.Lock()
+        # 当前线程本次识别的截止时间（故障转移链的时间预算）
+        self._call_state = threading.local()
+        # 按时长路由的决策次数（按选中的渠道）
+        self._route_counts: collections.Counter = collections.Counter()
+        self._local_preloading = False
+        # 多接入点测速（配置了 endpoint_candidates 时在后台运行）
+        self.endpoints = EndpointProber(
+            self._endpoint_candidates(),
+            logger=self.logger,
+            interval_s=float(self.config.get("endpoint_probe_interval_s", CONFIG_TEMPLATE["endpoint_probe_interval_s"])),
+            jitter_s=float(self.config.get("endpoint_probe_jitter_s", CONFIG_TEMPLATE["endpoint_probe_jitter_s"])),
+        )
+        self.endpoints.start()
+        self._endpoint_choice: dict[str, str] = {}
+        # 识别结果缓存（按音频内容 + 渠道配置寻址，transcript_cache_enabled 关闭时绕过）
+        self.cache = TranscriptCache(
+            Path(os.path.expanduser(str(self.config.get("transcript_cache_dir") or TRANSCRIPT_CACHE_DIR))),
+            int(float(self.config.get("transcript_cache_max_mb", CONFIG_TEMPLATE["transcript_cache_max_mb"])) * 1024 * 1024),
+            logger=self.logger,
+        )
+
+    # 可测速渠道对应的接入点配置项
+    ENDPOINT_KEYS = {"volcengine": "api_url", "soniox": "soniox_api_base", "qwen": "qwen_api_base"}
+
+    def _configured_endpoint(self, channel: str) -> str:
+        key = self.ENDPOINT_KEYS[channel]
+        return str(self.config.get(key) or CONFIG_TEMPLATE[key]).rstrip("/")
+
+    def _endpoint_candidates(self) -> dict[str, list[str]]:
+        configured = self.config.get("endpoint_candidates") or {}
+        candidates: dict[str, list[str]] = {}
+        if not isinstance(configured, dict):
+            self.logger.warning("endpoint_candidates 应为对象（渠道 → 接入点列表），已忽略。")
+            return candidates
+        for name, urls in configured.items():
+            channel = self.canonical_channel(name)
+            if channel not in self.ENDPOINT_KEYS or not isinstance(urls, list):
+                self.logger.warning("忽略无法测速的接入点配置：%s", name)
+                continue
+            merged = [self._configured_endpoint(channel)]
+            for url in urls:
+                url = str(url).strip().rstrip("/")
+                if url and url not in merged:
+                    merged.append(url)
+            candidates[channel] = merged
+        return candidates
+
+    def _endpoint(self, channel: str) -> str:
+        """
+        返回该渠道本次请求使用的接入点：有测速结果时为最快的健康接入点，否则为配置值。
+        """
+        configured = self._configured_endpoint(channel)
+        chosen = self.endpoints.best(channel) or configured
+        if self._endpoint_choice.get(channel, configured) != chosen:
+            self.logger.info("%s 接入点切换为 %s", self.display_name(channel), chosen)
+        self._endpoint_choice[channel] = chosen
+        return chosen
+
+    # 影响各渠道识别结果的配置项（参与识别缓存的键；凭证、超时、接入点等不影响结果的配置不参与）
+    CACHE_SETTING_KEYS = {
+        "volcengine": ("resource_id", "model_name", "volc_upload_codec"),
+        "volcengine_stream": ("volc_stream_resource_id",),
+        "soniox": (
+            "soniox_model",
+            "soniox_language_hints",
+            "soniox_context",
+            "soniox_enable_speaker_diarization",
+            "soniox_enable_language_identification",
+            "soniox_upload_codec",
+        ),
+        "soniox_stream": ("soniox_stream_model", "soniox_language_hints", "soniox_context"),
+        "qwen": ("qwen_model", "qwen_context", "qwen_language", "qwen_enable_lid", "qwen_enable_itn", "qwen_upload_codec"),
+        "local_sherpa": (
+            "local_sherpa_variant",
+            "local_sherpa_prefer_int8",
+            "local_sherpa_trim_silence",
+            "local_sherpa_vad_threshold",
+            "local_sherpa_decoding_method",
+        ),
+        "local_server": ("local_server_socket", "local_server_model"),
+    }
+
+    def _cache_key(self, channel: str, audio_file: str) -> Optional[str]:
+        """
+        返回该渠道识别此音频的缓存键；缓存关闭、渠道未知或音频无法读取时返回 None。
+        """
+        if not bool(self.config.get("transcript_cache_enabled", CONFIG_TEMPLATE["transcript_cache_enabled"])):
+            return None
+        keys = self.CACHE_SETTING_KEYS.get(channel)
+        if keys is None:
+            return None
+        digest = self.cache.audio_digest(audio_file)
+        if digest is None:
+            return None
+        settings = {key: self.config.get(key, CONFIG_TEMPLATE.get(key)) for key in keys}
+        if channel == "local_sherpa":
+            variant = str(settings["local_sherpa_variant"] or "small").strip().lower()
+            model_dir = str(self.config.get(f"local_sherpa_model_dir_{variant}") or "")
+            settings["model_dir"] = str(Path(os.path.expanduser(model_dir)).resolve()) if model_dir else ""
+        return TranscriptCache.make_key(digest, channel, settings)
+
+    def _log_cache_stats(self) -> None:
+        stats = self.cache.stats()
+        if not (stats["hits"] or stats["misses"]):
+            return
+        total = stats["hits"] + stats["misses"]
+        self.logger.info(
+            "识别缓存统计：命中 %d 次，未命中 %d 次（命中率 %.0f%%），写入 %d 条，淘汰 %d 条，当前 %d 条 / %.1f MB",
+            stats["hits"],
+            stats["misses"],
+            100.0 * stats["hits"] / total,
+            stats["stores"],
+            stats["evictions"],
+            stats["entries"] or 0,
+            (stats["bytes"] or 0) / (1024 * 1024),
+        )
+
+    def _build_transport(self):
+        engine = str(self.config.get("http_engine") or CONFIG_TEMPLATE["http_engine"]).strip().lower()
+        if engine != "async":
+            return self.http
+        if httpx is None:
+            self.logger.warning("未安装 httpx，http_engine=async 回退为 requests 连接池。")
+            return self.http
+        return AsyncHttpEngine(self.config, logger=self.logger)
+
+    def collect_missing_fields(self, config: dict) -> tuple[list[str], str]:
+        """
+        根据指定配置收集缺失的必填字段，并返回渠道标识。
+        """
+        channel = (config.get("channel") or "volcengine").strip().lower()
+        missing_messages: list[str] = []
+
+        if channel in {"volcengine_stream", "soniox_stream"} and websocket is None:
+            missing_messages.append("流式识别依赖 websocket-client（pip install websocket-client）")
+        if channel in {"volcengine", "volcano", "volc", "bytedance", "volcengine_stream"}:
+            app_key = os.environ.get("LEXISHARP_APP_KEY") or config.get("app_key", "")
+            access_key = os.environ.get("LEXISHARP_ACCESS_KEY") or config.get("access_key", "")
+            has_app_key = bool(str(app_key).strip()) and "在此填写" not in str(app_key)
+            has_access_key = bool(str(access_key).strip()) and "在此填写" not in str(access_key)
+            if not (has_app_key or has_access_key):
+                missing_messages.append("至少填写火山引擎凭证（App ID 或 Access Key）。")
+        elif channel in {"soniox", "soniox_stream"}:
+            api_key = os.environ.get("SONIOX_API_KEY") or config.get("soniox_api_key", "")
+            if "在此填写" in api_key or not str(api_key).strip():
+                missing_messages.append("Soniox API Key（soniox_api_key 或环境变量 SONIOX_API_KEY）")
+        elif channel in {"qwen", "tongyi", "tongyiqianwen", "dashscope"}:
+            api_key = os.environ.get("DASHSCOPE_API_KEY") or config.get("qwen_api_key", "")
+            if "在此填写" in str(api_key) or not str(api_key).strip():
+                missing_messages.append("通义千问 API Key（qwen_api_key 或环境变量 DASHSCOPE_API_KEY）")
+        elif channel in {"local_sherpa", "local", "sherpa"}:
+            variant = str(config.get("local_sherpa_variant", "small")).strip().lower()
+            if variant not in {"small", "full"}:
+                variant = "small"
+            model_dir = str(config.get(f"local_sherpa_model_dir_{variant}", "")).strip()
+            if not model_dir:
+                missing_messages.append("未设置本地模型目录（small/full）")
+            else:
+                p = Path(os.path.expanduser(model_dir)).resolve()
+                if not p.exists():
+                    missing_messages.append(f"模型目录不存在：{p}")
                 else:
-                    # 极少数特殊命名，尝试 sense_voice_model
-                    if "sense_voice_model" in param_names:
-                        kwargs["sense_voice_model"] = model_paths.get("model", "")
-                    else:
-                        # 最后兜底：构造配置对象（万一该版本支持）
-                        kwargs["model"] = model_paths.get("model", "")
+                    tokens = list(p.rglob("tokens.txt"))
+                    onnx = list(p.rglob("*.onnx"))
+                    if not tokens:
+                        missing_messages.append("模型缺少 tokens.txt")
+                    if not onnx:
+                        missing_messages.append("模型目录中未发现 .onnx 文件")
+        elif channel == "local_server":
+            if not str(config.get("local_server_socket") or "").strip():
+                missing_messages.append("本地识别服务套接字路径（local_server_socket）")
+        else:
+            self.logger.info("检测到自定义渠道：%s，跳过配置校验。", channel)
+
+        return missing_messages, channel
+
+    def display_name(self, channel: Optional[str] = None) -> str:
+        """
+        返回识别渠道（默认为当前渠道）的可读名称。
+        """
+        channel = (channel or self.config.get("channel") or "volcengine").strip().lower()
+        if channel in {"volcengine", "volcano", "volc", "bytedance"}:
+            return "火山引擎"
+        if channel == "soniox":
+            return "Soniox"
+        if channel == "volcengine_stream":
+            return "火山引擎（流式）"
+        if channel == "soniox_stream":
+            return "Soniox（流式）"
+        if channel in {"qwen", "tongyi", "tongyiqianwen", "dashscope"}:
+            return "通义千问"
+        if channel in {"local_sherpa", "local", "sherpa"}:
+            return "本地模型（sherpa-onnx）"
+        if channel == "local_server":
+            return "本地共享识别服务"
+        return channel or "火山引擎"
+
+    # 渠道别名 → 规范名称（耗时统计、对冲识别按规范名称区分渠道）
+    CHANNEL_ALIASES = {
+        "volcano": "volcengine",
+        "volc": "volcengine",
+        "bytedance": "volcengine",
+        "tongyi": "qwen",
+        "tongyiqianwen": "qwen",
+        "dashscope": "qwen",
+        "local": "local_sherpa",
+        "sherpa": "local_sherpa",
+    }
+
+    @classmethod
+    def canonical_channel(cls, channel: Optional[str]) -> str:
+        name = (channel or "volcengine").strip().lower() or "volcengine"
+        return cls.CHANNEL_ALIASES.get(name, name)
+
+    def transcribe(self, audio_file: str, background: bool = False, use_cache: bool = False) -> Optional[str]:
+        """
+        根据配置选择识别渠道并返回文本结果；配置了 hedge_channel 时启用对冲识别。
+        background=True（暂存区补识别）时不对冲、不在链内重试，结果也不计入熔断器，以免影响实时识别。
+        use_cache=True（批量转写、测试 WAV、ctl transcribe 等重复识别已有文件）时才读写识别缓存：
+        实时录音不会重复，既不必为其计算音频哈希，也不应把口述内容留在磁盘上。
+        """
+        if not background:
+            self._warm_stop.set()
+        chain, decision = self._route(self._channel_chain(), audio_file)
+        hedge = "" if background else str(self.config.get("hedge_channel") or "").strip()
+        started = time.monotonic()
+        self._call_state.background = background
+        self._call_state.use_cache = use_cache
+        try:
+            if hedge and self.canonical_channel(hedge) != chain[0]:
+                text = self._transcribe_hedged(chain, self.canonical_channel(hedge), audio_file)
+            else:
+                text = self._transcribe_chain(chain, audio_file)
+        except RuntimeError as exc:
+            if decision:
+                self.logger.info("路由结果：%s，失败（%.0f ms）：%s", decision, (time.monotonic() - started) * 1000.0, exc)
+            raise
+        finally:
+            self._call_state.background = False
+            self._call_state.use_cache = False
+        if decision:
+            self.logger.info(
+                "路由结果：%s，用时 %.0f ms，文本 %d 字", decision, (time.monotonic() - started) * 1000.0, len(text or "")
+            )
+        return text
+
+    def _route_short_channel(self) -> str:
+        return self.canonical_channel(
+            str(self.config.get("route_short_channel") or CONFIG_TEMPLATE["route_short_channel"])
+        )
+
+    def _local_ready(self, channel: str) -> bool:
+        """
+        本地渠道是否处于可立即解码的“热”状态。
+        """
+        if channel == "local_sherpa":
+            if bool(self.config.get("local_sherpa_process_isolation", False)):
+                return self.local_worker is not None and self.local_worker.is_ready()
+            return self.local_engine.is_loaded()
+        if channel == "local_server":
+            # 共享服务常驻内存，套接字存在即视为就绪
+            return Path(str(self.config.get("local_server_socket") or CONFIG_TEMPLATE["local_server_socket"])).exists()
+        return True
+
+    def _route(self, chain: List[str], audio_file: str) -> tuple[List[str], Optional[str]]:
+        """
+        按时长路由：短句在本地识别器已就绪、且近期统计未显示主渠道更快时改走 route_short_channel，
+        原主渠道顺延为第一个备用渠道。返回新的渠道链与决策说明（未启用时为 None）。
+        """
+        if not bool(self.config.get("route_by_duration", CONFIG_TEMPLATE["route_by_duration"])):
+            return chain, None
+        primary = chain[0]
+        target = self._route_short_channel()
+        if target == primary:
+            return chain, None
+        if primary in {"volcengine_stream", "soniox_stream"}:
+            # 流式渠道停止录音后只差一次往返，不参与路由
+            return chain, None
+        duration = _wav_duration(audio_file) or 0.0
+        limit = float(self.config.get("route_short_max_s", CONFIG_TEMPLATE["route_short_max_s"]))
+        prefix = f"音频 {duration:.1f} s"
+        if duration > limit:
+            reason = f"{prefix} > {limit:g} s"
+            choice = primary
+        elif bool(self.config.get("route_require_warm", CONFIG_TEMPLATE["route_require_warm"])) and not self._local_ready(target):
+            reason = f"{prefix}，{self.display_name(target)}未就绪"
+            choice = primary
+            self._prewarm_route_target()
+        else:
+            choice = target
+            reason = f"{prefix} ≤ {limit:g} s"
+            local_ratio = self.latency.ratio_percentile(target, 50)
+            cloud_ratio = self.latency.ratio_percentile(primary, 50)
+            if local_ratio is not None and cloud_ratio is not None:
+                scale = max(duration, 1.0) * 1000.0
+                reason += f"，预计 {self.display_name(target)} {local_ratio * scale:.0f} ms / {self.display_name(primary)} {cloud_ratio * scale:.0f} ms"
+                if cloud_ratio < local_ratio:
+                    choice = primary
+        with self._breaker_lock:
+            self._route_counts[choice] += 1
+        decision = f"{reason} → {self.display_name(choice)}"
+        self.logger.info("路由决策：%s", decision)
+        if choice == primary:
+            return chain, decision
+        # 主渠道在录音期间挂接的编码器/上传不再需要；本地失败回退到主渠道时按文件重新处理
+        self._discard_attached(audio_file)
+        return [target] + [channel for channel in chain if channel != target], decision
+
+    def _prewarm_route_target(self) -> None:
+        """
+        按时长路由启用时在后台加载短句渠道的本地模型，使后续短句可以直接走本地。
+        """
+        if not bool(self.config.get("route_by_duration", CONFIG_TEMPLATE["route_by_duration"])):
+            return
+        if self._route_short_channel() != "local_sherpa" or not LocalSherpaEngine.is_available():
+            return
+        self._preload_local_model()
+
+    def _preload_local_model(self) -> None:
+        """
+        在后台加载本地模型：启用进程隔离时启动解码子进程，否则在进程内加载识别器。
+        """
+        if self._local_ready("local_sherpa"):
+            return
+        if bool(self.config.get("local_sherpa_process_isolation", False)):
+            worker = self._get_local_worker()
+            if not worker.is_alive():
+                worker.start()
+            return
+        with self._breaker_lock:
+            if self._local_preloading:
+                return
+            self._local_preloading = True
+
+        def preload() -> None:
+            try:
+                spec = self.local_engine.resolve_model()
+                self.local_engine.load(spec, self.local_engine.decoding_methods(spec.model_type)[0])
+            except Exception as exc:  # pylint: disable=broad-except
+                self.logger.warning("预加载本地模型失败：%s", exc)
+            finally:
+                self._local_preloading = False
+
+        threading.Thread(target=preload, name="LocalPreload", daemon=True).start()
+
+    def _channel_chain(self) -> List[str]:
+        """
+        主渠道加 fallback_channels 组成的故障转移链（规范名称，去重保序）。
+        """
+        chain = [self.canonical_channel(self.config.get("channel"))]
+        fallbacks = self.config.get("fallback_channels") or []
+        if isinstance(fallbacks, str):
+            fallbacks = fallbacks.split(",")
+        for item in fallbacks:
+            if str(item).strip():
+                channel = self.canonical_channel(str(item))
+                if channel not in chain:
+                    chain.append(channel)
+        return chain
+
+    def breaker_wait(self) -> float:
+        """
+        故障转移链上的渠道全部处于熔断冷却中时，返回最早恢复的秒数；否则返回 0。
+        """
+        return min(self._breaker(channel).remaining() for channel in self._channel_chain())
+
+    def _breaker(self, channel: str) -> "CircuitBreaker":
+        with self._breaker_lock:
+            breaker = self._breakers.get(channel)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    self.display_name(channel),
+                    threshold=int(self.config.get("breaker_failure_threshold", CONFIG_TEMPLATE["breaker_failure_threshold"])),
+                    cooldown_s=float(self.config.get("breaker_cooldown_s", CONFIG_TEMPLATE["breaker_cooldown_s"])),
+                    logger=self.logger,
+                )
+                self._breakers[channel] = breaker
+            return breaker
+
+    def _request_timeout(self) -> float:
+        """
+        单个请求的超时（秒），且不超过本次识别剩余的时间预算。
+        启用 adaptive_timeout 时按音频时长与该渠道近期（耗时 / 音频时长）的 p95 估算并限制在上下限之间，否则为 max_wait_s。
+        """
+        channel = getattr(self._call_state, "channel", None)
+        audio_s = getattr(self._call_state, "audio_s", None) or 0.0
+        if bool(self.config.get("adaptive_timeout", CONFIG_TEMPLATE["adaptive_timeout"])):
+            floor = float(self.config.get("timeout_floor_s", CONFIG_TEMPLATE["timeout_floor_s"]))
+            ceiling = max(floor, float(self.config.get("timeout_ceiling_s", CONFIG_TEMPLATE["timeout_ceiling_s"])))
+            ratio = self.latency.ratio_percentile(channel, 95) if channel else None
+            if ratio is None:
+                # 近期样本不足：固定开销 + 按音频时长的先验估计
+                estimate = float(self.config.get("timeout_base_s", CONFIG_TEMPLATE["timeout_base_s"])) + audio_s * float(
+                    self.config.get("timeout_per_audio_s", CONFIG_TEMPLATE["timeout_per_audio_s"])
+                )
+                basis = "先验估计"
+            else:
+                headroom = float(self.config.get("timeout_headroom", CONFIG_TEMPLATE["timeout_headroom"]))
+                estimate = ratio * max(audio_s, 1.0) * headroom
+                basis = f"近期耗时比 p95 {ratio:.2f} × {headroom:g}"
+            timeout = min(ceiling, max(floor, estimate))
+            reason = f"音频 {audio_s:.1f} s，{basis}，下限 {floor:g} / 上限 {ceiling:g} s"
+        else:
+            timeout = float(self.config.get("max_wait_s", CONFIG_TEMPLATE["max_wait_s"]))
+            reason = "max_wait_s"
+        deadline = getattr(self._call_state, "deadline", None)
+        if deadline is not None and deadline - time.monotonic() < timeout:
+            timeout = max(1.0, deadline - time.monotonic())
+            reason += "，受剩余时间预算限制"
+        self.logger.info("请求超时 %.1f s（%s）", timeout, reason)
+        return timeout
+
+    def _transcribe_chain(self, chain: List[str], audio_file: str) -> Optional[str]:
+        """
+        按故障转移链依次尝试各渠道：每个渠道失败后带随机抖动重试，处于熔断冷却中的渠道直接跳过，
+        全部尝试受 recognition_budget_s 总时间预算约束。
+        """
+        # 后台补识别只避开冷却中的渠道：不占用试探名额、不重试，成败也不计入熔断器
+        background = bool(getattr(self._call_state, "background", False))
+        retries = 0 if background else max(0, int(self.config.get("channel_retries", CONFIG_TEMPLATE["channel_retries"])))
+        backoff = max(0.0, float(self.config.get("retry_backoff_ms", CONFIG_TEMPLATE["retry_backoff_ms"]))) / 1000.0
+        budget = float(self.config.get("recognition_budget_s", CONFIG_TEMPLATE["recognition_budget_s"]))
+        deadline = time.monotonic() + budget
+        errors: list = []
+        skipped: list = []
+        self._call_state.deadline = deadline
+        try:
+            for channel in chain:
+                breaker = self._breaker(channel)
+                skip = breaker.remaining() > 0 if background else not breaker.allow()
+                if skip:
+                    self.logger.info("%s 熔断中（%.0f 秒后恢复试探），跳过。", self.display_name(channel), breaker.remaining())
+                    skipped.append(channel)
+                    continue
+                for attempt in range(retries + 1):
+                    if time.monotonic() >= deadline:
+                        break
+                    # 只有成功或暂时性失败才算对渠道健康得出结论；取消、永久性错误与意外异常（如 wave.Error）都要归还试探名额
+                    concluded = background
+                    try:
+                        text = self._transcribe_timed(channel, audio_file)
+                        concluded = True
+                    except RecognitionCancelled:
+                        raise
+                    except RuntimeError as exc:
+                        errors.append((channel, exc))
+                        if not _is_transient_error(exc):
+                            # 鉴权失败、配置缺失、未返回可用文本等重试无益，也不说明渠道不可用：直接转下一渠道
+                            self.logger.warning("%s 识别失败（不重试）：%s", self.display_name(channel), exc)
+                            break
+                        self.logger.warning("%s 识别失败（第 %d 次）：%s", self.display_name(channel), attempt + 1, exc)
+                        if background:
+                            break
+                        breaker.record_failure()
+                        concluded = True
+                        if breaker.state != CircuitBreaker.CLOSED or attempt >= retries:
+                            break
+                        # 全抖动指数退避，避免多个客户端同时重试
+                        delay = min(random.uniform(0.0, backoff * (2 ** attempt)), max(0.0, deadline - time.monotonic()))
+                        self.logger.info("%.0f ms 后重试 %s", delay * 1000.0, self.display_name(channel))
+                        CancelToken.sleep(delay)
+                        continue
+                    finally:
+                        if not concluded:
+                            breaker.release()
+                    if not background:
+                        breaker.record_success()
+                    if channel != chain[0]:
+                        with self._breaker_lock:
+                            self._failovers[(chain[0], channel)] += 1
+                            count = self._failovers[(chain[0], channel)]
+                        self.logger.info(
+                            "故障转移：%s → %s 识别成功（累计 %d 次）", self.display_name(chain[0]), self.display_name(channel), count
+                        )
+                    return text
+                if time.monotonic() >= deadline:
+                    self.logger.warning("已超出识别时间预算 %.0f 秒，停止重试与故障转移。", budget)
+                    break
+        finally:
+            self._call_state.deadline = None
+        if not errors and skipped:
+            raise TransientRecognitionError(
+                "、".join(self.display_name(channel) for channel in skipped)
+                + f" 连续失败已暂停使用，{min(self._breaker(channel).remaining() for channel in skipped):.0f} 秒后自动重试。"
+            )
+        if not errors:
+            raise TransientRecognitionError(f"识别时间预算（{budget:.0f} 秒）已用尽。")
+        if len(errors) == 1:
+            raise errors[0][1]
+        raise self._combined_error(errors[-3:])
+
+    def _combined_error(self, errors: list) -> RuntimeError:
+        """
+        合并多个渠道的失败：其中任一为暂时性错误时整体仍视为暂时性，以便稍后补识别。
+        """
+        message = "；".join(f"{self.display_name(channel)}：{exc}" for channel, exc in errors)
+        if any(_is_transient_error(exc) for _channel, exc in errors):
+            return TransientRecognitionError(message)
+        return RuntimeError(message)
+
+    def _transcribe_on(self, channel: str, audio_file: str) -> Optional[str]:
+        """
+        使用指定的（规范名称）渠道识别音频文件。
+        """
+        self.logger.info("识别渠道：%s", channel)
+        CancelToken.check()
+        if channel == "volcengine":
+            return self._call_with_upload_codec(self._call_volcengine, audio_file, channel)
+        if channel == "soniox":
+            return self._call_with_upload_codec(self._call_soniox, audio_file, channel)
+        if channel in {"volcengine_stream", "soniox_stream"}:
+            return self._call_stream(channel, audio_file)
+        if channel == "qwen":
+            return self._call_with_upload_codec(self._call_qwen, audio_file, channel)
+        if channel == "local_sherpa":
+            return self._call_local_sherpa(audio_file)
+        if channel == "local_server":
+            return self._call_local_server(audio_file)
+        raise RuntimeError(f"未识别的识别渠道：{channel}")
+
+    def _transcribe_timed(self, channel: str, audio_file: str) -> Optional[str]:
+        cache_key = self._cache_key(channel, audio_file) if getattr(self._call_state, "use_cache", False) else None
+        if cache_key is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self.logger.info("%s 命中识别缓存（%d 字）", self.display_name(channel), len(cached))
+                # 录音期间挂接的编码器/上传/流式会话不再需要
+                self._discard_attached(audio_file)
+                return cached
+        # 供 _request_timeout 使用：上传的可能是压缩文件，时长以原始录音为准
+        audio_s = _wav_duration(audio_file)
+        self._call_state.channel = channel
+        self._call_state.audio_s = audio_s
+        started = time.monotonic()
+        try:
+            text = self._transcribe_on(channel, audio_file)
+        except RecognitionCancelled:
+            raise
+        except Exception:
+            self.latency.record_failure(channel)
+            raise
+        finally:
+            self._call_state.channel = self._call_state.audio_s = None
+        self.latency.record(channel, time.monotonic() - started, audio_s)
+        if cache_key is not None and text:
+            self.cache.put(cache_key, text, {"channel": channel, "duration_s": audio_s})
+        return text
+
+    def _run_hedge_leg(self, chain: List[str], audio_file: str, token: CancelToken, use_cache: bool) -> Optional[str]:
+        CancelToken.bind(token)
+        self._call_state.use_cache = use_cache
+        try:
+            return self._transcribe_chain(chain, audio_file)
+        finally:
+            self._call_state.use_cache = False
+            CancelToken.bind(None)
+
+    def _hedge_delay(self, channel: str) -> float:
+        """
+        发出备用请求前的等待（秒）：固定配置值，或主渠道近期耗时的 p90。
+        """
+        fixed_ms = float(self.config.get("hedge_delay_ms", CONFIG_TEMPLATE["hedge_delay_ms"]) or 0)
+        if fixed_ms > 0:
+            return fixed_ms / 1000.0
+        p90 = self.latency.percentile(channel, 90)
+        if p90 is None:
+            return float(self.config.get("hedge_default_delay_ms", CONFIG_TEMPLATE["hedge_default_delay_ms"])) / 1000.0
+        return p90
+
+    def _transcribe_hedged(self, chain: List[str], hedge: str, audio_file: str) -> Optional[str]:
+        """
+        对冲识别：先只请求主渠道（含其故障转移链），超过对冲延迟仍未返回（或已失败、结果为空）时把同一段音频发给备用渠道，
+        先得到非空结果的一方胜出，另一方随即取消。
+        """
+        primary = chain[0]
+        delay = self._hedge_delay(primary)
+        started = time.monotonic()
+        with self._hedge_lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="HedgeLeg")
+            pool = self._hedge_pool
+        legs: dict = {}
+
+        use_cache = bool(getattr(self._call_state, "use_cache", False))
+
+        def launch(channel: str, leg_chain: List[str]) -> None:
+            token = CancelToken()
+            legs[pool.submit(self._run_hedge_leg, leg_chain, audio_file, token, use_cache)] = (channel, token)
+
+        launch(primary, chain)
+        pending = set(legs)
+        hedged = False
+        winner: Optional[str] = None
+        text: Optional[str] = None
+        errors: list = []
+        while pending:
+            timeout = None if hedged else max(0.0, started + delay - time.monotonic())
+            done, pending = concurrent.futures.wait(pending, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                channel = legs[future][0]
+                try:
+                    result = future.result()
+                except RuntimeError as exc:
+                    self.logger.warning("对冲识别：%s 失败：%s", self.display_name(channel), exc)
+                    errors.append((channel, exc))
+                    continue
+                if result and winner is None:
+                    winner, text = channel, result
+            if winner is not None:
+                break
+            if not hedged and (not pending or time.monotonic() >= started + delay):
+                hedged = True
+                self.logger.info(
+                    "对冲识别：%s %s，发出备用请求（%s）",
+                    self.display_name(primary),
+                    f"{delay * 1000.0:.0f} ms 内未返回" if pending else "未得到结果",
+                    self.display_name(hedge),
+                )
+                launch(hedge, [hedge])
+                pending = {future for future in legs if not future.done()}
+
+        cancelled = 0
+        for future, (channel, token) in legs.items():
+            if channel != winner and not future.done():
+                token.cancel()
+                cancelled += 1
+        elapsed = time.monotonic() - started
+        self.latency.record_race(winner, hedged, elapsed)
+        if winner is not None:
+            self.logger.info(
+                "对冲识别：%s 胜出，总耗时 %.0f ms（对冲延迟 %.0f ms%s）",
+                self.display_name(winner),
+                elapsed * 1000.0,
+                delay * 1000.0,
+                "，已取消另一渠道" if cancelled else "",
+            )
+        if self.latency.races % 20 == 0:
+            self._log_hedge_stats(primary, hedge)
+        if winner is not None:
+            return text
+        if errors and len(errors) == len(legs):
+            if len(errors) == 1:
+                raise errors[0][1]
+            raise self._combined_error(errors)
+        return None
+
+    def _log_failover_stats(self) -> None:
+        with self._breaker_lock:
+            failovers = dict(self._failovers)
+            breakers = dict(self._breakers)
+        for (primary, channel), count in failovers.items():
+            self.logger.info("故障转移统计：%s → %s 共 %d 次", self.display_name(primary), self.display_name(channel), count)
+        for breaker in breakers.values():
+            if breaker.trips or breaker.state != CircuitBreaker.CLOSED:
+                self.logger.info(
+                    "熔断器 %s：当前%s，累计熔断 %d 次", breaker.name, CircuitBreaker.STATE_NAMES[breaker.state], breaker.trips
+                )
+
+    def _log_hedge_stats(self, primary: str, hedge: str) -> None:
+        races = self.latency.races
+        if not races:
+            return
+
+        def fmt(values: Optional[tuple]) -> str:
+            return "无数据" if values is None else " / ".join(f"{value * 1000.0:.0f}" for value in values)
+
+        self.logger.info(
+            "对冲统计：共 %d 次，发出备用请求 %d 次；%s 胜出 %d 次（%.0f%%），%s 胜出 %d 次（%.0f%%）；"
+            "整体耗时 p50/p90/p99 %s ms，%s 单独 %s ms，%s 单独 %s ms",
+            races,
+            self.latency.hedged,
+            self.display_name(primary),
+            self.latency.wins(primary),
+            100.0 * self.latency.wins(primary) / races,
+            self.display_name(hedge),
+            self.latency.wins(hedge),
+            100.0 * self.latency.wins(hedge) / races,
+            fmt(self.latency.race_percentiles()),
+            self.display_name(primary),
+            fmt(self.latency.percentiles(primary)),
+            self.display_name(hedge),
+            fmt(self.latency.percentiles(hedge)),
+        )
+
+    # 各云端渠道可接受的压缩编码
+    UPLOAD_CODECS = {
+        "volc": {"opus"},
+        "soniox": {"flac", "opus"},
+        "qwen": {"flac", "opus"},
+    }
+
+    def _upload_codec(self, channel: Optional[str] = None) -> str:
+        """
+        返回渠道（默认为当前渠道）配置的上传编码，未配置、不支持或本地渠道时为 wav。
+        """
+        channel = self.canonical_channel(channel or self.config.get("channel"))
+        prefix = {"volcengine": "volc", "soniox": "soniox", "qwen": "qwen"}.get(channel)
+        if prefix is None:
+            return "wav"
+        codec = str(self.config.get(f"{prefix}_upload_codec") or "wav").strip().lower()
+        if codec == "wav":
+            return codec
+        if codec not in self.UPLOAD_CODECS[prefix]:
+            self.logger.warning("%s 不支持上传编码 %s，改用 wav。", self.display_name(channel), codec)
+            return "wav"
+        return codec
+
+    def _new_encoder(self, codec: str, sample_rate: int = 16000) -> AudioEncoder:
+        return AudioEncoder(
+            codec,
+            sample_rate=sample_rate,
+            ffmpeg=str(self.config.get("ffmpeg_path") or CONFIG_TEMPLATE["ffmpeg_path"]),
+            opus_bitrate_kbps=int(self.config.get("opus_bitrate_kbps", CONFIG_TEMPLATE["opus_bitrate_kbps"])),
+            logger=self.logger,
+        )
+
+    def _log_encoder_unavailable(self, exc: Exception) -> None:
+        if not self._ffmpeg_missing_logged:
+            self.logger.warning("上传音频压缩不可用，改用 wav：%s", exc)
+            self._ffmpeg_missing_logged = True
+
+    def _live_upload_enabled(self) -> bool:
+        channel = (self.config.get("channel") or "volcengine").strip().lower()
+        return channel == "soniox" and bool(self.config.get("soniox_live_upload", CONFIG_TEMPLATE["soniox_live_upload"]))
+
+    def _new_stream_session(self, channel: str, sample_rate: int, show_partial: bool = True) -> StreamingSession:
+        session_class = VolcengineStreamSession if channel == "volcengine_stream" else SonioxStreamSession
+        return session_class(
+            self.config, self.logger, on_partial=self.on_partial if show_partial else None, sample_rate=sample_rate
+        )
+
+    def attach_recorder(self, recorder: "Recorder") -> None:
+        """
+        在开始录音前为录音器挂接监听者：流式识别会话、Soniox 边录边传，或上传编码器（录音结束时压缩文件即已就绪）。
+        """
+        with self._attached_lock:
+            # 丢弃未被识别流程取走的旧结果（例如录音启动失败或被取消）
+            stale = [item for item in self._attached if item.source_path is None or not Path(item.source_path).exists()]
+            self._attached = [item for item in self._attached if item not in stale]
+        for item in stale:
+            item.discard()
+
+        channel = (self.config.get("channel") or "volcengine").strip().lower()
+        if channel in {"volcengine_stream", "soniox_stream"}:
+            if websocket is None:
+                return
+            listener = self._new_stream_session(channel, recorder.sample_rate)
+        elif self._live_upload_enabled():
+            base_url = self._endpoint("soniox")
+            listener = LiveUpload(
+                self.transport,
+                f"{base_url}/v1/files",
+                self._soniox_headers(),
+                self.cleanup,
+                sample_rate=recorder.sample_rate,
+                timeout=float(self.config.get("max_wait_s", CONFIG_TEMPLATE["max_wait_s"])),
+                logger=self.logger,
+            )
+        else:
+            codec = self._upload_codec()
+            if codec == "wav":
+                return
+            listener = self._new_encoder(codec, recorder.sample_rate)
+            try:
+                listener.open()
+            except RuntimeError as exc:
+                self._log_encoder_unavailable(exc)
+                return
+        recorder.add_listener(listener)
+        with self._attached_lock:
+            self._attached.append(listener)
+
+    def _take_attached(self, audio_file: str, kind: type):
+        with self._attached_lock:
+            for item in self._attached:
+                if isinstance(item, kind) and item.source_path == audio_file:
+                    self._attached.remove(item)
+                    return item
+        return None
+
+    def _discard_attached(self, audio_file: str) -> None:
+        with self._attached_lock:
+            items = [item for item in self._attached if item.source_path == audio_file]
+            self._attached = [item for item in self._attached if item not in items]
+        for item in items:
+            item.discard()
+
+    def _has_attached(self, audio_file: str, kind: type) -> bool:
+        with self._attached_lock:
+            return any(isinstance(item, kind) and item.source_path == audio_file for item in self._attached)
+
+    def _call_with_upload_codec(self, call, audio_file: str, channel: str) -> Optional[str]:
+        """
+        按渠道配置把录音换成压缩后的文件再上传；编码不可用时退回原始 WAV。
+        """
+        primary = channel == self.canonical_channel(self.config.get("channel"))
+        if primary and self._has_attached(audio_file, LiveUpload):
+            # 已在录音期间以 WAV 上传完毕
+            return call(audio_file)
+        codec = self._upload_codec(channel)
+        # 录音期间挂接的编码器属于主渠道，对冲备用渠道自行编码
+        encoder = self._take_attached(audio_file, AudioEncoder) if primary else None
+        if encoder is not None and encoder.codec != codec:
+            encoder.discard()
+            encoder = None
+        if codec == "wav":
+            return call(audio_file)
+        if encoder is None:
+            try:
+                encoder = AudioEncoder.encode_file(
+                    audio_file,
+                    codec,
+                    ffmpeg=str(self.config.get("ffmpeg_path") or CONFIG_TEMPLATE["ffmpeg_path"]),
+                    opus_bitrate_kbps=int(self.config.get("opus_bitrate_kbps", CONFIG_TEMPLATE["opus_bitrate_kbps"])),
+                    logger=self.logger,
+                )
+            except (RuntimeError, OSError, wave.Error) as exc:
+                self._log_encoder_unavailable(exc)
+                return call(audio_file)
+        try:
+            upload_path = encoder.result()
+            if upload_path is None:
+                self.logger.warning("上传音频压缩失败（%s），改用 wav。", encoder.error)
+                return call(audio_file)
+            original = Path(audio_file).stat().st_size
+            encoded = Path(upload_path).stat().st_size
+            self.logger.info(
+                "上传编码 %s：%d → %d 字节（节省 %.0f%%），编码 CPU %.0f ms，录音结束后收尾 %.0f ms",
+                codec,
+                original,
+                encoded,
+                100.0 * (1 - encoded / original) if original else 0.0,
+                encoder.cpu_ms,
+                encoder.tail_ms,
+            )
+            return call(upload_path)
+        finally:
+            encoder.discard()
+
+    def _call_stream(self, channel: str, audio_file: str) -> Optional[str]:
+        """
+        流式渠道：取回录音期间的会话结果；转写已有文件时按最快速度回放。连接或识别失败时改用对应的文件识别接口。
+        """
+        if websocket is None:
+            raise RuntimeError("流式识别需要安装 websocket-client：pip install websocket-client")
+        session_class = VolcengineStreamSession if channel == "volcengine_stream" else SonioxStreamSession
+        session = self._take_attached(audio_file, session_class)
+        if session is None:
+            with wave.open(audio_file, "rb") as wf:
+                if wf.getsampwidth() != 2 or wf.getnchannels() != 1:
+                    raise RuntimeError("流式识别仅支持 16-bit 单声道 WAV。")
+                # 作为对冲备用渠道回放时不向界面推送中间结果
+                session = self._new_stream_session(
+                    channel, wf.getframerate(), show_partial=channel == self.canonical_channel(self.config.get("channel"))
+                )
+                session.start(audio_file)
+                while True:
+                    frames = wf.readframes(wf.getframerate())
+                    if not frames:
+                        break
+                    session.feed(frames)
+            session.close()
+        timeout = float(self.config.get("stream_final_timeout_s", CONFIG_TEMPLATE["stream_final_timeout_s"]))
+        token = CancelToken.current()
+        if token is not None:
+            token.add_callback(session.discard)
+        try:
+            text = session.result(timeout)
+        except RuntimeError as exc:
+            CancelToken.check()
+            self.logger.warning("%s，改用文件识别接口：%s", exc, audio_file)
+            if channel == "volcengine_stream":
+                return self._call_volcengine(audio_file)
+            return self._call_soniox(audio_file)
+        finally:
+            if token is not None:
+                token.remove_callback(session.discard)
+        if session.closed_at is not None and session.final_at is not None:
+            self.logger.info("%s完成，停止录音后 %.0f ms 得到最终结果", session.name, (session.final_at - session.closed_at) * 1000.0)
+        return text.strip() or None
+
+    def _call_volcengine(self, audio_file: str) -> Optional[str]:
+        """
+        调用火山引擎极速版ASR接口。
+        """
+        self.logger.info("准备读取音频并发起火山引擎请求：%s", audio_file)
+        upload_mode = str(self.config.get("volc_upload_mode") or CONFIG_TEMPLATE["volc_upload_mode"]).strip().lower()
+
+        request_id = os.environ.get("LEXISHARP_REQUEST_ID") or f"lexisharp-{uuid4()}"
+        self.logger.info("本次请求 RequestId：%s", request_id)
+
+        payload = {
+            "user": {
+                "uid": os.environ.get("LEXISHARP_APP_KEY", self.config.get("app_key"))
+            },
+            "audio": {
+                "data": Base64JsonBody.PLACEHOLDER
+            },
+            "request": {
+                "model_name": self.config.get("model_name", "bigmodel")
+            }
+        }
+
+        headers = {
+            "X-Api-App-Key": os.environ.get("LEXISHARP_APP_KEY", self.config.get("app_key")),
+            "X-Api-Access-Key": os.environ.get("LEXISHARP_ACCESS_KEY", self.config.get("access_key")),
+            "X-Api-Resource-Id": self.config.get("resource_id", "volc.bigasr.auc_turbo"),
+            "X-Api-Request-Id": request_id,
+            "X-Api-Sequence": "-1"
+        }
+
+        # 默认边读文件边做 base64 编码边上传，不在内存中构造完整的 JSON 请求体
+        body = Base64JsonBody(payload, audio_file)
+        if upload_mode == "buffer":
+            data = b"".join(body)
+        elif upload_mode == "chunked":
+            data = iter(body)
+        else:
+            data = body
+        headers["Content-Type"] = "application/json"
+        self.logger.info("火山引擎请求体 %d 字节（发送方式：%s）", len(body), upload_mode)
+
+        try:
+            response = self.transport.request(
+                "POST",
+                self._endpoint("volcengine"),
+                headers=headers,
+                data=data,
+                timeout=self._request_timeout()
+            )
+            response.raise_for_status()
+        except requests.HTTPError as exc:
+            error_body = ""
+            if exc.response is not None:
+                error_body = exc.response.text
+                self.logger.error(
+                    "HTTP 请求异常，状态：%s，响应体：%s",
+                    exc.response.status_code,
+                    error_body[:500]
+                )
+            raise RuntimeError(f"网络请求失败：{exc}，响应内容：{error_body}") from exc
+        except requests.RequestException as exc:
+            self.logger.exception("火山引擎请求发送失败")
+            raise RuntimeError(f"网络请求失败：{exc}") from exc
+
+        status_code = response.headers.get("X-Api-Status-Code")
+        self.logger.info("火山引擎返回状态码：%s，HTTP 状态：%s", status_code, response.status_code)
+        if status_code != "20000000":
+            message = response.headers.get("X-Api-Message", "未知错误")
+            self.logger.error("火山引擎接口返回异常：%s - %s", status_code, message)
+            # 55xxxxxx 为服务端内部错误或繁忙，其余（参数、音频格式、静音等）重试无益
+            error_class = TransientRecognitionError if str(status_code).startswith("55") else RuntimeError
+            raise error_class(f"ASR接口返回异常：{status_code} - {message}")
+
+        data = response.json()
+        text = data.get("result", {}).get("text", "")
+        self.logger.debug("火山引擎原始数据：%s", data)
+        return text.strip() or None
+
+    def _call_soniox(self, audio_file: str) -> Optional[str]:
+        """
+        调用 Soniox 异步识别接口。
+        """
+        api_key = os.environ.get("SONIOX_API_KEY") or self.config.get("soniox_api_key")
+        if not api_key or not str(api_key).strip():
+            raise RuntimeError("未配置 Soniox API Key，请在环境变量 SONIOX_API_KEY 或配置文件 soniox_api_key 中填写。")
+        live = self._take_attached(audio_file, LiveUpload)
+        # 边录边传的文件只能在上传时的接入点上转写
+        base_url = live.url[: -len("/v1/files")] if live is not None else self._endpoint("soniox")
+        model = (
+            os.environ.get("SONIOX_MODEL")
+            or self.config.get("soniox_model")
+            or CONFIG_TEMPLATE["soniox_model"]
+        )
+        poll_interval = max(0.05, float(self.config.get("soniox_poll_interval_s", CONFIG_TEMPLATE["soniox_poll_interval_s"])))
+        poll_min = min(
+            poll_interval,
+            max(0.05, float(self.config.get("soniox_poll_min_interval_s", CONFIG_TEMPLATE["soniox_poll_min_interval_s"]))),
+        )
+        poll_timeout = max(poll_interval, float(self.config.get("soniox_poll_timeout_s", CONFIG_TEMPLATE["soniox_poll_timeout_s"])))
+        timeout = self._request_timeout()
+
+        request_id = os.environ.get("LEXISHARP_REQUEST_ID") or f"lexisharp-{uuid4()}"
+        self.logger.info("Soniox 请求 RequestId：%s", request_id)
+
+        auth_headers = self._soniox_headers()
+
+        file_id = None
+        transcription_id = None
+        upload_url = f"{base_url}/v1/files"
+        transcription_url = f"{base_url}/v1/transcriptions"
+
+        try:
+            if live is not None:
+                file_id = self._finish_live_upload(live)
+            if not file_id:
+                self.logger.info("开始上传音频至 Soniox：%s", audio_file)
+                with open(audio_file, "rb") as audio_fp:
+                    response = self.transport.request("POST", upload_url, headers=auth_headers, files={"file": audio_fp}, timeout=timeout)
+                response.raise_for_status()
+                file_id = response.json().get("id")
+            if not file_id:
+                raise RuntimeError("Soniox 文件上传响应缺少文件 ID。")
+            self.logger.info("Soniox 文件 ID：%s", file_id)
+
+            request_body = {
+                "model": model,
+                "file_id": file_id,
+                "client_reference_id": request_id
+            }
+            hints = self.config.get("soniox_language_hints")
+            if isinstance(hints, list):
+                normalized = [str(item).strip() for item in hints if str(item).strip()]
+                if normalized:
+                    request_body["language_hints"] = normalized
+            if bool(self.config.get("soniox_enable_speaker_diarization")):
+                request_body["enable_speaker_diarization"] = True
+            if bool(self.config.get("soniox_enable_language_identification")):
+                request_body["enable_language_identification"] = True
+            context_text = (self.config.get("soniox_context") or "").strip()
+            if context_text:
+                request_body["context"] = context_text
+
+            self.logger.info("创建 Soniox 转写任务...")
+            response = self.transport.request("POST", transcription_url, headers=auth_headers, json=request_body, timeout=timeout)
+            response.raise_for_status()
+            transcription_id = response.json().get("id")
+            if not transcription_id:
+                raise RuntimeError("Soniox 转写创建响应缺少任务 ID。")
+            self.logger.info("Soniox 转写 ID：%s", transcription_id)
+
+            status_url = f"{transcription_url}/{transcription_id}"
+            transcript_url = f"{status_url}/transcript"
+
+            submitted = time.monotonic()
+            deadline = submitted + poll_timeout
+            last_status = ""
+            polls = 0
+            # 首次轮询前按音频时长 × 历史处理耗时比等待；随后从最小间隔起逐次退避
+            wait = self._soniox_first_wait(audio_file, poll_min)
+            if wait > 0:
+                CancelToken.sleep(wait)
+            wait = poll_min
+            while True:
+                if time.monotonic() > deadline:
+                    raise TransientRecognitionError("Soniox 识别超时，请检查音频或增大 soniox_poll_timeout_s。")
+                response = self.transport.request("GET", status_url, headers=auth_headers, timeout=timeout)
+                response.raise_for_status()
+                polls += 1
+                status_payload = response.json()
+                status = (status_payload.get("status") or "").lower()
+                if status != last_status:
+                    self.logger.info("Soniox 任务状态：%s", status or "未知")
+                    last_status = status
+                if status == "completed":
+                    break
+                if status == "error":
+                    message = status_payload.get("error_message") or status_payload.get("message") or "未知错误"
+                    raise RuntimeError(f"Soniox 识别失败：{message}")
+                CancelToken.sleep(min(wait, max(0.0, deadline - time.monotonic())))
+                wait = min(poll_interval, wait * 1.6)
+
+            self._record_soniox_timing(audio_file, time.monotonic() - submitted)
+            self.logger.info("Soniox 转写完成（轮询 %d 次，任务耗时 %.2f s），获取文本...", polls, time.monotonic() - submitted)
+            response = self.transport.request("GET", transcript_url, headers=auth_headers, timeout=timeout)
+            response.raise_for_status()
+            transcript_payload = response.json()
+            text = (transcript_payload.get("text") or "").strip()
+            if not text:
+                tokens = transcript_payload.get("tokens") or []
+                text = self._render_soniox_tokens(tokens).strip() if tokens else ""
+            if not text:
+                raise RuntimeError("Soniox API 未返回可用文本内容。")
+            return text
+        except requests.HTTPError as exc:
+            error_body = ""
+            if exc.response is not None:
+                error_body = exc.response.text
+            self.logger.error("Soniox HTTP 请求异常：%s，响应：%s", exc, error_body[:500])
+            raise RuntimeError(f"Soniox HTTP 请求失败：{exc}，响应内容：{error_body}") from exc
+        except requests.RequestException as exc:
+            self.logger.exception("Soniox 请求发送失败")
+            raise RuntimeError(f"Soniox 网络请求失败：{exc}") from exc
+        finally:
+            # 删除请求交给后台队列，识别文本无需等待清理完成
+            cleanup_timeout = min(timeout, 30)
+            cleanup_calls = []
+            if transcription_id:
+                cleanup_calls.append(
+                    ("DELETE", f"{transcription_url}/{transcription_id}", {"headers": auth_headers, "timeout": cleanup_timeout})
+                )
+            if file_id:
+                cleanup_calls.append(
+                    ("DELETE", f"{base_url}/v1/files/{file_id}", {"headers": auth_headers, "timeout": cleanup_timeout})
+                )
+            self.cleanup.submit(cleanup_calls)
+
+    def _soniox_headers(self) -> dict:
+        api_key = os.environ.get("SONIOX_API_KEY") or self.config.get("soniox_api_key")
+        return {
+            "Authorization": f"Bearer {api_key}",
+            "User-Agent": "LexiSharp-Soniox/1.0"
+        }
+
+    def _finish_live_upload(self, live: LiveUpload) -> Optional[str]:
+        """
+        等待录音期间开始的上传收尾并返回文件 ID；失败时返回 None，由调用方改为整体上传。
+        """
+        payload = live.result()
+        file_id = (payload or {}).get("id")
+        if not file_id:
+            self.logger.warning("边录边传失败，改为录音结束后上传：%s", live.error or "响应缺少文件 ID")
+            return None
+        self.logger.info(
+            "边录边传完成：共 %d 字节，录音结束后上传收尾 %.0f ms",
+            live.bytes_sent,
+            max(0.0, (live.finished_at or 0.0) - (live.closed_at or 0.0)) * 1000.0,
+        )
+        return file_id
+
+    def _call_audio_seconds(self, audio_file: str) -> Optional[float]:
+        """
+        当前调用对应录音的时长：上传的可能是压缩后的 flac/ogg，无法按 WAV 读取，
+        因此优先使用 _transcribe_timed 记录的原始录音时长。
+        """
+        return getattr(self._call_state, "audio_s", None) or _wav_duration(audio_file)
+
+    def _soniox_first_wait(self, audio_file: str, poll_min: float) -> float:
+        """
+        估算首次查询状态前的等待时间：尚无历史数据时立即以最小间隔开始轮询。
+        """
+        duration = self._call_audio_seconds(audio_file)
+        if not duration or self._soniox_ratio is None:
+            return poll_min
+        # 取估算值的八成，宁可早到一次也不要错过完成时刻
+        return max(poll_min, duration * self._soniox_ratio * 0.8)
+
+    def _record_soniox_timing(self, audio_file: str, elapsed: float) -> None:
+        duration = self._call_audio_seconds(audio_file)
+        if not duration:
+            return
+        ratio = elapsed / duration
+        self._soniox_ratio = ratio if self._soniox_ratio is None else 0.7 * self._soniox_ratio + 0.3 * ratio
+
+    def _render_soniox_tokens(self, tokens: List[dict]) -> str:
+        """
+        将 Soniox token 序列拼装成可读文本。
+        """
+        parts: List[str] = []
+        current_speaker: Optional[str] = None
+        current_language: Optional[str] = None
+        for token in tokens:
+            text = str(token.get("text") or "")
+            if not text:
+                continue
+            speaker = token.get("speaker")
+            language = token.get("language")
+            if speaker is not None and speaker != current_speaker:
+                if parts:
+                    parts.append("\n\n")
+                current_speaker = speaker
+                current_language = None
+                parts.append(f"说话人 {speaker}: ")
+            if language and language != current_language:
+                current_language = language
+                parts.append(f"[{language}] ")
+            parts.append(text)
+        return "".join(parts)
+
+    def _call_qwen(self, audio_file: str) -> Optional[str]:
+        """
+        调用通义千问录音识别接口（DashScope 多模态会话模型）。
+        默认直接请求 REST 接口并以 base64 内联音频；qwen_use_sdk=true 时改用 dashscope SDK。
+        """
+        api_key = os.environ.get("DASHSCOPE_API_KEY") or self.config.get("qwen_api_key")
+        if "在此填写" in str(api_key) or not str(api_key).strip():
+            raise RuntimeError("未配置通义千问 API Key，请在环境变量 DASHSCOPE_API_KEY 或配置项 qwen_api_key 中填写。")
+
+        model = (self.config.get("qwen_model") or CONFIG_TEMPLATE["qwen_model"]).strip() or CONFIG_TEMPLATE["qwen_model"]
+        context_text = str(self.config.get("qwen_context") or "").strip()
+        language = str(self.config.get("qwen_language") or "").strip()
+        enable_lid = bool(self.config.get("qwen_enable_lid", CONFIG_TEMPLATE["qwen_enable_lid"]))
+        enable_itn = bool(self.config.get("qwen_enable_itn", CONFIG_TEMPLATE["qwen_enable_itn"]))
+
+        use_sdk = bool(self.config.get("qwen_use_sdk", CONFIG_TEMPLATE["qwen_use_sdk"]))
+        if use_sdk:
+            try:
+                audio_uri = Path(audio_file).resolve().as_uri()
+            except ValueError:
+                audio_uri = f"file://{Path(audio_file).resolve()}"
+        else:
+            # 内联音频，省去 SDK 先上传临时存储再推理的一次往返
+            audio_format = Path(audio_file).suffix.lstrip(".").lower() or "wav"
+            with open(audio_file, "rb") as f:
+                audio_uri = f"data:audio/{audio_format};base64,{base64.b64encode(f.read()).decode('ascii')}"
+
+        messages: List[dict[str, object]] = []
+        if context_text:
+            messages.append({
+                "role": "system",
+                "content": [{"text": context_text}]
+            })
+        messages.append({
+            "role": "user",
+            "content": [{"audio": audio_uri}]
+        })
+
+        asr_options: dict[str, object] = {
+            "enable_lid": enable_lid,
+            "enable_itn": enable_itn
+        }
+        if language:
+            asr_options["language"] = language
+
+        timeout = self._request_timeout()
+        if use_sdk:
+            # SDK 先上传音频到临时存储再识别，保留原有的最低等待
+            timeout = max(15.0, timeout)
+
+        self.logger.info(
+            "准备调用通义千问（%s），模型：%s，语种提示：%s，启用语种检测：%s，启用逆文本规范化：%s",
+            "SDK" if use_sdk else "REST",
+            model,
+            language or "自动检测",
+            "是" if enable_lid else "否",
+            "是" if enable_itn else "否"
+        )
+
+        if use_sdk:
+            response = self._call_qwen_sdk(str(api_key).strip(), model, messages, asr_options, timeout)
+        else:
+            response = self._call_qwen_rest(str(api_key).strip(), model, messages, asr_options, timeout)
+
+        output = response.get("output") or {}
+        text_fragments: List[str] = []
+        annotations_languages: List[str] = []
+
+        if isinstance(output, dict):
+            choices = output.get("choices") or []
+            if choices:
+                first_choice = choices[0] or {}
+                message_payload = first_choice.get("message") if isinstance(first_choice, dict) else None
+                if message_payload is None:
+                    message_payload = getattr(first_choice, "message", None)
+                if message_payload:
+                    if isinstance(message_payload, dict):
+                        annotations = message_payload.get("annotations") or []
+                        content = message_payload.get("content") or []
+                    else:
+                        annotations = getattr(message_payload, "annotations", []) or []
+                        content = getattr(message_payload, "content", []) or []
+                    for annotation in annotations:
+                        if isinstance(annotation, dict):
+                            lang = str(annotation.get("language") or "").strip()
+                            if lang:
+                                annotations_languages.append(lang)
+                    for item in content:
+                        if isinstance(item, dict):
+                            snippet = str(item.get("text") or "").strip()
+                            if snippet:
+                                text_fragments.append(snippet)
+            if not text_fragments:
+                direct_text = output.get("text")
+                if isinstance(direct_text, str) and direct_text.strip():
+                    text_fragments.append(direct_text.strip())
+        else:
+            self.logger.debug("通义千问返回的 output 非字典类型：%s", type(output))
+
+        text = "".join(text_fragments).strip()
+        if not text:
+            self.logger.debug("通义千问原始响应：%s", response)
+            raise RuntimeError("通义千问 API 未返回可用文本，请检查音频文件或日志。")
+
+        if annotations_languages:
+            ordered_unique = list(dict.fromkeys(annotations_languages))
+            self.logger.info("通义千问识别到的语种：%s", "、".join(ordered_unique))
+
+        usage = response.get("usage") or {}
+        if isinstance(usage, dict):
+            duration = usage.get("seconds")
+            if duration is not None:
+                self.logger.info("通义千问计费时长：%s 秒", duration)
+
+        return text
+
+    def _call_qwen_rest(
+        self,
+        api_key: str,
+        model: str,
+        messages: List[dict[str, object]],
+        asr_options: dict[str, object],
+        timeout: int
+    ) -> dict:
+        """
+        通过连接池直接请求 DashScope 多模态生成接口，返回响应 JSON。
+        """
+        base_url = self._endpoint("qwen")
+        body = {
+            "model": model,
+            "input": {"messages": messages},
+            "parameters": {"result_format": "message", "asr_options": asr_options}
+        }
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "User-Agent": "LexiSharp-Qwen/1.0"
+        }
+        try:
+            response = self.transport.request(
+                "POST",
+                f"{base_url}{QWEN_GENERATION_PATH}",
+                headers=headers,
+                json=body,
+                timeout=timeout
+            )
+        except requests.RequestException as exc:
+            self.logger.exception("通义千问请求发送失败")
+            raise RuntimeError(f"通义千问网络请求失败：{exc}") from exc
+
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+        if response.status_code != HTTPStatus.OK:
+            error_code = payload.get("code") or response.status_code
+            error_message = payload.get("message") or response.text[:200] or "未知错误"
+            self.logger.error("通义千问接口返回异常，HTTP 状态：%s，RequestId：%s", response.status_code, payload.get("request_id"))
+            transient = response.status_code == 429 or response.status_code >= 500
+            error_class = TransientRecognitionError if transient else RuntimeError
+            raise error_class(f"通义千问接口返回异常：{error_code} - {error_message}")
+        self.logger.info("通义千问 RequestId：%s", payload.get("request_id"))
+        return payload
+
+    def _call_qwen_sdk(
+        self,
+        api_key: str,
+        model: str,
+        messages: List[dict[str, object]],
+        asr_options: dict[str, object],
+        timeout: int
+    ) -> dict:
+        """
+        通过 dashscope SDK 调用（SDK 会先把本地文件上传到临时存储）。
+        """
+        try:
+            # 延迟导入：dashscope 导入耗时明显，仅在启用 SDK 模式时加载
+            import dashscope  # type: ignore[import]
+        except ImportError as exc:
+            raise RuntimeError("未安装 dashscope 库，请执行 `pip install dashscope` 后重试，或关闭 qwen_use_sdk。") from exc
+
+        try:
+            response = dashscope.MultiModalConversation.call(
+                api_key=api_key,
+                model=model,
+                messages=messages,
+                result_format="message",
+                asr_options=asr_options,
+                request_timeout=timeout
+            )
+        except Exception as exc:  # pylint: disable=broad-except
+            self.logger.exception("通义千问接口调用失败")
+            raise RuntimeError(f"通义千问调用失败：{exc}") from exc
+
+        status_code = int(response.get("status_code", HTTPStatus.OK))
+        if status_code != HTTPStatus.OK:
+            error_code = response.get("code") or status_code
+            error_message = response.get("message") or "未知错误"
+            error_class = TransientRecognitionError if status_code == 429 or status_code >= 500 else RuntimeError
+            raise error_class(f"通义千问接口返回异常：{error_code} - {error_message}")
+        return response
+
+    # ====== 本地离线引擎（sherpa-onnx） ======
+    def _call_local_sherpa(self, audio_file: str) -> Optional[str]:
+        """
+        使用 sherpa-onnx 在本地进行离线识别；启用进程隔离时交由解码子进程处理。
+        """
+        if bool(self.config.get("local_sherpa_process_isolation", False)):
+            return self._get_local_worker().transcribe_file(audio_file)
+        return self.local_engine.transcribe_file(audio_file)
+
+    def _call_local_server(self, audio_file: str) -> Optional[str]:
+        """
+        通过 Unix 套接字调用共享的本地识别服务（`lexisharp.py server`）。
+        """
+        socket_path = os.path.expanduser(
+            str(self.config.get("local_server_socket") or CONFIG_TEMPLATE["local_server_socket"]).strip()
+        )
+        pcm_bytes, sr = read_wav_pcm16(audio_file)
+        header = {
+            "op": "transcribe",
+            "model": str(self.config.get("local_server_model") or "").strip(),
+            "sr": sr,
+            "format": "s16le",
+        }
+        timeout = max(10.0, self._request_timeout())
+        trusted_uids = {0, os.getuid()}
+        owner_uid = str(self.config.get("local_server_owner_uid") or "").strip()
+        if owner_uid:
+            try:
+                trusted_uids.add(int(owner_uid))
+            except ValueError as exc:
+                raise RuntimeError(f"local_server_owner_uid 需为数字用户 ID：{owner_uid}") from exc
+        started = time.perf_counter()
+        try:
+            reply, _ = unix_request(socket_path, header, pcm_bytes, timeout=timeout, trusted_uids=trusted_uids)
+        except FileNotFoundError as exc:
+            raise RuntimeError(f"本地识别服务未运行（{socket_path}），请先执行 `lexisharp.py server`。") from exc
+        except (OSError, ConnectionError) as exc:
+            raise RuntimeError(f"连接本地识别服务失败：{exc}") from exc
+        if not reply.get("ok"):
+            raise RuntimeError(f"本地识别服务返回异常：{reply.get('error') or '未知错误'}")
+        self.logger.info(
+            "本地识别服务完成：模型=%s，批大小=%s，排队 %.1f ms，解码 %.1f ms，往返 %.1f ms",
+            reply.get("model"),
+            reply.get("batch_size"),
+            float(reply.get("queue_ms") or 0.0),
+            float(reply.get("decode_ms") or 0.0),
+            (time.perf_counter() - started) * 1000.0,
+        )
+        return (reply.get("text") or "").strip() or None
+
+    def _get_local_worker(self) -> LocalDecodeWorker:
+        """
+        获取（必要时创建）本地解码子进程。
+        """
+        if self.local_worker is None:
+            self.local_worker = LocalDecodeWorker(self.config, logger=self.logger)
+        return self.local_worker
+
+    def prewarm(self) -> None:
+        """
+        当前渠道为本地模型时在后台预先加载模型（进程隔离时启动解码子进程）；
+        启用按时长路由时同时预加载短句渠道的本地模型。
+        """
+        self._prewarm_route_target()
+        channel = (self.config.get("channel") or "").strip().lower()
+        if channel not in {"local_sherpa", "local", "sherpa"}:
+            return
+        if not LocalSherpaEngine.is_available():
+            return
+        self._preload_local_model()
+
+    def warm_up(self) -> None:
+        """
+        录音开始时在后台预热当前渠道：本地渠道提前加载模型；云端渠道提前建立连接，
+        录音超过 http_idle_timeout_s 时定期续期，直到开始识别（最长 WARMUP_MAX_S 秒）。
+        """
+        channel = (self.config.get("channel") or "volcengine").strip().lower()
+        if channel in {"local_sherpa", "local", "sherpa"}:
+            self.prewarm()
+            return
+        if not bool(self.config.get("http_warmup", CONFIG_TEMPLATE["http_warmup"])):
+            return
+        if channel in {"volcengine", "volcano", "volc", "bytedance"}:
+            url = self._endpoint("volcengine")
+        elif channel == "soniox":
+            url = self._endpoint("soniox") + "/v1/files"
+        elif channel in {"qwen", "tongyi", "tongyiqianwen", "dashscope"}:
+            if bool(self.config.get("qwen_use_sdk", CONFIG_TEMPLATE["qwen_use_sdk"])):
+                # SDK 模式自行管理连接，无法预热
+                return
+            url = self._endpoint("qwen") + QWEN_GENERATION_PATH
+        else:
+            return
+        self._warm_stop.set()
+        stop = self._warm_stop = threading.Event()
+        threading.Thread(target=self._keep_warm, args=(url, stop), name="HttpWarmup", daemon=True).start()
+
+    def _keep_warm(self, url: str, stop: threading.Event) -> None:
+        idle = max(1.0, float(self.config.get("http_idle_timeout_s", CONFIG_TEMPLATE["http_idle_timeout_s"])))
+        deadline = time.monotonic() + self.WARMUP_MAX_S
+        self.transport.warm(url)
+        # 在空闲超时前续期，长录音结束时预热的连接仍然可用
+        while not stop.wait(idle * 0.8) and time.monotonic() < deadline:
+            self.transport.warm(url)
+
+    def close(self) -> None:
+        self._warm_stop.set()
+        if self.local_worker:
+            self.local_worker.close()
+            self.local_worker = None
+        with self._attached_lock:
+            attached, self._attached = self._attached, []
+        for item in attached:
+            item.discard()
+        if self._hedge_pool is not None:
+            hedge = str(self.config.get("hedge_channel") or "").strip()
+            if hedge:
+                self._log_hedge_stats(self.canonical_channel(self.config.get("channel")), self.canonical_channel(hedge))
+            self._hedge_pool.shutdown(wait=False, cancel_futures=True)
+            self._hedge_pool = None
+        self.endpoints.close()
+        self._log_failover_stats()
+        self._log_cache_stats()
+        for channel, count in self._route_counts.items():
+            self.logger.info("路由统计：%s %d 次", self.display_name(channel), count)
+        self.cleanup.close()
+        if self.transport is not self.http:
+            self.transport.close()
+        self.http.close()
+
+
+class TextOutput:
+    """
+    识别结果输出：复制到剪贴板，并按配置通过 DBus / uinput / xdotool 自动写入目标窗口。
+    """
+
+    # uinput 直接键入前等待物理修饰键松开的上限（秒）
+    MODIFIER_RELEASE_WAIT_S = 1.0
+
+    def __init__(self, config: dict, logger: logging.Logger):
+        self.config = config
+        self.logger = logger
+        self.clipboard = ClipboardHelper(logger=self.logger)
+        self.input_injector = InputInjector(logger=self.logger)
+        dbus_timeout = int(self.config.get("dbus_timeout_ms", CONFIG_TEMPLATE["dbus_timeout_ms"]))
+        self.dbus_input = FcitxDbusInput(logger=self.logger, timeout_ms=dbus_timeout)
+        self._ibus_notice_logged = False
+        # 已提示过的不直接键入原因（每种只提示一次）
+        self._direct_typing_notices: set = set()
+        # X11 进程内键入引擎（首次键入时才连接 X 服务器）
+        self.xtest = XTestTyper(self.logger) if XTestTyper.is_available() else None
+
+    def deliver(self, text: str, target_window: Optional[str]) -> str:
+        """
+        输出识别结果并返回状态提示。
+        """
+        copy_success_message = "识别完成，内容已复制到剪贴板。"
+        auto_paste_clipboard_message = "识别完成，内容已复制到剪贴板，并自动粘贴到目标窗口。"
+        auto_paste_restored_message = "识别完成，已自动粘贴到目标窗口；剪贴板将恢复为原内容，识别结果不会保留在剪贴板中。"
+        auto_paste_dbus_message = "识别完成，已通过输入法自动提交到目标窗口，剪贴板保持原样。"
+        auto_paste_typed_message = "识别完成，已通过虚拟键盘直接键入到目标窗口，剪贴板保持原样。"
+        copy_message = copy_success_message
+
+        auto_paste_enabled = bool(self.config.get("auto_paste", False))
+        autopaste_result: Optional[AutoPasteResult] = None
+        pasted = False
+        clipboard_synced = False
+        copy_needed = True
+
+        if auto_paste_enabled:
+            autopaste_result = self.auto_paste(text, target_window)
+            pasted = autopaste_result.success
+            clipboard_synced = autopaste_result.clipboard_synced
+            if pasted and autopaste_result.method in ("dbus", "uinput_type"):
+                copy_needed = False
+            else:
+                copy_needed = not clipboard_synced
+
+        copied = True
+        if copy_needed:
+            copied = self.clipboard.copy(text)
+            if not copied:
+                copy_message = (
+                    "识别成功，但无法复制到剪贴板，请安装 wl-clipboard（Wayland）或 xclip/xsel（X11）。"
+                )
+
+        final_status = (
+            "识别完成，内容已复制到剪贴板，请手动粘贴。"
+            if copied
+            else copy_message
+        )
+        if auto_paste_enabled:
+            if pasted:
+                if autopaste_result and autopaste_result.method == "dbus":
+                    final_status = auto_paste_dbus_message
+                elif autopaste_result and autopaste_result.method == "uinput_type":
+                    final_status = auto_paste_typed_message
+                elif autopaste_result and autopaste_result.clipboard_restoring:
+                    final_status = auto_paste_restored_message
+                else:
+                    final_status = auto_paste_clipboard_message
+                if autopaste_result and autopaste_result.status_message:
+                    final_status += f"（{autopaste_result.status_message}）"
+            elif autopaste_result and autopaste_result.status_message:
+                final_status = autopaste_result.status_message
+
+        if not copied:
+            final_status = copy_message
+        return final_status
+
+    def prewarm(self) -> None:
+        """
+        输入方式为 dbus 时在后台提前建立 DBus 连接与输入上下文。
+        """
+        if str(self.config.get("input_method", "clipboard")).strip().lower() == "dbus" and self.dbus_input:
+            self.dbus_input.warmup()
+
+    def auto_paste(self, text: str, target_window: Optional[str]) -> AutoPasteResult:
+        """自动输入识别结果，优先尝试 DBus，再回退至原有方案。"""
+        text = text or self.clipboard.paste()
+        if not text:
+            message = "自动粘贴失败：暂未获取到可写入的文本。"
+            self.logger.warning(message)
+            return AutoPasteResult(False, False, "none", message)
+
+        preferred_method = str(self.config.get("input_method", "clipboard")).strip().lower()
+        allow_clipboard_fallback = bool(self.config.get("dbus_fallback_to_clipboard", True))
+        paste_wait_ms = max(0, int(self.config.get("paste_delay_ms", 200)))
+        clipboard_synced = False
+        status_message: Optional[str] = None
+
+        restore_text: Optional[str] = None
+        if preferred_method == "dbus":
+            restore_enabled = bool(
+                self.config.get("dbus_fallback_restore_clipboard", CONFIG_TEMPLATE["dbus_fallback_restore_clipboard"])
+            )
+            dbus_ready = bool(self.dbus_input and self.dbus_input.is_supported())
+            framework = self.dbus_input.framework() if self.dbus_input else None
+            if framework == "ibus":
+                # IBus 没有供外部程序提交文本的 DBus 方法，不再逐个探测 Fcitx 接口
+                if not self._ibus_notice_logged:
+                    self._ibus_notice_logged = True
+                    self.logger.info(
+                        "当前输入法框架为 IBus，不支持经 DBus 提交文本，改用剪贴板粘贴%s。",
+                        "（粘贴后恢复原剪贴板内容）" if restore_enabled else "",
+                    )
+            elif dbus_ready:
+                if self.dbus_input.send(text):
+                    return AutoPasteResult(True, False, "dbus")
+                self.logger.warning("DBus 输入失败，将尝试传统方式。")
+            else:
+                self.logger.warning("DBus 输入配置启用，但依赖缺失或初始化失败。")
+            if self._type_directly(text, framework):
+                return AutoPasteResult(True, False, "uinput_type")
+            if not allow_clipboard_fallback:
+                message = "DBus 输入失败，已保留剪贴板内容，请手动粘贴。"
+                return AutoPasteResult(False, False, "dbus", message)
+            if restore_enabled:
+                restore_text = self.clipboard.snapshot_text()
+            clipboard_synced = self.clipboard.copy(text)
+            if not clipboard_synced:
+                status_message = (
+                    "回退时复制到剪贴板失败，后续快捷键粘贴可能不可用。"
+                )
+        else:
+            if self._type_directly(text):
+                return AutoPasteResult(True, False, "uinput_type")
+            clipboard_synced = self.clipboard.copy(text)
+            if not clipboard_synced:
+                status_message = (
+                    "识别成功，但无法复制到剪贴板，请安装 wl-clipboard（Wayland）或 xclip/xsel（X11）。"
+                )
+
+        self.logger.info(
+            "自动粘贴文本长度=%d，clipboard_synced=%s", len(text), clipboard_synced
+        )
+
+        if self.input_injector and clipboard_synced and self.input_injector.can_use_uinput():
+            self.logger.info("尝试通过 uinput 注入 Ctrl+V，等待 %d ms。", paste_wait_ms)
+            if self.input_injector.inject_ctrl_v(wait_ms=paste_wait_ms):
+                self.logger.info("uinput 自动粘贴流程完成。")
+                return self._pasted("uinput", True, restore_text, text, status_message)
+            self.logger.warning("uinput 自动粘贴失败，将回退至 xdotool。")
+
+        engine = str(self.config.get("x11_typing_engine") or CONFIG_TEMPLATE["x11_typing_engine"]).strip().lower()
+        if engine == "xtest" and self.xtest is not None and not self.input_injector.is_wayland:
+            self.xtest.max_delay_s = max(0, int(self.config.get("type_delay_ms", 5))) / 1000.0
+            self.logger.info("准备经 XTest 向窗口 %s 键入，字符数=%d", target_window or "（当前焦点）", len(text))
+            if self.xtest.type_text(text, target_window):
+                return self._pasted("xtest", clipboard_synced, restore_text, text, status_message)
+            self.logger.warning("XTest 键入失败，将回退至 xdotool。")
+
+        if not target_window:
+            message = "缺少目标窗口，已复制文本，请手动粘贴。"
+            self.logger.warning(message)
+            return AutoPasteResult(False, clipboard_synced, "none", message)
+
+        delay_ms = max(1, int(self.config.get("type_delay_ms", 5)))
+        self.logger.info(
+            "准备向窗口 %s (%s) 模拟键入，字符数=%d",
+            target_window,
+            window_name(target_window),
+            len(text)
+        )
+        try:
+            result = subprocess.run(
+                [
+                    "xdotool",
+                    "type",
+                    "--window",
+                    target_window,
+                    "--clearmodifiers",
+                    "--delay",
+                    str(delay_ms),
+                    text
+                ],
+                check=False,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+        except FileNotFoundError:
+            message = "未找到 xdotool，无法模拟键入，请手动粘贴。"
+            self.logger.exception(message)
+            return AutoPasteResult(False, clipboard_synced, "none", message)
+        except Exception as exc:  # pragma: no cover
+            message = f"自动粘贴流程出现未知异常：{exc}"
+            self.logger.exception(message)
+            return AutoPasteResult(False, clipboard_synced, "none", message)
+
+        if result.returncode == 0:
+            self.logger.info("已向窗口 %s 模拟键入文本", target_window)
+            return self._pasted("xdotool", clipboard_synced, restore_text, text, status_message)
+
+        message = "自动粘贴失败：xdotool type 返回非零状态。"
+        self.logger.error(message)
+        return AutoPasteResult(False, clipboard_synced, "xdotool", message)
+
+    def _type_directly(self, text: str, framework: Optional[str] = None) -> bool:
+        """
+        Wayland 下文本可完全由 US 布局键入时，经 uinput 直接键入，省去 wl-copy、paste_delay_ms 等待与 Ctrl+V。
+        """
+        mode = str(self.config.get("uinput_direct_typing", CONFIG_TEMPLATE["uinput_direct_typing"])).strip().lower()
+        if mode in ("off", "false", "never") or not self.input_injector or not self.input_injector.can_type(text):
+            return False
+        if mode != "always":
+            framework = framework or (self.dbus_input.framework() if self.dbus_input else None)
+            if framework:
+                # 输入法处于中文模式时会把字母按键当作拼音截获
+                self._direct_typing_notice(
+                    "framework",
+                    "检测到输入法框架 %s，uinput_direct_typing=auto 时不直接键入；确认输入法保持英文状态后可设为 always。",
+                    framework,
+                )
+                return False
+            layout = self.input_injector.keyboard_layout()
+            if layout != "us":
+                # 虚拟键盘发送的是 US 布局的键码，其他布局（或无法确认时）会键入错误的字符
+                self._direct_typing_notice(
+                    "layout",
+                    "键盘布局为 %s，uinput_direct_typing=auto 时仅在确认 US 布局时直接键入；确认使用 US 布局后可设为 always。",
+                    layout or "未知",
+                )
+                return False
+        held = self.input_injector.held_modifiers(self.MODIFIER_RELEASE_WAIT_S)
+        if held is None and mode != "always":
+            self._direct_typing_notice(
+                "modifiers",
+                "无法读取物理键盘状态（/dev/input 无读权限），无法确认修饰键已松开，uinput_direct_typing=auto 时不直接键入。",
+            )
+            return False
+        if held:
+            # 仍按着的 Ctrl/Alt（如停止录音的快捷键）会把键入的字母变成快捷键
+            self.logger.warning("修饰键 %s 仍被按住，不直接键入。", "、".join(held))
+            return False
+        delay_ms = max(0, int(self.config.get("type_delay_ms", 5)))
+        return self.input_injector.type_text(text, delay_ms)
+
+    def _direct_typing_notice(self, reason: str, message: str, *args) -> None:
+        if reason not in self._direct_typing_notices:
+            self._direct_typing_notices.add(reason)
+            self.logger.info(message, *args)
+
+    def _pasted(
+        self, method: str, clipboard_synced: bool, previous: Optional[str], text: str, status_message: Optional[str]
+    ) -> AutoPasteResult:
+        """
+        经剪贴板粘贴成功：有粘贴前的剪贴板文本时安排恢复，并在结果中注明识别结果不会留在剪贴板。
+        """
+        if previous is None or previous == text:
+            return AutoPasteResult(True, clipboard_synced, method, status_message)
+        delay_ms = int(self.config.get("clipboard_restore_delay_ms", CONFIG_TEMPLATE["clipboard_restore_delay_ms"]))
+        self.clipboard.restore_later(previous, text, delay_ms)
+        return AutoPasteResult(True, clipboard_synced, method, status_message, clipboard_restoring=True)
+
+    def close(self) -> None:
+        if self.dbus_input:
+            self.dbus_input.close()
+        if self.xtest:
+            self.xtest.close()
+        if self.input_injector:
+            self.input_injector.close()
+
+
+class RecordingSpool:
+    """
+    失败录音暂存区：识别失败的录音移入暂存目录（附带 JSON 元数据），后台线程按退避间隔重新识别，
+    成功后把结果写入 spool_results.jsonl（可选复制到剪贴板）。识别成功的录音不经过暂存区。
+    """
+
+    def __init__(
+        self,
+        config: dict,
+        asr: "ASREngine",
+        logger: logging.Logger,
+        clipboard: Optional[ClipboardHelper] = None,
+        on_result=None,
+    ):
+        self.config = config
+        self.asr = asr
+        self.logger = logger.getChild("spool")
+        self.clipboard = clipboard
+        # 补识别成功回调：参数为 (文本, 元数据)
+        self.on_result = on_result
+        self.enabled = bool(config.get("spool_enabled", CONFIG_TEMPLATE["spool_enabled"]))
+        self.directory = Path(os.path.expanduser(str(config.get("spool_dir") or SPOOL_DIR)))
+        self.max_bytes = int(float(config.get("spool_max_mb", CONFIG_TEMPLATE["spool_max_mb"])) * 1024 * 1024)
+        self.max_age_s = float(config.get("spool_max_age_h", CONFIG_TEMPLATE["spool_max_age_h"])) * 3600.0
+        self.retry_base_s = max(1.0, float(config.get("spool_retry_base_s", CONFIG_TEMPLATE["spool_retry_base_s"])))
+        self.retry_max_s = max(self.retry_base_s, float(config.get("spool_retry_max_s", CONFIG_TEMPLATE["spool_retry_max_s"])))
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._online = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---- 暂存 ----
+    def keep(self, audio_file: str, exc: BaseException) -> Optional[str]:
+        """
+        把识别失败的录音移入暂存目录，返回暂存路径；未启用、失败不是暂时性的（鉴权失败、配置缺失、
+        未返回可用文本等，稍后重试也不会成功）或移动失败时返回 None（录音照常删除）。
+        """
+        if not self.enabled:
+            return None
+        if not _is_transient_error(exc):
+            self.logger.info("识别失败不是暂时性错误，录音不暂存：%s", exc)
+            return None
+        error = str(exc)
+        created = time.time()
+        name = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(created))}-{uuid4().hex[:8]}"
+        target = self.directory / f"{name}.wav"
+        meta = {
+            "created_at": created,
+            "attempts": 0,
+            "next_attempt_at": created + self.retry_base_s,
+            "last_error": error,
+            "duration_s": _wav_duration(audio_file),
+        }
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            os.chmod(self.directory, 0o700)
+            shutil.move(audio_file, target)
+            self._write_meta(target, meta)
+        except OSError as exc:
+            self.logger.error("暂存录音失败：%s", exc)
+            return None
+        self.logger.info("识别失败，录音已暂存：%s（%s）", target.name, error)
+        self._enforce_quota()
+        self.start()
+        self._wake.set()
+        return str(target)
+
+    def pending(self) -> int:
+        return len(self._items())
+
+    def notify_online(self) -> None:
+        """
+        实时识别成功说明网络已恢复：由后台线程把暂存录音的下次重试提前到现在（调用方不做任何磁盘操作）。
+        """
+        if self._thread is None:
+            return
+        self._online.set()
+        self._wake.set()
+
+    def _reschedule_now(self) -> None:
+        with self._lock:
+            now = time.time()
+            for wav in self._items():
+                meta = self._read_meta(wav)
+                if meta is not None and meta.get("next_attempt_at", 0) > now:
+                    meta["next_attempt_at"] = now
+                    self._write_meta(wav, meta)
+
+    @staticmethod
+    def _meta_path(wav: Path) -> Path:
+        return wav.with_suffix(".json")
+
+    def _read_meta(self, wav: Path) -> Optional[dict]:
+        try:
+            return json.loads(self._meta_path(wav).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, wav: Path, meta: dict) -> None:
+        tmp = self._meta_path(wav).with_suffix(".tmp")
+        tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self._meta_path(wav))
+
+    def _items(self) -> List[Path]:
+        try:
+            return sorted(self.directory.glob("*.wav"))
+        except OSError:
+            return []
+
+    def _remove(self, wav: Path) -> None:
+        for path in (wav, self._meta_path(wav)):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as exc:
+                self.logger.warning("删除暂存文件失败：%s（%s）", path, exc)
+
+    def _enforce_quota(self) -> None:
+        """
+        删除超过保留时间的录音，再从最旧的开始删除直到总容量不超过上限。
+        """
+        with self._lock:
+            now = time.time()
+            items = []
+            for wav in self._items():
+                try:
+                    stat = wav.stat()
+                except OSError:
+                    continue
+                if now - stat.st_mtime > self.max_age_s:
+                    self.logger.warning("暂存录音超过保留时间，已删除：%s", wav.name)
+                    self._remove(wav)
+                    continue
+                items.append((wav, stat.st_size))
+            total = sum(size for _, size in items)
+            for wav, size in items:
+                if total <= self.max_bytes:
+                    break
+                self.logger.warning("暂存区超出容量上限，删除最旧的录音：%s", wav.name)
+                self._remove(wav)
+                total -= size
+
+    # ---- 补识别 ----
+    def start(self) -> None:
+        """
+        暂存区有录音时启动后台补识别线程；暂存区为空时不启动，直到有录音被暂存。
+        """
+        if not self.enabled or self._thread is not None:
+            return
+        count = self.pending()
+        if not count:
+            return
+        self.logger.info("暂存区有 %d 段待补识别的录音。", count)
+        self._thread = threading.Thread(target=self._run, name="SpoolDrainer", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self) -> None:
+        self._enforce_quota()
+        while not self._stop.is_set():
+            if self._online.is_set():
+                self._online.clear()
+                self._reschedule_now()
+            due, wait = self._next_due()
+            if due is None:
+                self._wake.wait(wait)
+                self._wake.clear()
+                continue
+            # 渠道都在熔断冷却中时等冷却结束再试，不消耗补识别次数
+            cooldown = self.asr.breaker_wait()
+            if cooldown > 0:
+                self.logger.info("识别渠道熔断中，%.0f 秒后再补识别。", cooldown)
+                self._wake.wait(cooldown)
+                self._wake.clear()
+                continue
+            self._attempt(due)
+
+    def _next_due(self) -> tuple[Optional[Path], Optional[float]]:
+        """
+        返回最早到期的录音；都未到期时返回 (None, 距最近到期的秒数)，暂存区为空时等待时间为 None。
+        """
+        now = time.time()
+        earliest: Optional[float] = None
+        for wav in self._items():
+            meta = self._read_meta(wav) or {}
+            next_at = float(meta.get("next_attempt_at", 0.0))
+            if next_at <= now:
+                return wav, None
+            earliest = next_at if earliest is None else min(earliest, next_at)
+        return None, None if earliest is None else earliest - now
+
+    def _attempt(self, wav: Path) -> None:
+        meta = self._read_meta(wav) or {"created_at": wav.stat().st_mtime, "attempts": 0}
+        meta["attempts"] = int(meta.get("attempts", 0)) + 1
+        self.logger.info("补识别暂存录音：%s（第 %d 次）", wav.name, meta["attempts"])
+        try:
+            text = self.asr.transcribe(str(wav), background=True)
+        except Exception as exc:  # pylint: disable=broad-except
+            delay = min(self.retry_max_s, self.retry_base_s * (2 ** (meta["attempts"] - 1))) * random.uniform(0.8, 1.2)
+            meta["last_error"] = str(exc)
+            meta["next_attempt_at"] = time.time() + delay
+            with self._lock:
+                if wav.exists():
+                    self._write_meta(wav, meta)
+            self.logger.warning("补识别失败，%.0f 秒后重试：%s", delay, exc)
+            return
+        if text:
+            self._deliver(text, meta)
+        else:
+            self.logger.info("暂存录音未识别出文本，已丢弃：%s", wav.name)
+        with self._lock:
+            self._remove(wav)
+
+    def _deliver(self, text: str, meta: dict) -> None:
+        record = {
+            "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(float(meta.get("created_at", 0.0)))),
+            "recognized_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "attempts": meta.get("attempts"),
+            "text": text,
+        }
+        try:
+            SPOOL_RESULTS_PATH.parent.mkdir(parents=True, exist_ok=True)
+            with open(SPOOL_RESULTS_PATH, "a", encoding="utf-8") as fp:
+                fp.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as exc:
+            self.logger.error("写入补识别结果失败：%s", exc)
+        deliver = str(self.config.get("spool_deliver") or CONFIG_TEMPLATE["spool_deliver"]).strip().lower()
+        if deliver == "clipboard" and self.clipboard is not None:
+            self.clipboard.copy(text)
+        self.logger.info("补识别成功（录音于 %s）：%s", record["recorded_at"], text)
+        if self.on_result is not None:
+            try:
+                self.on_result(text, record)
+            except Exception:  # pylint: disable=broad-except
+                self.logger.debug("补识别结果回调失败", exc_info=True)
+
+
+class FloatingButton:
+    """
+    浮动录音按钮，支持拖拽与尺寸调节。
+    """
+
+    STATE_STYLE = {
+        "idle": ("#4CAF50", "#388E3C", "开始录音"),
+        "recording": ("#F44336", "#D32F2F", "录音中…"),
+        "processing": ("#FF9800", "#F57C00", "识别中…"),
+    }
+
+    def __init__(self, app: "LexiSharpApp", size: int):
+        self.app = app
+        self.top = tk.Toplevel(app.root)
+        self.top.withdraw()
+        self.top.overrideredirect(True)
+        self.top.attributes("-topmost", True)
+        self.top.configure(bg="#1B1B1B")
+
+        self.size = max(50, int(size))
+        self._dragging = False
+        self._press_offset = (0, 0)
+        self._icon_img: Optional[tk.PhotoImage] = None
+
+        self.button = tk.Button(
+            self.top,
+            text="",
+            bg="#4CAF50",
+            fg="white",
+            activebackground="#388E3C",
+            activeforeground="white",
+            relief=tk.FLAT,
+            bd=0,
+            font=("WenQuanYi Micro Hei", 10, "bold"),
+            cursor="hand2"
+        )
+        self.button.pack(fill=tk.BOTH, expand=True)
+
+        self.button.bind("<ButtonPress-1>", self._on_press)
+        self.button.bind("<B1-Motion>", self._on_drag)
+        self.button.bind("<ButtonRelease-1>", self._on_release)
+
+        self.top.geometry(f"{self.size}x{self.size}+120+120")
+        # 设置窗口图标（与主窗口一致）
+        try:
+            if self.app._app_icon_photo is not None:
+                self.top.iconphoto(True, self.app._app_icon_photo)
+        except Exception:
+            pass
+        # 应用图标到按钮
+        self._apply_icon()
+        self.top.deiconify()
+
+    def update_size(self, size: int) -> None:
+        """
+        调整按钮尺寸。
+        """
+        self.size = max(50, int(size))
+        x = self.top.winfo_x() if self.top.winfo_ismapped() else 120
+        y = self.top.winfo_y() if self.top.winfo_ismapped() else 120
+        self.top.geometry(f"{self.size}x{self.size}+{x}+{y}")
+        self._apply_icon()
+
+    def set_state(self, state: str) -> None:
+        """
+        根据状态调整显示样式。
+        """
+        bg, active_bg, text = self.STATE_STYLE.get(state, self.STATE_STYLE["idle"])
+        self.button.configure(
+            bg=bg,
+            activebackground=active_bg,
+            text=""
+        )
+        # 始终使用图标展示
+        self._apply_icon()
+
+    def destroy(self) -> None:
+        """
+        销毁浮动按钮。
+        """
+        if self.top:
+            try:
+                self.top.destroy()
+            finally:
+                self.top = None
+
+    def _on_press(self, event) -> None:
+        self._dragging = False
+        self._press_offset = (event.x, event.y)
+        self.app.prime_external_window()
+
+    def _on_drag(self, event) -> None:
+        self._dragging = True
+        x = event.x_root - self._press_offset[0]
+        y = event.y_root - self._press_offset[1]
+        self.top.geometry(f"{self.size}x{self.size}+{x}+{y}")
+
+    def _on_release(self, _event) -> None:
+        if not self._dragging:
+            self.app.root.after(0, self.app.toggle_recording)
+        self._dragging = False
+
+    def _apply_icon(self) -> None:
+        """根据当前尺寸获取图标并应用到按钮。"""
+        try:
+            # 给图标留一点内边距
+            icon_size = max(24, int(self.size * 0.7))
+            img = self.app.get_icon_for_size(icon_size)
+            if img is not None:
+                self._icon_img = img  # 保存引用，避免被 GC
+                self.button.configure(image=self._icon_img, compound=tk.CENTER)
+            else:
+                # 无图标时显示短文本
+                self.button.configure(image="", text="录音")
+        except Exception:
+            self.button.configure(image="", text="录音")
+
+
+class LexiSharpApp:
+    """
+    Tkinter 图形界面应用，负责录音、调用ASR、剪贴板操作。
+    """
+
+    def __init__(self, root: tk.Tk, config: dict, logger: logging.Logger):
+        self.root = root
+        self.config = config
+        self.logger = logger
+        self.asr = ASREngine(self.config, logger=self.logger)
+        # 流式渠道的中间结果实时显示在结果区
+        self.asr.on_partial = self._show_partial
+        self.output = TextOutput(self.config, logger=self.logger)
+        self.clipboard = self.output.clipboard
+        self.input_injector = self.output.input_injector
+        # 识别失败的录音暂存后在后台补识别
+        self.spool = RecordingSpool(
+            self.config, self.asr, self.logger, clipboard=self.clipboard, on_result=self._on_spool_result
+        )
+        self.spool.start()
+        self.start_hotkey = (self.config.get("start_hotkey") or "").strip()
+        self.stop_hotkey = (self.config.get("stop_hotkey") or "").strip()
+        self.hotkey_manager: Optional[GlobalHotkeyManager] = None
+        self.floating_button: Optional[FloatingButton] = None
+        self._floating_state = "idle"
+        self.floating_enabled_var = tk.BooleanVar(
+            master=self.root,
+            value=bool(self.config.get("floating_button_enabled", False))
+        )
+        float_size = int(self.config.get("floating_button_size", 96) or 96)
+        self.floating_size_var = tk.IntVar(
+            master=self.root,
+            value=max(50, min(200, float_size))
+        )
+        device = (self.config.get("arecord_device") or "").strip() or None
+        if device:
+            self.logger.info("配置中指定录音设备：%s", device)
+        self.recorder = Recorder(device=device, logger=self.logger)
+
+        self.root.update_idletasks()
+        self.root_window_id = str(self.root.winfo_id())
+        self._own_windows: set[str] = {self.root_window_id}
+        self._last_external_window: Optional[str] = None
+        self._register_window(self.root)
+
+        self.target_window: Optional[str] = None
+        self.audio_path: Optional[str] = None
+        self.processing = False
+
+        self.status_var = tk.StringVar(value="准备就绪，点击开始录音。")
+        self.result_var = tk.StringVar(value="尚未识别内容。")
+        self.button_text = tk.StringVar(value="开始录音")
+        self.level_var = tk.DoubleVar(value=0.0)
+        self.last_result_text: str = ""
+        self.original_window_before_record: Optional[str] = None
+        self.settings_dialog: Optional["SettingsDialog"] = None
+        self.config_ready: bool = False
+        self._config_prompt_shown: bool = False
+
+        # 应用图标缓存
+        self._app_icon_photo: Optional[tk.PhotoImage] = None
+        self._icon_cache: dict[int, tk.PhotoImage] = {}
+        self._icon_source_path: Optional[str] = None
+        self._icon_base_pil = None  # type: ignore[assignment]
+
+        self._setup_theme()
+        self._init_icons()
+        self._build_ui()
+        self._update_floating_controls_state()
+        self._schedule_level_update()
+        self._validate_keys(initial=NEW_CONFIG_CREATED)
+        self._init_hotkeys()
+        if self.floating_enabled_var.get():
+            self._create_floating_button()
+            self._apply_floating_state(self._floating_state)
+        self.asr.prewarm()
+        self.output.prewarm()
+
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+
+    def _build_ui(self) -> None:
+        """
+        构建界面组件。
+        """
+        self.root.title("LexiSharp-linux")
+        self.root.geometry("500x500")
+        self.root.resizable(False, False)
+
+        font_title = ("WenQuanYi Micro Hei", 18, "bold")
+        font_body = ("WenQuanYi Micro Hei", 12)
+
+        # 顶部两按钮并排：开始录音 / 设置（等宽）
+        btn_bar = ttk.Frame(self.root, padding=(20, 16))
+        btn_bar.pack(fill=tk.X)
+        btn_bar.columnconfigure(0, weight=1)
+        btn_bar.columnconfigure(1, weight=1)
+
+        self.record_button = ttk.Button(
+            btn_bar,
+            textvariable=self.button_text,
+            command=self.toggle_recording,
+            style="Record.TButton",
+        )
+        self.record_button.grid(row=0, column=0, sticky="ew", padx=(0, 8))
+
+        settings_button = ttk.Button(
+            btn_bar,
+            text="设置",
+            command=self._open_settings,
+            style="Record.TButton",
+        )
+        settings_button.grid(row=0, column=1, sticky="ew", padx=(8, 0))
+
+        # 主页其余内容
+        main_frame = ttk.Frame(self.root, padding=(20, 0))
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        # 设置主窗口图标（如果找到 asr.png/svg）
+        if self._app_icon_photo is not None:
+            try:
+                self.root.iconphoto(True, self._app_icon_photo)
+            except Exception:
+                pass
+
+        floating_frame = ttk.Frame(main_frame)
+        floating_frame.pack(pady=(4, 0))
+
+        floating_toggle = ttk.Checkbutton(
+            floating_frame,
+            text="显示浮动录音按钮",
+            variable=self.floating_enabled_var,
+            command=self._toggle_floating_button
+        )
+        floating_toggle.pack(side=tk.LEFT)
+
+        size_label = ttk.Label(
+            floating_frame,
+            text="按钮大小"
+        )
+        size_label.pack(side=tk.LEFT, padx=(16, 4))
+
+        self.floating_size_scale = tk.Scale(
+            floating_frame,
+            from_=60,
+            to=160,
+            orient=tk.HORIZONTAL,
+            resolution=5,
+            showvalue=True,
+            variable=self.floating_size_var,
+            command=self._on_floating_size_change,
+            length=160
+        )
+        self.floating_size_scale.pack(side=tk.LEFT)
+
+        level_label = ttk.Label(
+            main_frame,
+            text="实时音量检测"
+        )
+        level_label.pack(pady=(0, 4))
+
+        self.level_bar = ttk.Progressbar(
+            main_frame,
+            orient=tk.HORIZONTAL,
+            length=360,
+            mode="determinate",
+            maximum=100,
+            variable=self.level_var
+        )
+        self.level_bar.pack(fill=tk.X)
+
+        status_label = ttk.Label(
+            main_frame,
+            textvariable=self.status_var,
+            wraplength=360,
+            justify=tk.LEFT,
+            # 字体通过主题控制
+        )
+        status_label.pack(pady=(10, 4), fill=tk.X)
+
+        result_frame = ttk.LabelFrame(main_frame, text="最近识别结果")
+        result_frame.pack(fill=tk.BOTH, expand=True, pady=(4, 16))
+
+        result_display = ttk.Label(
+            result_frame,
+            textvariable=self.result_var,
+            wraplength=360,
+            justify=tk.LEFT,
+            # 字体通过主题控制
+        )
+        result_display.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
+
+    def _setup_theme(self) -> None:
+        """配置 ttk 主题与样式。"""
+        try:
+            style = ttk.Style(self.root)
+            # 选择通用主题
+            try:
+                style.theme_use("clam")
+            except Exception:
+                pass
+
+            style.configure("Header.TButton", padding=8)
+            # 录音按钮样式
+            style.configure(
+                "Record.TButton",
+                font=("WenQuanYi Micro Hei", 14, "bold"),
+                padding=14
+            )
+        except Exception:
+            pass
+
+    def _init_icons(self) -> None:
+        """尝试从当前目录或脚本目录加载 asr.png 或 asr.svg 作为程序图标。"""
+        candidates = []
+        try:
+            here = Path.cwd()
+            candidates.extend([here / "asr.png", here / "asr.svg"])
+        except Exception:
+            pass
+        try:
+            script_dir = Path(__file__).resolve().parent
+            candidates.extend([script_dir / "asr.png", script_dir / "asr.svg"])
+        except Exception:
+            pass
+
+        icon_path: Optional[Path] = None
+        for p in candidates:
+            try:
+                if p.exists():
+                    icon_path = p
+                    break
+            except Exception:
+                continue
+
+        if not icon_path:
+            return
+        self._icon_source_path = str(icon_path)
+
+        try:
+            if icon_path.suffix.lower() == ".png":
+                # 直接用 Tk PhotoImage；同时若有 PIL 则保留 PIL 以便缩放
+                self._app_icon_photo = tk.PhotoImage(file=str(icon_path))
+                if Image is not None:
+                    self._icon_base_pil = Image.open(str(icon_path)).convert("RGBA")
+            elif icon_path.suffix.lower() == ".svg":
+                # 尝试用 cairosvg 转 PNG，再用 PIL 读
+                if cairosvg is not None and Image is not None and ImageTk is not None:
+                    png_bytes = cairosvg.svg2png(url=str(icon_path))
+                    from io import BytesIO
+                    self._icon_base_pil = Image.open(BytesIO(png_bytes)).convert("RGBA")
+                    # 生成一个中等大小的 PhotoImage 作为窗口图标
+                    im64 = self._icon_base_pil.copy()
+                    im64.thumbnail((64, 64), Image.LANCZOS)
+                    self._app_icon_photo = ImageTk.PhotoImage(im64)
+                else:
+                    # 无法处理 svg，忽略
+                    return
+        except Exception:
+            # 加载失败则放弃图标设置
+            self._app_icon_photo = None
+            self._icon_base_pil = None
+            return
+
+    def get_icon_for_size(self, size: int) -> Optional[tk.PhotoImage]:
+        """返回指定像素大小的 PhotoImage，用于浮动按钮等。"""
+        if size <= 0:
+            return None
+        if size in self._icon_cache:
+            return self._icon_cache[size]
+        try:
+            if self._icon_base_pil is not None and ImageTk is not None:
+                im = self._icon_base_pil.copy()
+                im.thumbnail((size, size), Image.LANCZOS)
+                photo = ImageTk.PhotoImage(im)
+                self._icon_cache[size] = photo
+                return photo
+            # 无 PIL，则尝试基于 Tk PhotoImage 缩放（只能近似）
+            if self._app_icon_photo is not None:
+                w = self._app_icon_photo.width()
+                if w > 0:
+                    factor = max(1, int(round(w / max(1, size))))
+                    try:
+                        photo = self._app_icon_photo.subsample(factor)
+                        self._icon_cache[size] = photo
+                        return photo
+                    except Exception:
+                        return self._app_icon_photo
+        except Exception:
+            return None
+        return None
+
+    def _validate_keys(self, initial: bool = False, trigger_prompt: bool = True) -> bool:
+        """
+        检查当前渠道所需配置是否完整。
+        """
+        self.logger.debug("开始校验配置。")
+        missing_messages, channel = self._collect_missing_fields(self.config)
+
+        if missing_messages:
+            self.config_ready = False
+            if hasattr(self, "record_button"):
+                self.record_button.configure(state=tk.DISABLED)
+            missing_text = "、".join(missing_messages)
+            self.logger.warning("配置缺失：%s", missing_text)
+            self.status_var.set("配置缺失，请点击右上角“设置”按钮完成必填项。")
+            if trigger_prompt and (initial or not self._config_prompt_shown):
+                messagebox.showwarning(
+                    "配置提醒",
+                    f"当前配置缺少以下内容：\n{missing_text}\n请在“设置”中完善后再使用。"
+                )
+                self._config_prompt_shown = True
+            if trigger_prompt:
+                self.root.after(0, self._open_settings)
+            return False
+
+        self.logger.info("配置校验通过，渠道：%s", channel)
+        self.config_ready = True
+        self._config_prompt_shown = False
+        if hasattr(self, "record_button"):
+            self.record_button.configure(state=tk.NORMAL)
+        if initial or self.status_var.get().startswith("配置缺失"):
+            self.status_var.set("准备就绪，点击开始录音。")
+        return True
+
+    def toggle_recording(self) -> None:
+        """
+        开始或停止录音。
+        """
+        if self.processing:
+            return
+        if not self.config_ready:
+            messagebox.showwarning("配置提醒", "当前配置尚未完成，请先在设置中填写必需字段。")
+            self._open_settings()
+            return
+
+        if not self.recorder.is_running():
+            self.prime_external_window()
+            self.start_recording()
+        else:
+            self.stop_recording()
+
+    def start_recording(self) -> None:
+        """
+        开始录音。
+        """
+        self.logger.info("开始录音。")
+        self.asr.attach_recorder(self.recorder)
+        try:
+            self.audio_path = self.recorder.start()
+        except RuntimeError as exc:
+            self.logger.exception("启动录音失败")
+            messagebox.showerror("录音失败", str(exc))
+            self._schedule_floating_state("idle")
+            return
+
+        self.logger.info("录音文件已创建：%s", self.audio_path)
+        self.asr.warm_up()
+        self.button_text.set("停止录音")
+        self.status_var.set("录音中…再次点击按钮即可结束。")
+        self._schedule_floating_state("recording")
+
+    def stop_recording(self) -> None:
+        """
+        停止录音并进入识别流程。
+        """
+        path = self.recorder.stop()
+        self.audio_path = path
+        self.logger.info("停止录音，文件路径：%s", path)
+        if not path or not Path(path).exists():
+            self.logger.warning("未捕获到音频文件，path=%s", path)
+            self.button_text.set("开始录音")
+            self.status_var.set("未捕获到音频文件，请重试。")
+            self._schedule_floating_state("idle")
+            return
+
+        file_size = Path(path).stat().st_size
+        self.logger.info("音频文件大小：%d 字节", file_size)
+        self.button_text.set("开始录音")
+        provider_name = self._channel_display_name()
+        self.status_var.set(f"正在向 {provider_name} 发送识别请求…")
+        self._schedule_floating_state("processing")
+        self.processing = True
+        threading.Thread(target=self._recognize_task, daemon=True).start()
+
+    def _recognize_task(self) -> None:
+        """
+        后台线程：读取音频、调用ASR、处理结果。
+        """
+        threading.current_thread().name = "ASRWorker"
+        try:
+            self.logger.info("识别线程启动，音频文件：%s", self.audio_path)
+            text = self.asr.transcribe(self.audio_path)
+            self.spool.notify_online()
+            if text is None:
+                self.logger.warning("ASR 未返回有效文本")
+                self._update_status("未获得识别结果，请检查日志或稍后再试。")
+                return
+            self.logger.info("ASR 返回文本：%s", text)
+            self._refresh_result(text)
+            self._update_status(self.output.deliver(text, self.target_window))
+        except Exception as exc:  # pylint: disable=broad-except
+            self.logger.exception("识别流程发生异常")
+            if self.audio_path and self.spool.keep(self.audio_path, exc):
+                self._update_status(f"识别失败：{exc}（录音已暂存，恢复后自动补识别）")
+            else:
+                self._update_status(f"识别失败：{exc}")
+        finally:
+            if self.audio_path and Path(self.audio_path).exists():
+                try:
+                    self.logger.info("清理音频文件：%s", self.audio_path)
+                    os.remove(self.audio_path)
+                except OSError:
+                    self.logger.exception("删除音频文件失败：%s", self.audio_path)
+                    pass
+            self.original_window_before_record = None
+            self.audio_path = None
+            self.processing = False
+            self._schedule_floating_state("idle")
+
+    def _collect_missing_fields(self, config: dict) -> tuple[list[str], str]:
+        return self.asr.collect_missing_fields(config)
+
+    def _channel_display_name(self) -> str:
+        return self.asr.display_name()
+
+    def _call_asr(self, audio_file: str) -> Optional[str]:
+        # 仅供设置界面测试 WAV 使用：反复测试同一文件时命中识别缓存
+        return self.asr.transcribe(audio_file, use_cache=True)
+
+    def _open_settings(self) -> None:
+        """
+        打开设置对话框。
+        """
+        try:
+            if self.settings_dialog and self.settings_dialog.window.winfo_exists():
+                self.settings_dialog.window.lift()
+                self.settings_dialog.window.focus_force()
+                return
+        except Exception:
+            self.settings_dialog = None
+        try:
+            self.settings_dialog = SettingsDialog(self)
+        except Exception:
+            self.logger.exception("打开设置窗口失败")
+            messagebox.showerror("设置", "无法打开设置窗口，请查看日志。")
+
+    def _on_settings_closed(self) -> None:
+        """
+        设置窗口关闭时回调。
+        """
+        self.settings_dialog = None
+
+    def _on_spool_result(self, text: str, record: dict) -> None:
+        """
+        暂存录音补识别成功（由补识别线程回调）。
+        """
+        self._refresh_result(text)
+        copied = str(self.config.get("spool_deliver") or "").strip().lower() == "clipboard"
+        self._update_status(f"已补识别 {record['recorded_at']} 的录音{'，已复制到剪贴板' if copied else ''}。")
+
+    def _show_partial(self, text: str) -> None:
+        """
+        显示流式识别的中间结果（由识别线程回调）。
+        """
+        self.root.after(0, self.result_var.set, text)
+
+    def _refresh_result(self, text: str) -> None:
+        """
+        更新识别结果展示。
+        """
+        self.last_result_text = text
+        self.root.after(0, self.result_var.set, text)
+
+    def _update_status(self, message: str) -> None:
+        """
+        在线程安全的前提下更新状态提示。
+        """
+        self.logger.info("状态更新：%s", message)
+        self.root.after(0, self.status_var.set, message)
+
+    def _update_floating_controls_state(self) -> None:
+        """
+        根据启用状态更新浮动按钮控制。
+        """
+        state = tk.NORMAL if self.floating_enabled_var.get() else tk.DISABLED
+        if hasattr(self, "floating_size_scale"):
+            self.floating_size_scale.configure(state=state)
+
+    def _toggle_floating_button(self) -> None:
+        """
+        打开或关闭浮动录音按钮，并保存配置。
+        """
+        enabled = bool(self.floating_enabled_var.get())
+        if enabled:
+            self._create_floating_button()
+        else:
+            self._destroy_floating_button()
+        self._update_floating_controls_state()
+        self.config["floating_button_enabled"] = enabled
+        self.config["floating_button_size"] = int(self.floating_size_var.get())
+        try:
+            save_config(self.config)
+        except Exception:
+            self.logger.exception("保存浮动按钮配置失败")
+
+    def _on_floating_size_change(self, value: str) -> None:
+        """
+        调整浮动按钮大小。
+        """
+        try:
+            size = int(float(value))
+        except (TypeError, ValueError):
+            return
+        size = max(50, min(200, size))
+        if self.floating_size_var.get() != size:
+            self.floating_size_var.set(size)
+        if self.floating_button:
+            self.floating_button.update_size(size)
+        self.config["floating_button_size"] = size
+        try:
+            save_config(self.config)
+        except Exception:
+            self.logger.exception("保存浮动按钮大小失败")
+
+    def _create_floating_button(self) -> None:
+        """
+        创建浮动录音按钮。
+        """
+        size = int(self.floating_size_var.get())
+        if self.floating_button:
+            self.floating_button.update_size(size)
+            self.floating_button.set_state(self._floating_state)
+            return
+        try:
+            self.floating_button = FloatingButton(self, size)
+            self.floating_button.top.update_idletasks()
+            self._register_window(self.floating_button.top)
+            self.floating_button.set_state(self._floating_state)
+            self.logger.info("启用浮动录音按钮，尺寸：%d", size)
+        except Exception as exc:
+            self.logger.exception("创建浮动录音按钮失败")
+            messagebox.showwarning(
+                "浮动按钮不可用",
+                f"创建浮动录音按钮失败：{exc}"
+            )
+            self.floating_enabled_var.set(False)
+            self.floating_button = None
+            self._update_floating_controls_state()
+
+    def _destroy_floating_button(self) -> None:
+        """
+        销毁浮动录音按钮。
+        """
+        if self.floating_button:
+            self._unregister_window(self.floating_button.top)
+            self.floating_button.destroy()
+            self.floating_button = None
+            self.logger.info("已关闭浮动录音按钮。")
+
+    def _schedule_floating_state(self, state: str) -> None:
+        """
+        异步更新浮动按钮状态。
+        """
+        self.root.after(0, self._apply_floating_state, state)
+
+    def _apply_floating_state(self, state: str) -> None:
+        """
+        实际更新浮动按钮状态。
+        """
+        self._floating_state = state
+        if self.floating_button:
+            self.floating_button.set_state(state)
+        self.logger.debug("浮动按钮状态更新为：%s", state)
+
+    def _register_window(self, widget: tk.Widget) -> None:
+        """
+        将 Tk 组件对应的窗口加入内部窗口集合。
+        """
+        wid = self._widget_window_id(widget)
+        if wid:
+            self._own_windows.add(wid)
+            self.logger.debug("注册内部窗口 ID：%s", wid)
+
+    def _unregister_window(self, widget: tk.Widget) -> None:
+        """
+        从内部窗口集合移除指定窗口。
+        """
+        wid = self._widget_window_id(widget)
+        if wid and wid in self._own_windows:
+            self._own_windows.discard(wid)
+            self.logger.debug("注销内部窗口 ID：%s", wid)
+
+    @staticmethod
+    def _widget_window_id(widget: tk.Widget) -> Optional[str]:
+        """
+        获取 Tk 组件的窗口 ID。
+        """
+        try:
+            return str(widget.winfo_id())
+        except Exception:
+            return None
+
+    def prime_external_window(self) -> None:
+        """
+        在焦点切换前记录当前外部窗口 ID。
+        """
+        if self.input_injector and self.input_injector.can_use_uinput():
+            # Wayland 下依赖 uinput，无需记录窗口 ID。
+            self.logger.debug("已启用 uinput 自动粘贴，跳过窗口记录。")
+            self.target_window = None
+            return
+
+        window_id = current_active_window()
+        if not window_id:
+            self.logger.debug("未能获取当前窗口，可能未安装 xdotool。")
+            return
+        if window_id in self._own_windows:
+            self.logger.debug("当前窗口属于 LexiSharp，自行忽略：%s", window_id)
+            return
+        if window_id == self._last_external_window:
+            self.logger.debug("外部窗口保持不变：%s", window_id)
+        else:
+            self.logger.info("记录外部窗口：%s (%s)", window_id, window_name(window_id))
+        self.target_window = window_id
+        self._last_external_window = window_id
+
+    def _on_main_button_press(self, _event) -> None:
+        """
+        主窗口录音按钮按下时记录外部窗口。
+        """
+        self.prime_external_window()
+
+    def _init_hotkeys(self) -> None:
+        """
+        初始化全局快捷键。
+        """
+        if not self.start_hotkey and not self.stop_hotkey:
+            self.logger.info("未配置全局快捷键，跳过初始化。")
+            return
+        try:
+            self.hotkey_manager = GlobalHotkeyManager(
+                self.start_hotkey,
+                self.stop_hotkey,
+                self._on_hotkey_start,
+                self._on_hotkey_stop,
+                self.logger
+            )
+        except RuntimeError as exc:
+            self.logger.exception("全局快捷键初始化失败")
+            messagebox.showwarning(
+                "全局快捷键不可用",
+                f"全局快捷键初始化失败：{exc}"
+            )
+            self.hotkey_manager = None
+
+    def _on_hotkey_start(self) -> None:
+        """
+        全局快捷键触发开始录音。
+        """
+        self.logger.info("收到开始录音快捷键信号。")
+        self.root.after(0, self._start_from_hotkey)
+
+    def _on_hotkey_stop(self) -> None:
+        """
+        全局快捷键触发结束录音。
+        """
+        self.logger.info("收到结束录音快捷键信号。")
+        self.root.after(0, self._stop_from_hotkey)
+
+    def _start_from_hotkey(self) -> None:
+        """
+        热键触发的开始录音逻辑。
+        """
+        if self.processing or self.recorder.is_running():
+            self.logger.info(
+                "忽略开始录音快捷键：processing=%s, is_running=%s",
+                self.processing,
+                self.recorder.is_running()
+            )
+            return
+        self.prime_external_window()
+        self.start_recording()
+
+    def _stop_from_hotkey(self) -> None:
+        """
+        热键触发的结束录音逻辑。
+        """
+        if not self.recorder.is_running():
+            self.logger.info("忽略结束录音快捷键：录音尚未开始。")
+            return
+        self.stop_recording()
+
+    def _schedule_level_update(self) -> None:
+        """
+        定时刷新音量指示条。
+        """
+        level = 0.0
+        try:
+            level = max(0.0, min(self.recorder.current_level(), 1.0))
+        except Exception:
+            level = 0.0
+        self.level_var.set(level * 100)
+        self.root.after(100, self._schedule_level_update)
+
+    def _on_close(self) -> None:
+        """
+        释放资源并关闭窗口。
+        """
+        self.logger.info("准备关闭应用。")
+        if self.hotkey_manager:
+            self.hotkey_manager.stop()
+            self.hotkey_manager = None
+
+        self._destroy_floating_button()
+
+        self.spool.close()
+        self.output.close()
+        self.asr.close()
+
+        if self.recorder.is_running():
+            path = self.recorder.stop()
+            if path and Path(path).exists():
+                try:
+                    os.remove(path)
+                    self.logger.info("关闭时清理音频文件：%s", path)
+                except OSError:
+                    self.logger.exception("关闭时删除音频文件失败：%s", path)
+
+        self.root.destroy()
+
+
+class SettingsDialog:
+    """
+    配置设置对话框，支持渠道切换与字段编辑。
+    """
+
+    CHANNEL_OPTIONS = [
+        ("volcengine", "火山引擎（Volcengine）"),
+        ("soniox", "Soniox"),
+        ("volcengine_stream", "火山引擎（流式）"),
+        ("soniox_stream", "Soniox（流式）"),
+        ("qwen", "通义千问（Qwen）"),
+        ("local_sherpa", "本地模型（sherpa-onnx）"),
+        ("local_server", "本地共享识别服务"),
+    ]
+
+    CHANNEL_FIELDS: dict[str, list[dict[str, object]]] = {
+        "volcengine": [
+            {
+                "key": "app_key",
+                "label": "App ID",
+                "type": "entry",
+                "help": "必填：火山引擎控制台生成的 App ID。",
+            },
+            {
+                "key": "access_key",
+                "label": "Access Key",
+                "type": "entry",
+                "help": "必填：火山引擎控制台生成的 Access Key。",
+            },
+            {
+                "key": "resource_id",
+                "label": "Resource ID",
+                "type": "entry",
+                "help": "资源标识，若官方有更新可在此调整。",
+            },
+            {
+                "key": "api_url",
+                "label": "API 地址",
+                "type": "entry",
+                "help": "ASR 请求地址，通常保持默认即可。",
+            },
+            {
+                "key": "model_name",
+                "label": "模型名称",
+                "type": "entry",
+                "help": "模型标识，例如 bigmodel。",
+            },
+            {
+                "key": "volc_upload_codec",
+                "label": "上传编码",
+                "type": "entry",
+                "default": CONFIG_TEMPLATE["volc_upload_codec"],
+                "help": "wav 或 opus；opus 需安装 ffmpeg，录音期间实时压缩以缩短上传时间。",
+            },
+        ],
+        "soniox": [
+            {
+                "key": "soniox_api_key",
+                "label": "API Key",
+                "type": "entry",
+                "help": "必填：Soniox 控制台生成的 API Key。",
+            },
+            {
+                "key": "soniox_api_base",
+                "label": "API 基础地址",
+                "type": "entry",
+                "help": "默认 https://api.soniox.com，如需代理可在此调整。",
+            },
+            {
+                "key": "soniox_model",
+                "label": "模型（Model）",
+                "type": "entry",
+                "help": "例如 stt-async-preview，可参考官方文档。",
+            },
+            {
+                "key": "soniox_language_hints",
+                "label": "语言提示（逗号分隔）",
+                "type": "entry",
+                "list": True,
+                "help": "可选：例如 zh,en，有助于提升识别准确度。",
+            },
+            {
+                "key": "soniox_enable_speaker_diarization",
+                "label": "启用说话人分离",
+                "type": "boolean",
+            },
+            {
+                "key": "soniox_enable_language_identification",
+                "label": "启用语言识别",
+                "type": "boolean",
+            },
+            {
+                "key": "soniox_context",
+                "label": "上下文提示",
+                "type": "text",
+                "height": 5,
+                "help": "可选：输入行业词汇或短语，增强识别效果（≤10K 字符）。",
+            },
+            {
+                "key": "soniox_poll_interval_s",
+                "label": "最大轮询间隔（秒）",
+                "type": "entry",
+                "value_type": float,
+                "default": CONFIG_TEMPLATE["soniox_poll_interval_s"],
+            },
+            {
+                "key": "soniox_poll_min_interval_s",
+                "label": "最小轮询间隔（秒）",
+                "type": "entry",
+                "value_type": float,
+                "default": CONFIG_TEMPLATE["soniox_poll_min_interval_s"],
+            },
+            {
+                "key": "soniox_poll_timeout_s",
+                "label": "超时时间（秒）",
+                "type": "entry",
+                "value_type": float,
+                "default": CONFIG_TEMPLATE["soniox_poll_timeout_s"],
+            },
+            {
+                "key": "soniox_upload_codec",
+                "label": "上传编码",
+                "type": "entry",
+                "default": CONFIG_TEMPLATE["soniox_upload_codec"],
+                "help": "wav、flac（无损）或 opus；压缩需安装 ffmpeg。",
+            },
+            {
+                "key": "soniox_live_upload",
+                "label": "边录音边上传",
+                "type": "boolean",
+                "help": "开始录音即流式上传音频，停止后立即创建转写任务；开启后上传编码固定为 wav。",
+            },
+        ],
+        "qwen": [
+            {
+                "key": "qwen_api_key",
+                "label": "API Key",
+                "type": "entry",
+                "help": "必填：百炼控制台生成的 DashScope API Key，可使用环境变量 DASHSCOPE_API_KEY。",
+            },
+            {
+                "key": "qwen_model",
+                "label": "模型名称",
+                "type": "entry",
+                "default": CONFIG_TEMPLATE["qwen_model"],
+                "help": "默认 qwen3-asr-flash，如需体验版可改为 qwen-audio-asr。",
+            },
+            {
+                "key": "qwen_context",
+                "label": "上下文（Context）",
+                "type": "text",
+                "height": 4,
+                "help": "可选：用于优化识别的行业词、专有名词等提示文本。",
+            },
+            {
+                "key": "qwen_language",
+                "label": "指定语种（可选）",
+                "type": "entry",
+                "help": "可选值如 zh、en、yue，留空则自动检测语种。",
+            },
+            {
+                "key": "qwen_enable_lid",
+                "label": "启用语种识别",
+                "type": "boolean",
+            },
+            {
+                "key": "qwen_enable_itn",
+                "label": "启用逆文本规范化",
+                "type": "boolean",
+                "help": "开启后会输出更规范的数字/单位格式（仅支持中英文）。",
+            },
+            {
+                "key": "qwen_api_base",
+                "label": "接口地址",
+                "type": "entry",
+                "default": CONFIG_TEMPLATE["qwen_api_base"],
+                "help": "国际站可改为 https://dashscope-intl.aliyuncs.com。",
+            },
+            {
+                "key": "qwen_use_sdk",
+                "label": "使用 dashscope SDK",
+                "type": "boolean",
+                "help": "默认直接请求 REST 接口并内联音频；开启后改用 SDK（需安装 dashscope，会多一次上传往返）。",
+            },
+            {
+                "key": "qwen_upload_codec",
+                "label": "上传编码",
+                "type": "entry",
+                "default": CONFIG_TEMPLATE["qwen_upload_codec"],
+                "help": "wav、flac（无损）或 opus；压缩需安装 ffmpeg。",
+            },
+        ],
+        "local_server": [
+            {
+                "key": "local_server_socket",
+                "label": "服务套接字路径",
+                "type": "entry",
+                "default": CONFIG_TEMPLATE["local_server_socket"],
+                "help": "多用户共享的本地识别服务地址，由 `lexisharp.py server` 启动。",
+            },
+            {
+                "key": "local_server_model",
+                "label": "模型名称（可选）",
+                "type": "entry",
+                "help": "例如 small 或 full，留空使用服务端默认模型。",
+            },
+        ],
+    }
+    # 流式渠道复用对应文件识别渠道的凭证字段
+    CHANNEL_FIELDS["volcengine_stream"] = [
+        *[field for field in CHANNEL_FIELDS["volcengine"] if field["key"] in {"app_key", "access_key", "model_name"}],
+        {
+            "key": "volc_stream_resource_id",
+            "label": "Resource ID",
+            "type": "entry",
+            "default": CONFIG_TEMPLATE["volc_stream_resource_id"],
+            "help": "流式识别资源标识：小时版 volc.bigasr.sauc.duration，并发版 volc.bigasr.sauc.concurrent。",
+        },
+        {
+            "key": "volc_stream_url",
+            "label": "WebSocket 地址",
+            "type": "entry",
+            "default": CONFIG_TEMPLATE["volc_stream_url"],
+            "help": "通常保持默认；本地调试可指向 `lexisharp.py stream-mock`。",
+        },
+    ]
+    CHANNEL_FIELDS["soniox_stream"] = [
+        *[field for field in CHANNEL_FIELDS["soniox"] if field["key"] in {"soniox_api_key", "soniox_language_hints", "soniox_context"}],
+        {
+            "key": "soniox_stream_model",
+            "label": "实时模型（Model）",
+            "type": "entry",
+            "default": CONFIG_TEMPLATE["soniox_stream_model"],
+            "help": "例如 stt-rt-preview，可参考官方文档。",
+        },
+        {
+            "key": "soniox_stream_url",
+            "label": "WebSocket 地址",
+            "type": "entry",
+            "default": CONFIG_TEMPLATE["soniox_stream_url"],
+            "help": "通常保持默认；本地调试可指向 `lexisharp.py stream-mock`。",
+        },
+    ]
+
+    def __init__(self, app: LexiSharpApp):
+        self.app = app
+        self.window = tk.Toplevel(app.root)
+        self.window.title("配置设置")
+        self.window.geometry("520x560")
+        self.window.minsize(520, 460)
+        self.window.resizable(False, False)
+        self.window.transient(app.root)
+        self.window.grab_set()
+        self.window.focus_force()
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.label_map = {key: label for key, label in self.CHANNEL_OPTIONS}
+        self.value_map = {label: key for key, label in self.CHANNEL_OPTIONS}
+
+        current_channel = (app.config.get("channel") or "volcengine").strip().lower()
+        if current_channel not in self.label_map:
+            current_channel = "volcengine"
+
+        top_frame = tk.Frame(self.window, padx=18, pady=16)
+        top_frame.pack(fill=tk.X)
+
+        channel_label = tk.Label(
+            top_frame,
+            text="识别渠道",
+            font=("WenQuanYi Micro Hei", 12, "bold")
+        )
+        channel_label.pack(anchor=tk.W)
+
+        self.channel_var = tk.StringVar(value=self.label_map[current_channel])
+        self.channel_combobox = ttk.Combobox(
+            top_frame,
+            textvariable=self.channel_var,
+            state="readonly",
+            values=[label for _, label in self.CHANNEL_OPTIONS],
+            width=28
+        )
+        self.channel_combobox.pack(anchor=tk.W, pady=(4, 10))
+        self.channel_combobox.bind("<<ComboboxSelected>>", self._on_channel_change)
+
+        ttk.Separator(self.window, orient=tk.HORIZONTAL).pack(fill=tk.X, padx=18)
+
+        scroll_container = tk.Frame(self.window)
+        scroll_container.pack(fill=tk.BOTH, expand=True, padx=18, pady=(12, 0))
+
+        self.canvas = tk.Canvas(
+            scroll_container,
+            borderwidth=0,
+            highlightthickness=0,
+            width=0,
+            height=0
+        )
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        scrollbar = ttk.Scrollbar(scroll_container, orient=tk.VERTICAL, command=self.canvas.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+
+        self.channel_frame = ttk.Frame(self.canvas)
+        self._canvas_window = self.canvas.create_window((0, 0), window=self.channel_frame, anchor="nw")
+        self.channel_frame.bind("<Configure>", lambda _event: self._update_scroll_region())
+        self.canvas.bind("<Configure>", self._on_canvas_configure)
+        self.canvas.bind("<MouseWheel>", self._on_mousewheel)
+        self.canvas.bind("<Button-4>", self._on_mousewheel)  # Linux scroll up
+        self.canvas.bind("<Button-5>", self._on_mousewheel)  # Linux scroll down
+
+        button_frame = ttk.Frame(self.window, padding=(18, 12))
+        button_frame.pack(fill=tk.X, pady=(0, 12))
+
+        save_button = ttk.Button(
+            button_frame,
+            text="保存",
+            width=10,
+            command=self._save
+        )
+        save_button.pack(side=tk.RIGHT, padx=(6, 0))
+
+        cancel_button = ttk.Button(
+            button_frame,
+            text="取消",
+            width=10,
+            command=self.close
+        )
+        cancel_button.pack(side=tk.RIGHT)
+
+        self.field_widgets: dict[str, dict[str, object]] = {}
+
+        try:
+            self.app._register_window(self.window)
+        except Exception:
+            self.app.logger.exception("注册设置窗口失败")
+
+        # 本地引擎变量（仅在 local_sherpa 使用）
+        self.local_variant_var = tk.StringVar(value=str(app.config.get("local_sherpa_variant", "small")))
+        self.local_provider_var = tk.StringVar(value=str(app.config.get("local_sherpa_provider", "cpu")))
+        self.local_threads_var = tk.IntVar(value=int(app.config.get("local_sherpa_threads", 4)))
+        self.local_small_dir_var = tk.StringVar(value=str(app.config.get("local_sherpa_model_dir_small", "")))
+        self.local_full_dir_var = tk.StringVar(value=str(app.config.get("local_sherpa_model_dir_full", "")))
+        self.local_prefer_int8_var = tk.BooleanVar(value=bool(app.config.get("local_sherpa_prefer_int8", True)))
+        self.local_trim_silence_var = tk.BooleanVar(value=bool(app.config.get("local_sherpa_trim_silence", False)))
+        # 已移除 Hugging Face 仓库配置，仅保留 GitHub Releases 下载
+
+        self._render_channel_fields(current_channel)
+
+    def _on_channel_change(self, _event=None) -> None:
+        channel_key = self._get_selected_channel_key()
+        self._render_channel_fields(channel_key)
+
+    def _get_selected_channel_key(self) -> str:
+        label = self.channel_var.get()
+        return self.value_map.get(label, "volcengine")
 
-            return func(**kwargs)
+    def _render_channel_fields(self, channel: str) -> None:
+        for child in self.channel_frame.winfo_children():
+            child.destroy()
+        self.field_widgets.clear()
 
-        tokens = tokens_path
-        names = {p.name.lower(): str(p) for p in onnx_files}
+        # 本地引擎自渲染
+        if channel == "local_sherpa":
+            self._render_local_sherpa_panel()
+            self._update_scroll_region()
+            return
 
-        # 优先从类方法查找；否则从模块级函数兜底
-        rec_cls = getattr(sherpa_onnx, "OfflineRecognizer", None)
-        factory = None
-        if model_type == "transducer":
-            factory = getattr(rec_cls, "from_transducer", None) or getattr(sherpa_onnx, "from_transducer", None)
-            if not factory:
-                raise RuntimeError("当前 sherpa-onnx 版本不支持 transducer 工厂方法，请升级 sherpa-onnx。")
-            return call_with_supported(
-                factory,
-                dict(
-                    tokens=tokens,
-                    num_threads=num_threads,
-                    provider=provider,
-                    decoding_method=decoding_method,
-                ),
-                model_type,
-                {
-                    "encoder": names.get("encoder.onnx", ""),
-                    "decoder": names.get("decoder.onnx", ""),
-                    "joiner": names.get("joiner.onnx", ""),
-                },
-            )
-        if model_type == "sense_voice":
-            factory = getattr(rec_cls, "from_sense_voice", None) or getattr(sherpa_onnx, "from_sense_voice", None)
-            if not factory:
-                # 某些版本可能使用 from_sensevoice 命名，尝试兜底
-                factory = getattr(rec_cls, "from_sensevoice", None) or getattr(sherpa_onnx, "from_sensevoice", None)
-            if not factory:
-                raise RuntimeError("当前 sherpa-onnx 版本不支持 sense-voice 工厂方法，请升级 sherpa-onnx。")
-            model_path = self._choose_model_file(onnx_files, prefer_int8, provider)
-            return call_with_supported(
-                factory,
-                dict(
-                    tokens=tokens,
-                    num_threads=num_threads,
-                    provider=provider,
-                    decoding_method=decoding_method,
-                    language="auto",
-                    use_itn=False,
-                ),
-                model_type,
-                {"model": model_path},
-            )
-        if model_type == "whisper":
-            factory = getattr(rec_cls, "from_whisper", None) or getattr(sherpa_onnx, "from_whisper", None)
-            if not factory:
-                raise RuntimeError("当前 sherpa-onnx 版本不支持 whisper 工厂方法，请升级 sherpa-onnx。")
-            return call_with_supported(
-                factory,
-                dict(
-                    tokens=tokens,
-                    num_threads=num_threads,
-                    provider=provider,
-                    decoding_method=decoding_method,
-                ),
-                model_type,
-                {
-                    "encoder": names.get("whisper-encoder.onnx") or names.get("encoder.onnx", ""),
-                    "decoder": names.get("whisper-decoder.onnx") or names.get("decoder.onnx", ""),
-                    "model": next((v for k, v in names.items() if "whisper" in k), ""),
-                },
+        fields = self.CHANNEL_FIELDS.get(channel, [])
+        if not fields:
+            empty_label = tk.Label(
+                self.channel_frame,
+                text="当前渠道暂无可配置项。",
+                font=("WenQuanYi Micro Hei", 11),
+                fg="#666666"
             )
-        # paraformer 默认
-        factory = getattr(rec_cls, "from_paraformer", None) or getattr(sherpa_onnx, "from_paraformer", None)
-        if not factory:
-            raise RuntimeError("当前 sherpa-onnx 版本不支持 paraformer 工厂方法，请升级 sherpa-onnx。")
-        model_path = self._choose_model_file(onnx_files, prefer_int8, provider)
-        return call_with_supported(
-            factory,
-            dict(
-                tokens=tokens,
-                num_threads=num_threads,
-                provider=provider,
-                decoding_method=decoding_method,
-            ),
-            model_type,
-            {"model": model_path},
-        )
-
-    def _choose_model_file(self, onnx_files: list[Path], prefer_int8: bool, provider: str) -> str:
-        """在多个 .onnx 中选择一个主模型文件：
-        - CPU 且 prefer_int8 时优先选择名称包含 int8 的文件；
-        - 否则优先非 int8；
-        - 若未匹配到，回退为体积最大者。
-        """
-        if not onnx_files:
-            return ""
-        names = [p.name.lower() for p in onnx_files]
-        pairs = list(zip(names, onnx_files))
-        if provider == "cpu" and prefer_int8:
-            for n, p in pairs:
-                if "int8" in n:
-                    return str(p)
-        else:
-            # 优先非 int8
-            for n, p in pairs:
-                if "int8" not in n:
-                    return str(p)
-        # 兜底：体积最大
-        return str(max(onnx_files, key=lambda p: p.stat().st_size))
+            empty_label.pack(anchor=tk.W)
+            return
 
-    def _auto_paste_async(self) -> AutoPasteResult:
-        """自动输入识别结果，优先尝试 DBus，再回退至原有方案。"""
-        text = self.last_result_text or self.clipboard.paste()
-        if not text:
-            message = "自动粘贴失败：暂未获取到可写入的文本。"
-            self.logger.warning(message)
-            return AutoPasteResult(False, False, "none", message)
+        for field in fields:
+            label = tk.Label(
+                self.channel_frame,
+                text=field["label"],
+                font=("WenQuanYi Micro Hei", 12)
+            )
+            label.pack(anchor=tk.W, pady=(0, 2))
 
-        preferred_method = str(self.config.get("input_method", "clipboard")).strip().lower()
-        allow_clipboard_fallback = bool(self.config.get("dbus_fallback_to_clipboard", True))
-        paste_wait_ms = max(0, int(self.config.get("paste_delay_ms", 200)))
-        clipboard_synced = False
-        status_message: Optional[str] = None
+            key = field["key"]  # type: ignore[index]
+            current_value = self._get_config_value(key, field)
+            entry_type = field.get("type")
 
-        if preferred_method == "dbus":
-            if self.dbus_input and self.dbus_input.is_supported():
-                if self.dbus_input.send(text):
-                    return AutoPasteResult(True, False, "dbus")
-                self.logger.warning("DBus 输入失败，将尝试传统方式。")
+            if entry_type == "entry":
+                entry = tk.Entry(self.channel_frame, width=38)
+                if isinstance(current_value, list):
+                    entry.insert(0, ", ".join(current_value))
+                elif current_value not in (None, ""):
+                    entry.insert(0, str(current_value))
+                entry.pack(anchor=tk.W, pady=(0, 6))
+                self.field_widgets[key] = {"widget": entry, "field": field}
+            elif entry_type == "boolean":
+                var = tk.BooleanVar(value=bool(current_value))
+                checkbox = tk.Checkbutton(
+                    self.channel_frame,
+                    text="启用",
+                    variable=var,
+                    font=("WenQuanYi Micro Hei", 11)
+                )
+                checkbox.pack(anchor=tk.W, pady=(0, 6))
+                self.field_widgets[key] = {"widget": checkbox, "variable": var, "field": field}
+            elif entry_type == "text":
+                height = field.get("height", 4)
+                text_widget = tk.Text(self.channel_frame, width=42, height=int(height))
+                text_widget.insert("1.0", str(current_value or ""))
+                text_widget.pack(anchor=tk.W, pady=(0, 6))
+                self.field_widgets[key] = {"widget": text_widget, "field": field}
             else:
-                self.logger.warning("DBus 输入配置启用，但依赖缺失或初始化失败。")
-            if not allow_clipboard_fallback:
-                message = "DBus 输入失败，已保留剪贴板内容，请手动粘贴。"
-                return AutoPasteResult(False, False, "dbus", message)
-            clipboard_synced = self.clipboard.copy(text)
-            if not clipboard_synced:
-                status_message = (
-                    "回退时复制到剪贴板失败，后续快捷键粘贴可能不可用。"
+                placeholder = tk.Label(
+                    self.channel_frame,
+                    text="暂不支持的字段类型",
+                    fg="red"
                 )
-        else:
-            clipboard_synced = self.clipboard.copy(text)
-            if not clipboard_synced:
-                status_message = (
-                    "识别成功，但无法复制到剪贴板，请安装 wl-clipboard（Wayland）或 xclip/xsel（X11）。"
+                placeholder.pack(anchor=tk.W, pady=(0, 6))
+                continue
+
+            help_text = field.get("help")
+            if help_text:
+                help_label = tk.Label(
+                    self.channel_frame,
+                    text=str(help_text),
+                    font=("WenQuanYi Micro Hei", 10),
+                    fg="#666666",
+                    wraplength=360,
+                    justify=tk.LEFT
                 )
+                help_label.pack(anchor=tk.W, pady=(0, 8))
 
-        self.logger.info(
-            "自动粘贴文本长度=%d，clipboard_synced=%s", len(text), clipboard_synced
+        self._update_scroll_region()
+
+    # ===== 本地模型（sherpa-onnx）设置面板 =====
+    def _render_local_sherpa_panel(self) -> None:
+        title = tk.Label(
+            self.channel_frame,
+            text="本地模型选择",
+            font=("WenQuanYi Micro Hei", 12, "bold")
         )
+        title.pack(anchor=tk.W, pady=(0, 6))
 
-        if self.input_injector and clipboard_synced and self.input_injector.can_use_uinput():
-            self.logger.info("尝试通过 uinput 注入 Ctrl+V，等待 %d ms。", paste_wait_ms)
-            if self.input_injector.inject_ctrl_v(wait_ms=paste_wait_ms):
-                self.logger.info("uinput 自动粘贴流程完成。")
-                return AutoPasteResult(True, True, "uinput", status_message)
-            self.logger.warning("uinput 自动粘贴失败，将回退至 xdotool。")
+        # small / full 单选
+        variant_frame = tk.Frame(self.channel_frame)
+        variant_frame.pack(anchor=tk.W, pady=(0, 6), fill=tk.X)
+        tk.Radiobutton(
+            variant_frame,
+            text="small（小模型≈300MB，INT8，速度优先）",
+            variable=self.local_variant_var,
+            value="small",
+            command=self._update_local_status
+        ).pack(anchor=tk.W)
+        tk.Radiobutton(
+            variant_frame,
+            text="full（大模型≈900MB，FP，准确度优先）",
+            variable=self.local_variant_var,
+            value="full",
+            command=self._update_local_status
+        ).pack(anchor=tk.W)
+
+        # 目录与状态
+        path_frame = tk.Frame(self.channel_frame)
+        path_frame.pack(anchor=tk.W, pady=(6, 2), fill=tk.X)
+        tk.Label(path_frame, text="模型目录：").pack(side=tk.LEFT)
+        self.local_path_entry = tk.Entry(path_frame, width=36)
+        self.local_path_entry.pack(side=tk.LEFT, padx=(4, 4))
+        tk.Button(path_frame, text="选择…", command=self._browse_local_dir).pack(side=tk.LEFT)
+
+        self.local_status_label = tk.Label(
+            self.channel_frame,
+            text="正在检测模型…",
+            fg="#666666",
+            wraplength=360,
+            justify=tk.LEFT
+        )
+        self.local_status_label.pack(anchor=tk.W, pady=(4, 8))
+
+        # GitHub Releases 下载（支持加速）
+        gh_frame = tk.LabelFrame(self.channel_frame, text="从 GitHub Releases 下载（支持加速，程序自动解压配置）")
+        gh_frame.pack(anchor=tk.W, fill=tk.X, pady=(4, 8))
+
+        url_row = tk.Frame(gh_frame)
+        url_row.pack(anchor=tk.W, pady=(4, 2), fill=tk.X)
+        tk.Label(url_row, text="GitHub 直链：").pack(side=tk.LEFT)
+        self.github_url_entry = tk.Entry(url_row, width=36)
+        self.github_url_entry.pack(side=tk.LEFT, padx=(4, 4))
 
-        if not self.target_window:
-            message = "缺少目标窗口，已复制文本，请手动粘贴。"
-            self.logger.warning(message)
-            return AutoPasteResult(False, clipboard_synced, "none", message)
+        accel_row = tk.Frame(gh_frame)
+        accel_row.pack(anchor=tk.W, pady=(2, 2), fill=tk.X)
+        tk.Label(accel_row, text="加速：").pack(side=tk.LEFT)
+        self.github_accel_var = tk.StringVar(value="gh-proxy.com")
+        ttk.Combobox(
+            accel_row,
+            textvariable=self.github_accel_var,
+            state="readonly",
+            values=["无加速", "gh-proxy.com", "edgeone.gh-proxy.com"],
+            width=22
+        ).pack(side=tk.LEFT, padx=(4, 12))
+        tk.Button(accel_row, text="下载/更新", command=self._download_via_github).pack(side=tk.LEFT)
 
-        delay_ms = max(1, int(self.config.get("type_delay_ms", 5)))
-        self.logger.info(
-            "准备向窗口 %s (%s) 模拟键入，字符数=%d",
-            self.target_window,
-            self._window_name(self.target_window),
-            len(text)
+        tip2 = (
+            "若网络较慢，推荐选择 gh-proxy.com 或 edgeone.gh-proxy.com 进行加速。\n"
+            "下载完成后会自动解压到当前规格目录并生效。"
         )
-        try:
-            result = subprocess.run(
-                [
-                    "xdotool",
-                    "type",
-                    "--window",
-                    self.target_window,
-                    "--clearmodifiers",
-                    "--delay",
-                    str(delay_ms),
-                    text
-                ],
-                check=False,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL
-            )
-        except FileNotFoundError:
-            message = "未找到 xdotool，无法模拟键入，请手动粘贴。"
-            self.logger.exception(message)
-            return AutoPasteResult(False, clipboard_synced, "none", message)
-        except Exception as exc:  # pragma: no cover
-            message = f"自动粘贴流程出现未知异常：{exc}"
-            self.logger.exception(message)
-            return AutoPasteResult(False, clipboard_synced, "none", message)
+        tk.Label(gh_frame, text=tip2, fg="#666666", justify=tk.LEFT, wraplength=360).pack(anchor=tk.W, pady=(2, 2))
 
-        if result.returncode == 0:
-            self.logger.info("已向窗口 %s 模拟键入文本", self.target_window)
-            return AutoPasteResult(True, clipboard_synced, "xdotool", status_message)
+        # 推理参数
+        infer_frame = tk.LabelFrame(self.channel_frame, text="推理设置")
+        infer_frame.pack(anchor=tk.W, fill=tk.X, pady=(4, 8))
+        row = tk.Frame(infer_frame)
+        row.pack(anchor=tk.W, pady=(2, 2))
+        tk.Label(row, text="执行提供者：").pack(side=tk.LEFT)
+        ttk.Combobox(
+            row,
+            textvariable=self.local_provider_var,
+            state="readonly",
+            values=["cpu", "cuda"],
+            width=10
+        ).pack(side=tk.LEFT, padx=(4, 12))
+        tk.Label(row, text="线程数：").pack(side=tk.LEFT)
+        tk.Spinbox(row, from_=1, to=16, textvariable=self.local_threads_var, width=5).pack(side=tk.LEFT)
 
-        message = "自动粘贴失败：xdotool type 返回非零状态。"
-        self.logger.error(message)
-        return AutoPasteResult(False, clipboard_synced, "xdotool", message)
+        # 量化优先 & 去静音
+        toggles = tk.Frame(infer_frame)
+        toggles.pack(anchor=tk.W, pady=(6, 2))
+        tk.Checkbutton(
+            toggles,
+            text="优先使用量化模型（CPU 推荐）",
+            variable=self.local_prefer_int8_var
+        ).pack(anchor=tk.W)
+        tk.Checkbutton(
+            toggles,
+            text="去静音（VAD 预裁剪）",
+            variable=self.local_trim_silence_var
+        ).pack(anchor=tk.W)
 
-    def _refresh_result(self, text: str) -> None:
-        """
-        更新识别结果展示。
-        """
-        self.last_result_text = text
-        self.root.after(0, self.result_var.set, text)
+        # 测试本地 WAV 文件
+        test_row = tk.Frame(infer_frame)
+        test_row.pack(anchor=tk.W, pady=(6, 2))
+        tk.Button(test_row, text="选择本地 WAV 测试识别…", command=self._test_local_wav).pack(side=tk.LEFT)
 
-    def _update_status(self, message: str) -> None:
-        """
-        在线程安全的前提下更新状态提示。
-        """
-        self.logger.info("状态更新：%s", message)
-        self.root.after(0, self.status_var.set, message)
+        self._update_local_status()
 
-    def _update_floating_controls_state(self) -> None:
-        """
-        根据启用状态更新浮动按钮控制。
-        """
-        state = tk.NORMAL if self.floating_enabled_var.get() else tk.DISABLED
-        if hasattr(self, "floating_size_scale"):
-            self.floating_size_scale.configure(state=state)
+    def _current_variant_dir_var(self) -> tk.StringVar:
+        """根据 small/full 返回目录变量。"""
+        if self.local_variant_var.get() == "full":
+            return self.local_full_dir_var
+        return self.local_small_dir_var
 
-    def _toggle_floating_button(self) -> None:
-        """
-        打开或关闭浮动录音按钮，并保存配置。
-        """
-        enabled = bool(self.floating_enabled_var.get())
-        if enabled:
-            self._create_floating_button()
-        else:
-            self._destroy_floating_button()
-        self._update_floating_controls_state()
-        self.config["floating_button_enabled"] = enabled
-        self.config["floating_button_size"] = int(self.floating_size_var.get())
+    def _update_local_status(self) -> None:
+        # 同步路径输入框
+        dir_var = self._current_variant_dir_var()
+        # 若目录为空或仍为历史默认缓存路径，自动切换到配置目录
         try:
-            save_config(self.config)
+            current_dir = (dir_var.get() or "").strip()
         except Exception:
-            self.logger.exception("保存浮动按钮配置失败")
+            current_dir = ""
+        if (not current_dir) or (".cache/lexisharp-local-asr" in current_dir):
+            variant = self.local_variant_var.get().strip().lower()
+            new_dir = (CONFIG_DIR / ("models/zh-full" if variant == "full" else "models/zh-small")).as_posix()
+            dir_var.set(new_dir)
+        self.local_path_entry.delete(0, tk.END)
+        self.local_path_entry.insert(0, dir_var.get())
 
-    def _on_floating_size_change(self, value: str) -> None:
-        """
-        调整浮动按钮大小。
-        """
-        try:
-            size = int(float(value))
-        except (TypeError, ValueError):
-            return
-        size = max(50, min(200, size))
-        if self.floating_size_var.get() != size:
-            self.floating_size_var.set(size)
-        if self.floating_button:
-            self.floating_button.update_size(size)
-        self.config["floating_button_size"] = size
+        # 设置默认 GitHub 直链
+        variant = self.local_variant_var.get().strip().lower()
+        default_url = ""
+        if variant == "small":
+            default_url = (
+                "https://github.com/k2-fsa/sherpa-onnx/releases/download/asr-models/"
+                "sherpa-onnx-sense-voice-zh-en-ja-ko-yue-int8-2025-09-09.tar.bz2"
+            )
+        else:
+            default_url = (
+                "https://github.com/k2-fsa/sherpa-onnx/releases/download/asr-models/"
+                "sherpa-onnx-sense-voice-zh-en-ja-ko-yue-2024-07-17.tar.bz2"
+            )
         try:
-            save_config(self.config)
+            current_text = self.github_url_entry.get().strip()
         except Exception:
-            self.logger.exception("保存浮动按钮大小失败")
+            current_text = ""
+        # 若为空或是上一个规格的默认值，则覆盖为当前规格默认
+        if not current_text or "sherpa-onnx-sense-voice-zh-en-ja-ko-yue" in current_text:
+            self.github_url_entry.delete(0, tk.END)
+            self.github_url_entry.insert(0, default_url)
 
-    def _create_floating_button(self) -> None:
-        """
-        创建浮动录音按钮。
-        """
-        size = int(self.floating_size_var.get())
-        if self.floating_button:
-            self.floating_button.update_size(size)
-            self.floating_button.set_state(self._floating_state)
+        # 检查安装状态
+        path = os.path.expanduser(dir_var.get())
+        p = Path(path)
+        if not p.exists():
+            self.local_status_label.configure(text="未检测到模型。点击“下载/更新”或选择本地目录导入。", fg="#D32F2F")
+            return
+        tokens = list(p.rglob("tokens.txt"))
+        onnx = list(p.rglob("*.onnx"))
+        if tokens and onnx:
+            self.local_status_label.configure(text=f"已安装：{p}\n包含 {len(onnx)} 个 ONNX 文件。", fg="#388E3C")
+        else:
+            missing = []
+            if not tokens:
+                missing.append("tokens.txt")
+            if not onnx:
+                missing.append("*.onnx")
+            self.local_status_label.configure(text=f"目录不完整，缺少：{', '.join(missing)}", fg="#D32F2F")
+
+    def _browse_local_dir(self) -> None:
+        directory = filedialog.askdirectory(title="选择本地模型目录")
+        if not directory:
+            return
+        dir_var = self._current_variant_dir_var()
+        dir_var.set(directory)
+        self._update_local_status()
+
+    def _test_local_wav(self) -> None:
+        path = filedialog.askopenfilename(
+            title="选择 WAV 文件",
+            filetypes=[("WAV 文件", "*.wav"), ("所有文件", "*.*")],
+        )
+        if not path:
+            return
+        # 后台线程执行，避免阻塞 UI
+        def worker():
+            try:
+                self.app.status_var.set("测试识别中…")
+                text = self.app._call_asr(path)
+                if text:
+                    self.app._refresh_result(text)
+                    messagebox.showinfo("测试识别结果", text)
+                else:
+                    messagebox.showwarning("测试识别", "未获得识别结果，请检查模型与音频。")
+            except Exception as exc:
+                self.app.logger.exception("测试识别失败")
+                messagebox.showerror("测试识别失败", str(exc))
+        import threading
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _download_via_github(self) -> None:
+        import threading, tarfile
+        from urllib.parse import urlparse
+
+        def _set_status(text: str, color: str = "#666666") -> None:
+            try:
+                self.local_status_label.configure(text=text, fg=color)
+            except Exception:
+                pass
+
+        raw_url = self.github_url_entry.get().strip()
+        if not raw_url or not raw_url.startswith("https://github.com/"):
+            messagebox.showwarning("下载", "请填写有效的 GitHub 直链（以 https://github.com/ 开头）。")
             return
-        try:
-            self.floating_button = FloatingButton(self, size)
-            self.floating_button.top.update_idletasks()
-            self._register_window(self.floating_button.top)
-            self.floating_button.set_state(self._floating_state)
-            self.logger.info("启用浮动录音按钮，尺寸：%d", size)
-        except Exception as exc:
-            self.logger.exception("创建浮动录音按钮失败")
-            messagebox.showwarning(
-                "浮动按钮不可用",
-                f"创建浮动录音按钮失败：{exc}"
-            )
-            self.floating_enabled_var.set(False)
-            self.floating_button = None
-            self._update_floating_controls_state()
 
-    def _destroy_floating_button(self) -> None:
-        """
-        销毁浮动录音按钮。
-        """
-        if self.floating_button:
-            self._unregister_window(self.floating_button.top)
-            self.floating_button.destroy()
-            self.floating_button = None
-            self.logger.info("已关闭浮动录音按钮。")
+        accel = self.github_accel_var.get().strip()
+        final_url = raw_url
+        if accel == "gh-proxy.com":
+            final_url = f"https://gh-proxy.com/{raw_url}"
+        elif accel == "edgeone.gh-proxy.com":
+            final_url = f"https://edgeone.gh-proxy.com/{raw_url}"
 
-    def _schedule_floating_state(self, state: str) -> None:
-        """
-        异步更新浮动按钮状态。
-        """
-        self.root.after(0, self._apply_floating_state, state)
+        dir_var = self._current_variant_dir_var()
+        target_dir = Path(os.path.expanduser(dir_var.get()))
+        target_dir.mkdir(parents=True, exist_ok=True)
 
-    def _apply_floating_state(self, state: str) -> None:
-        """
-        实际更新浮动按钮状态。
-        """
-        self._floating_state = state
-        if self.floating_button:
-            self.floating_button.set_state(state)
-        self.logger.debug("浮动按钮状态更新为：%s", state)
+        parsed = urlparse(raw_url)
+        fname = Path(parsed.path).name or "model.tar.bz2"
+        tar_path = target_dir / fname
 
-    def _register_window(self, widget: tk.Widget) -> None:
-        """
-        将 Tk 组件对应的窗口加入内部窗口集合。
-        """
-        wid = self._widget_window_id(widget)
-        if wid:
-            self._own_windows.add(wid)
-            self.logger.debug("注册内部窗口 ID：%s", wid)
+        def worker() -> None:
+            try:
+                _set_status("开始下载模型（GitHub）…", "#666666")
+                with self.app.asr.http.request("GET", final_url, stream=True, timeout=30) as r:
+                    r.raise_for_status()
+                    total = int(r.headers.get("Content-Length", 0))
+                    downloaded = 0
+                    with open(tar_path, "wb") as f:
+                        for chunk in r.iter_content(chunk_size=1024 * 1024):
+                            if not chunk:
+                                continue
+                            f.write(chunk)
+                            downloaded += len(chunk)
+                            if total:
+                                mb = downloaded / (1024 * 1024)
+                                tmb = total / (1024 * 1024)
+                                self.window.after(0, _set_status, f"下载中… {mb:.1f}/{tmb:.1f} MB", "#666666")
+                # 解压
+                _set_status("下载完成，正在解压…", "#666666")
+                try:
+                    with tarfile.open(tar_path, mode="r:bz2") as tf:
+                        tf.extractall(path=target_dir)
+                except tarfile.ReadError:
+                    # 不是 tar.bz2，忽略解压
+                    pass
+                try:
+                    tar_path.unlink(missing_ok=True)
+                except Exception:
+                    pass
+                # 自动保存配置并启用本地模型
+                self.window.after(0, _set_status, f"模型已安装：{target_dir}，正在应用配置…", "#388E3C")
+                self.window.after(0, self._apply_local_config_and_enable)
+                self.window.after(200, self._update_local_status)
+            except requests.RequestException as exc:
+                self.app.logger.exception("GitHub 下载失败")
+                self.window.after(0, _set_status, f"下载失败：{exc}", "#D32F2F")
+                # 若使用加速失败，尝试回退原链一次
+                if final_url != raw_url:
+                    try:
+                        with self.app.asr.http.request("GET", raw_url, stream=True, timeout=30) as r:
+                            r.raise_for_status()
+                            with open(tar_path, "wb") as f:
+                                for chunk in r.iter_content(chunk_size=1024 * 1024):
+                                    if chunk:
+                                        f.write(chunk)
+                        self.window.after(0, _set_status, "加速失败，已回退直链并下载完成，正在解压…", "#666666")
+                        import tarfile as _tarfile
+                        try:
+                            with _tarfile.open(tar_path, mode="r:bz2") as tf:
+                                tf.extractall(path=target_dir)
+                        except _tarfile.ReadError:
+                            pass
+                        try:
+                            tar_path.unlink(missing_ok=True)
+                        except Exception:
+                            pass
+                        self.window.after(0, _set_status, f"模型已安装：{target_dir}，正在应用配置…", "#388E3C")
+                        self.window.after(0, self._apply_local_config_and_enable)
+                        self.window.after(200, self._update_local_status)
+                    except Exception as exc2:
+                        self.app.logger.exception("GitHub 直链回退仍失败")
+                        self.window.after(0, _set_status, f"下载失败：{exc2}", "#D32F2F")
+            except Exception as exc:
+                self.app.logger.exception("下载流程异常")
+                self.window.after(0, _set_status, f"下载异常：{exc}", "#D32F2F")
 
-    def _unregister_window(self, widget: tk.Widget) -> None:
-        """
-        从内部窗口集合移除指定窗口。
-        """
-        wid = self._widget_window_id(widget)
-        if wid and wid in self._own_windows:
-            self._own_windows.discard(wid)
-            self.logger.debug("注销内部窗口 ID：%s", wid)
+        threading.Thread(target=worker, daemon=True).start()
 
-    @staticmethod
-    def _widget_window_id(widget: tk.Widget) -> Optional[str]:
-        """
-        获取 Tk 组件的窗口 ID。
-        """
+    def _apply_local_config_and_enable(self) -> None:
+        """下载解压成功后，自动保存配置并启用本地模型，尽量做到“一键即可用”。"""
         try:
-            return str(widget.winfo_id())
+            updates: dict[str, object] = {
+                "channel": "local_sherpa",
+                "local_sherpa_variant": self.local_variant_var.get().strip().lower() or "small",
+                "local_sherpa_provider": self.local_provider_var.get().strip().lower() or "cpu",
+                "local_sherpa_threads": int(self.local_threads_var.get() or 2),
+                "local_sherpa_model_dir_small": self.local_small_dir_var.get().strip(),
+                "local_sherpa_model_dir_full": self.local_full_dir_var.get().strip(),
+            }
+            self.app.config.update(updates)
+            save_config(self.app.config)
+            # 立即生效
+            self.app._validate_keys(trigger_prompt=False)
+            provider_name = self.app._channel_display_name()
+            self.app.status_var.set(f"配置已自动保存，当前识别渠道：{provider_name}。")
         except Exception:
-            return None
-
-    @staticmethod
-    def _window_name(window_id: Optional[str]) -> str:
-        """
-        获取窗口标题，便于调试。
-        """
-        if not window_id:
-            return ""
-        try:
-            result = subprocess.run(
-                ["xdotool", "getwindowname", window_id],
-                check=False,
-                capture_output=True,
-                text=True,
-                timeout=0.5
-            )
-            name = result.stdout.strip()
-            return name or ""
-        except Exception:  # pragma: no cover
-            return ""
+            self.app.logger.exception("自动保存与启用本地模型失败")
 
-    def prime_external_window(self) -> None:
-        """
-        在焦点切换前记录当前外部窗口 ID。
-        """
-        if self.input_injector and self.input_injector.can_use_uinput():
-            # Wayland 下依赖 uinput，无需记录窗口 ID。
-            self.logger.debug("已启用 uinput 自动粘贴，跳过窗口记录。")
-            self.target_window = None
-            return
+    def _get_config_value(self, key: str, field: dict[str, object]):
+        if key in self.app.config:
+            value = self.app.config[key]
+            if field.get("list"):
+                if isinstance(value, list):
+                    return value
+                if isinstance(value, str):
+                    return [item.strip() for item in value.split(",") if item.strip()]
+            return value
+        return field.get("default", CONFIG_TEMPLATE.get(key))
 
-        window_id = current_active_window()
-        if not window_id:
-            self.logger.debug("未能获取当前窗口，可能未安装 xdotool。")
-            return
-        if window_id in self._own_windows:
-            self.logger.debug("当前窗口属于 LexiSharp，自行忽略：%s", window_id)
-            return
-        if window_id == self._last_external_window:
-            self.logger.debug("外部窗口保持不变：%s", window_id)
+    def _save(self) -> None:
+        channel_key = self._get_selected_channel_key()
+        updates: dict[str, object] = {"channel": channel_key}
+        if channel_key == "local_sherpa":
+            # 从自定义控件收集配置
+            updates.update({
+                "local_sherpa_variant": self.local_variant_var.get().strip().lower() or "small",
+                "local_sherpa_provider": self.local_provider_var.get().strip().lower() or "cpu",
+                "local_sherpa_threads": int(self.local_threads_var.get() or 4),
+                "local_sherpa_model_dir_small": self.local_small_dir_var.get().strip(),
+                "local_sherpa_model_dir_full": self.local_full_dir_var.get().strip(),
+                "local_sherpa_prefer_int8": bool(self.local_prefer_int8_var.get()),
+                "local_sherpa_trim_silence": bool(self.local_trim_silence_var.get()),
+            })
         else:
-            self.logger.info("记录外部窗口：%s (%s)", window_id, self._window_name(window_id))
-        self.target_window = window_id
-        self._last_external_window = window_id
-
-    def _on_main_button_press(self, _event) -> None:
-        """
-        主窗口录音按钮按下时记录外部窗口。
-        """
-        self.prime_external_window()
-
-    def _init_hotkeys(self) -> None:
-        """
-        初始化全局快捷键。
-        """
-        if not self.start_hotkey and not self.stop_hotkey:
-            self.logger.info("未配置全局快捷键，跳过初始化。")
-            return
-        try:
-            self.hotkey_manager = GlobalHotkeyManager(
-                self.start_hotkey,
-                self.stop_hotkey,
-                self._on_hotkey_start,
-                self._on_hotkey_stop,
-                self.logger
-            )
-        except RuntimeError as exc:
-            self.logger.exception("全局快捷键初始化失败")
-            messagebox.showwarning(
-                "全局快捷键不可用",
-                f"全局快捷键初始化失败：{exc}"
-            )
-            self.hotkey_manager = None
+            fields = self.CHANNEL_FIELDS.get(channel_key, [])
 
-    def _on_hotkey_start(self) -> None:
-        """
-        全局快捷键触发开始录音。
-        """
-        self.logger.info("收到开始录音快捷键信号。")
-        self.root.after(0, self._start_from_hotkey)
+            for field in fields:
+                key = field["key"]  # type: ignore[index]
+                stored = self.field_widgets.get(key)
+                if not stored:
+                    continue
+                widget = stored.get("widget")
+                entry_type = field.get("type")
 
-    def _on_hotkey_stop(self) -> None:
-        """
-        全局快捷键触发结束录音。
-        """
-        self.logger.info("收到结束录音快捷键信号。")
-        self.root.after(0, self._stop_from_hotkey)
+                if entry_type == "entry":
+                    value_str = widget.get().strip() if isinstance(widget, tk.Entry) else ""
+                    if field.get("list"):
+                        value = [item.strip() for item in value_str.split(",") if item.strip()]
+                    elif field.get("value_type") is float:
+                        if not value_str:
+                            value_str = str(field.get("default", CONFIG_TEMPLATE.get(key, 0.0)))
+                        try:
+                            value = float(value_str)
+                        except ValueError:
+                            messagebox.showerror("设置", f"{field['label']} 需要填写数字。")  # type: ignore[index]
+                            if isinstance(widget, tk.Entry):
+                                widget.focus_set()
+                            return
+                    else:
+                        value = value_str
+                    updates[key] = value
+                elif entry_type == "boolean":
+                    var = stored.get("variable")
+                    if isinstance(var, tk.BooleanVar):
+                        updates[key] = bool(var.get())
+                elif entry_type == "text":
+                    if isinstance(widget, tk.Text):
+                        updates[key] = widget.get("1.0", tk.END).strip()
 
-    def _start_from_hotkey(self) -> None:
-        """
-        热键触发的开始录音逻辑。
-        """
-        if self.processing or self.recorder.is_running():
-            self.logger.info(
-                "忽略开始录音快捷键：processing=%s, is_running=%s",
-                self.processing,
-                self.recorder.is_running()
-            )
+        candidate_config = dict(self.app.config)
+        candidate_config.update(updates)
+        missing_messages, _ = self.app._collect_missing_fields(candidate_config)
+        if missing_messages:
+            detail = "、".join(missing_messages)
+            messagebox.showwarning("设置", f"保存失败：以下字段仍需填写：{detail}。")
             return
-        self.prime_external_window()
-        self.start_recording()
 
-    def _stop_from_hotkey(self) -> None:
-        """
-        热键触发的结束录音逻辑。
-        """
-        if not self.recorder.is_running():
-            self.logger.info("忽略结束录音快捷键：录音尚未开始。")
-            return
-        self.stop_recording()
+        try:
+            self.app.config.update(updates)
+            if not self.app._validate_keys(trigger_prompt=False):
+                messagebox.showwarning("设置", "仍有必填项缺失，请继续完善。")
+                return
+            save_config(self.app.config)
+            self.app.logger.info("配置已通过设置窗口更新：%s", updates.keys())
+            provider_name = self.app._channel_display_name()
+            self.app.status_var.set(f"配置已保存，当前识别渠道：{provider_name}。")
+            messagebox.showinfo("设置", "配置已保存。")
+            self.close()
+        except Exception as exc:
+            self.app.logger.exception("保存配置失败")
+            messagebox.showerror("设置", f"保存失败：{exc}")
 
-    def _schedule_level_update(self) -> None:
-        """
-        定时刷新音量指示条。
-        """
-        level = 0.0
+    def close(self) -> None:
         try:
-            level = max(0.0, min(self.recorder.current_level(), 1.0))
+            self.window.grab_release()
         except Exception:
-            level = 0.0
-        self.level_var.set(level * 100)
-        self.root.after(100, self._schedule_level_update)
-
-    def _on_close(self) -> None:
-        """
-        释放资源并关闭窗口。
-        """
-        self.logger.info("准备关闭应用。")
-        if self.hotkey_manager:
-            self.hotkey_manager.stop()
-            self.hotkey_manager = None
-
-        self._destroy_floating_button()
+            pass
+        try:
+            self.app._unregister_window(self.window)
+        except Exception:
+            pass
+        if self.window.winfo_exists():
+            self.window.destroy()
+        self.app._on_settings_closed()
 
-        if self.input_injector:
-            self.input_injector.close()
+    def _on_canvas_configure(self, event: tk.Event) -> None:  # type: ignore[type-arg]
+        try:
+            self.canvas.itemconfigure(self._canvas_window, width=event.width)
+        except Exception:
+            pass
+        self._update_scroll_region()
 
-        if self.recorder.is_running():
-            path = self.recorder.stop()
-            if path and Path(path).exists():
-                try:
-                    os.remove(path)
-                    self.logger.info("关闭时清理音频文件：%s", path)
-                except OSError:
-                    self.logger.exception("关闭时删除音频文件失败：%s", path)
+    def _update_scroll_region(self) -> None:
+        try:
+            self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+        except Exception:
+            pass
 
-        self.root.destroy()
+    def _on_mousewheel(self, event: tk.Event) -> None:  # type: ignore[type-arg]
+        try:
+            delta = 0
+            if hasattr(event, "delta") and event.delta:
+                delta = -1 if event.delta > 0 else 1
+            else:
+                if getattr(event, "num", None) == 4:
+                    delta = -1
+                elif getattr(event, "num", None) == 5:
+                    delta = 1
+            if delta:
+                self.canvas.yview_scroll(delta, "units")
+        except Exception:
+            pass
 
 
-class SettingsDialog:
+# ====== 无界面常驻模式（daemon） ======
+class LexiSharpDaemon:
     """
-    配置设置对话框，支持渠道切换与字段编辑。
+    无界面常驻模式：录音器、识别引擎与输入注入保持常驻，
+    通过 Unix 控制套接字接受 start/stop/toggle/transcribe 等命令，可选启用全局快捷键。
     """
 
-    CHANNEL_OPTIONS = [
-        ("volcengine", "火山引擎（Volcengine）"),
-        ("soniox", "Soniox"),
-        ("qwen", "通义千问（Qwen）"),
-        ("local_sherpa", "本地模型（sherpa-onnx）"),
-    ]
-
-    CHANNEL_FIELDS: dict[str, list[dict[str, object]]] = {
-        "volcengine": [
-            {
-                "key": "app_key",
-                "label": "App ID",
-                "type": "entry",
-                "help": "必填：火山引擎控制台生成的 App ID。",
-            },
-            {
-                "key": "access_key",
-                "label": "Access Key",
-                "type": "entry",
-                "help": "必填：火山引擎控制台生成的 Access Key。",
-            },
-            {
-                "key": "resource_id",
-                "label": "Resource ID",
-                "type": "entry",
-                "help": "资源标识，若官方有更新可在此调整。",
-            },
-            {
-                "key": "api_url",
-                "label": "API 地址",
-                "type": "entry",
-                "help": "ASR 请求地址，通常保持默认即可。",
-            },
-            {
-                "key": "model_name",
-                "label": "模型名称",
-                "type": "entry",
-                "help": "模型标识，例如 bigmodel。",
-            },
-        ],
-        "soniox": [
-            {
-                "key": "soniox_api_key",
-                "label": "API Key",
-                "type": "entry",
-                "help": "必填：Soniox 控制台生成的 API Key。",
-            },
-            {
-                "key": "soniox_api_base",
-                "label": "API 基础地址",
-                "type": "entry",
-                "help": "默认 https://api.soniox.com，如需代理可在此调整。",
-            },
-            {
-                "key": "soniox_model",
-                "label": "模型（Model）",
-                "type": "entry",
-                "help": "例如 stt-async-preview，可参考官方文档。",
-            },
-            {
-                "key": "soniox_language_hints",
-                "label": "语言提示（逗号分隔）",
-                "type": "entry",
-                "list": True,
-                "help": "可选：例如 zh,en，有助于提升识别准确度。",
-            },
-            {
-                "key": "soniox_enable_speaker_diarization",
-                "label": "启用说话人分离",
-                "type": "boolean",
-            },
-            {
-                "key": "soniox_enable_language_identification",
-                "label": "启用语言识别",
-                "type": "boolean",
-            },
-            {
-                "key": "soniox_context",
-                "label": "上下文提示",
-                "type": "text",
-                "height": 5,
-                "help": "可选：输入行业词汇或短语，增强识别效果（≤10K 字符）。",
-            },
-            {
-                "key": "soniox_poll_interval_s",
-                "label": "轮询间隔（秒）",
-                "type": "entry",
-                "value_type": float,
-                "default": CONFIG_TEMPLATE["soniox_poll_interval_s"],
-            },
-            {
-                "key": "soniox_poll_timeout_s",
-                "label": "超时时间（秒）",
-                "type": "entry",
-                "value_type": float,
-                "default": CONFIG_TEMPLATE["soniox_poll_timeout_s"],
-            },
-        ],
-        "qwen": [
-            {
-                "key": "qwen_api_key",
-                "label": "API Key",
-                "type": "entry",
-                "help": "必填：百炼控制台生成的 DashScope API Key，可使用环境变量 DASHSCOPE_API_KEY。",
-            },
-            {
-                "key": "qwen_model",
-                "label": "模型名称",
-                "type": "entry",
-                "default": CONFIG_TEMPLATE["qwen_model"],
-                "help": "默认 qwen3-asr-flash，如需体验版可改为 qwen-audio-asr。",
-            },
-            {
-                "key": "qwen_context",
-                "label": "上下文（Context）",
-                "type": "text",
-                "height": 4,
-                "help": "可选：用于优化识别的行业词、专有名词等提示文本。",
-            },
-            {
-                "key": "qwen_language",
-                "label": "指定语种（可选）",
-                "type": "entry",
-                "help": "可选值如 zh、en、yue，留空则自动检测语种。",
-            },
-            {
-                "key": "qwen_enable_lid",
-                "label": "启用语种识别",
-                "type": "boolean",
-            },
-            {
-                "key": "qwen_enable_itn",
-                "label": "启用逆文本规范化",
-                "type": "boolean",
-                "help": "开启后会输出更规范的数字/单位格式（仅支持中英文）。",
-            },
-        ],
-    }
-
-    def __init__(self, app: LexiSharpApp):
-        self.app = app
-        self.window = tk.Toplevel(app.root)
-        self.window.title("配置设置")
-        self.window.geometry("520x560")
-        self.window.minsize(520, 460)
-        self.window.resizable(False, False)
-        self.window.transient(app.root)
-        self.window.grab_set()
-        self.window.focus_force()
-        self.window.protocol("WM_DELETE_WINDOW", self.close)
+    def __init__(self, config: dict, logger: logging.Logger, socket_path: str, enable_hotkeys: bool = True):
+        self.config = config
+        self.logger = logger.getChild("daemon")
+        self.socket_path = Path(socket_path)
+        self.asr = ASREngine(config, logger=logger)
+        self.output = TextOutput(config, logger=logger)
+        self.spool = RecordingSpool(config, self.asr, logger, clipboard=self.output.clipboard, on_result=self._on_spool_result)
+        device = (config.get("arecord_device") or "").strip() or None
+        self.recorder = Recorder(device=device, logger=logger)
+        self.enable_hotkeys = enable_hotkeys
+        self.hotkey_manager: Optional[GlobalHotkeyManager] = None
+        self.state = "idle"
+        self.target_window: Optional[str] = None
+        self.last_text = ""
+        self.last_status = "准备就绪。"
+        # 流式渠道录音期间的中间结果，可通过 status 查询
+        self.partial_text = ""
+        self.asr.on_partial = self._on_partial
+        self._lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._stop_event = threading.Event()
 
-        self.label_map = {key: label for key, label in self.CHANNEL_OPTIONS}
-        self.value_map = {label: key for key, label in self.CHANNEL_OPTIONS}
+    def _on_partial(self, text: str) -> None:
+        self.partial_text = text
 
-        current_channel = (app.config.get("channel") or "volcengine").strip().lower()
-        if current_channel not in self.label_map:
-            current_channel = "volcengine"
+    def _on_spool_result(self, text: str, record: dict) -> None:
+        self.last_text = text
+        self.last_status = f"已补识别 {record['recorded_at']} 的录音。"
 
-        top_frame = tk.Frame(self.window, padx=18, pady=16)
-        top_frame.pack(fill=tk.X)
+    # ---- 录音控制 ----
+    def start_recording(self) -> dict:
+        with self._lock:
+            if self.state != "idle":
+                return {"ok": False, "error": f"当前状态为 {self.state}，无法开始录音。", "state": self.state}
+            missing, _ = self.asr.collect_missing_fields(self.config)
+            if missing:
+                return {"ok": False, "error": f"配置缺失：{'、'.join(missing)}", "state": self.state}
+            self.target_window = None if self.output.input_injector.can_use_uinput() else current_active_window()
+            self.partial_text = ""
+            self.asr.attach_recorder(self.recorder)
+            try:
+                path = self.recorder.start()
+            except RuntimeError as exc:
+                self.logger.exception("启动录音失败")
+                return {"ok": False, "error": str(exc), "state": self.state}
+            self.state = "recording"
+        self.asr.warm_up()
+        self.logger.info("开始录音：%s，目标窗口：%s", path, self.target_window or "无")
+        return {"ok": True, "state": "recording"}
+
+    def stop_recording(self, deliver: bool = True) -> dict:
+        """
+        结束录音并同步完成识别，返回识别文本。
+        """
+        with self._lock:
+            if self.state != "recording":
+                return {"ok": False, "error": "录音尚未开始。", "state": self.state}
+            self.state = "processing"
+        path = self.recorder.stop()
+        try:
+            if not path or not Path(path).exists():
+                self.last_status = "未捕获到音频文件，请重试。"
+                return {"ok": False, "error": self.last_status, "state": "idle"}
+            return self._recognize(path, deliver, self.target_window, spool=True)
+        finally:
+            if path and Path(path).exists():
+                try:
+                    os.remove(path)
+                except OSError:
+                    self.logger.exception("删除音频文件失败：%s", path)
+            with self._lock:
+                self.state = "idle"
 
-        channel_label = tk.Label(
-            top_frame,
-            text="识别渠道",
-            font=("WenQuanYi Micro Hei", 12, "bold")
-        )
-        channel_label.pack(anchor=tk.W)
+    def toggle(self, deliver: bool = True) -> dict:
+        with self._lock:
+            recording = self.state == "recording"
+        if recording:
+            return self.stop_recording(deliver=deliver)
+        return self.start_recording()
+
+    def transcribe_file(self, audio_file: str, deliver: bool = False) -> dict:
+        if not Path(audio_file).is_file():
+            return {"ok": False, "error": f"文件不存在：{audio_file}"}
+        target = current_active_window() if deliver and not self.output.input_injector.can_use_uinput() else None
+        return self._recognize(audio_file, deliver, target, use_cache=True)
+
+    def _recognize(
+        self, audio_file: str, deliver: bool, target_window: Optional[str], spool: bool = False, use_cache: bool = False
+    ) -> dict:
+        """
+        识别音频文件；spool=True（本次录音）时识别失败的录音移入暂存区，恢复后自动补识别；
+        use_cache=True（ctl transcribe 识别已有文件）时读写识别缓存。
+        """
+        started = time.perf_counter()
+        try:
+            text = self.asr.transcribe(audio_file, use_cache=use_cache)
+        except Exception as exc:  # pylint: disable=broad-except
+            self.logger.exception("识别流程发生异常")
+            self.last_status = f"识别失败：{exc}"
+            if spool and self.spool.keep(audio_file, exc):
+                self.last_status += "（录音已暂存，恢复后自动补识别）"
+            return {"ok": False, "error": self.last_status}
+        self.spool.notify_online()
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        if not text:
+            self.last_status = "未获得识别结果，请检查日志或稍后再试。"
+            return {"ok": False, "error": self.last_status}
+        self.last_text = text
+        self.last_status = self.output.deliver(text, target_window) if deliver else "识别完成。"
+        self.logger.info("识别完成，耗时 %.0f ms：%s", elapsed_ms, self.last_status)
+        return {"ok": True, "text": text, "status": self.last_status, "elapsed_ms": round(elapsed_ms, 1)}
+
+    def status(self) -> dict:
+        return {
+            "ok": True,
+            "state": self.state,
+            "channel": self.asr.display_name(),
+            "last_text": self.last_text,
+            "partial_text": self.partial_text,
+            "last_status": self.last_status,
+            "spool_pending": self.spool.pending(),
+            "cache": self.asr.cache.stats(),
+            "level": round(self.recorder.current_level(), 3) if self.recorder.is_running() else 0.0,
+        }
 
-        self.channel_var = tk.StringVar(value=self.label_map[current_channel])
-        self.channel_combobox = ttk.Combobox(
-            top_frame,
-            textvariable=self.channel_var,
-            state="readonly",
-            values=[label for _, label in self.CHANNEL_OPTIONS],
-            width=28
-        )
-        self.channel_combobox.pack(anchor=tk.W, pady=(4, 10))
-        self.channel_combobox.bind("<<ComboboxSelected>>", self._on_channel_change)
+    # ---- 快捷键 ----
+    def _init_hotkeys(self) -> None:
+        start_hotkey = (self.config.get("start_hotkey") or "").strip()
+        stop_hotkey = (self.config.get("stop_hotkey") or "").strip()
+        if not self.enable_hotkeys or (not start_hotkey and not stop_hotkey):
+            return
+        try:
+            self.hotkey_manager = GlobalHotkeyManager(
+                start_hotkey,
+                stop_hotkey,
+                lambda: self._run_async(self.start_recording),
+                lambda: self._run_async(self.stop_recording),
+                self.logger,
+            )
+        except RuntimeError as exc:
+            self.logger.warning("全局快捷键不可用，仅接受控制套接字命令：%s", exc)
+            self.hotkey_manager = None
 
-        ttk.Separator(self.window, orient=tk.HORIZONTAL).pack(fill=tk.X, padx=18)
+    def _run_async(self, func) -> None:
+        # 识别可能耗时较长，避免阻塞快捷键监听线程
+        threading.Thread(target=func, name="DaemonAction", daemon=True).start()
+
+    # ---- 控制套接字 ----
+    def serve_forever(self) -> None:
+        _prepare_unix_socket_path(self.socket_path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(str(self.socket_path))
+        os.chmod(self.socket_path, 0o600)
+        self._sock.listen(8)
+        self._sock.settimeout(0.5)
+        self._init_hotkeys()
+        self.asr.prewarm()
+        self.output.prewarm()
+        self.spool.start()
+        self.logger.info("常驻模式已启动：%s，识别渠道：%s", self.socket_path, self.asr.display_name())
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    conn, _ = self._sock.accept()
+                except socket.timeout:
+                    continue
+                except OSError:
+                    if self._stop_event.is_set():
+                        break
+                    raise
+                threading.Thread(target=self._handle_client, args=(conn,), name="DaemonClient", daemon=True).start()
+        finally:
+            self.shutdown()
 
-        scroll_container = tk.Frame(self.window)
-        scroll_container.pack(fill=tk.BOTH, expand=True, padx=18, pady=(12, 0))
+    def shutdown(self) -> None:
+        self._stop_event.set()
+        if self.hotkey_manager:
+            self.hotkey_manager.stop()
+            self.hotkey_manager = None
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+                try:
+                    self.socket_path.unlink()
+                except OSError:
+                    pass
+            if self.recorder.is_running():
+                path = self.recorder.stop()
+                if path and Path(path).exists():
+                    os.remove(path)
+            self.spool.close()
+            self.output.close()
+            self.asr.close()
+            self.logger.info("常驻模式已停止。")
+
+    def _handle_client(self, conn: socket.socket) -> None:
+        with conn:
+            if _peer_uid(conn) not in {os.getuid(), 0}:
+                self.logger.warning("拒绝其他用户的控制连接。")
+                return
+            try:
+                header, _ = recv_frame(conn)
+            except (ConnectionError, OSError, ValueError):
+                return
+            try:
+                reply = self._dispatch(header)
+            except Exception as exc:  # pylint: disable=broad-except
+                self.logger.exception("处理控制命令失败：%s", header.get("op"))
+                reply = {"ok": False, "error": str(exc)}
+            try:
+                send_frame(conn, reply)
+            except OSError:
+                pass
+            if header.get("op") == "quit":
+                # 应答写出后再通知主循环退出，由 serve_forever 负责清理
+                self._stop_event.set()
+
+    def _dispatch(self, header: dict) -> dict:
+        op = header.get("op")
+        deliver = bool(header.get("deliver", True))
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        if op == "status":
+            return self.status()
+        if op == "start":
+            return self.start_recording()
+        if op == "stop":
+            return self.stop_recording(deliver=deliver)
+        if op == "toggle":
+            return self.toggle(deliver=deliver)
+        if op == "transcribe":
+            return self.transcribe_file(str(header.get("path") or ""), deliver=bool(header.get("deliver", False)))
+        if op == "quit":
+            return {"ok": True}
+        return {"ok": False, "error": f"未知命令：{op}"}
+
+
+def run_daemon(args: argparse.Namespace, config: dict, logger: logging.Logger) -> int:
+    """
+    以无界面常驻模式运行（不创建 Tk 窗口）。
+    """
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(name)s - %(message)s"))
+    logger.addHandler(console)
+    daemon = LexiSharpDaemon(
+        config,
+        logger,
+        socket_path=args.socket or default_daemon_socket(config),
+        enable_hotkeys=not args.no_hotkeys,
+    )
+    signal.signal(signal.SIGTERM, lambda *_: daemon.shutdown())
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError as exc:
+        print(f"常驻模式启动失败：{exc}", file=sys.stderr)
+        return 1
+    return 0
 
-        self.canvas = tk.Canvas(
-            scroll_container,
-            borderwidth=0,
-            highlightthickness=0,
-            width=0,
-            height=0
-        )
-        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
-        scrollbar = ttk.Scrollbar(scroll_container, orient=tk.VERTICAL, command=self.canvas.yview)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.canvas.configure(yscrollcommand=scrollbar.set)
+# ====== 本地引擎基准测试 ======
+BENCH_DIR = CONFIG_DIR / "bench"
 
-        self.channel_frame = ttk.Frame(self.canvas)
-        self._canvas_window = self.canvas.create_window((0, 0), window=self.channel_frame, anchor="nw")
-        self.channel_frame.bind("<Configure>", lambda _event: self._update_scroll_region())
-        self.canvas.bind("<Configure>", self._on_canvas_configure)
-        self.canvas.bind("<MouseWheel>", self._on_mousewheel)
-        self.canvas.bind("<Button-4>", self._on_mousewheel)  # Linux scroll up
-        self.canvas.bind("<Button-5>", self._on_mousewheel)  # Linux scroll down
 
-        button_frame = ttk.Frame(self.window, padding=(18, 12))
-        button_frame.pack(fill=tk.X, pady=(0, 12))
+def _percentile(values: List[float], pct: float) -> float:
+    """
+    线性插值计算分位数，values 为空时返回 0。
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _current_rss_mb() -> float:
+    """
+    读取当前进程常驻内存（MB），仅支持 Linux /proc。
+    """
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return 0.0
 
-        save_button = ttk.Button(
-            button_frame,
-            text="保存",
-            width=10,
-            command=self._save
-        )
-        save_button.pack(side=tk.RIGHT, padx=(6, 0))
 
-        cancel_button = ttk.Button(
-            button_frame,
-            text="取消",
-            width=10,
-            command=self.close
-        )
-        cancel_button.pack(side=tk.RIGHT)
+def _peak_rss_mb() -> float:
+    """
+    返回当前进程的峰值常驻内存（MB）。
+    """
+    # Linux 下 ru_maxrss 单位为 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
 
-        self.field_widgets: dict[str, dict[str, object]] = {}
 
-        try:
-            self.app._register_window(self.window)
-        except Exception:
-            self.app.logger.exception("注册设置窗口失败")
+def _synthetic_utterance(duration_s: float, sample_rate: int, seed: int) -> "np.ndarray":
+    """
+    生成近似语音包络的合成音频（谐波 + 音节调制 + 噪声），保证不同版本间输入一致。
+    """
+    rng = np.random.default_rng(seed)
+    n = max(1, int(duration_s * sample_rate))
+    t = np.arange(n, dtype=np.float32) / sample_rate
+    f0 = 120.0 + 60.0 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = np.clip(np.sin(2 * np.pi * 4.0 * t), 0.0, None) ** 0.5
+    noise = rng.normal(0.0, 0.02, n)
+    return (0.25 * voiced * envelope + noise).astype(np.float32)
+
+
+def _iter_wav_files(paths: List[str]):
+    """
+    逐个产出文件与目录参数中的 wav 文件（目录按名称顺序递归遍历，不一次性展开）。
+    """
+    for raw in paths:
+        path = Path(os.path.expanduser(raw))
+        if path.is_file():
+            yield str(path)
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.lower().endswith(".wav"):
+                    yield os.path.join(dirpath, filename)
+
+
+def _collect_wav_files(paths: List[str]) -> List[str]:
+    """
+    展开文件与目录参数，返回排序后的 wav 文件列表。
+    """
+    return list(_iter_wav_files(paths))
 
-        # 本地引擎变量（仅在 local_sherpa 使用）
-        self.local_variant_var = tk.StringVar(value=str(app.config.get("local_sherpa_variant", "small")))
-        self.local_provider_var = tk.StringVar(value=str(app.config.get("local_sherpa_provider", "cpu")))
-        self.local_threads_var = tk.IntVar(value=int(app.config.get("local_sherpa_threads", 4)))
-        self.local_small_dir_var = tk.StringVar(value=str(app.config.get("local_sherpa_model_dir_small", "")))
-        self.local_full_dir_var = tk.StringVar(value=str(app.config.get("local_sherpa_model_dir_full", "")))
-        self.local_prefer_int8_var = tk.BooleanVar(value=bool(app.config.get("local_sherpa_prefer_int8", True)))
-        self.local_trim_silence_var = tk.BooleanVar(value=bool(app.config.get("local_sherpa_trim_silence", False)))
-        # 已移除 Hugging Face 仓库配置，仅保留 GitHub Releases 下载
 
-        self._render_channel_fields(current_channel)
+def _split_option(value: Optional[str]) -> List[str]:
+    """
+    解析逗号分隔的命令行参数。
+    """
+    return [item.strip() for item in str(value or "").split(",") if item.strip()]
 
-    def _on_channel_change(self, _event=None) -> None:
-        channel_key = self._get_selected_channel_key()
-        self._render_channel_fields(channel_key)
 
-    def _get_selected_channel_key(self) -> str:
-        label = self.channel_var.get()
-        return self.value_map.get(label, "volcengine")
+def _parse_bool(value: str) -> bool:
+    return value.strip().lower() in {"1", "true", "yes", "on", "y"}
 
-    def _render_channel_fields(self, channel: str) -> None:
-        for child in self.channel_frame.winfo_children():
-            child.destroy()
-        self.field_widgets.clear()
 
-        # 本地引擎自渲染
-        if channel == "local_sherpa":
-            self._render_local_sherpa_panel()
-            self._update_scroll_region()
-            return
+def _bench_case_worker(case: dict, corpus: dict, conn) -> None:
+    """
+    基准测试子进程入口：冷启动加载模型并测量解码延迟，结果通过管道回传。
+    每个配置独立进程运行，保证冷启动时间与峰值内存互不干扰。
+    """
+    logger = logging.getLogger("lexisharp.bench")
+    try:
+        engine = LocalSherpaEngine(case["config"], logger=logger)
+        utterances: list[tuple[str, "np.ndarray", int]] = []
+        for path in corpus.get("files", []):
+            samples, sr = engine.read_wav(path)
+            utterances.append((Path(path).name, samples, sr))
+        for index, duration in enumerate(corpus.get("synthetic", [])):
+            samples = _synthetic_utterance(float(duration), engine.sample_rate, seed=index)
+            utterances.append((f"synthetic-{duration}s", samples, engine.sample_rate))
+        if not utterances:
+            raise RuntimeError("语料为空。")
+
+        rss_baseline = _current_rss_mb()
+        started = time.perf_counter()
+        spec = engine.resolve_model(case["model_dir"])
+        recognizer = engine.load(spec, case["decoding_method"])
+        cold_load_s = time.perf_counter() - started
+        rss_loaded = _current_rss_mb()
+
+        # 首次解码通常包含 onnxruntime 的惰性初始化，单独统计
+        name, samples, sr = utterances[0]
+        started = time.perf_counter()
+        sample_text = engine.decode(recognizer, samples, sr)
+        first_decode_s = time.perf_counter() - started
+
+        for _ in range(max(0, int(corpus.get("warmup", 1)))):
+            for _name, samples, sr in utterances:
+                engine.decode(recognizer, samples, sr)
+
+        latencies: List[float] = []
+        audio_total = 0.0
+        decode_total = 0.0
+        for _ in range(max(1, int(corpus.get("repeat", 3)))):
+            for _name, samples, sr in utterances:
+                started = time.perf_counter()
+                engine.decode(recognizer, samples, sr)
+                elapsed = time.perf_counter() - started
+                latencies.append(elapsed * 1000.0)
+                decode_total += elapsed
+                audio_total += len(samples) / float(sr)
+
+        conn.send({
+            "ok": True,
+            "model_type": spec.model_type,
+            "cold_load_s": round(cold_load_s, 4),
+            "first_decode_s": round(first_decode_s, 4),
+            "warm_rtf": round(decode_total / audio_total, 5) if audio_total else None,
+            "latency_ms": {
+                "p50": round(_percentile(latencies, 50), 2),
+                "p95": round(_percentile(latencies, 95), 2),
+                "p99": round(_percentile(latencies, 99), 2),
+                "mean": round(sum(latencies) / len(latencies), 2),
+                "max": round(max(latencies), 2),
+            },
+            "decodes": len(latencies),
+            "audio_s": round(audio_total, 3),
+            "rss_baseline_mb": round(rss_baseline, 1),
+            "rss_loaded_mb": round(rss_loaded, 1),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+            "sample_text": sample_text[:80],
+        })
+    except Exception as exc:  # pylint: disable=broad-except
+        conn.send({"ok": False, "error": f"{type(exc).__name__}: {exc}"})
+    finally:
+        conn.close()
 
-        fields = self.CHANNEL_FIELDS.get(channel, [])
-        if not fields:
-            empty_label = tk.Label(
-                self.channel_frame,
-                text="当前渠道暂无可配置项。",
-                font=("WenQuanYi Micro Hei", 11),
-                fg="#666666"
-            )
-            empty_label.pack(anchor=tk.W)
-            return
 
-        for field in fields:
-            label = tk.Label(
-                self.channel_frame,
-                text=field["label"],
-                font=("WenQuanYi Micro Hei", 12)
+def _package_version(name: str) -> Optional[str]:
+    try:
+        return importlib_metadata.version(name)
+    except importlib_metadata.PackageNotFoundError:
+        return None
+
+
+def _bench_matrix(args: argparse.Namespace, config: dict) -> List[dict]:
+    """
+    根据命令行参数展开配置矩阵，未指定的维度沿用当前配置。
+    """
+    model_dirs = list(args.model_dir or [])
+    if not model_dirs:
+        for variant in ("small", "full"):
+            candidate = str(config.get(f"local_sherpa_model_dir_{variant}") or "").strip()
+            if candidate and Path(os.path.expanduser(candidate)).exists():
+                model_dirs.append(candidate)
+    providers = _split_option(args.provider) or [str(config.get("local_sherpa_provider") or "cpu")]
+    threads = [int(v) for v in _split_option(args.threads)] or [int(config.get("local_sherpa_threads", 4))]
+    int8_options = [_parse_bool(v) for v in _split_option(args.prefer_int8)] or [
+        bool(config.get("local_sherpa_prefer_int8", True))
+    ]
+    decoding = _split_option(args.decoding) or [
+        str(config.get("local_sherpa_decoding_method") or "").strip() or "greedy_search"
+    ]
+
+    cases: List[dict] = []
+    for model_dir in model_dirs:
+        for provider in providers:
+            for num_threads in threads:
+                for prefer_int8 in int8_options:
+                    for method in decoding:
+                        case_config = dict(config)
+                        case_config.update({
+                            "local_sherpa_provider": provider.lower(),
+                            "local_sherpa_threads": num_threads,
+                            "local_sherpa_prefer_int8": prefer_int8,
+                            "local_sherpa_decoding_method": method,
+                            # 基准测试衡量模型本身，不做去静音预处理
+                            "local_sherpa_trim_silence": False,
+                        })
+                        cases.append({
+                            "model_dir": str(Path(os.path.expanduser(model_dir)).resolve()),
+                            "provider": provider.lower(),
+                            "threads": num_threads,
+                            "prefer_int8": prefer_int8,
+                            "decoding_method": method,
+                            "config": case_config,
+                        })
+    return cases
+
+
+def run_benchmark(args: argparse.Namespace, config: dict, logger: logging.Logger) -> int:
+    """
+    对每个本地模型配置运行语料，输出冷启动耗时、热态 RTF、延迟分位与峰值内存，并写入 JSON。
+    """
+    if not LocalSherpaEngine.is_available():
+        print("本地引擎不可用：请先安装 sherpa-onnx onnxruntime numpy。", file=sys.stderr)
+        return 2
+
+    files = _collect_wav_files(args.wav or [])
+    synthetic = [float(v) for v in _split_option(args.synthetic)]
+    if args.wav and not files:
+        print("未找到可用的 WAV 文件。", file=sys.stderr)
+        return 2
+    if not files and not synthetic:
+        synthetic = [1.0, 3.0, 10.0]
+    corpus = {"files": files, "synthetic": synthetic, "repeat": args.repeat, "warmup": args.warmup}
+
+    cases = _bench_matrix(args, config)
+    if not cases:
+        print("未找到可测试的模型目录，请通过 --model-dir 指定。", file=sys.stderr)
+        return 2
+
+    logger.info("开始本地引擎基准测试：%d 个配置，文件 %d 个，合成音频 %s", len(cases), len(files), synthetic)
+    ctx = multiprocessing.get_context("spawn")
+    results: List[dict] = []
+    for index, case in enumerate(cases, start=1):
+        label = (
+            f"{Path(case['model_dir']).name} provider={case['provider']} threads={case['threads']} "
+            f"int8={'on' if case['prefer_int8'] else 'off'} {case['decoding_method']}"
+        )
+        print(f"[{index}/{len(cases)}] {label}", flush=True)
+        parent_conn, child_conn = ctx.Pipe(duplex=False)
+        process = ctx.Process(
+            target=_bench_case_worker,
+            args=(case, corpus, child_conn),
+            name=f"Bench-{index}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        outcome: dict
+        if parent_conn.poll(args.timeout):
+            try:
+                outcome = parent_conn.recv()
+            except EOFError:
+                outcome = {"ok": False, "error": "子进程异常退出"}
+        else:
+            outcome = {"ok": False, "error": f"超时（>{args.timeout}s）"}
+        process.join(timeout=5)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        if not outcome.get("ok") and process.exitcode not in (0, None):
+            outcome["exitcode"] = process.exitcode
+        record = {key: value for key, value in case.items() if key != "config"}
+        record.update(outcome)
+        results.append(record)
+        if outcome.get("ok"):
+            lat = outcome["latency_ms"]
+            print(
+                f"    cold_load={outcome['cold_load_s']:.2f}s first={outcome['first_decode_s']:.3f}s "
+                f"rtf={outcome['warm_rtf']} p50={lat['p50']}ms p95={lat['p95']}ms p99={lat['p99']}ms "
+                f"peak_rss={outcome['peak_rss_mb']}MB",
+                flush=True,
             )
-            label.pack(anchor=tk.W, pady=(0, 2))
+        else:
+            print(f"    失败：{outcome.get('error')}", flush=True)
+            logger.warning("基准测试配置失败：%s - %s", label, outcome.get("error"))
+
+    report = {
+        "schema": 1,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "versions": {
+            "sherpa_onnx": _package_version("sherpa-onnx"),
+            "onnxruntime": _package_version("onnxruntime") or _package_version("onnxruntime-gpu"),
+            "numpy": _package_version("numpy"),
+        },
+        "corpus": {
+            "files": files,
+            "synthetic_durations_s": synthetic,
+            "repeat": args.repeat,
+            "warmup": args.warmup,
+        },
+        "results": results,
+    }
+    output = Path(args.output) if args.output else BENCH_DIR / f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"结果已写入：{output}")
+    logger.info("本地引擎基准测试完成，结果：%s", output)
+    return 0 if all(item.get("ok") for item in results) else 1
 
-            key = field["key"]  # type: ignore[index]
-            current_value = self._get_config_value(key, field)
-            entry_type = field.get("type")
 
-            if entry_type == "entry":
-                entry = tk.Entry(self.channel_frame, width=38)
-                if isinstance(current_value, list):
-                    entry.insert(0, ", ".join(current_value))
-                elif current_value not in (None, ""):
-                    entry.insert(0, str(current_value))
-                entry.pack(anchor=tk.W, pady=(0, 6))
-                self.field_widgets[key] = {"widget": entry, "field": field}
-            elif entry_type == "boolean":
-                var = tk.BooleanVar(value=bool(current_value))
-                checkbox = tk.Checkbutton(
-                    self.channel_frame,
-                    text="启用",
-                    variable=var,
-                    font=("WenQuanYi Micro Hei", 11)
-                )
-                checkbox.pack(anchor=tk.W, pady=(0, 6))
-                self.field_widgets[key] = {"widget": checkbox, "variable": var, "field": field}
-            elif entry_type == "text":
-                height = field.get("height", 4)
-                text_widget = tk.Text(self.channel_frame, width=42, height=int(height))
-                text_widget.insert("1.0", str(current_value or ""))
-                text_widget.pack(anchor=tk.W, pady=(0, 6))
-                self.field_widgets[key] = {"widget": text_widget, "field": field}
-            else:
-                placeholder = tk.Label(
-                    self.channel_frame,
-                    text="暂不支持的字段类型",
-                    fg="red"
-                )
-                placeholder.pack(anchor=tk.W, pady=(0, 6))
-                continue
+# ====== 边录边传基准测试 ======
+class _StandInSonioxHandler(BaseHTTPRequestHandler):
+    """
+    本地替身 Soniox 服务：按限定带宽读取上传数据，记录上传起止时间，模拟转写处理耗时。
+    """
+
+    protocol_version = "HTTP/1.1"
+    # 由 run_upload_bench 设置：uplink_bps、processing_s、uploads（上传起止时间记录）
+    state: dict = {}
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        return
+
+    def _send_json(self, status: int, payload: Optional[dict] = None) -> None:
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _throttled_read(self, size: int) -> int:
+        received = 0
+        while received < size:
+            block = self.rfile.read(min(4096, size - received))
+            if not block:
+                break
+            received += len(block)
+            time.sleep(len(block) / self.state["uplink_bps"])
+        return received
+
+    def _read_body(self) -> int:
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            total = 0
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return total
+                total += self._throttled_read(size)
+                self.rfile.readline()
+        return self._throttled_read(int(self.headers.get("Content-Length") or 0))
+
+    def do_POST(self):  # noqa: N802
+        if self.path == "/v1/files":
+            record = {"started": time.monotonic()}
+            record["bytes"] = self._read_body()
+            record["finished"] = time.monotonic()
+            record["chunked"] = "chunked" in self.headers.get("Transfer-Encoding", "").lower()
+            self.state["uploads"].append(record)
+            self._send_json(201, {"id": f"file-{len(self.state['uploads'])}"})
+        elif self.path == "/v1/transcriptions":
+            self._read_body()
+            self.state["ready_at"] = time.monotonic() + self.state["processing_s"]
+            self._send_json(201, {"id": "bench"})
+        else:
+            self._send_json(404, {})
+
+    def do_GET(self):  # noqa: N802
+        if self.path == "/v1/transcriptions/bench":
+            done = time.monotonic() >= self.state.get("ready_at", 0.0)
+            self._send_json(200, {"status": "completed" if done else "processing"})
+        elif self.path == "/v1/transcriptions/bench/transcript":
+            self._send_json(200, {"text": "ok"})
+        else:
+            self._send_json(404, {})
+
+    def do_DELETE(self):  # noqa: N802
+        self._send_json(204)
+
 
-            help_text = field.get("help")
-            if help_text:
-                help_label = tk.Label(
-                    self.channel_frame,
-                    text=str(help_text),
-                    font=("WenQuanYi Micro Hei", 10),
-                    fg="#666666",
-                    wraplength=360,
-                    justify=tk.LEFT
-                )
-                help_label.pack(anchor=tk.W, pady=(0, 8))
+class _ReplayRecorder:
+    """
+    以录音的节奏回放 WAV 文件并驱动录音监听者，代替 arecord 用于基准测试。
+    """
 
-        self._update_scroll_region()
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self._listeners: list = []
 
-    # ===== 本地模型（sherpa-onnx）设置面板 =====
-    def _render_local_sherpa_panel(self) -> None:
-        title = tk.Label(
-            self.channel_frame,
-            text="本地模型选择",
-            font=("WenQuanYi Micro Hei", 12, "bold")
-        )
-        title.pack(anchor=tk.W, pady=(0, 6))
+    def add_listener(self, listener) -> None:
+        self._listeners.append(listener)
 
-        # small / full 单选
-        variant_frame = tk.Frame(self.channel_frame)
-        variant_frame.pack(anchor=tk.W, pady=(0, 6), fill=tk.X)
-        tk.Radiobutton(
-            variant_frame,
-            text="small（小模型≈300MB，INT8，速度优先）",
-            variable=self.local_variant_var,
-            value="small",
-            command=self._update_local_status
-        ).pack(anchor=tk.W)
-        tk.Radiobutton(
-            variant_frame,
-            text="full（大模型≈900MB，FP，准确度优先）",
-            variable=self.local_variant_var,
-            value="full",
-            command=self._update_local_status
-        ).pack(anchor=tk.W)
+    def replay(self, frames: bytes, speed: float) -> str:
+        tmp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
+        tmp_file.close()
+        listeners, self._listeners = self._listeners, []
+        for listener in listeners:
+            listener.start(tmp_file.name)
+        step = self.sample_rate // 10 * 2
+        with wave.open(tmp_file.name, "wb") as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(self.sample_rate)
+            for offset in range(0, len(frames), step):
+                chunk = frames[offset:offset + step]
+                wf.writeframes(chunk)
+                for listener in listeners:
+                    listener.feed(chunk)
+                time.sleep(0.1 / speed)
+        for listener in listeners:
+            listener.close()
+        return tmp_file.name
+
+
+def run_upload_bench(args: argparse.Namespace, config: dict, logger: logging.Logger) -> int:
+    """
+    使用本地替身 Soniox 服务对比“录音结束后上传”与“边录边传”的停止录音到出字延迟。
+    """
+    if args.wav:
+        try:
+            with wave.open(args.wav, "rb") as wf:
+                if wf.getsampwidth() != 2 or wf.getnchannels() != 1:
+                    print("仅支持 16-bit 单声道 WAV。", file=sys.stderr)
+                    return 2
+                sample_rate = wf.getframerate()
+                frames = wf.readframes(wf.getnframes())
+        except (OSError, wave.Error) as exc:
+            print(f"读取 WAV 失败：{exc}", file=sys.stderr)
+            return 2
+    else:
+        if np is None:
+            print("合成音频需要 numpy，请安装后重试或通过 --wav 指定文件。", file=sys.stderr)
+            return 2
+        sample_rate = 16000
+        frames = (_synthetic_utterance(args.seconds, sample_rate, seed=0) * 32767).astype("<i2").tobytes()
+    duration = len(frames) / 2 / sample_rate
+
+    state = {"uplink_bps": args.uplink_kbps * 1000 / 8, "processing_s": args.processing_ms / 1000.0, "uploads": []}
+    handler = type("StandInSonioxHandler", (_StandInSonioxHandler,), {"state": state})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, name="StandInSoniox", daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(
+        f"替身服务 {base_url}：音频 {duration:.1f}s（{len(frames)} 字节），上行 {args.uplink_kbps:g} kbps，"
+        f"处理耗时 {args.processing_ms:g} ms，回放速度 {args.speed:g}x",
+        flush=True,
+    )
 
-        # 目录与状态
-        path_frame = tk.Frame(self.channel_frame)
-        path_frame.pack(anchor=tk.W, pady=(6, 2), fill=tk.X)
-        tk.Label(path_frame, text="模型目录：").pack(side=tk.LEFT)
-        self.local_path_entry = tk.Entry(path_frame, width=36)
-        self.local_path_entry.pack(side=tk.LEFT, padx=(4, 4))
-        tk.Button(path_frame, text="选择…", command=self._browse_local_dir).pack(side=tk.LEFT)
+    results: dict[str, List[float]] = {}
+    try:
+        for live in (False, True):
+            label = "边录边传" if live else "录音结束后上传"
+            bench_config = dict(
+                config,
+                channel="soniox",
+                soniox_api_base=base_url,
+                soniox_api_key="bench",
+                soniox_live_upload=live,
+                soniox_upload_codec="wav",
+                http_warmup=False,
+                # 每轮回放的是同一段音频，命中识别缓存就测不到上传与识别的耗时
+                transcript_cache_enabled=False,
+            )
+            asr = ASREngine(bench_config, logger=logger)
+            recorder = _ReplayRecorder(sample_rate)
+            latencies: List[float] = []
+            try:
+                for _ in range(max(1, args.repeat)):
+                    asr.attach_recorder(recorder)
+                    path = recorder.replay(frames, args.speed)
+                    stopped = time.monotonic()
+                    try:
+                        asr.transcribe(path)
+                    finally:
+                        os.remove(path)
+                    latency_ms = (time.monotonic() - stopped) * 1000.0
+                    upload = state["uploads"][-1]
+                    latencies.append(latency_ms)
+                    print(
+                        f"  {label}：停止到出字 {latency_ms:.0f} ms，上传起止（相对停止录音）"
+                        f"{(upload['started'] - stopped) * 1000.0:+.0f} ~ {(upload['finished'] - stopped) * 1000.0:+.0f} ms"
+                        f"（{upload['bytes']} 字节，{'分块传输' if upload['chunked'] else 'Content-Length'}）",
+                        flush=True,
+                    )
+            finally:
+                asr.close()
+            results[label] = latencies
+    finally:
+        server.shutdown()
+        server.server_close()
 
-        self.local_status_label = tk.Label(
-            self.channel_frame,
-            text="正在检测模型…",
-            fg="#666666",
-            wraplength=360,
-            justify=tk.LEFT
-        )
-        self.local_status_label.pack(anchor=tk.W, pady=(4, 8))
+    before = _percentile(results["录音结束后上传"], 50)
+    after = _percentile(results["边录边传"], 50)
+    print(f"中位延迟：录音结束后上传 {before:.0f} ms，边录边传 {after:.0f} ms，节省 {before - after:.0f} ms")
+    logger.info("边录边传基准测试：%.0f ms -> %.0f ms", before, after)
+    return 0
 
-        # GitHub Releases 下载（支持加速）
-        gh_frame = tk.LabelFrame(self.channel_frame, text="从 GitHub Releases 下载（支持加速，程序自动解压配置）")
-        gh_frame.pack(anchor=tk.W, fill=tk.X, pady=(4, 8))
 
-        url_row = tk.Frame(gh_frame)
-        url_row.pack(anchor=tk.W, pady=(4, 2), fill=tk.X)
-        tk.Label(url_row, text="GitHub 直链：").pack(side=tk.LEFT)
-        self.github_url_entry = tk.Entry(url_row, width=36)
-        self.github_url_entry.pack(side=tk.LEFT, padx=(4, 4))
+# ====== 流式识别替身服务 ======
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
 
-        accel_row = tk.Frame(gh_frame)
-        accel_row.pack(anchor=tk.W, pady=(2, 2), fill=tk.X)
-        tk.Label(accel_row, text="加速：").pack(side=tk.LEFT)
-        self.github_accel_var = tk.StringVar(value="gh-proxy.com")
-        ttk.Combobox(
-            accel_row,
-            textvariable=self.github_accel_var,
-            state="readonly",
-            values=["无加速", "gh-proxy.com", "edgeone.gh-proxy.com"],
-            width=22
-        ).pack(side=tk.LEFT, padx=(4, 12))
-        tk.Button(accel_row, text="下载/更新", command=self._download_via_github).pack(side=tk.LEFT)
 
-        tip2 = (
-            "若网络较慢，推荐选择 gh-proxy.com 或 edgeone.gh-proxy.com 进行加速。\n"
-            "下载完成后会自动解压到当前规格目录并生效。"
-        )
-        tk.Label(gh_frame, text=tip2, fg="#666666", justify=tk.LEFT, wraplength=360).pack(anchor=tk.W, pady=(2, 2))
+def _ws_read_exact(conn: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        block = conn.recv(size - len(data))
+        if not block:
+            raise ConnectionError("连接已关闭")
+        data += block
+    return data
 
-        # 推理参数
-        infer_frame = tk.LabelFrame(self.channel_frame, text="推理设置")
-        infer_frame.pack(anchor=tk.W, fill=tk.X, pady=(4, 8))
-        row = tk.Frame(infer_frame)
-        row.pack(anchor=tk.W, pady=(2, 2))
-        tk.Label(row, text="执行提供者：").pack(side=tk.LEFT)
-        ttk.Combobox(
-            row,
-            textvariable=self.local_provider_var,
-            state="readonly",
-            values=["cpu", "cuda"],
-            width=10
-        ).pack(side=tk.LEFT, padx=(4, 12))
-        tk.Label(row, text="线程数：").pack(side=tk.LEFT)
-        tk.Spinbox(row, from_=1, to=16, textvariable=self.local_threads_var, width=5).pack(side=tk.LEFT)
 
-        # 量化优先 & 去静音
-        toggles = tk.Frame(infer_frame)
-        toggles.pack(anchor=tk.W, pady=(6, 2))
-        tk.Checkbutton(
-            toggles,
-            text="优先使用量化模型（CPU 推荐）",
-            variable=self.local_prefer_int8_var
-        ).pack(anchor=tk.W)
-        tk.Checkbutton(
-            toggles,
-            text="去静音（VAD 预裁剪）",
-            variable=self.local_trim_silence_var
-        ).pack(anchor=tk.W)
+def _ws_recv(conn: socket.socket) -> tuple[int, bytes]:
+    """
+    读取一个（客户端带掩码的）WebSocket 帧，返回（操作码, 负载）；不处理分片。
+    """
+    first, second = _ws_read_exact(conn, 2)
+    size = second & 0x7F
+    if size == 126:
+        size = struct.unpack(">H", _ws_read_exact(conn, 2))[0]
+    elif size == 127:
+        size = struct.unpack(">Q", _ws_read_exact(conn, 8))[0]
+    mask = _ws_read_exact(conn, 4) if second & 0x80 else b""
+    payload = _ws_read_exact(conn, size)
+    if mask:
+        payload = bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+    return first & 0x0F, payload
+
+
+def _ws_send(conn: socket.socket, opcode: int, payload: bytes) -> None:
+    size = len(payload)
+    if size < 126:
+        header = struct.pack(">BB", 0x80 | opcode, size)
+    elif size < 65536:
+        header = struct.pack(">BBH", 0x80 | opcode, 126, size)
+    else:
+        header = struct.pack(">BBQ", 0x80 | opcode, 127, size)
+    conn.sendall(header + payload)
+
+
+class StreamMockServer:
+    """
+    本地流式识别替身服务：实现火山引擎二进制帧协议与 Soniox 实时 JSON 协议，每 0.5 秒音频产出一个词，便于离线调试流式渠道。
+    """
 
-        # 测试本地 WAV 文件
-        test_row = tk.Frame(infer_frame)
-        test_row.pack(anchor=tk.W, pady=(6, 2))
-        tk.Button(test_row, text="选择本地 WAV 测试识别…", command=self._test_local_wav).pack(side=tk.LEFT)
+    VOLC_PATH = "/api/v3/sauc/bigmodel"
+    SONIOX_PATH = "/transcribe-websocket"
 
-        self._update_local_status()
+    def __init__(self, host: str, port: int, latency_ms: float, logger: logging.Logger):
+        self.logger = logger
+        self.latency_s = max(0.0, latency_ms) / 1000.0
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+        self._sock.listen(16)
+        self.address = self._sock.getsockname()
+
+    def serve_forever(self) -> None:
+        while True:
+            try:
+                conn, _addr = self._sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._handle, args=(conn,), name="StreamMockClient", daemon=True).start()
+
+    def shutdown(self) -> None:
+        self._sock.close()
+
+    def _handshake(self, conn: socket.socket) -> str:
+        request = b""
+        while b"\r\n\r\n" not in request:
+            block = conn.recv(4096)
+            if not block:
+                raise ConnectionError("握手前连接已关闭")
+            request += block
+        lines = request.split(b"\r\n\r\n", 1)[0].decode("latin-1").split("\r\n")
+        path = lines[0].split(" ")[1]
+        headers = {key.strip().lower(): value.strip() for key, _, value in (line.partition(":") for line in lines[1:])}
+        accept = base64.b64encode(hashlib.sha1((headers.get("sec-websocket-key", "") + _WS_GUID).encode()).digest()).decode()
+        conn.sendall(
+            (
+                "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+            ).encode("latin-1")
+        )
+        return path
 
-    def _current_variant_dir_var(self) -> tk.StringVar:
-        """根据 small/full 返回目录变量。"""
-        if self.local_variant_var.get() == "full":
-            return self.local_full_dir_var
-        return self.local_small_dir_var
+    def _send(self, conn: socket.socket, opcode: int, payload: bytes) -> None:
+        # 模拟网络往返
+        if self.latency_s:
+            time.sleep(self.latency_s / 2)
+        _ws_send(conn, opcode, payload)
 
-    def _update_local_status(self) -> None:
-        # 同步路径输入框
-        dir_var = self._current_variant_dir_var()
-        # 若目录为空或仍为历史默认缓存路径，自动切换到配置目录
+    def _handle(self, conn: socket.socket) -> None:
         try:
-            current_dir = (dir_var.get() or "").strip()
-        except Exception:
-            current_dir = ""
-        if (not current_dir) or (".cache/lexisharp-local-asr" in current_dir):
-            variant = self.local_variant_var.get().strip().lower()
-            new_dir = (CONFIG_DIR / ("models/zh-full" if variant == "full" else "models/zh-small")).as_posix()
-            dir_var.set(new_dir)
-        self.local_path_entry.delete(0, tk.END)
-        self.local_path_entry.insert(0, dir_var.get())
+            path = self._handshake(conn)
+            self.logger.info("替身服务连接：%s", path)
+            if path.startswith(self.VOLC_PATH):
+                self._serve_volcengine(conn)
+            elif path.startswith(self.SONIOX_PATH):
+                self._serve_soniox(conn)
+            else:
+                _ws_send(conn, 0x8, struct.pack(">H", 1008))
+        except (ConnectionError, OSError, ValueError) as exc:
+            self.logger.info("替身服务连接结束：%s", exc)
+        finally:
+            conn.close()
 
-        # 设置默认 GitHub 直链
-        variant = self.local_variant_var.get().strip().lower()
-        default_url = ""
-        if variant == "small":
-            default_url = (
-                "https://github.com/k2-fsa/sherpa-onnx/releases/download/asr-models/"
-                "sherpa-onnx-sense-voice-zh-en-ja-ko-yue-int8-2025-09-09.tar.bz2"
-            )
-        else:
-            default_url = (
-                "https://github.com/k2-fsa/sherpa-onnx/releases/download/asr-models/"
-                "sherpa-onnx-sense-voice-zh-en-ja-ko-yue-2024-07-17.tar.bz2"
+    @staticmethod
+    def _words(audio_bytes: int, sample_rate: int) -> List[str]:
+        return [f"词{index + 1}" for index in range(audio_bytes // sample_rate)]
+
+    def _serve_volcengine(self, conn: socket.socket) -> None:
+        session = VolcengineStreamSession
+        audio_bytes = 0
+        sample_rate = 16000
+        while True:
+            opcode, data = _ws_recv(conn)
+            if opcode == 0x8:
+                return
+            message_type = data[1] >> 4
+            flags = data[1] & 0x0F
+            rest = data[4:]
+            if flags & 0x01:
+                rest = rest[4:]
+            size = struct.unpack(">I", rest[:4])[0]
+            body = gzip.decompress(rest[4:4 + size]) if size else b""
+            if message_type == session.FULL_CLIENT_REQUEST:
+                sample_rate = int(json.loads(body).get("audio", {}).get("rate", 16000))
+                continue
+            audio_bytes += len(body)
+            last = flags & 0b0010 != 0
+            payload = json.dumps({"result": {"text": "".join(self._words(audio_bytes, sample_rate))}}).encode("utf-8")
+            frame = session.pack(
+                session.FULL_SERVER_RESPONSE,
+                session.NEG_SEQUENCE if last else session.POS_SEQUENCE,
+                session.JSON_SERIALIZATION,
+                payload,
+                seq=1,
             )
-        try:
-            current_text = self.github_url_entry.get().strip()
-        except Exception:
-            current_text = ""
-        # 若为空或是上一个规格的默认值，则覆盖为当前规格默认
-        if not current_text or "sherpa-onnx-sense-voice-zh-en-ja-ko-yue" in current_text:
-            self.github_url_entry.delete(0, tk.END)
-            self.github_url_entry.insert(0, default_url)
+            self._send(conn, 0x2, frame)
+            if last:
+                _ws_send(conn, 0x8, struct.pack(">H", 1000))
+                return
 
-        # 检查安装状态
-        path = os.path.expanduser(dir_var.get())
-        p = Path(path)
-        if not p.exists():
-            self.local_status_label.configure(text="未检测到模型。点击“下载/更新”或选择本地目录导入。", fg="#D32F2F")
+    def _serve_soniox(self, conn: socket.socket) -> None:
+        _opcode, data = _ws_recv(conn)
+        sample_rate = int(json.loads(data).get("sample_rate", 16000))
+        audio_bytes = 0
+        sent_words = 0
+        while True:
+            opcode, data = _ws_recv(conn)
+            if opcode == 0x8:
+                return
+            if data:
+                audio_bytes += len(data)
+                words = self._words(audio_bytes, sample_rate)
+                tokens = [{"text": word, "is_final": True} for word in words[sent_words:]]
+                sent_words = len(words)
+                tokens.append({"text": "…", "is_final": False})
+                self._send(conn, 0x1, json.dumps({"tokens": tokens}).encode("utf-8"))
+                continue
+            # 空帧：音频结束，余下不足一个词的部分也作为最终结果
+            tail = [{"text": f"词{sent_words + 1}", "is_final": True}] if audio_bytes % sample_rate else []
+            self._send(conn, 0x1, json.dumps({"tokens": tail, "finished": True}).encode("utf-8"))
+            _ws_send(conn, 0x8, struct.pack(">H", 1000))
             return
-        tokens = list(p.rglob("tokens.txt"))
-        onnx = list(p.rglob("*.onnx"))
-        if tokens and onnx:
-            self.local_status_label.configure(text=f"已安装：{p}\n包含 {len(onnx)} 个 ONNX 文件。", fg="#388E3C")
-        else:
-            missing = []
-            if not tokens:
-                missing.append("tokens.txt")
-            if not onnx:
-                missing.append("*.onnx")
-            self.local_status_label.configure(text=f"目录不完整，缺少：{', '.join(missing)}", fg="#D32F2F")
 
-    def _browse_local_dir(self) -> None:
-        directory = filedialog.askdirectory(title="选择本地模型目录")
-        if not directory:
-            return
-        dir_var = self._current_variant_dir_var()
-        dir_var.set(directory)
-        self._update_local_status()
 
-    def _test_local_wav(self) -> None:
-        path = filedialog.askopenfilename(
-            title="选择 WAV 文件",
-            filetypes=[("WAV 文件", "*.wav"), ("所有文件", "*.*")],
+def run_stream_mock(args: argparse.Namespace, config: dict, logger: logging.Logger) -> int:
+    """
+    启动流式识别替身服务，直到 Ctrl+C。
+    """
+    server = StreamMockServer(args.host, args.port, args.latency_ms, logger)
+    host, port = server.address[:2]
+    print(f"流式识别替身服务已启动：ws://{host}:{port}", flush=True)
+    print(f'  火山引擎：  "volc_stream_url": "ws://{host}:{port}{StreamMockServer.VOLC_PATH}"', flush=True)
+    print(f'  Soniox：    "soniox_stream_url": "ws://{host}:{port}{StreamMockServer.SONIOX_PATH}"', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+    return 0
+
+
+# ====== 模拟键入基准测试 ======
+TYPE_BENCH_SAMPLES = {
+    "ascii": "The quick brown fox jumps over the lazy dog, 0123456789! ",
+    "mixed": "语音输入测试：The quick brown fox 跳过了懒狗，共 42 个字符。",
+}
+
+
+class _TypeBenchReceiver:
+    """
+    基准测试的接收窗口：独立 X 连接上的顶层窗口，后台线程实时把收到的按键还原为字符。
+    """
+
+    def __init__(self):
+        self.display = xlib_display.Display()
+        screen = self.display.screen()
+        self.window = screen.root.create_window(
+            0, 0, 480, 120, 0, screen.root_depth, event_mask=X.KeyPressMask | X.StructureNotifyMask
         )
-        if not path:
-            return
-        # 后台线程执行，避免阻塞 UI
-        def worker():
-            try:
-                self.app.status_var.set("测试识别中…")
-                text = self.app._call_asr(path)
-                if text:
-                    self.app._refresh_result(text)
-                    messagebox.showinfo("测试识别结果", text)
+        self.window.set_wm_name("LexiSharp type-bench")
+        self.window.map()
+        self.display.sync()
+        self.shift_keycode = self.display.keysym_to_keycode(XK.XK_Shift_L)
+        self.received: List[str] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="TypeBenchReceiver", daemon=True)
+        self._thread.start()
+
+    @property
+    def window_id(self) -> str:
+        return str(self.window.id)
+
+    def focus(self) -> None:
+        self.window.set_input_focus(X.RevertToParent, X.CurrentTime)
+        self.display.sync()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if not self.display.pending_events():
+                time.sleep(0.001)
+                continue
+            event = self.display.next_event()
+            if event.type == X.MappingNotify:
+                self.display.refresh_keyboard_mapping(event)
+            elif event.type == X.KeyPress and event.detail != self.shift_keycode:
+                keysym = self.display.keycode_to_keysym(event.detail, 1 if event.state & X.ShiftMask else 0)
+                if keysym == XK.XK_Return:
+                    self.received.append("\n")
+                elif keysym & 0xFF000000 == 0x01000000:
+                    self.received.append(chr(keysym & 0xFFFFFF))
+                elif 0 < keysym < 0x100:
+                    self.received.append(chr(keysym))
                 else:
-                    messagebox.showwarning("测试识别", "未获得识别结果，请检查模型与音频。")
-            except Exception as exc:
-                self.app.logger.exception("测试识别失败")
-                messagebox.showerror("测试识别失败", str(exc))
-        import threading
-        threading.Thread(target=worker, daemon=True).start()
+                    self.received.append("\ufffd")
 
-    def _download_via_github(self) -> None:
-        import threading, tarfile
-        from urllib.parse import urlparse
+    def wait_for(self, count: int, idle_s: float = 1.0) -> None:
+        last, deadline = len(self.received), time.monotonic() + idle_s
+        while len(self.received) < count and time.monotonic() < deadline:
+            time.sleep(0.005)
+            if len(self.received) != last:
+                last, deadline = len(self.received), time.monotonic() + idle_s
 
-        def _set_status(text: str, color: str = "#666666") -> None:
-            try:
-                self.local_status_label.configure(text=text, fg=color)
-            except Exception:
-                pass
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=1)
+        self.window.destroy()
+        self.display.close()
+
+
+def run_type_bench(args: argparse.Namespace, config: dict, logger: logging.Logger) -> int:
+    """
+    在当前 X 显示（建议 Xvfb）上创建接收窗口，分别用 XTest 与 xdotool 键入同一段文本，比较字符/秒与正确率。
+    """
+    if not XTestTyper.is_available():
+        print("需要 X11 显示与 python-xlib：请在 X11/Xvfb 会话中运行（如 xvfb-run python lexisharp.py type-bench）。", file=sys.stderr)
+        return 2
+    sample = TYPE_BENCH_SAMPLES[args.charset]
+    text = (sample * (args.chars // len(sample) + 1))[: args.chars]
+    delay_ms = max(1, int(config.get("type_delay_ms", 5)))
+    engines = _split_option(args.engines) or ["xtest", "xdotool"]
+    receiver = _TypeBenchReceiver()
+    typer = XTestTyper(logger, max_delay_ms=delay_ms)
+    results: List[dict] = []
+    try:
+        for engine in engines:
+            if engine == "xdotool" and shutil.which("xdotool") is None:
+                print("未安装 xdotool，跳过。", file=sys.stderr)
+                continue
+            for round_index in range(max(1, args.repeat)):
+                receiver.focus()
+                receiver.received.clear()
+                started = time.perf_counter()
+                if engine == "xtest":
+                    ok = typer.type_text(text)
+                else:
+                    ok = subprocess.run(
+                        ["xdotool", "type", "--window", receiver.window_id, "--delay", str(delay_ms), text],
+                        check=False,
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.DEVNULL,
+                    ).returncode == 0
+                sent_s = time.perf_counter() - started
+                receiver.wait_for(len(text))
+                received = "".join(receiver.received)
+                correct = sum(1 for a, b in zip(received, text) if a == b)
+                results.append(
+                    {
+                        "engine": engine,
+                        "round": round_index + 1,
+                        "ok": ok,
+                        "chars": len(text),
+                        "elapsed_ms": round(sent_s * 1000.0, 1),
+                        "chars_per_s": round(len(text) / sent_s, 1) if sent_s > 0 else None,
+                        "received": len(received),
+                        "accuracy": round(correct / len(text), 4),
+                    }
+                )
+    finally:
+        typer.close()
+        receiver.close()
+
+    print(f"文本：{len(text)} 个字符（{args.charset}），xdotool 按键间隔 {delay_ms} ms，XTest 自适应 0 ~ {delay_ms} ms")
+    print(f"{'引擎':<10}{'轮次':>4}{'耗时(ms)':>12}{'字符/秒':>10}{'收到':>8}{'正确率':>9}")
+    for item in results:
+        print(
+            f"{item['engine']:<10}{item['round']:>4}{item['elapsed_ms']:>12.1f}{item['chars_per_s'] or 0:>10.1f}"
+            f"{item['received']:>8}{item['accuracy'] * 100:>8.1f}%"
+        )
+    if args.output:
+        Path(args.output).expanduser().write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0 if results and all(item["ok"] for item in results) else 1
 
-        raw_url = self.github_url_entry.get().strip()
-        if not raw_url or not raw_url.startswith("https://github.com/"):
-            messagebox.showwarning("下载", "请填写有效的 GitHub 直链（以 https://github.com/ 开头）。")
-            return
 
-        accel = self.github_accel_var.get().strip()
-        final_url = raw_url
-        if accel == "gh-proxy.com":
-            final_url = f"https://gh-proxy.com/{raw_url}"
-        elif accel == "edgeone.gh-proxy.com":
-            final_url = f"https://edgeone.gh-proxy.com/{raw_url}"
+# ====== 批量转写 ======
+BATCH_DIR = CONFIG_DIR / "batch"
+_BATCH_STATE: dict = {}
 
-        dir_var = self._current_variant_dir_var()
-        target_dir = Path(os.path.expanduser(dir_var.get()))
-        target_dir.mkdir(parents=True, exist_ok=True)
 
-        parsed = urlparse(raw_url)
-        fname = Path(parsed.path).name or "model.tar.bz2"
-        tar_path = target_dir / fname
+def _batch_worker_init(config: dict) -> None:
+    """
+    批量转写子进程初始化：每个进程加载一份识别器并常驻。
+    """
+    engine = LocalSherpaEngine(config, logger=logging.getLogger("lexisharp.batch"))
+    spec = engine.resolve_model()
+    method = engine.decoding_methods(spec.model_type)[0]
+    _BATCH_STATE.update(engine=engine, spec=spec, recognizer=engine.load(spec, method))
 
-        def worker() -> None:
+
+def _batch_decode_chunk(paths: List[str]) -> List[dict]:
+    """
+    子进程中批量解码一组文件，decode_streams 失败时逐条回退。
+    """
+    engine: LocalSherpaEngine = _BATCH_STATE["engine"]
+    recognizer = _BATCH_STATE["recognizer"]
+    records: List[dict] = []
+    items: List[tuple["np.ndarray", int]] = []
+    pending: List[dict] = []
+    for path in paths:
+        try:
+            samples, sr = engine.read_wav(path)
+        except Exception as exc:  # pylint: disable=broad-except
+            records.append({"path": path, "error": f"{type(exc).__name__}: {exc}"})
+            continue
+        items.append((engine.prepare_samples(samples, sr), sr))
+        pending.append({"path": path, "duration_s": round(len(samples) / float(sr), 3)})
+    if not items:
+        return records
+
+    started = time.perf_counter()
+    try:
+        texts = LocalSherpaEngine.decode_batch(recognizer, items)
+    except Exception:  # pylint: disable=broad-except
+        texts = []
+        for samples, sr in items:
             try:
-                _set_status("开始下载模型（GitHub）…", "#666666")
-                with requests.get(final_url, stream=True, timeout=30) as r:
-                    r.raise_for_status()
-                    total = int(r.headers.get("Content-Length", 0))
-                    downloaded = 0
-                    with open(tar_path, "wb") as f:
-                        for chunk in r.iter_content(chunk_size=1024 * 1024):
-                            if not chunk:
-                                continue
-                            f.write(chunk)
-                            downloaded += len(chunk)
-                            if total:
-                                mb = downloaded / (1024 * 1024)
-                                tmb = total / (1024 * 1024)
-                                self.window.after(0, _set_status, f"下载中… {mb:.1f}/{tmb:.1f} MB", "#666666")
-                # 解压
-                _set_status("下载完成，正在解压…", "#666666")
-                try:
-                    with tarfile.open(tar_path, mode="r:bz2") as tf:
-                        tf.extractall(path=target_dir)
-                except tarfile.ReadError:
-                    # 不是 tar.bz2，忽略解压
-                    pass
-                try:
-                    tar_path.unlink(missing_ok=True)
-                except Exception:
-                    pass
-                # 自动保存配置并启用本地模型
-                self.window.after(0, _set_status, f"模型已安装：{target_dir}，正在应用配置…", "#388E3C")
-                self.window.after(0, self._apply_local_config_and_enable)
-                self.window.after(200, self._update_local_status)
-            except requests.RequestException as exc:
-                self.app.logger.exception("GitHub 下载失败")
-                self.window.after(0, _set_status, f"下载失败：{exc}", "#D32F2F")
-                # 若使用加速失败，尝试回退原链一次
-                if final_url != raw_url:
-                    try:
-                        with requests.get(raw_url, stream=True, timeout=30) as r:
-                            r.raise_for_status()
-                            with open(tar_path, "wb") as f:
-                                for chunk in r.iter_content(chunk_size=1024 * 1024):
-                                    if chunk:
-                                        f.write(chunk)
-                        self.window.after(0, _set_status, "加速失败，已回退直链并下载完成，正在解压…", "#666666")
-                        import tarfile as _tarfile
-                        try:
-                            with _tarfile.open(tar_path, mode="r:bz2") as tf:
-                                tf.extractall(path=target_dir)
-                        except _tarfile.ReadError:
-                            pass
-                        try:
-                            tar_path.unlink(missing_ok=True)
-                        except Exception:
-                            pass
-                        self.window.after(0, _set_status, f"模型已安装：{target_dir}，正在应用配置…", "#388E3C")
-                        self.window.after(0, self._apply_local_config_and_enable)
-                        self.window.after(200, self._update_local_status)
-                    except Exception as exc2:
-                        self.app.logger.exception("GitHub 直链回退仍失败")
-                        self.window.after(0, _set_status, f"下载失败：{exc2}", "#D32F2F")
-            except Exception as exc:
-                self.app.logger.exception("下载流程异常")
-                self.window.after(0, _set_status, f"下载异常：{exc}", "#D32F2F")
+                texts.append(engine.transcribe_samples(samples, sr, spec=_BATCH_STATE["spec"]) or "")
+            except Exception as exc:  # pylint: disable=broad-except
+                texts.append(exc)
+    decode_ms = (time.perf_counter() - started) * 1000.0
+    for record, text in zip(pending, texts):
+        if isinstance(text, Exception):
+            record["error"] = f"{type(text).__name__}: {text}"
+        else:
+            record["text"] = text
+        record["batch_size"] = len(items)
+        record["elapsed_ms"] = round(decode_ms / len(items), 2)
+        records.append(record)
+    return records
 
-        threading.Thread(target=worker, daemon=True).start()
 
-    def _apply_local_config_and_enable(self) -> None:
-        """下载解压成功后，自动保存配置并启用本地模型，尽量做到“一键即可用”。"""
-        try:
-            updates: dict[str, object] = {
-                "channel": "local_sherpa",
-                "local_sherpa_variant": self.local_variant_var.get().strip().lower() or "small",
-                "local_sherpa_provider": self.local_provider_var.get().strip().lower() or "cpu",
-                "local_sherpa_threads": int(self.local_threads_var.get() or 2),
-                "local_sherpa_model_dir_small": self.local_small_dir_var.get().strip(),
-                "local_sherpa_model_dir_full": self.local_full_dir_var.get().strip(),
-            }
-            self.app.config.update(updates)
-            save_config(self.app.config)
-            # 立即生效
-            self.app._validate_keys(trigger_prompt=False)
-            provider_name = self.app._channel_display_name()
-            self.app.status_var.set(f"配置已自动保存，当前识别渠道：{provider_name}。")
-        except Exception:
-            self.app.logger.exception("自动保存与启用本地模型失败")
+def _wav_duration(path: str) -> Optional[float]:
+    try:
+        with wave.open(path, "rb") as wf:
+            return round(wf.getnframes() / float(wf.getframerate()), 3)
+    except (OSError, wave.Error, ZeroDivisionError):
+        return None
 
-    def _get_config_value(self, key: str, field: dict[str, object]):
-        if key in self.app.config:
-            value = self.app.config[key]
-            if field.get("list"):
-                if isinstance(value, list):
-                    return value
-                if isinstance(value, str):
-                    return [item.strip() for item in value.split(",") if item.strip()]
-            return value
-        return field.get("default", CONFIG_TEMPLATE.get(key))
 
-    def _save(self) -> None:
-        channel_key = self._get_selected_channel_key()
-        updates: dict[str, object] = {"channel": channel_key}
-        if channel_key == "local_sherpa":
-            # 从自定义控件收集配置
-            updates.update({
-                "local_sherpa_variant": self.local_variant_var.get().strip().lower() or "small",
-                "local_sherpa_provider": self.local_provider_var.get().strip().lower() or "cpu",
-                "local_sherpa_threads": int(self.local_threads_var.get() or 4),
-                "local_sherpa_model_dir_small": self.local_small_dir_var.get().strip(),
-                "local_sherpa_model_dir_full": self.local_full_dir_var.get().strip(),
-                "local_sherpa_prefer_int8": bool(self.local_prefer_int8_var.get()),
-                "local_sherpa_trim_silence": bool(self.local_trim_silence_var.get()),
-            })
-        else:
-            fields = self.CHANNEL_FIELDS.get(channel_key, [])
+def _batch_transcribe_one(asr: "ASREngine", path: str) -> List[dict]:
+    """
+    云端/服务渠道：单文件识别（由线程池并发调用）。
+    """
+    record: dict = {"path": path, "duration_s": _wav_duration(path)}
+    started = time.perf_counter()
+    try:
+        record["text"] = asr.transcribe(path, use_cache=True) or ""
+    except Exception as exc:  # pylint: disable=broad-except
+        record["error"] = str(exc)
+    record["elapsed_ms"] = round((time.perf_counter() - started) * 1000.0, 2)
+    return [record]
 
-            for field in fields:
-                key = field["key"]  # type: ignore[index]
-                stored = self.field_widgets.get(key)
-                if not stored:
-                    continue
-                widget = stored.get("widget")
-                entry_type = field.get("type")
 
-                if entry_type == "entry":
-                    value_str = widget.get().strip() if isinstance(widget, tk.Entry) else ""
-                    if field.get("list"):
-                        value = [item.strip() for item in value_str.split(",") if item.strip()]
-                    elif field.get("value_type") is float:
-                        if not value_str:
-                            value_str = str(field.get("default", CONFIG_TEMPLATE.get(key, 0.0)))
-                        try:
-                            value = float(value_str)
-                        except ValueError:
-                            messagebox.showerror("设置", f"{field['label']} 需要填写数字。")  # type: ignore[index]
-                            if isinstance(widget, tk.Entry):
-                                widget.focus_set()
-                            return
-                    else:
-                        value = value_str
-                    updates[key] = value
-                elif entry_type == "boolean":
-                    var = stored.get("variable")
-                    if isinstance(var, tk.BooleanVar):
-                        updates[key] = bool(var.get())
-                elif entry_type == "text":
-                    if isinstance(widget, tk.Text):
-                        updates[key] = widget.get("1.0", tk.END).strip()
+def _load_batch_done(output: Path) -> set[str]:
+    """
+    读取已有结果文件，返回已成功转写的路径（按解析后的绝对路径，同一文件以最后一条记录为准）。
+    末尾被中断的半行会被截断；存在重复或失败记录时重写结果文件，只保留各文件最后一条成功记录，
+    失败的文件随后重试并写入新记录，结果文件中每个文件始终只有一条记录。
+    """
+    if not output.exists():
+        return set()
+    latest: dict[str, bytes] = {}
+    failed: set[str] = set()
+    lines = 0
+    valid_size = 0
+    with output.open("rb") as fp:
+        for line in fp:
+            if not line.endswith(b"\n"):
+                break
+            valid_size += len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not record.get("path"):
+                continue
+            lines += 1
+            key = _batch_path_key(record["path"])
+            latest.pop(key, None)
+            latest[key] = line
+            if "error" in record:
+                failed.add(key)
+            else:
+                failed.discard(key)
+    if failed or lines != len(latest):
+        tmp = output.with_name(f".{output.name}.{uuid4().hex[:8]}.tmp")
+        with tmp.open("wb") as fp:
+            fp.writelines(line for key, line in latest.items() if key not in failed)
+        os.replace(tmp, output)
+    elif valid_size != output.stat().st_size:
+        with output.open("r+b") as fp:
+            fp.truncate(valid_size)
+    return set(latest) - failed
+
+
+def _batch_path_key(path: str) -> str:
+    """
+    结果文件中的路径统一为绝对路径，续跑时不受工作目录与参数写法影响。
+    """
+    return str(Path(os.path.expanduser(path)).resolve())
 
-        candidate_config = dict(self.app.config)
-        candidate_config.update(updates)
-        missing_messages, _ = self.app._collect_missing_fields(candidate_config)
-        if missing_messages:
-            detail = "、".join(missing_messages)
-            messagebox.showwarning("设置", f"保存失败：以下字段仍需填写：{detail}。")
-            return
 
-        try:
-            self.app.config.update(updates)
-            if not self.app._validate_keys(trigger_prompt=False):
-                messagebox.showwarning("设置", "仍有必填项缺失，请继续完善。")
-                return
-            save_config(self.app.config)
-            self.app.logger.info("配置已通过设置窗口更新：%s", updates.keys())
-            provider_name = self.app._channel_display_name()
-            self.app.status_var.set(f"配置已保存，当前识别渠道：{provider_name}。")
-            messagebox.showinfo("设置", "配置已保存。")
-            self.close()
-        except Exception as exc:
-            self.app.logger.exception("保存配置失败")
-            messagebox.showerror("设置", f"保存失败：{exc}")
+def _cached_batch_result(asr: "ASREngine", channel: str, path: str, keys: dict):
+    """
+    查询识别缓存：命中时返回已完成的 Future（结果与解码任务相同的记录列表），未命中时记下缓存键并返回 None。
+    """
+    key = asr._cache_key(channel, path)
+    if key is None:
+        return None
+    text = asr.cache.get(key)
+    if text is None:
+        keys[path] = key
+        return None
+    future: concurrent.futures.Future = concurrent.futures.Future()
+    future.set_result([{"path": path, "duration_s": _wav_duration(path), "text": text, "cached": True}])
+    return future
 
-    def close(self) -> None:
-        try:
-            self.window.grab_release()
-        except Exception:
-            pass
-        try:
-            self.app._unregister_window(self.window)
-        except Exception:
-            pass
-        if self.window.winfo_exists():
-            self.window.destroy()
-        self.app._on_settings_closed()
 
-    def _on_canvas_configure(self, event: tk.Event) -> None:  # type: ignore[type-arg]
-        try:
-            self.canvas.itemconfigure(self._canvas_window, width=event.width)
-        except Exception:
-            pass
-        self._update_scroll_region()
+def _local_batch_tasks(asr: "ASREngine", files, size: int, keys: dict):
+    """
+    本地模型的批量任务：缓存命中的文件直接产出结果，其余每 size 个文件组成一次 decode_streams。
+    """
+    chunk: List[str] = []
+    for path in files:
+        cached = _cached_batch_result(asr, "local_sherpa", path, keys)
+        if cached is not None:
+            yield cached
+            continue
+        chunk.append(path)
+        if len(chunk) >= size:
+            yield (_batch_decode_chunk, chunk)
+            chunk = []
+    if chunk:
+        yield (_batch_decode_chunk, chunk)
+
+
+def run_batch(args: argparse.Namespace, config: dict, logger: logging.Logger) -> int:
+    """
+    批量转写目录/文件，结果逐行写入 JSONL，重复运行时跳过已完成的文件。
+    """
+    config = dict(config)
+    if args.channel:
+        config["channel"] = args.channel
+    if args.no_cache:
+        config["transcript_cache_enabled"] = False
+    channel = (config.get("channel") or "volcengine").strip().lower()
+    is_local = channel in {"local_sherpa", "local", "sherpa"}
+    if is_local:
+        if not LocalSherpaEngine.is_available():
+            print("本地引擎不可用：请先安装 sherpa-onnx onnxruntime numpy。", file=sys.stderr)
+            return 2
+        if args.model_dir:
+            config[f"local_sherpa_model_dir_{config.get('local_sherpa_variant') or 'small'}"] = args.model_dir
+        config["local_sherpa_threads"] = max(1, args.threads)
+    asr = ASREngine(config, logger)
+    missing, _ = asr.collect_missing_fields(config)
+    if missing:
+        print(f"配置缺失：{'、'.join(missing)}", file=sys.stderr)
+        return 2
+
+    BATCH_DIR.mkdir(parents=True, exist_ok=True)
+    output = Path(args.output).expanduser() if args.output else BATCH_DIR / "batch.jsonl"
+    if args.no_resume:
+        # 不续跑时清空旧结果，避免同一文件重复出现
+        output.write_text("", encoding="utf-8")
+        done: set[str] = set()
+    else:
+        done = _load_batch_done(output)
+    if done:
+        print(f"续跑：跳过 {len(done)} 个已完成文件（{output}）", file=sys.stderr)
+    files = (path for path in map(_batch_path_key, _iter_wav_files(args.paths)) if path not in done)
+    # 本地模型在子进程中解码，识别缓存由主进程查询与写入（云端渠道经 asr.transcribe 自动使用缓存）
+    cache_keys: dict = {}
+
+    if is_local:
+        jobs = args.jobs or max(1, (os.cpu_count() or 1) // max(1, args.threads))
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=jobs,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_batch_worker_init,
+            initargs=(config,),
+        )
+        tasks = _local_batch_tasks(asr, files, max(1, args.batch_size), cache_keys)
+    else:
+        jobs = args.jobs or 4
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="BatchASR")
+        tasks = ((_batch_transcribe_one, asr, path) for path in files)
+    logger.info("批量转写：渠道=%s，并发=%d，输出=%s", channel, jobs, output)
+    print(f"渠道：{asr.display_name()}，并发：{jobs}，输出：{output}", file=sys.stderr)
+
+    stats = {"completed": 0, "failed": 0, "audio": 0.0}
+    started = time.perf_counter()
+    # 同时在途的任务数有上限，文件再多内存占用也保持平稳
+    max_inflight = jobs * 2
+    inflight: set = set()
+    interrupted = False
+    with output.open("a", encoding="utf-8") as out:
+
+        def write_results(finished) -> None:
+            for future in finished:
+                for record in future.result():
+                    key = cache_keys.pop(record["path"], None)
+                    if key is not None and record.get("text"):
+                        asr.cache.put(key, record["text"], {"channel": "local_sherpa", "duration_s": record.get("duration_s")})
+                    record["channel"] = channel
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    stats["completed"] += 1
+                    stats["failed"] += 1 if "error" in record else 0
+                    stats["audio"] += float(record.get("duration_s") or 0.0)
+            out.flush()
+            print(f"\r已完成 {stats['completed']}（失败 {stats['failed']}）", end="", file=sys.stderr)
 
-    def _update_scroll_region(self) -> None:
         try:
-            self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        except Exception:
-            pass
+            for task in tasks:
+                inflight.add(task if isinstance(task, concurrent.futures.Future) else executor.submit(*task))
+                if len(inflight) >= max_inflight:
+                    finished, inflight = concurrent.futures.wait(
+                        inflight, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    write_results(finished)
+            write_results(concurrent.futures.as_completed(inflight))
+        except KeyboardInterrupt:
+            interrupted = True
+            print("\n已中断，重新运行同一命令即可从断点继续。", file=sys.stderr)
+        except concurrent.futures.process.BrokenProcessPool as exc:
+            interrupted = True
+            logger.error("批量转写子进程异常退出：%s", exc)
+            print(f"\n子进程异常退出：{exc}", file=sys.stderr)
+        finally:
+            executor.shutdown(wait=not interrupted, cancel_futures=True)
+            asr.close()
+
+    wall = time.perf_counter() - started
+    completed, failed, audio_total = stats["completed"], stats["failed"], stats["audio"]
+    print(
+        f"\n完成 {completed} 个文件，失败 {failed}，音频 {audio_total:.1f}s，耗时 {wall:.1f}s"
+        + (f"，实时倍率 {audio_total / wall:.1f}x" if wall > 0 and audio_total else ""),
+        file=sys.stderr,
+    )
+    cache_stats = asr.cache.stats()
+    if cache_stats["hits"] or cache_stats["misses"]:
+        print(f"识别缓存：命中 {cache_stats['hits']}，未命中 {cache_stats['misses']}", file=sys.stderr)
+    logger.info("批量转写结束：完成=%d，失败=%d，音频=%.1fs，耗时=%.1fs", completed, failed, audio_total, wall)
+    if interrupted:
+        return 130
+    return 1 if failed else 0
 
-    def _on_mousewheel(self, event: tk.Event) -> None:  # type: ignore[type-arg]
-        try:
-            delta = 0
-            if hasattr(event, "delta") and event.delta:
-                delta = -1 if event.delta > 0 else 1
-            else:
-                if getattr(event, "num", None) == 4:
-                    delta = -1
-                elif getattr(event, "num", None) == 5:
-                    delta = 1
-            if delta:
-                self.canvas.yview_scroll(delta, "units")
-        except Exception:
-            pass
+
+def run_local_server(args: argparse.Namespace, config: dict, logger: logging.Logger) -> int:
+    """
+    启动多用户共享的本地识别服务。
+    """
+    if not LocalSherpaEngine.is_available():
+        print("本地引擎不可用：请先安装 sherpa-onnx onnxruntime numpy。", file=sys.stderr)
+        return 2
+    models: dict[str, str] = {}
+    for item in args.model or []:
+        name, sep, model_dir = item.partition("=")
+        if not sep or not name.strip() or not model_dir.strip():
+            print(f"无效的 --model 参数：{item}（格式 NAME=DIR）", file=sys.stderr)
+            return 2
+        models[name.strip()] = model_dir.strip()
+    if not models:
+        for variant in ("small", "full"):
+            candidate = str(config.get(f"local_sherpa_model_dir_{variant}") or "").strip()
+            if candidate and Path(os.path.expanduser(candidate)).exists():
+                models[variant] = candidate
+    default_model = args.default_model or str(config.get("local_sherpa_variant") or "small")
+
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(name)s - %(message)s"))
+    logger.addHandler(console)
+    try:
+        server = LocalASRServer(
+            config,
+            logger,
+            socket_path=args.socket or str(config.get("local_server_socket") or CONFIG_TEMPLATE["local_server_socket"]),
+            models=models,
+            default_model=default_model,
+            max_batch=args.max_batch,
+            batch_window_ms=args.batch_window_ms,
+            socket_mode=int(args.socket_mode, 8),
+        )
+        if args.preload:
+            server.preload()
+    except (RuntimeError, ValueError) as exc:
+        print(f"启动本地识别服务失败：{exc}", file=sys.stderr)
+        return 2
+    signal.signal(signal.SIGTERM, lambda *_: server.shutdown())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError as exc:
+        print(f"本地识别服务异常：{exc}", file=sys.stderr)
+        return 1
+    logger.info("本地识别服务已停止。")
+    return 0
 
 
-def main() -> None:
+def build_arg_parser() -> argparse.ArgumentParser:
+    """
+    构造命令行参数解析器；不带子命令时启动图形界面。
+    """
+    parser = argparse.ArgumentParser(prog="lexisharp", description="LexiSharp-linux 语音输入工具")
+    subparsers = parser.add_subparsers(dest="command")
+
+    bench = subparsers.add_parser("bench", help="本地引擎基准测试（冷启动、RTF、延迟分位、峰值内存）")
+    bench.add_argument("--wav", action="append", metavar="PATH", help="WAV 文件或目录，可重复指定")
+    bench.add_argument("--synthetic", metavar="SECONDS", help="合成音频时长列表，如 1,3,10（未指定 --wav 时默认）")
+    bench.add_argument("--model-dir", action="append", metavar="DIR", help="模型目录，可重复指定；默认使用已安装的 small/full")
+    bench.add_argument("--provider", help="执行提供者列表，如 cpu,cuda")
+    bench.add_argument("--threads", help="线程数列表，如 1,2,4")
+    bench.add_argument("--prefer-int8", help="是否优先量化模型，如 true,false")
+    bench.add_argument("--decoding", help="解码方法列表，如 greedy_search,modified_beam_search")
+    bench.add_argument("--repeat", type=int, default=3, help="热态测量轮数（默认 3）")
+    bench.add_argument("--warmup", type=int, default=1, help="热身轮数（默认 1）")
+    bench.add_argument("--timeout", type=float, default=600.0, help="单个配置的超时时间（秒）")
+    bench.add_argument("--output", metavar="FILE", help="结果 JSON 路径，默认 ~/.lexisharp-linux/bench/")
+
+    upload_bench = subparsers.add_parser("upload-bench", help="用本地替身服务测量 Soniox 边录边传节省的延迟")
+    upload_bench.add_argument("--wav", metavar="PATH", help="回放的 16-bit 单声道 WAV，默认合成音频")
+    upload_bench.add_argument("--seconds", type=float, default=10.0, help="合成音频时长（秒，默认 10）")
+    upload_bench.add_argument("--uplink-kbps", type=float, default=1000.0, help="模拟上行带宽（kbps，默认 1000）")
+    upload_bench.add_argument("--processing-ms", type=float, default=300.0, help="模拟服务端转写耗时（毫秒，默认 300）")
+    upload_bench.add_argument("--speed", type=float, default=1.0, help="回放速度倍数（默认 1，即实时）")
+    upload_bench.add_argument("--repeat", type=int, default=2, help="每种方式的测量轮数（默认 2）")
+
+    stream_mock = subparsers.add_parser("stream-mock", help="本地流式识别替身服务（火山引擎/Soniox WebSocket 协议），用于离线调试")
+    stream_mock.add_argument("--host", default="127.0.0.1", help="监听地址（默认 127.0.0.1）")
+    stream_mock.add_argument("--port", type=int, default=18765, help="监听端口（默认 18765）")
+    stream_mock.add_argument("--latency-ms", type=float, default=0.0, help="模拟每条应答的网络往返（毫秒）")
+
+    type_bench = subparsers.add_parser("type-bench", help="X11 模拟键入基准测试：XTest 与 xdotool 的字符/秒（建议在 Xvfb 中运行）")
+    type_bench.add_argument("--chars", type=int, default=500, help="键入的字符数（默认 500）")
+    type_bench.add_argument("--charset", choices=sorted(TYPE_BENCH_SAMPLES), default="ascii", help="文本内容：ascii 或 mixed（含中文）")
+    type_bench.add_argument("--engines", help="参与比较的引擎列表，默认 xtest,xdotool")
+    type_bench.add_argument("--repeat", type=int, default=3, help="每个引擎的测量轮数（默认 3）")
+    type_bench.add_argument("--output", metavar="FILE", help="结果 JSON 路径")
+
+    batch = subparsers.add_parser("batch", help="批量转写目录中的 WAV 文件，结果写入 JSONL（支持断点续跑）")
+    batch.add_argument("paths", nargs="+", metavar="PATH", help="WAV 文件或目录（递归查找 *.wav）")
+    batch.add_argument("-o", "--output", metavar="FILE", help="结果 JSONL 路径，默认 ~/.lexisharp-linux/batch/batch.jsonl")
+    batch.add_argument("--channel", help="识别渠道，默认使用配置中的 channel")
+    batch.add_argument("--model-dir", help="本地模型目录，默认使用配置中的 small/full 目录")
+    batch.add_argument("--jobs", type=int, default=0, help="并发数：本地模型为进程数（默认 CPU 核数/线程数），云端默认 4")
+    batch.add_argument("--threads", type=int, default=1, help="本地模型每个进程的 onnxruntime 线程数（默认 1）")
+    batch.add_argument("--batch-size", type=int, default=8, help="本地模型单次 decode_streams 的文件数（默认 8）")
+    batch.add_argument("--no-resume", action="store_true", help="忽略已有结果，全部重新转写")
+    batch.add_argument("--no-cache", action="store_true", help="绕过识别缓存（不读取也不写入）")
+
+    server = subparsers.add_parser("server", help="多用户共享的本地识别服务（Unix 套接字）")
+    server.add_argument("--socket", metavar="PATH", help="监听的套接字路径，默认取 local_server_socket")
+    server.add_argument("--model", action="append", metavar="NAME=DIR", help="模型名称与目录，可重复指定；默认使用已安装的 small/full")
+    server.add_argument("--default-model", metavar="NAME", help="客户端未指定模型时使用的模型")
+    server.add_argument("--max-batch", type=int, default=8, help="单次 decode_streams 的最大批大小（默认 8）")
+    server.add_argument("--batch-window-ms", type=float, default=15.0, help="聚合并发请求的等待窗口（毫秒，默认 15）")
+    server.add_argument("--socket-mode", default="666", help="套接字文件权限（八进制，默认 666）")
+    server.add_argument("--preload", action="store_true", help="启动时立即加载全部模型")
+
+    daemon = subparsers.add_parser("daemon", help="无界面常驻模式，通过控制套接字或快捷键触发听写")
+    daemon.add_argument("--socket", metavar="PATH", help="控制套接字路径，默认 $XDG_RUNTIME_DIR/lexisharp.sock")
+    daemon.add_argument("--no-hotkeys", action="store_true", help="不注册全局快捷键（交由窗口管理器绑定 ctl 命令）")
+
+    add_ctl_arguments(subparsers.add_parser("ctl", help="控制常驻进程"))
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
     """
     应用入口。
     """
+    args = build_arg_parser().parse_args(argv)
     config = ensure_config()
+    if args.command == "ctl":
+        raise SystemExit(run_ctl(args, config))
     logger = setup_logging(config.get("log_level", "INFO"))
     logger.info("LexiSharp-linux 启动，配置路径：%s", CONFIG_PATH)
 
+    if args.command == "bench":
+        raise SystemExit(run_benchmark(args, config, logger))
+    if args.command == "upload-bench":
+        raise SystemExit(run_upload_bench(args, config, logger))
+    if args.command == "stream-mock":
+        raise SystemExit(run_stream_mock(args, config, logger))
+    if args.command == "type-bench":
+        raise SystemExit(run_type_bench(args, config, logger))
+    if args.command == "batch":
+        raise SystemExit(run_batch(args, config, logger))
+    if args.command == "server":
+        raise SystemExit(run_local_server(args, config, logger))
+    if args.command == "daemon":
+        raise SystemExit(run_daemon(args, config, logger))
+
     root = tk.Tk()
     app = LexiSharpApp(root, config, logger)
     root.mainloop()
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
@@ -28,6 +28,8 @@ a = Analysis(
         'Xlib.display',
         'Xlib.X',
         'Xlib.ext.xtest',
+        'Xlib.XK',
+        'Xlib.protocol.event',
         'dbus_next',
         'dbus_next.constants',
         'dbus_next.errors',